@@ -0,0 +1,312 @@
+"""
+In-process Kafka consumer group ingestion
+Consumes the source topics in batches with confluent-kafka, persists each batch to the
+database, hands it to the reconciliation shards, and only then commits the offsets
+"""
+import json
+import os
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from confluent_kafka import Consumer, KafkaError, KafkaException, TopicPartition
+except ImportError:  # the local broker stand-in still works without the client library
+    Consumer = None
+    KafkaError = None
+    KafkaException = Exception
+    try:
+        from consumers.local_broker import TopicPartition
+    except ImportError:
+        from app.consumers.local_broker import TopicPartition
+
+logger = logging.getLogger(__name__)
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
+KAFKA_GROUP_ID = os.getenv("KAFKA_GROUP_ID", "reconciliation-engine")
+KAFKA_TOPICS = os.getenv("KAFKA_TOPICS", "core_txns,gateway_txns,mobile_txns").split(",")
+KAFKA_BATCH_SIZE = int(os.getenv("KAFKA_BATCH_SIZE", 500))
+KAFKA_POLL_TIMEOUT = float(os.getenv("KAFKA_POLL_TIMEOUT", 1.0))
+# Group members started by this process; Kafka spreads the partitions over them
+KAFKA_CONSUMER_THREADS = int(os.getenv("KAFKA_CONSUMER_THREADS", 1))
+# Route by partition instead of txn_id hash. Only correct when every producer keys by
+# txn_id with the same partitioner and all source topics have the same partition count.
+KAFKA_SHARD_BY_PARTITION = os.getenv("KAFKA_SHARD_BY_PARTITION", "false").lower() in ("1", "true", "yes")
+
+# Backoff while the database is rejecting whole batches
+PERSIST_RETRY_MIN = 0.5
+PERSIST_RETRY_MAX = 30.0
+# A batch still waiting for the batch writer's commit after this long is logged (and waited for)
+PERSIST_TIMEOUT = float(os.getenv("KAFKA_PERSIST_TIMEOUT", 60.0))
+
+def _db_service():
+    try:
+        from services.database_service import db_service
+    except ImportError:
+        from app.services.database_service import db_service
+    return db_service
+
+def _batch_writer():
+    try:
+        from services.batch_writer import batch_writer
+    except ImportError:
+        from app.services.batch_writer import batch_writer
+    return batch_writer
+
+def default_persist(transactions: List[dict]) -> bool:
+    """Persist a batch through the shared batch writer, blocking until its flush commits.
+    
+    Batches from every consumer thread that arrive within one flush window
+    are written together, so the offsets committed afterwards always point
+    at durable rows. A slow flush is waited for, not treated as a failure:
+    its rows are still buffered and will commit, so retrying them here
+    would insert them twice.
+    """
+    ticket = _batch_writer().save_transactions(transactions)
+    while not ticket.wait(PERSIST_TIMEOUT):
+        if ticket.done:
+            return False
+        logger.warning(f"⏳ Batch of {len(transactions)} transactions not committed after {PERSIST_TIMEOUT:.0f}s; still waiting")
+    return True
+
+def default_persist_one(transaction: dict) -> bool:
+    """Persist a single transaction (used to isolate bad rows of a rejected batch)"""
+    return _db_service().save_transaction(transaction)
+
+class KafkaGroupConsumer:
+    """One member of the reconciliation consumer group.
+    
+    Offsets are committed manually, after the batch is in the database and
+    queued on the engine shards, so every committed message has its
+    transactions row (a crash replays at most the last uncommitted batch)
+    and a restart resumes from the group's committed position instead of
+    replaying the topics from the beginning.
+    
+    Reconciliation is not replayed: sources still in a shard queue or the
+    in-memory pending store when the process dies are not reconciled after
+    the restart, and their rows stay PENDING. With the redis pending store
+    (RECONCILIATION_PENDING_STORE=redis) only the shard queues are lost.
+    
+    consumer_factory builds the underlying consumer from a config dict;
+    it defaults to confluent_kafka.Consumer and can be LocalBroker.consumer
+    to run against the in-memory stand-in.
+    """
+    
+    def __init__(self, engine, topics: Optional[List[str]] = None, group_id: str = KAFKA_GROUP_ID,
+                 bootstrap_servers: str = KAFKA_BOOTSTRAP_SERVERS, batch_size: int = KAFKA_BATCH_SIZE,
+                 poll_timeout: float = KAFKA_POLL_TIMEOUT, shard_by_partition: bool = KAFKA_SHARD_BY_PARTITION,
+                 persist: Callable[[List[dict]], bool] = default_persist,
+                 persist_one: Optional[Callable[[dict], bool]] = default_persist_one,
+                 consumer_factory: Optional[Callable[[dict], object]] = None, name: str = "consumer-0"):
+        self.engine = engine
+        self.topics = topics or KAFKA_TOPICS
+        self.batch_size = batch_size
+        self.poll_timeout = poll_timeout
+        self.shard_by_partition = shard_by_partition
+        self.persist = persist
+        self.persist_one = persist_one
+        self.name = name
+        self.config = {
+            'bootstrap.servers': bootstrap_servers,
+            'group.id': group_id,
+            'enable.auto.commit': False,
+            'auto.offset.reset': 'earliest',
+            'enable.partition.eof': False,
+            'client.id': f"{group_id}-{name}"
+        }
+        
+        if consumer_factory is None:
+            if Consumer is None:
+                raise ImportError("confluent-kafka is required for KafkaGroupConsumer (or pass consumer_factory)")
+            consumer_factory = Consumer
+        self.consumer_factory = consumer_factory
+        
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.assignment: List[Tuple[str, int]] = []
+        self.retry_delay = PERSIST_RETRY_MIN
+        self.stats = {
+            'consumed': 0,
+            'persisted': 0,
+            'committed_batches': 0,
+            'invalid': 0,
+            'dropped': 0,
+            'persist_failures': 0,
+            'commit_failures': 0,
+            'rebalances': 0
+        }
+    
+    # ==================== LIFECYCLE ====================
+    
+    def start(self):
+        """Run the consume loop in a background thread"""
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"kafka-{self.name}", daemon=True)
+        self.thread.start()
+    
+    def stop(self, timeout: float = 10):
+        """Finish the in-flight batch, commit it and leave the group"""
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+    
+    def run(self):
+        """Consume, persist, dispatch and commit until stopped"""
+        consumer = self.consumer_factory(self.config)
+        consumer.subscribe(self.topics, on_assign=self._on_assign, on_revoke=self._on_revoke)
+        logger.info(f"✅ [{self.name}] Joined group {self.config['group.id']} for topics {self.topics}")
+        
+        try:
+            while self.running:
+                try:
+                    messages = consumer.consume(num_messages=self.batch_size, timeout=self.poll_timeout)
+                except KafkaException as e:
+                    logger.error(f"❌ [{self.name}] Consume failed: {e}")
+                    time.sleep(self.poll_timeout)
+                    continue
+                
+                if messages:
+                    self.process_batch(consumer, messages)
+        finally:
+            consumer.close()
+            logger.info(f"🛑 [{self.name}] Left consumer group")
+    
+    # ==================== BATCH HANDLING ====================
+    
+    def process_batch(self, consumer, messages: list):
+        """Persist, dispatch and commit one consumed batch"""
+        transactions = []
+        partitions = []
+        offsets: Dict[Tuple[str, int], List[int]] = {}  # {(topic, partition): [first, last]}
+        
+        for message in messages:
+            error = message.error()
+            if error is not None:
+                if KafkaError is None or error.code() != KafkaError._PARTITION_EOF:
+                    logger.error(f"❌ [{self.name}] Kafka error: {error}")
+                continue
+            
+            tp = (message.topic(), message.partition())
+            if tp in offsets:
+                offsets[tp][1] = message.offset()
+            else:
+                offsets[tp] = [message.offset(), message.offset()]
+            
+            transaction = self._decode(message)
+            if transaction is not None:
+                transactions.append(transaction)
+                partitions.append(message.partition())
+        
+        self.stats['consumed'] += len(messages)
+        
+        if transactions:
+            persisted = self._persist(transactions)
+            if persisted is None:
+                # Database unavailable: rewind and retry the same batch, nothing committed
+                for (topic, partition), (first, _) in offsets.items():
+                    consumer.seek(TopicPartition(topic, partition, first))
+                time.sleep(self.retry_delay)
+                self.retry_delay = min(self.retry_delay * 2, PERSIST_RETRY_MAX)
+                return
+            self.retry_delay = PERSIST_RETRY_MIN
+            
+            for transaction, partition in zip(transactions, partitions):
+                if id(transaction) in persisted:
+                    self._dispatch(transaction, partition)
+        
+        self._commit(consumer, offsets)
+    
+    def _decode(self, message) -> Optional[dict]:
+        """Parse a JSON transaction; None (and counted) if it is unusable"""
+        try:
+            transaction = json.loads(message.value())
+        except (TypeError, ValueError):
+            logger.warning(f"❌ [{message.topic()}] Invalid JSON at offset {message.offset()}")
+            self.stats['invalid'] += 1
+            return None
+        
+        if not isinstance(transaction, dict) or not transaction.get('txn_id') or not transaction.get('source'):
+            logger.warning(f"❌ [{message.topic()}] Missing txn_id or source at offset {message.offset()}")
+            self.stats['invalid'] += 1
+            return None
+        return transaction
+    
+    def _persist(self, transactions: List[dict]) -> Optional[set]:
+        """Save the batch; returns ids of the saved transactions, or None to retry the batch.
+        
+        A rejected batch is retried row by row so one bad record cannot block
+        the partition: rows that still fail are dropped (and logged), unless
+        every row fails, which means the database itself is down.
+        """
+        if self.persist(transactions):
+            self.stats['persisted'] += len(transactions)
+            return {id(transaction) for transaction in transactions}
+        
+        self.stats['persist_failures'] += 1
+        if self.persist_one is None or len(transactions) == 1:
+            return None
+        
+        saved = {id(transaction) for transaction in transactions if self.persist_one(transaction)}
+        if not saved:
+            return None
+        
+        dropped = len(transactions) - len(saved)
+        self.stats['persisted'] += len(saved)
+        if dropped:
+            self.stats['dropped'] += dropped
+            logger.error(f"❌ [{self.name}] Dropped {dropped} transactions the database rejected")
+        return saved
+    
+    def _dispatch(self, transaction: dict, partition: int):
+        """Hand a persisted transaction to its engine shard"""
+        if self.shard_by_partition:
+            self.engine.add_transaction(transaction, shard=partition % self.engine.num_shards)
+        else:
+            self.engine.add_transaction(transaction)
+    
+    def _commit(self, consumer, offsets: Dict[Tuple[str, int], List[int]]):
+        """Synchronously commit the next offset of every partition in the batch"""
+        if not offsets:
+            return
+        try:
+            consumer.commit(offsets=[TopicPartition(topic, partition, last + 1)
+                                     for (topic, partition), (_, last) in offsets.items()],
+                            asynchronous=False)
+            self.stats['committed_batches'] += 1
+        except KafkaException as e:
+            # Typically a rebalance took the partitions away; the new owner replays them
+            self.stats['commit_failures'] += 1
+            logger.warning(f"⚠️ [{self.name}] Offset commit failed: {e}")
+    
+    # ==================== REBALANCE CALLBACKS ====================
+    
+    def _on_assign(self, consumer, partitions):
+        self.assignment = [(tp.topic, tp.partition) for tp in partitions]
+        self.stats['rebalances'] += 1
+        if self.shard_by_partition:
+            mapping = ", ".join(f"{tp.topic}[{tp.partition}]→shard {tp.partition % self.engine.num_shards}"
+                                for tp in partitions)
+            logger.info(f"🔄 [{self.name}] Assigned {mapping or 'no partitions'}")
+        else:
+            logger.info(f"🔄 [{self.name}] Assigned {len(partitions)} partitions")
+    
+    def _on_revoke(self, consumer, partitions):
+        # Batches commit synchronously before the next consume(), so nothing is outstanding here
+        logger.info(f"🔄 [{self.name}] Revoked {len(partitions)} partitions")
+        self.assignment = []
+    
+    def get_status(self) -> dict:
+        return {
+            'name': self.name,
+            'running': self.running and bool(self.thread and self.thread.is_alive()),
+            'assignment': [f"{topic}[{partition}]" for topic, partition in self.assignment],
+            **self.stats
+        }
+
+def start_group_consumers(engine, count: int = KAFKA_CONSUMER_THREADS, **options) -> List[KafkaGroupConsumer]:
+    """Start count members of the consumer group in this process"""
+    consumers = [KafkaGroupConsumer(engine, name=f"consumer-{index}", **options) for index in range(max(1, count))]
+    for consumer in consumers:
+        consumer.start()
+    return consumers
@@ -0,0 +1,209 @@
+"""
+In-memory stand-in for a Kafka cluster
+Implements the slice of the confluent-kafka Consumer API that KafkaGroupConsumer uses
+(subscribe with rebalance callbacks, batched consume, seek, manual commit), so the
+ingestion path can run end to end without a broker
+"""
+import zlib
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+class TopicPartition:
+    """Mirror of confluent_kafka.TopicPartition (topic, partition, offset)"""
+    
+    def __init__(self, topic: str, partition: int = -1, offset: int = -1001):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+    
+    def __repr__(self):
+        return f"TopicPartition({self.topic!r}, {self.partition}, {self.offset})"
+
+class LocalMessage:
+    """Mirror of confluent_kafka.Message accessors"""
+    
+    __slots__ = ('_topic', '_partition', '_offset', '_key', '_value')
+    
+    def __init__(self, topic: str, partition: int, offset: int, key: Optional[bytes], value: bytes):
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._key = key
+        self._value = value
+    
+    def topic(self) -> str:
+        return self._topic
+    
+    def partition(self) -> int:
+        return self._partition
+    
+    def offset(self) -> int:
+        return self._offset
+    
+    def key(self) -> Optional[bytes]:
+        return self._key
+    
+    def value(self) -> bytes:
+        return self._value
+    
+    def error(self):
+        return None
+
+class LocalBroker:
+    """Topics of fixed partition count, committed offsets per group, and range-style group assignment.
+    
+    Keyed messages go to crc32(key) % partitions (stable across processes), so
+    every source topic puts the same txn_id on the same partition number.
+    """
+    
+    def __init__(self, partitions: int = 3):
+        self.partitions = partitions
+        self.logs: Dict[str, List[List[LocalMessage]]] = {}
+        self.committed: Dict[str, Dict[Tuple[str, int], int]] = defaultdict(dict)  # {group: {(topic, partition): offset}}
+        self.members: Dict[str, List['LocalConsumer']] = defaultdict(list)
+        self.round_robin = 0
+        self.cond = threading.Condition()
+    
+    def create_topic(self, topic: str):
+        with self.cond:
+            self.logs.setdefault(topic, [[] for _ in range(self.partitions)])
+    
+    def produce(self, topic: str, value, key=None, partition: Optional[int] = None) -> Tuple[int, int]:
+        """Append a message; returns (partition, offset)"""
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        
+        with self.cond:
+            self.create_topic(topic)
+            if partition is None:
+                if key is not None:
+                    partition = zlib.crc32(key) % self.partitions
+                else:
+                    partition = self.round_robin % self.partitions
+                    self.round_robin += 1
+            log = self.logs[topic][partition]
+            log.append(LocalMessage(topic, partition, len(log), key, value))
+            self.cond.notify_all()
+            return partition, len(log) - 1
+    
+    def consumer(self, config: dict) -> 'LocalConsumer':
+        """Factory with the signature of confluent_kafka.Consumer(config)"""
+        return LocalConsumer(self, config)
+    
+    def committed_offsets(self, group: str) -> Dict[Tuple[str, int], int]:
+        with self.cond:
+            return dict(self.committed[group])
+    
+    def lag(self, group: str) -> int:
+        """Messages not yet committed by the group, over all topics"""
+        with self.cond:
+            committed = self.committed[group]
+            return sum(len(log) - committed.get((topic, partition), 0)
+                       for topic, logs in self.logs.items() for partition, log in enumerate(logs))
+    
+    def _rebalance(self, group: str):
+        """Spread the group's subscribed partitions over its members (caller holds cond)"""
+        members = self.members[group]
+        topics = sorted({topic for member in members for topic in member.topics})
+        for topic in topics:
+            self.create_topic(topic)
+        partitions = [(topic, partition) for topic in topics for partition in range(self.partitions)]
+        
+        for index, member in enumerate(members):
+            assigned = [tp for position, tp in enumerate(partitions)
+                        if position % len(members) == index and tp[0] in member.topics]
+            member._pending_assignment = assigned
+        self.cond.notify_all()
+
+class LocalConsumer:
+    """One member of a consumer group on a LocalBroker"""
+    
+    def __init__(self, broker: LocalBroker, config: dict):
+        self.broker = broker
+        self.group = config.get('group.id', 'default')
+        self.topics: List[str] = []
+        self.assigned: List[Tuple[str, int]] = []
+        self.positions: Dict[Tuple[str, int], int] = {}
+        self.on_assign: Optional[Callable] = None
+        self.on_revoke: Optional[Callable] = None
+        self._pending_assignment: Optional[List[Tuple[str, int]]] = None
+        self.closed = False
+    
+    def subscribe(self, topics: List[str], on_assign: Optional[Callable] = None, on_revoke: Optional[Callable] = None):
+        with self.broker.cond:
+            self.topics = list(topics)
+            self.on_assign = on_assign
+            self.on_revoke = on_revoke
+            if self not in self.broker.members[self.group]:
+                self.broker.members[self.group].append(self)
+            self.broker._rebalance(self.group)
+    
+    def _serve_rebalance(self):
+        """Run rebalance callbacks from inside consume(), like librdkafka does"""
+        with self.broker.cond:
+            pending, self._pending_assignment = self._pending_assignment, None
+        if pending is None:
+            return
+        
+        if self.assigned and self.on_revoke:
+            self.on_revoke(self, [TopicPartition(topic, partition) for topic, partition in self.assigned])
+        
+        with self.broker.cond:
+            committed = self.broker.committed[self.group]
+            self.assigned = pending
+            self.positions = {tp: committed.get(tp, 0) for tp in pending}  # auto.offset.reset=earliest
+        
+        if self.on_assign:
+            self.on_assign(self, [TopicPartition(topic, partition, self.positions[(topic, partition)])
+                                  for topic, partition in pending])
+    
+    def consume(self, num_messages: int = 1, timeout: float = -1) -> List[LocalMessage]:
+        deadline = time.monotonic() + (timeout if timeout >= 0 else 3600)
+        while not self.closed:
+            self._serve_rebalance()
+            with self.broker.cond:
+                messages = []
+                for tp in self.assigned:
+                    log = self.broker.logs[tp[0]][tp[1]]
+                    position = self.positions[tp]
+                    taken = log[position:position + num_messages - len(messages)]
+                    messages.extend(taken)
+                    self.positions[tp] = position + len(taken)
+                    if len(messages) >= num_messages:
+                        break
+                if messages:
+                    return messages
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self.broker.cond.wait(remaining)
+        return []
+    
+    def seek(self, partition: TopicPartition):
+        with self.broker.cond:
+            tp = (partition.topic, partition.partition)
+            if tp in self.positions:
+                self.positions[tp] = partition.offset
+    
+    def commit(self, message=None, offsets: Optional[List[TopicPartition]] = None, asynchronous: bool = True):
+        with self.broker.cond:
+            committed = self.broker.committed[self.group]
+            for tp in offsets or []:
+                if (tp.topic, tp.partition) in self.positions:
+                    committed[(tp.topic, tp.partition)] = tp.offset
+        return offsets
+    
+    def assignment(self) -> List[TopicPartition]:
+        return [TopicPartition(topic, partition) for topic, partition in self.assigned]
+    
+    def close(self):
+        with self.broker.cond:
+            self.closed = True
+            if self in self.broker.members[self.group]:
+                self.broker.members[self.group].remove(self)
+                self.broker._rebalance(self.group)
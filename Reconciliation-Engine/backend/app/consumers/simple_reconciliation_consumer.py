@@ -1,6 +1,3 @@
-import subprocess
-import json
-import threading
 import time
 import logging
 from datetime import datetime
@@ -15,84 +12,30 @@ try:
 except ImportError:
     from app.services.real_reconciliation_service import reconciliation_engine
 
+try:
+    from services.partition_manager import partition_manager
+except ImportError:
+    from app.services.partition_manager import partition_manager
+
+try:
+    from consumers.kafka_group_consumer import KAFKA_TOPICS, start_group_consumers
+except ImportError:
+    from app.consumers.kafka_group_consumer import KAFKA_TOPICS, start_group_consumers
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def consume_topic(topic_name):
-    """Consume messages from a specific Kafka topic"""
-    logger.info(f"🚀 Starting consumer for {topic_name}")
-    
-    cmd = [
-        "docker", "exec", "kafka-kafka-1",
-        "kafka-console-consumer",
-        "--bootstrap-server", "localhost:9092",
-        "--topic", topic_name,
-        "--from-beginning"
-    ]
-    
-    try:
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE, 
-            text=True,
-            encoding='utf-8',
-            errors='ignore',
-            bufsize=1
-        )
-        
-        logger.info(f"✅ Consumer started for {topic_name}")
-        
-        while True:
-            line = process.stdout.readline()
-            if line:
-                line = line.strip()
-                if line:
-                    try:
-                        transaction = json.loads(line)
-                        logger.info(f"📥 [{topic_name}] Received: {transaction.get('txn_id', 'unknown')}")
-                        
-                        # Save to database
-                        try:
-                            try:
-                                from services.database_service import db_service
-                            except ImportError:
-                                from app.services.database_service import db_service
-                            db_service.save_transaction(transaction)
-                        except Exception as e:
-                            logger.warning(f"Failed to save transaction to database: {e}")
-                        
-                        # Add to reconciliation engine
-                        reconciliation_engine.add_transaction(transaction)
-                        
-                    except json.JSONDecodeError:
-                        logger.warning(f"❌ [{topic_name}] Invalid JSON: {line}")
-                    except Exception as e:
-                        logger.error(f"❌ [{topic_name}] Error: {e}")
-            
-            # Check if process ended
-            if process.poll() is not None:
-                break
-                
-    except Exception as e:
-        logger.error(f"❌ Consumer error for {topic_name}: {e}")
-    finally:
-        if 'process' in locals():
-            process.terminate()
-
 def main():
-    """Start consumers for all topics"""
-    topics = ['core_txns', 'gateway_txns', 'mobile_txns']
+    """Start the consumer group for all topics"""
+    topics = KAFKA_TOPICS
     
     logger.info("🚀 Starting Simple Reconciliation Consumer...")
     
-    # Start a thread for each topic
-    threads = []
-    for topic in topics:
-        thread = threading.Thread(target=consume_topic, args=(topic,), daemon=True)
-        thread.start()
-        threads.append(thread)
-        time.sleep(1)  # Small delay between starting consumers
+    # Keep partitions created ahead of the writes (and apply retention) while consuming
+    partition_manager.start()
+    
+    # Each member consumes batches, saves them to the database, feeds the engine, then commits
+    consumers = start_group_consumers(reconciliation_engine, topics=topics)
     
     logger.info(f"✅ Started consumers for all topics: {topics}")
     
@@ -105,6 +48,9 @@ def main():
                        f"Mismatches={stats['total_mismatches']}, "
                        f"Pending={stats['pending_reconciliation']}, "
                        f"Success Rate={stats['success_rate']}%")
+            if stats.get('rule_stats'):
+                logger.info("📏 Rules: " + ", ".join(f"{name}={rule['hits']}/{rule['evaluations']} ({rule['avg_us']}µs)"
+                                                    for name, rule in stats['rule_stats'].items()))
             
             # Show recent reconciliation results
             recent = reconciliation_engine.get_recent_reconciled(3)
@@ -118,6 +64,11 @@ def main():
         logger.info("🛑 Shutting down consumers...")
     except Exception as e:
         logger.error(f"❌ Main loop error: {e}")
+    finally:
+        for consumer in consumers:
+            consumer.stop()
+        reconciliation_engine.stop()
+        partition_manager.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,6 +1,7 @@
 from db.database import Base, engine
 from models.transaction import Transaction
 from models.mismatch import Mismatch
+from models.rollup import TransactionRollup, MismatchRollup
 
 print("🏦 Creating banking reconciliation tables...")
 print("📋 Transaction table with reconciliation fields...")
@@ -11,6 +12,7 @@ try:
     print("✅ Database tables created successfully!")
     print("   - transactions (with reconciliation status)")
     print("   - mismatches (with severity and resolution tracking)")
+    print("   - transaction_rollups, mismatch_rollups (per-minute dashboard counters)")
 except Exception as e:
     print(f"❌ Error creating tables: {e}")
     print("Make sure PostgreSQL is running and .env file is configured correctly")
\ No newline at end of file
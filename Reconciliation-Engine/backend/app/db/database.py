@@ -1,7 +1,14 @@
 from pathlib import Path
 from dotenv import load_dotenv
 import os
-from sqlalchemy import create_engine
+import time
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError, ArgumentError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Always load .env from backend directory
@@ -12,6 +19,265 @@ load_dotenv(env_path)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Connection pool settings (QueuePool): persistent connections, extra ones allowed under
+# burst, seconds to wait for a free connection before failing, seconds before a
+# connection is replaced, and a liveness check on checkout
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Server-side statement timeout in milliseconds (PostgreSQL); 0 disables it
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+
+class PoolMetrics:
+    """Checkout wait and hold times of the engine's pool (recent samples + running totals)"""
+    
+    def __init__(self, samples: int = 1000):
+        self.lock = threading.Lock()
+        self.waits = deque(maxlen=samples)
+        self.holds = deque(maxlen=samples)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.max_wait = 0.0
+        self.max_hold = 0.0
+    
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self.lock:
+            self.waits.append(seconds)
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+    
+    def record_hold(self, seconds: float):
+        with self.lock:
+            self.holds.append(seconds)
+            self.max_hold = max(self.max_hold, seconds)
+    
+    @staticmethod
+    def _summary(samples: list, maximum: float) -> dict:
+        if not samples:
+            return {'avg_ms': 0.0, 'p95_ms': 0.0, 'max_ms': round(maximum * 1000, 2)}
+        ordered = sorted(samples)
+        return {
+            'avg_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+            'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+            'max_ms': round(maximum * 1000, 2)
+        }
+    
+    def snapshot(self) -> dict:
+        with self.lock:
+            waits, holds = list(self.waits), list(self.holds)
+            checkouts, timeouts, max_wait, max_hold = self.checkouts, self.timeouts, self.max_wait, self.max_hold
+        return {
+            'checkouts': checkouts,
+            'timeouts': timeouts,
+            'wait': self._summary(waits, max_wait),
+            'checkout_time': self._summary(holds, max_hold)
+        }
+
+pool_metrics = PoolMetrics()
+
+class _MeteredPool:
+    """Pool mixin that records how long each checkout waited for a connection"""
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+class MeteredQueuePool(_MeteredPool, QueuePool):
+    pass
+
+class MeteredAsyncQueuePool(_MeteredPool, AsyncAdaptedQueuePool):
+    pass
+
+def _engine_options(url: str, asynchronous: bool = False) -> dict:
+    if url and url.startswith("sqlite") and ":memory:" in url:
+        return {}  # one connection per thread (SingletonThreadPool); nothing to tune
+    options = {
+        'poolclass': MeteredAsyncQueuePool if asynchronous else MeteredQueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING
+    }
+    if url and url.startswith("postgresql") and DB_STATEMENT_TIMEOUT_MS > 0:
+        if asynchronous:
+            options['connect_args'] = {'server_settings': {'statement_timeout': str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options['connect_args'] = {'options': f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info['checked_out_at'] = time.perf_counter()
+
+def _on_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop('checked_out_at', None)
+    if checked_out_at is not None:
+        pool_metrics.record_hold(time.perf_counter() - checked_out_at)
+
+def _meter(sync_engine):
+    event.listen(sync_engine, "checkout", _on_checkout)
+    event.listen(sync_engine, "checkin", _on_checkin)
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+_meter(engine)
+
+# asyncio engine for the async routers: same database through an asyncio driver
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+def async_database_url(url: str) -> Optional[str]:
+    """DATABASE_URL with its driver swapped for the asyncio one, or None for other databases"""
+    if not url:
+        return None
+    scheme, _, rest = url.partition("://")
+    backend = scheme.split("+")[0]
+    if backend not in ASYNC_DRIVERS:
+        return None
+    return f"{ASYNC_DRIVERS[backend]}://{rest}"
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DATABASE_URL:
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, asynchronous=True))
+        _meter(async_engine.sync_engine)
+        AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    except (ImportError, ArgumentError) as e:
+        # asyncpg / aiosqlite not installed: the async service falls back to the threadpool
+        print(f"⚠️ Async database engine unavailable ({e}); async routers will use the threadpool")
+
+def _occupancy(pool) -> dict:
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0)
+    }
+
+def get_pool_status() -> dict:
+    """Pool configuration, current occupancy and checkout wait/hold metrics (both engines)"""
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__, **pool_metrics.snapshot(), **_occupancy(pool)}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'max_overflow': DB_MAX_OVERFLOW,
+            'timeout_s': DB_POOL_TIMEOUT,
+            'recycle_s': DB_POOL_RECYCLE,
+            'pre_ping': DB_POOL_PRE_PING
+        })
+    if async_engine is not None:
+        status['async_pool'] = _occupancy(async_engine.pool)
+    return status
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+# ==================== REQUEST-SCOPED SESSION ====================
+
+class SharedSession:
+    """Handle on the request's session whose close() keeps it (and its connection) open"""
+    
+    def __init__(self, session):
+        self._session = session
+    
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+    
+    def close(self):
+        # Drop loaded objects so the next call reads fresh rows, but keep the connection
+        self._session.expunge_all()
+
+class RequestScope:
+    """One lazily opened session shared by every DatabaseService call of a request.
+    
+    Async handlers get the same for AsyncDatabaseService: one AsyncSession
+    for the calls they await one after another (see async_session).
+    """
+    
+    def __init__(self):
+        self.session = None
+        self.failed = False
+        self.async_session = None
+        self.async_failed = False
+        self.async_busy = False  # an awaited call is running on async_session
+    
+    def get(self) -> SharedSession:
+        if self.session is None:
+            self.session = SessionLocal()
+        elif self.failed:
+            # A previous call hit a database error; start a clean transaction
+            self.session.rollback()
+        self.failed = False
+        return SharedSession(self.session)
+    
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+    
+    async def aclose(self):
+        if self.async_session is not None:
+            await self.async_session.close()
+            self.async_session = None
+        self.close()
+
+_request_scope: ContextVar = ContextVar("request_scope", default=None)
+
+def current_request_scope():
+    """The RequestScope of the running request, or None outside one (consumers, scripts)"""
+    return _request_scope.get()
+
+@event.listens_for(engine, "handle_error")
+def _on_error(context):
+    # The failed statement may have aborted the shared transaction (PostgreSQL)
+    request_scope = _request_scope.get()
+    if request_scope is not None:
+        request_scope.failed = True
+
+def _on_async_error(context):
+    request_scope = _request_scope.get()
+    if request_scope is not None:
+        request_scope.async_failed = True
+
+if async_engine is not None:
+    event.listen(async_engine.sync_engine, "handle_error", _on_async_error)
+
+class RequestSessionMiddleware:
+    """ASGI middleware that gives each HTTP request one database session, closed when the response is sent.
+    
+    Sync endpoints run in the threadpool with a copy of the request's
+    context, so they find the scope through the context variable.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_scope = RequestScope()
+        token = _request_scope.set(request_scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+            await request_scope.aclose()
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from .db.database import RequestSessionMiddleware
 from .routers.transactions_router import router as txn_router
 from .routers.mismatches_router import router as mismatch_router
 from .routers.dashboard_router_temp import router as dashboard_router
@@ -12,6 +13,9 @@ app = FastAPI(
     version="2.0.0"
 )
 
+# One database session per request, shared by every service call the handler makes
+app.add_middleware(RequestSessionMiddleware)
+
 # Enable CORS for frontend
 app.add_middleware(
     CORSMiddleware,
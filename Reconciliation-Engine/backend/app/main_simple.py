@@ -1,6 +1,7 @@
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from .routers.auth_router_simple import router as auth_router
+from .db.database import RequestSessionMiddleware
+from .routers.auth_router_simple import router as auth_router, verify_token
 from .routers.analytics_router_simple import router as analytics_router
 from .routers.dashboard_router_simple import router as dashboard_router
 from .routers.system_health_router import router as system_health_router
@@ -11,6 +12,9 @@ app = FastAPI(
     version="2.0.0"
 )
 
+# One database session per request, shared by every service call the handler makes
+app.add_middleware(RequestSessionMiddleware)
+
 # Enable CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -66,6 +70,15 @@ async def get_redis_stats():
             "error": str(e)
         }
 
+@app.get("/api/reconciliation/rules")
+async def get_reconciliation_rules(current_user: dict = Depends(verify_token)):
+    """Active reconciliation rule set (reloaded when RECONCILIATION_RULES_FILE changes)"""
+    from .services.reconciliation_rules import rule_registry
+    return {
+        **rule_registry.info(),
+        "definition": rule_registry.current().definition
+    }
+
 @app.get("/")
 def root():
     return {"message": "Banking Reconciliation API - Working Mode", "status": "healthy"}
\ No newline at end of file
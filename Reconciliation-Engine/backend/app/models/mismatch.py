@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Integer, Text, Float
+from sqlalchemy import Column, String, DateTime, Integer, Text, Float, Index
 from sqlalchemy.sql import func
 from ..db.database import Base
 
@@ -26,4 +26,12 @@ class Mismatch(Base):
     # Audit fields - use application time instead of server time
     detected_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, nullable=True)
-    updated_at = Column(DateTime, nullable=True)
\ No newline at end of file
+    updated_at = Column(DateTime, nullable=True)
+
+# Hot-query indexes (created by create_all, and on existing databases by create_indexes.py)
+# Newest-first keyset listings on (detected_at, id), optionally filtered by severity, type or status;
+# also time-window counts
+Index('ix_mismatches_detected_at_id', Mismatch.detected_at.desc(), Mismatch.id.desc())
+Index('ix_mismatches_severity_detected_at_id', Mismatch.severity, Mismatch.detected_at.desc(), Mismatch.id.desc())
+Index('ix_mismatches_type_detected_at_id', Mismatch.mismatch_type, Mismatch.detected_at.desc(), Mismatch.id.desc())
+Index('ix_mismatches_status_detected_at_id', Mismatch.status, Mismatch.detected_at.desc(), Mismatch.id.desc())
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, DateTime, Integer
+from ..db.database import Base
+
+# Per-minute counters maintained by DatabaseService.write_batch alongside the rows they count,
+# so dashboard statistics sum buckets instead of scanning transactions/mismatches.
+# Nullable dimensions are stored as '' (primary key columns cannot be NULL).
+
+class TransactionRollup(Base):
+    __tablename__ = "transaction_rollups"
+    
+    bucket = Column(DateTime, primary_key=True)  # created_at truncated to the minute
+    source = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    reconciliation_status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class MismatchRollup(Base):
+    __tablename__ = "mismatch_rollups"
+    
+    bucket = Column(DateTime, primary_key=True)  # detected_at truncated to the minute
+    mismatch_type = Column(String, primary_key=True)
+    severity = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
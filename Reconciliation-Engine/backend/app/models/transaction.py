@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, Integer, Text, Boolean
+from sqlalchemy import Column, String, Float, DateTime, Integer, Text, Boolean, Index
 from sqlalchemy.sql import func
 from ..db.database import Base
 
@@ -21,4 +21,19 @@ class Transaction(Base):
     
     # Audit fields - use application time instead of server time
     created_at = Column(DateTime, nullable=True)
-    updated_at = Column(DateTime, nullable=True)
\ No newline at end of file
+    updated_at = Column(DateTime, nullable=True)
+
+# Hot-query indexes (created by create_all, and on existing databases by create_indexes.py)
+# Newest-first keyset listings on (created_at, id), optionally filtered by source, status or
+# reconciliation status; the id tie-breaker lets a cursor seek straight to its page. Also time-window counts
+Index('ix_transactions_created_at_id', Transaction.created_at.desc(), Transaction.id.desc())
+Index('ix_transactions_source_created_at_id', Transaction.source, Transaction.created_at.desc(), Transaction.id.desc())
+Index('ix_transactions_status_created_at_id', Transaction.status, Transaction.created_at.desc(), Transaction.id.desc())
+Index('ix_transactions_reconciliation_created_at_id', Transaction.reconciliation_status,
+      Transaction.created_at.desc(), Transaction.id.desc())
+# Verdict lookups and duplicate detection group by (txn_id, source)
+Index('ix_transactions_txn_id_source', Transaction.txn_id, Transaction.source)
+# Small partial index over the unreconciled backlog only
+Index('ix_transactions_pending_created_at', Transaction.created_at,
+      postgresql_where=Transaction.reconciliation_status == 'PENDING',
+      sqlite_where=Transaction.reconciliation_status == 'PENDING')
@@ -1,6 +1,7 @@
 from db.database import Base, engine
 from models.transaction import Transaction
 from models.mismatch import Mismatch
+from models.rollup import TransactionRollup, MismatchRollup
 
 print("🏦 Recreating banking reconciliation tables...")
 print("⚠️  This will drop existing tables and recreate them")
@@ -18,6 +19,7 @@ try:
     print("✅ Database tables recreated successfully!")
     print("   - transactions (with reconciliation status, audit fields)")
     print("   - mismatches (with severity, resolution tracking, audit fields)")
+    print("   - transaction_rollups, mismatch_rollups (per-minute dashboard counters)")
     
 except Exception as e:
     print(f"❌ Error recreating tables: {e}")
@@ -5,13 +5,16 @@ Advanced analytics endpoints for operations dashboard
 from fastapi import APIRouter, Query, HTTPException, Depends
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
+import asyncio
 import sys
 import os
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.database_service import db_service
+from services.database_service import TIMELINE_INTERVALS
+from services.async_database_service import async_db_service
+from services.reconciliation_rules import rule_registry
 from services.auth_service import (
     get_current_user, 
     require_read_stats,
@@ -23,7 +26,7 @@ router = APIRouter()
 
 @router.get("/overview")
 @require_read_stats()
-def get_overview_stats(
+async def get_overview_stats(
     date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
     current_user: Dict[str, Any] = Depends(get_current_user)
@@ -48,43 +51,37 @@ def get_overview_stats(
             details={'date_from': date_from, 'date_to': date_to}
         )
         
-        # Get comprehensive stats
-        stats = db_service.get_transaction_stats()
-        
-        # Calculate today's metrics
-        today = datetime.now().date()
-        today_transactions = db_service.get_transactions_by_date(today)
-        today_mismatches = db_service.get_mismatches_by_date(today)
-        
-        # Calculate delayed transactions (>5 minutes between sources)
-        delayed_count = db_service.get_delayed_transactions_count(minutes=5)
-        
-        # Calculate duplicates
-        duplicate_count = db_service.get_duplicate_transactions_count()
+        # Comprehensive stats, today's metrics (summed from the per-minute rollups) and the
+        # delay analytics (delayed >5 min and duplicates, one window query), queried concurrently
+        stats, today, delays = await asyncio.gather(
+            async_db_service.get_transaction_stats(),
+            async_db_service.get_rollup_stats(since=datetime.combine(datetime.now().date(), datetime.min.time())),
+            async_db_service.get_delay_analytics(delayed_minutes=5)
+        )
         
         return {
             "kpis": {
-                "total_transactions_today": len(today_transactions),
+                "total_transactions_today": today['transactions'],
                 "total_mismatches": stats['total_mismatches'],
                 "reconciliation_accuracy": round(stats['success_rate'], 1),
                 "pending_transactions": stats['pending_reconciliation'],
-                "duplicates_detected": duplicate_count,
-                "delayed_transactions": delayed_count
+                "duplicates_detected": delays['duplicate_count'],
+                "delayed_transactions": delays['delayed_count']
             },
             "trends": {
-                "transactions_vs_yesterday": calculate_trend(today_transactions, "transactions"),
-                "mismatches_vs_yesterday": calculate_trend(today_mismatches, "mismatches"),
+                "transactions_vs_yesterday": calculate_trend(today['transactions'], "transactions"),
+                "mismatches_vs_yesterday": calculate_trend(today['mismatches'], "mismatches"),
                 "accuracy_trend": "stable"  # Could be calculated from historical data
             },
             "generated_at": datetime.now().isoformat()
         }
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving overview: {str(e)}")
 
 @router.get("/mismatch-summary")
 @require_read_stats()
-def get_mismatch_summary(
+async def get_mismatch_summary(
     date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
     current_user: Dict[str, Any] = Depends(get_current_user)
@@ -101,23 +98,19 @@ def get_mismatch_summary(
             resource='analytics'
         )
         
-        stats = db_service.get_transaction_stats()
-        mismatches = db_service.get_mismatches(limit=1000)  # Get more for analysis
+        # Type and severity totals come from the rollups and resolution status from a
+        # grouped count; sources (a JSON column) are analysed over the latest mismatches
+        rollups, status_counts, mismatches = await asyncio.gather(
+            async_db_service.get_rollup_stats(),
+            async_db_service.count_mismatches_by('status'),
+            async_db_service.get_mismatches(limit=1000)
+        )
         
-        # Analyze mismatch patterns
-        mismatch_by_type = {}
-        mismatch_by_severity = {}
+        mismatch_by_type = rollups['by_mismatch_type']
+        mismatch_by_severity = rollups['by_severity']
         mismatch_by_source = {}
         
         for mismatch in mismatches:
-            # By type
-            mtype = mismatch.get('type', 'UNKNOWN')
-            mismatch_by_type[mtype] = mismatch_by_type.get(mtype, 0) + 1
-            
-            # By severity
-            severity = mismatch.get('severity', 'UNKNOWN')
-            mismatch_by_severity[severity] = mismatch_by_severity.get(severity, 0) + 1
-            
             # By source
             sources = mismatch.get('sources_involved', [])
             for source in sources:
@@ -125,24 +118,24 @@ def get_mismatch_summary(
         
         return {
             "summary": {
-                "total_mismatches": len(mismatches),
+                "total_mismatches": rollups['mismatches'],
                 "critical_mismatches": mismatch_by_severity.get('HIGH', 0),
-                "resolution_rate": calculate_resolution_rate(mismatches)
+                "resolution_rate": calculate_resolution_rate(status_counts)
             },
             "breakdown": {
                 "by_type": mismatch_by_type,
                 "by_severity": mismatch_by_severity,
                 "by_source": mismatch_by_source
             },
-            "top_issues": get_top_mismatch_issues(mismatches)
+            "top_issues": get_top_mismatch_issues(mismatch_by_type)
         }
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving mismatch summary: {str(e)}")
 
 @router.get("/source-distribution")
 @require_read_stats()
-def get_source_distribution(
+async def get_source_distribution(
     hours: int = Query(24, description="Hours to analyze"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
@@ -152,7 +145,7 @@ def get_source_distribution(
     Pie chart data showing transaction distribution across sources
     """
     try:
-        stats = db_service.get_transaction_stats()
+        stats = await async_db_service.get_transaction_stats()
         source_dist = stats.get('source_distribution', {})
         
         # Calculate percentages
@@ -174,13 +167,13 @@ def get_source_distribution(
             "analysis_period": f"Last {hours} hours",
             "generated_at": datetime.now().isoformat()
         }
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving source distribution: {str(e)}")
 
 @router.get("/mismatch-type-counts")
 @require_read_stats()
-def get_mismatch_type_counts(
+async def get_mismatch_type_counts(
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
@@ -189,7 +182,7 @@ def get_mismatch_type_counts(
     Bar chart data for mismatch types
     """
     try:
-        stats = db_service.get_transaction_stats()
+        stats = await async_db_service.get_transaction_stats()
         mismatch_types = stats.get('mismatch_types', {})
         
         # Format for chart
@@ -210,25 +203,28 @@ def get_mismatch_type_counts(
             "total_types": len(chart_data),
             "most_common": chart_data[0] if chart_data else None
         }
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving mismatch types: {str(e)}")
 
 @router.get("/timeline")
 @require_read_stats()
-def get_timeline_data(
-    hours: int = Query(24, description="Hours of timeline data"),
-    interval: str = Query("hour", description="Interval: minute, hour, day"),
+async def get_timeline_data(
+    hours: int = Query(24, ge=1, description="Hours of timeline data"),
+    interval: str = Query("hour", description="Interval: minute, 5m, hour, day"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
     📈 Time-series Analytics
     
-    Timeline data for transactions and mismatches
+    Timeline data for transactions and mismatches, zero-filled per interval
     """
+    if interval not in TIMELINE_INTERVALS:
+        raise HTTPException(status_code=400, detail=f"Unknown interval '{interval}' (use: {', '.join(TIMELINE_INTERVALS)})")
+    
     try:
         # Get timeline data from database
-        timeline_data = db_service.get_timeline_stats(hours=hours, interval=interval)
+        timeline_data = await async_db_service.get_timeline_stats(hours=hours, interval=interval)
         
         return {
             "timeline": timeline_data,
@@ -240,13 +236,13 @@ def get_timeline_data(
                 "trend": calculate_timeline_trend(timeline_data)
             }
         }
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving timeline: {str(e)}")
 
 @router.get("/anomalies")
 @require_read_stats()
-def get_anomaly_detection(
+async def get_anomaly_detection(
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
@@ -257,8 +253,13 @@ def get_anomaly_detection(
     try:
         anomalies = []
         
+        # Recent rates and the delay analytics of the window, queried concurrently
+        recent_stats, delays = await asyncio.gather(
+            async_db_service.get_recent_activity_stats(minutes=30),
+            async_db_service.get_delay_analytics()
+        )
+        
         # Check for transaction spikes
-        recent_stats = db_service.get_recent_activity_stats(minutes=30)
         if recent_stats['transaction_rate'] > get_normal_rate() * 2:
             anomalies.append({
                 "type": "TRANSACTION_SPIKE",
@@ -276,30 +277,38 @@ def get_anomaly_detection(
                 "detected_at": datetime.now().isoformat()
             })
         
-        # Check for source delays
-        source_delays = db_service.get_source_delay_analysis()
-        for source, delay in source_delays.items():
-            if delay > 300:  # 5 minutes
+        # Check for source delays (p95 reconciliation delay over the window)
+        for source, source_stats in delays['by_source'].items():
+            if source_stats['p95_delay_s'] > 300:  # 5 minutes
                 anomalies.append({
                     "type": "SOURCE_DELAY",
                     "severity": "MEDIUM",
-                    "description": f"{source} source has {delay}s average delay",
+                    "description": f"{source} source has {source_stats['p95_delay_s']}s p95 delay",
                     "detected_at": datetime.now().isoformat(),
                     "source": source
                 })
         
+        # Check for duplicate submissions
+        if delays['duplicate_count'] > 0:
+            anomalies.append({
+                "type": "DUPLICATE_TRANSACTIONS",
+                "severity": "LOW",
+                "description": f"{delays['duplicate_count']} duplicate transactions in the last {delays.get('window_hours', 24)}h",
+                "detected_at": datetime.now().isoformat()
+            })
+        
         return {
             "anomalies": anomalies,
             "total_anomalies": len(anomalies),
             "system_health": "HEALTHY" if len(anomalies) == 0 else "ATTENTION_REQUIRED"
         }
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error detecting anomalies: {str(e)}")
 
 @router.post("/reconcile/{txn_id}")
 @require_admin()
-def manual_reconciliation(
+async def manual_reconciliation(
     txn_id: str,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
@@ -318,7 +327,7 @@ def manual_reconciliation(
         )
         
         # Get transaction details
-        transactions = db_service.get_transactions_by_txn_id(txn_id)
+        transactions = await async_db_service.get_transactions_by_txn_id(txn_id)
         if not transactions:
             raise HTTPException(status_code=404, detail=f"Transaction {txn_id} not found")
         
@@ -332,31 +341,26 @@ def manual_reconciliation(
             "triggered_by": current_user['username'],
             "triggered_at": datetime.now().isoformat()
         }
-        
+    
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Manual reconciliation failed: {str(e)}")
 
 # Helper functions
-def calculate_trend(current_data, data_type):
+def calculate_trend(current_count, data_type):
     """Calculate trend compared to previous period"""
     # Simplified trend calculation
-    return "up" if len(current_data) > 0 else "stable"
+    return "up" if current_count > 0 else "stable"
 
-def calculate_resolution_rate(mismatches):
-    """Calculate mismatch resolution rate"""
-    resolved = sum(1 for m in mismatches if m.get('status') == 'RESOLVED')
-    total = len(mismatches)
+def calculate_resolution_rate(status_counts):
+    """Calculate mismatch resolution rate from counts per status"""
+    resolved = status_counts.get('RESOLVED', 0)
+    total = sum(status_counts.values())
     return round((resolved / total * 100), 1) if total > 0 else 0
 
-def get_top_mismatch_issues(mismatches):
-    """Get top 5 mismatch issues"""
-    type_counts = {}
-    for m in mismatches:
-        mtype = m.get('type', 'UNKNOWN')
-        type_counts[mtype] = type_counts.get(mtype, 0) + 1
-    
+def get_top_mismatch_issues(type_counts):
+    """Get top 5 mismatch issues from counts per type"""
     return sorted(type_counts.items(), key=lambda x: x[1], reverse=True)[:5]
 
 def get_source_color(source):
@@ -369,16 +373,8 @@ def get_source_color(source):
     return colors.get(source, '#9E9E9E')
 
 def get_mismatch_severity(mtype):
-    """Determine mismatch severity based on type"""
-    high_severity = ['AMOUNT_MISMATCH', 'ACCOUNT_MISMATCH']
-    medium_severity = ['STATUS_MISMATCH', 'CURRENCY_MISMATCH']
-    
-    if mtype in high_severity:
-        return 'HIGH'
-    elif mtype in medium_severity:
-        return 'MEDIUM'
-    else:
-        return 'LOW'
+    """Determine mismatch severity based on type (from the reconciliation rule set)"""
+    return rule_registry.severity_for(mtype)
 
 def get_mismatch_color(mtype):
     """Get color for mismatch type visualization"""
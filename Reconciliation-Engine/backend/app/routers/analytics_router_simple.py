@@ -8,13 +8,19 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 import io
 import csv
+import asyncio
 from .auth_router_simple import verify_token
-from ..services.database_service import db_service
+from ..services.database_service import (
+    db_service, TIMELINE_INTERVALS, TRANSACTION_REPORT_COLUMNS, MISMATCH_REPORT_COLUMNS
+)
+from ..services.async_database_service import async_db_service
+from ..services.report_export import report_exporter, REPORT_FORMATS
+from ..services.reconciliation_rules import rule_registry
 
 router = APIRouter()
 
 @router.get("/overview")
-def get_overview_stats(
+async def get_overview_stats(
     date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
     current_user: dict = Depends(verify_token)
@@ -22,32 +28,32 @@ def get_overview_stats(
     """📊 Real Banking KPI Overview from Database"""
     
     try:
-        # Get real statistics from database
-        stats = db_service.get_transaction_stats()
-        
         # Calculate recent metrics (last 24 hours instead of strict "today")
-        from datetime import timedelta
         today = datetime.now().date()
-        yesterday = today - timedelta(days=1)
+        midnight = datetime.combine(today, datetime.min.time())
         
-        # Try today first, if no transactions, use yesterday
-        today_transactions = db_service.get_transactions_by_date(today)
-        if len(today_transactions) == 0:
-            today_transactions = db_service.get_transactions_by_date(yesterday)
+        # Independent queries run concurrently, each on its own pooled connection
+        stats, today_stats, delays = await asyncio.gather(
+            async_db_service.get_transaction_stats(),
+            async_db_service.get_rollup_stats(since=midnight),
+            async_db_service.get_delay_analytics(delayed_minutes=5)
+        )
         
-        # Calculate delayed and duplicate transactions
-        delayed_count = db_service.get_delayed_transactions_count(minutes=5)
-        duplicate_count = db_service.get_duplicate_transactions_count()
+        # Try today first, if no transactions, use yesterday (counted from the rollups)
+        today_count = today_stats['transactions']
+        if today_count == 0:
+            yesterday_stats = await async_db_service.get_rollup_stats(since=midnight - timedelta(days=1), until=midnight)
+            today_count = yesterday_stats['transactions']
         
         return {
             "kpis": {
-                "total_transactions_today": len(today_transactions),
+                "total_transactions_today": today_count,
                 "total_transactions_all_time": stats.get('total_transactions', 0),
                 "total_mismatches": stats.get('total_mismatches', 0),
                 "reconciliation_accuracy": stats.get('success_rate', 100.0),
                 "pending_transactions": stats.get('pending_reconciliation', 0),
-                "duplicates_detected": duplicate_count,
-                "delayed_transactions": delayed_count
+                "duplicates_detected": delays['duplicate_count'],
+                "delayed_transactions": delays['delayed_count']
             },
             "trends": {
                 "transactions_vs_yesterday": "stable",  # Could be calculated from historical data
@@ -56,7 +62,7 @@ def get_overview_stats(
             },
             "generated_at": datetime.now().isoformat()
         }
-        
+    
     except Exception as e:
         print(f"Error getting overview stats: {e}")
         # Fallback to basic stats
@@ -78,7 +84,7 @@ def get_overview_stats(
         }
 
 @router.get("/mismatch-summary")
-def get_mismatch_summary(
+async def get_mismatch_summary(
     date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
     current_user: dict = Depends(verify_token)
@@ -86,23 +92,25 @@ def get_mismatch_summary(
     """🚨 Mismatch Summary Analytics - Real Data from Database"""
     
     try:
-        # Get real statistics from database
-        stats = db_service.get_transaction_stats()
+        # Get real statistics from database (type/severity rollups, counts per resolution status)
+        stats, status_counts = await asyncio.gather(
+            async_db_service.get_transaction_stats(),
+            async_db_service.count_mismatches_by('status')
+        )
         mismatch_types = stats.get('mismatch_types', {})
         
         # Calculate totals
         total_mismatches = sum(mismatch_types.values())
-        critical_mismatches = mismatch_types.get('AMOUNT_MISMATCH', 0) + mismatch_types.get('CURRENCY_MISMATCH', 0)
         
-        # Calculate resolution rate (for now, assume all are open, so 0% resolved)
-        resolution_rate = 0.0  # Could be enhanced to track actual resolutions
+        # Calculate resolution rate
+        status_total = sum(status_counts.values())
+        resolution_rate = round(status_counts.get('RESOLVED', 0) / status_total * 100, 1) if status_total else 0.0
         
-        # Severity breakdown (based on mismatch types)
-        severity_breakdown = {
-            "HIGH": mismatch_types.get('AMOUNT_MISMATCH', 0) + mismatch_types.get('CURRENCY_MISMATCH', 0),
-            "MEDIUM": mismatch_types.get('STATUS_MISMATCH', 0) + mismatch_types.get('ACCOUNT_MISMATCH', 0),
-            "LOW": mismatch_types.get('TIMESTAMP_MISMATCH', 0) + mismatch_types.get('MISSING_FIELD', 0)
-        }
+        # Severity breakdown (severity recorded on each mismatch, from the rollups)
+        severity_breakdown = {"HIGH": 0, "MEDIUM": 0, "LOW": 0}
+        for severity, count in stats.get('severity_distribution', {}).items():
+            severity_breakdown[severity] = severity_breakdown.get(severity, 0) + count
+        critical_mismatches = severity_breakdown["HIGH"]
         
         # Source breakdown (simplified - could be enhanced to track by source)
         source_breakdown = {
@@ -127,7 +135,7 @@ def get_mismatch_summary(
             },
             "top_issues": top_issues[:5]  # Top 5 issues
         }
-        
+    
     except Exception as e:
         print(f"Error getting mismatch summary: {e}")
         # Fallback to empty data
@@ -146,7 +154,7 @@ def get_mismatch_summary(
         }
 
 @router.get("/source-distribution")
-def get_source_distribution(
+async def get_source_distribution(
     hours: int = Query(24, description="Hours to analyze"),
     current_user: dict = Depends(verify_token)
 ):
@@ -154,7 +162,7 @@ def get_source_distribution(
     
     try:
         # Get real statistics from database
-        stats = db_service.get_transaction_stats()
+        stats = await async_db_service.get_transaction_stats()
         source_distribution = stats.get('source_distribution', {})
         
         # Calculate total and percentages
@@ -183,7 +191,7 @@ def get_source_distribution(
             "analysis_period": f"Last {hours} hours",
             "generated_at": datetime.now().isoformat()
         }
-        
+    
     except Exception as e:
         print(f"Error getting source distribution: {e}")
         # Fallback to empty data
@@ -195,14 +203,14 @@ def get_source_distribution(
         }
 
 @router.get("/mismatch-type-counts")
-def get_mismatch_type_counts(
+async def get_mismatch_type_counts(
     current_user: dict = Depends(verify_token)
 ):
     """📊 Mismatch Type Analysis - Real Data from Database"""
     
     try:
         # Get real statistics from database
-        stats = db_service.get_transaction_stats()
+        stats = await async_db_service.get_transaction_stats()
         mismatch_types = stats.get('mismatch_types', {})
         
         # Convert to chart format
@@ -213,23 +221,17 @@ def get_mismatch_type_counts(
             'CURRENCY_MISMATCH': '#E91E63',
             'TIMESTAMP_MISMATCH': '#FFC107',
             'ACCOUNT_MISMATCH': '#9C27B0',
-            'MISSING_FIELD': '#607D8B'
+            'MISSING_FIELD': '#607D8B',
+            'MISSING_SOURCE': '#795548',
+            'INVALID_DATA': '#B71C1C'
         }
         
         for mtype, count in mismatch_types.items():
             if count > 0:
-                # Assign proper severity levels
-                if "AMOUNT" in mtype or "CURRENCY" in mtype:
-                    severity = "HIGH"
-                elif "STATUS" in mtype or "ACCOUNT" in mtype:
-                    severity = "MEDIUM"
-                else:
-                    severity = "LOW"
-                
                 chart_data.append({
                     "type": mtype.replace('_', ' ').title(),
                     "count": count,
-                    "severity": severity,
+                    "severity": rule_registry.severity_for(mtype),
                     "color": colors.get(mtype, "#666666")
                 })
         
@@ -243,7 +245,7 @@ def get_mismatch_type_counts(
             "total_types": len(chart_data),
             "most_common": most_common
         }
-        
+    
     except Exception as e:
         print(f"Error getting mismatch type counts: {e}")
         # Fallback to empty data
@@ -254,16 +256,19 @@ def get_mismatch_type_counts(
         }
 
 @router.get("/timeline")
-def get_timeline_data(
-    hours: int = Query(24, description="Hours of timeline data"),
-    interval: str = Query("hour", description="Interval: minute, hour, day"),
+async def get_timeline_data(
+    hours: int = Query(24, ge=1, description="Hours of timeline data"),
+    interval: str = Query("hour", description="Interval: minute, 5m, hour, day"),
     current_user: dict = Depends(verify_token)
 ):
     """📈 Time-series Analytics - Real Data from Database"""
     
+    if interval not in TIMELINE_INTERVALS:
+        raise HTTPException(status_code=400, detail=f"Unknown interval '{interval}' (use: {', '.join(TIMELINE_INTERVALS)})")
+    
     try:
-        # Get real timeline data from database
-        timeline_data = db_service.get_timeline_stats(hours, interval)
+        # Get real timeline data from database (one grouped query per table, zero-filled)
+        timeline_data = await async_db_service.get_timeline_stats(hours, interval)
         
         # If no data, create empty timeline
         if not timeline_data:
@@ -302,7 +307,7 @@ def get_timeline_data(
                 "total_mismatches": total_mismatches
             }
         }
-        
+    
     except Exception as e:
         print(f"Error getting timeline data: {e}")
         # Fallback to empty timeline
@@ -328,26 +333,63 @@ def get_timeline_data(
         }
 
 @router.get("/anomalies")
-def get_anomaly_detection(
+async def get_anomaly_detection(
     current_user: dict = Depends(verify_token)
 ):
-    """🚨 Anomaly Detection - Mock Data"""
+    """🚨 Anomaly Detection from Database (spikes vs the window average, p95 delays, duplicates)"""
     
-    return {
-        "anomalies": [
-            {
+    try:
+        recent_stats, delays = await asyncio.gather(
+            async_db_service.get_recent_activity_stats(minutes=30),
+            async_db_service.get_delay_analytics()
+        )
+        anomalies = []
+        
+        # Transaction spike: last 30 minutes against the analytics window's average rate
+        window_minutes = delays.get('window_hours', 24) * 60
+        normal_rate = delays.get('transactions', 0) / window_minutes if window_minutes else 0
+        if normal_rate > 0 and recent_stats['transaction_rate'] > normal_rate * 2:
+            anomalies.append({
                 "type": "TRANSACTION_SPIKE",
                 "severity": "MEDIUM",
-                "description": "Transaction rate 127/min is 1.8x normal",
+                "description": f"Transaction rate {recent_stats['transaction_rate']}/min is {recent_stats['transaction_rate'] / normal_rate:.1f}x normal",
                 "detected_at": datetime.now().isoformat()
-            }
-        ],
-        "total_anomalies": 1,
-        "system_health": "ATTENTION_REQUIRED"
-    }
+            })
+        
+        for source, source_stats in delays['by_source'].items():
+            if source_stats['p95_delay_s'] > 300:  # 5 minutes
+                anomalies.append({
+                    "type": "SOURCE_DELAY",
+                    "severity": "MEDIUM",
+                    "description": f"{source} source has {source_stats['p95_delay_s']}s p95 delay",
+                    "detected_at": datetime.now().isoformat(),
+                    "source": source
+                })
+        
+        if delays['duplicate_count'] > 0:
+            anomalies.append({
+                "type": "DUPLICATE_TRANSACTIONS",
+                "severity": "LOW",
+                "description": f"{delays['duplicate_count']} duplicate transactions in the last {delays.get('window_hours', 24)}h",
+                "detected_at": datetime.now().isoformat()
+            })
+        
+        return {
+            "anomalies": anomalies,
+            "total_anomalies": len(anomalies),
+            "system_health": "HEALTHY" if len(anomalies) == 0 else "ATTENTION_REQUIRED"
+        }
+    
+    except Exception as e:
+        print(f"Error detecting anomalies: {e}")
+        return {
+            "anomalies": [],
+            "total_anomalies": 0,
+            "system_health": "HEALTHY"
+        }
 
 @router.post("/reconcile/{txn_id}")
-def manual_reconciliation(
+async def manual_reconciliation(
     txn_id: str,
     current_user: dict = Depends(verify_token)
 ):
@@ -379,7 +421,7 @@ def require_admin(current_user: dict = Depends(verify_token)):
     return current_user
 
 def generate_csv_response(data: List[Dict], filename: str):
-    """Generate CSV response from data"""
+    """Generate CSV response from data (small in-memory reports)"""
     output = io.StringIO()
     if data:
         writer = csv.DictWriter(output, fieldnames=data[0].keys())
@@ -393,32 +435,55 @@ def generate_csv_response(data: List[Dict], filename: str):
     )
     return response
 
+def stream_report(chunks, columns: Dict[str, str], name: str, format: str):
+    """Stream row chunks from a server-side cursor as CSV or Parquet (constant memory, no row cap)"""
+    if format == 'parquet' and not report_exporter.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow on the server")
+    
+    media_type, extension = REPORT_FORMATS[format]
+    chunks = report_exporter.start(chunks)  # runs the query now: errors become a 500, not a cut-off file
+    body = report_exporter.parquet(chunks, columns) if format == 'parquet' else report_exporter.csv(chunks, columns)
+    filename = f"{name}.{extension}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+REPORT_FORMAT_QUERY = Query("csv", pattern="^(csv|parquet)$", description="csv, or parquet for large audit exports")
+
 @router.get("/reports/transactions")
-def download_transactions_report(current_user: dict = Depends(require_admin)):
+def download_transactions_report(format: str = REPORT_FORMAT_QUERY, current_user: dict = Depends(require_admin)):
     """📄 Download All Transactions Report - Admin Only"""
     try:
-        transactions = db_service.get_transactions(limit=10000)  # Get more for report
-        filename = f"transactions_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        return generate_csv_response(transactions, filename)
+        chunks = db_service.iter_transactions_report()
+        name = f"transactions_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return stream_report(chunks, TRANSACTION_REPORT_COLUMNS, name, format)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
 
 @router.get("/reports/transactions-today")
-def download_today_transactions_report(current_user: dict = Depends(require_admin)):
+def download_today_transactions_report(format: str = REPORT_FORMAT_QUERY,
+                                       current_user: dict = Depends(require_admin)):
     """📅 Download Today's Transactions Report - Admin Only"""
     try:
         today = datetime.now().date()
-        transactions = db_service.get_transactions_by_date(today)
-        filename = f"transactions_today_{today.strftime('%Y%m%d')}.csv"
-        return generate_csv_response(transactions, filename)
+        start_time = datetime.combine(today, datetime.min.time())
+        chunks = db_service.iter_transactions_report(start_time=start_time, end_time=start_time + timedelta(days=1))
+        name = f"transactions_today_{today.strftime('%Y%m%d')}"
+        return stream_report(chunks, TRANSACTION_REPORT_COLUMNS, name, format)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
 
 @router.get("/reports/reconciliation-summary")
-def download_reconciliation_summary_report(current_user: dict = Depends(require_admin)):
+async def download_reconciliation_summary_report(current_user: dict = Depends(require_admin)):
     """📊 Download Reconciliation Summary Report - Admin Only"""
     try:
-        stats = db_service.get_transaction_stats()
+        stats = await async_db_service.get_transaction_stats()
         # Convert stats to list format for CSV
         summary_data = [
             {"metric": "Total Transactions", "value": stats.get('total_transactions', 0)},
@@ -432,32 +497,39 @@ def download_reconciliation_summary_report(current_user: dict = Depends(require_
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
 
 @router.get("/reports/mismatches")
-def download_mismatches_report(current_user: dict = Depends(require_admin)):
+def download_mismatches_report(format: str = REPORT_FORMAT_QUERY, current_user: dict = Depends(require_admin)):
     """🚨 Download All Mismatches Report - Admin Only"""
     try:
-        mismatches = db_service.get_mismatches(limit=10000)  # Get more for report
-        filename = f"mismatches_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        return generate_csv_response(mismatches, filename)
+        chunks = db_service.iter_mismatches_report()
+        name = f"mismatches_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return stream_report(chunks, MISMATCH_REPORT_COLUMNS, name, format)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
 
 @router.get("/reports/high-severity-mismatches")
-def download_high_severity_mismatches_report(current_user: dict = Depends(require_admin)):
+def download_high_severity_mismatches_report(format: str = REPORT_FORMAT_QUERY,
+                                             current_user: dict = Depends(require_admin)):
     """🔴 Download High Severity Mismatches Report - Admin Only"""
     try:
-        mismatches = db_service.get_mismatches(limit=10000, severity="HIGH")
-        filename = f"high_severity_mismatches_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        return generate_csv_response(mismatches, filename)
+        chunks = db_service.iter_mismatches_report(severity="HIGH")
+        name = f"high_severity_mismatches_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return stream_report(chunks, MISMATCH_REPORT_COLUMNS, name, format)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
 
 @router.get("/reports/audit-trail")
-def download_audit_trail_report(current_user: dict = Depends(require_admin)):
+def download_audit_trail_report(format: str = REPORT_FORMAT_QUERY, current_user: dict = Depends(require_admin)):
     """📋 Download Audit Trail Report - Admin Only"""
     try:
         # For audit trail, we'll use transaction data with additional fields
-        transactions = db_service.get_transactions(limit=10000)
-        filename = f"audit_trail_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        return generate_csv_response(transactions, filename)
+        chunks = db_service.iter_transactions_report()
+        name = f"audit_trail_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return stream_report(chunks, TRANSACTION_REPORT_COLUMNS, name, format)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
\ No newline at end of file
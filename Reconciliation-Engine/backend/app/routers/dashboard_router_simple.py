@@ -9,57 +9,69 @@ from datetime import datetime, timedelta
 import io
 import csv
 from .auth_router_simple import verify_token
-from ..services.database_service import db_service
+from ..services.async_database_service import async_db_service
 
 router = APIRouter()
 
 @router.get("/transactions")
-def get_transactions(
-    limit: int = Query(50, description="Number of transactions to return"),
-    page: int = Query(1, description="Page number"),
+async def get_transactions(
+    limit: int = Query(50, ge=1, le=500, description="Number of transactions to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page"),
+    page: int = Query(1, description="Page number (informational; use cursor to move between pages)"),
     source: Optional[str] = Query(None, description="Filter by source"),
     status: Optional[str] = Query(None, description="Filter by status"),
+    reconciliation_status: Optional[str] = Query(None, description="Filter by reconciliation status"),
     sort_by: str = Query("created_at", description="Sort field"),
     sort_direction: str = Query("desc", description="Sort direction"),
     current_user: dict = Depends(verify_token)
 ):
-    """💳 Get Real Transactions from Database"""
+    """💳 Get Real Transactions from Database (keyset pagination: newest first, pages linked by cursors)"""
     
     try:
-        # Get real transactions from database
-        transactions = db_service.get_transactions(
-            limit=limit, 
-            source=source, 
-            status=status
+        # Seeks from the cursor's (created_at, id), so any page costs the same as the first
+        result = await async_db_service.get_transactions_page(
+            limit=limit,
+            cursor=cursor,
+            source=source,
+            status=status,
+            reconciliation_status=reconciliation_status
         )
         
-        # Get total count for pagination
-        stats = db_service.get_transaction_stats()
-        total = stats.get('total_transactions', 0)
+        # Approximate total (from the rollups) for display only
+        total = result['total'] or 0
         total_pages = (total + limit - 1) // limit
         
         return {
-            "transactions": transactions,
+            "transactions": result['items'],
             "total": total,
+            "total_is_estimate": result['total_is_estimate'],
             "page": page,
             "limit": limit,
-            "total_pages": total_pages
+            "total_pages": total_pages,
+            "next_cursor": result['next_cursor'],
+            "prev_cursor": result['prev_cursor']
         }
-        
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error getting transactions: {e}")
         # Fallback to empty data if database error
         return {
             "transactions": [],
             "total": 0,
+            "total_is_estimate": True,
             "page": page,
             "limit": limit,
-            "total_pages": 0
+            "total_pages": 0,
+            "next_cursor": None,
+            "prev_cursor": None
         }
 
 @router.get("/mismatches")
-def get_mismatches(
-    limit: int = Query(50, description="Number of mismatches to return"),
+async def get_mismatches(
+    limit: int = Query(50, ge=1, le=500, description="Number of mismatches to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page"),
     mismatch_type: Optional[str] = Query(None, description="Filter by type"),
     severity: Optional[str] = Query(None, description="Filter by severity"),
     status: Optional[str] = Query(None, description="Filter by status"),
@@ -69,18 +81,17 @@ def get_mismatches(
     """🚨 Get Real Mismatches from Database"""
     
     try:
-        # Get real mismatches from database
-        mismatches = db_service.get_mismatches(
+        # Get real mismatches from database (keyset page on detected_at, id)
+        result = await async_db_service.get_mismatches_page(
             limit=limit,
+            cursor=cursor,
             severity=severity,
             mismatch_type=mismatch_type,
             status=status,
             txn_id=txn_id
         )
-        
-        # Get stats for summary
-        stats = db_service.get_transaction_stats()
-        total_mismatches = stats.get('total_mismatches', 0)
+        mismatches = result['items']
+        total_mismatches = result['total']
         
         # Calculate summary from actual data
         high_severity = len([m for m in mismatches if m.get('severity') == 'HIGH'])
@@ -94,6 +105,9 @@ def get_mismatches(
         return {
             "mismatches": mismatches,
             "total": total_mismatches,
+            "total_is_estimate": result['total_is_estimate'],
+            "next_cursor": result['next_cursor'],
+            "prev_cursor": result['prev_cursor'],
             "summary": {
                 "high_severity": high_severity,
                 "medium_severity": medium_severity,
@@ -103,13 +117,18 @@ def get_mismatches(
                 "resolved": resolved
             }
         }
-        
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error getting mismatches: {e}")
         # Fallback to empty data if database error
         return {
             "mismatches": [],
             "total": 0,
+            "total_is_estimate": True,
+            "next_cursor": None,
+            "prev_cursor": None,
             "summary": {
                 "high_severity": 0,
                 "medium_severity": 0,
@@ -121,7 +140,7 @@ def get_mismatches(
         }
 
 @router.get("/transactions/{txn_id}")
-def get_transaction_details(
+async def get_transaction_details(
     txn_id: str,
     current_user: dict = Depends(verify_token)
 ):
@@ -129,7 +148,7 @@ def get_transaction_details(
     
     try:
         # Get real transactions for this txn_id from database
-        transactions = db_service.get_transactions_by_txn_id(txn_id)
+        transactions = await async_db_service.get_transactions_by_txn_id(txn_id)
         
         if not transactions:
             # If no transactions found, return empty response
@@ -155,8 +174,7 @@ def get_transaction_details(
             })
         
         # Get mismatches for this transaction
-        mismatches = db_service.get_mismatches(limit=100)
-        txn_mismatches = [m for m in mismatches if m['txn_id'] == txn_id]
+        txn_mismatches = await async_db_service.get_mismatches(limit=100, txn_id=txn_id)
         
         return {
             "txn_id": txn_id,
@@ -165,7 +183,7 @@ def get_transaction_details(
             "sources_count": len(sources),
             "mismatches_count": len(txn_mismatches)
         }
-        
+    
     except Exception as e:
         print(f"Error getting transaction details: {e}")
         # Fallback to error response
@@ -176,14 +194,14 @@ def get_transaction_details(
         }
 
 @router.get("/health")
-def get_health_status(current_user: dict = Depends(verify_token)):
+async def get_health_status(current_user: dict = Depends(verify_token)):
     """❤️ System Health Check - Real Data from Database"""
     
     try:
         # Get real health status from database
-        health_data = db_service.get_health_status()
+        health_data = await async_db_service.get_health_status()
         return health_data
-        
+    
     except Exception as e:
         print(f"Error getting health status: {e}")
         # Fallback to basic status if database error
@@ -195,13 +213,13 @@ def get_health_status(current_user: dict = Depends(verify_token)):
         }
 
 @router.get("/stats")
-def get_stats(current_user: dict = Depends(verify_token)):
+async def get_stats(current_user: dict = Depends(verify_token)):
     """📊 Real System Statistics from Database"""
     
     try:
         # Get real statistics from database
-        return db_service.get_transaction_stats()
-        
+        return await async_db_service.get_transaction_stats()
+    
     except Exception as e:
         print(f"Error getting stats: {e}")
         # Fallback to basic stats if database error
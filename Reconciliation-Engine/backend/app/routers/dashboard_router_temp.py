@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Query, HTTPException
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 import sys
 import os
@@ -6,15 +7,16 @@ import os
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.database_service import db_service
+from services.async_database_service import async_db_service
 
 router = APIRouter()
 
 # ==================== PHASE 2 BANKING APIs ====================
 
 @router.get("/transactions")
-def get_transactions(
+async def get_transactions(
     limit: int = Query(50, ge=1, le=1000, description="Number of transactions to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page"),
     source: Optional[str] = Query(None, description="Filter by source (core, gateway, mobile)"),
     status: Optional[str] = Query(None, description="Filter by status (SUCCESS, FAILED, PENDING)"),
     reconciliation_status: Optional[str] = Query(None, description="Filter by reconciliation status")
@@ -23,25 +25,27 @@ def get_transactions(
     📋 Get transactions with filtering options
     
     Banking-grade transaction listing with:
-    - Pagination support
+    - Keyset (cursor) pagination
     - Source filtering (core banking, gateway, mobile)
     - Status filtering
     - Reconciliation status filtering
     """
     try:
-        transactions = db_service.get_transactions(
+        # Keyset page: every filter runs in the database and deep pages cost the same as the first
+        page = await async_db_service.get_transactions_page(
             limit=limit,
+            cursor=cursor,
             source=source,
-            status=status
+            status=status,
+            reconciliation_status=reconciliation_status
         )
         
-        # Filter by reconciliation status if provided
-        if reconciliation_status:
-            transactions = [t for t in transactions if t.get('reconciliation_status') == reconciliation_status]
-        
         return {
-            "transactions": transactions,
-            "total": len(transactions),
+            "transactions": page['items'],
+            "total": page['total'],
+            "total_is_estimate": page['total_is_estimate'],
+            "next_cursor": page['next_cursor'],
+            "prev_cursor": page['prev_cursor'],
             "filters": {
                 "source": source,
                 "status": status,
@@ -49,12 +53,14 @@ def get_transactions(
                 "limit": limit
             }
         }
-        
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving transactions: {str(e)}")
 
 @router.get("/transactions/{txn_id}")
-def get_transaction_details(txn_id: str):
+async def get_transaction_details(txn_id: str):
     """
     🔍 Get detailed view of a specific transaction across all sources
     
@@ -64,7 +70,7 @@ def get_transaction_details(txn_id: str):
     - Mobile application
     """
     try:
-        transactions = db_service.get_transactions_by_txn_id(txn_id)
+        transactions = await async_db_service.get_transactions_by_txn_id(txn_id)
         
         if not transactions:
             raise HTTPException(status_code=404, detail=f"Transaction {txn_id} not found")
@@ -75,15 +81,16 @@ def get_transaction_details(txn_id: str):
             "source_count": len(transactions),
             "reconciliation_status": transactions[0].get('reconciliation_status', 'UNKNOWN')
         }
-        
+    
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving transaction details: {str(e)}")
 
 @router.get("/mismatches")
-def get_mismatches(
+async def get_mismatches(
     limit: int = Query(50, ge=1, le=500, description="Number of mismatches to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page"),
     severity: Optional[str] = Query(None, description="Filter by severity (HIGH, MEDIUM, LOW)"),
     mismatch_type: Optional[str] = Query(None, description="Filter by mismatch type"),
     status: Optional[str] = Query(None, description="Filter by resolution status")
@@ -97,16 +104,20 @@ def get_mismatches(
     - Resolution status tracking
     """
     try:
-        mismatches = db_service.get_mismatches(
+        page = await async_db_service.get_mismatches_page(
             limit=limit,
+            cursor=cursor,
             severity=severity,
             mismatch_type=mismatch_type,
             status=status
         )
         
         return {
-            "mismatches": mismatches,
-            "total": len(mismatches),
+            "mismatches": page['items'],
+            "total": page['total'],
+            "total_is_estimate": page['total_is_estimate'],
+            "next_cursor": page['next_cursor'],
+            "prev_cursor": page['prev_cursor'],
             "filters": {
                 "severity": severity,
                 "mismatch_type": mismatch_type,
@@ -114,12 +125,14 @@ def get_mismatches(
                 "limit": limit
             }
         }
-        
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving mismatches: {str(e)}")
 
 @router.get("/stats")
-def get_comprehensive_stats():
+async def get_comprehensive_stats():
     """
     📊 Get comprehensive reconciliation statistics
     
@@ -131,7 +144,7 @@ def get_comprehensive_stats():
     - Recent activity metrics
     """
     try:
-        stats = db_service.get_transaction_stats()
+        stats = await async_db_service.get_transaction_stats()
         
         return {
             "overview": {
@@ -150,12 +163,12 @@ def get_comprehensive_stats():
             "recent_activity": stats['recent_activity'],
             "generated_at": "2025-12-14T14:45:00Z"
         }
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving statistics: {str(e)}")
 
 @router.get("/health")
-def get_health_status():
+async def get_health_status():
     """
     ❤️ Get system health status
     
@@ -167,12 +180,12 @@ def get_health_status():
     - Uptime information
     """
     try:
-        health = db_service.get_health_status()
+        health = await async_db_service.get_health_status()
         
         # Add Redis health check
         from services.redis_service import redis_service
-        redis_connected = redis_service.is_connected()
-        redis_stats = redis_service.get_redis_stats() if redis_connected else {}
+        redis_connected = await run_in_threadpool(redis_service.is_connected)
+        redis_stats = await run_in_threadpool(redis_service.get_redis_stats) if redis_connected else {}
         
         return {
             "status": health['status'],
@@ -190,7 +203,7 @@ def get_health_status():
             "uptime": health['uptime'],
             "timestamp": "2025-12-14T14:45:00Z"
         }
-        
+    
     except Exception as e:
         return {
             "status": "ERROR",
@@ -201,10 +214,10 @@ def get_health_status():
 # ==================== LEGACY COMPATIBILITY ====================
 
 @router.get("/metrics")
-def get_metrics():
+async def get_metrics():
     """Legacy metrics endpoint for frontend compatibility"""
     try:
-        stats = db_service.get_transaction_stats()
+        stats = await async_db_service.get_transaction_stats()
         
         return {
             "totalTransactions": stats['total_reconciled'],
@@ -213,7 +226,7 @@ def get_metrics():
             "pendingReconciliation": stats['pending_reconciliation'],
             "systemStatus": "ONLINE"
         }
-        
+    
     except Exception as e:
         return {
             "totalTransactions": 0,
@@ -224,11 +237,11 @@ def get_metrics():
         }
 
 @router.get("/reconciliation-details")
-def get_reconciliation_details():
+async def get_reconciliation_details():
     """Legacy reconciliation details for frontend compatibility"""
     try:
-        stats = db_service.get_transaction_stats()
-        transactions = db_service.get_transactions(10)
+        stats = await async_db_service.get_transaction_stats()
+        transactions = await async_db_service.get_transactions(10)
         
         return {
             "statistics": {
@@ -241,7 +254,7 @@ def get_reconciliation_details():
             "mismatch_breakdown": stats['mismatch_types'],
             "source_breakdown": stats['source_distribution']
         }
-        
+    
     except Exception as e:
         return {
             "statistics": {"total_reconciled": 0, "total_mismatches": 0, "success_rate": 100, "pending_reconciliation": 0},
@@ -251,7 +264,7 @@ def get_reconciliation_details():
         }
 
 @router.get("/redis-stats")
-def get_redis_performance():
+async def get_redis_performance():
     """
     🚀 Get Redis cache performance statistics
     
@@ -260,18 +273,22 @@ def get_redis_performance():
     - Memory usage
     - Active connections
     - In-flight transaction counts
+    - Read cache hits, misses and latency per method
     """
     try:
         from services.redis_service import redis_service
+        from services.read_cache import read_cache
         
-        if not redis_service.is_connected():
+        # Redis calls block: keep them off the event loop
+        if not await run_in_threadpool(redis_service.is_connected):
             return {
                 "status": "DISCONNECTED",
-                "error": "Redis not available"
+                "error": "Redis not available",
+                "read_cache": read_cache.snapshot()
             }
         
         # Get Redis statistics
-        redis_stats = redis_service.get_redis_stats()
+        redis_stats = await run_in_threadpool(redis_service.get_redis_stats)
         
         # Calculate cache hit ratio
         hits = redis_stats.get('keyspace_hits', 0)
@@ -279,10 +296,9 @@ def get_redis_performance():
         total_requests = hits + misses
         hit_ratio = (hits / total_requests * 100) if total_requests > 0 else 0
         
-        # Get in-flight transaction counts
-        inflight_core = len(redis_service.get_inflight_by_source('core'))
-        inflight_gateway = len(redis_service.get_inflight_by_source('gateway'))
-        inflight_mobile = len(redis_service.get_inflight_by_source('mobile'))
+        # Get in-flight transaction counts (one ZCARD per source index)
+        inflight = await run_in_threadpool(redis_service.count_inflight, ('core', 'gateway', 'mobile'))
+        inflight_core, inflight_gateway, inflight_mobile = inflight['core'], inflight['gateway'], inflight['mobile']
         
         return {
             "status": "CONNECTED",
@@ -301,9 +317,10 @@ def get_redis_performance():
                     "total": inflight_core + inflight_gateway + inflight_mobile
                 }
             },
+            "read_cache": read_cache.snapshot(),
             "timestamp": "2025-12-14T14:45:00Z"
         }
-        
+    
     except Exception as e:
         return {
             "status": "ERROR",
@@ -3,7 +3,9 @@ System Health API Router
 Provides endpoints for real-time system monitoring
 """
 from fastapi import APIRouter, HTTPException, Depends
+from starlette.concurrency import run_in_threadpool
 from typing import Dict, List
+from datetime import datetime
 import logging
 from ..services.system_health_service import system_health_service
 from ..services.auth_service import get_current_user, require_admin, require_auditor
@@ -18,7 +20,7 @@ async def get_system_health_overview():
     Public endpoint for basic health check
     """
     try:
-        return system_health_service.get_system_overview()
+        return await run_in_threadpool(system_health_service.get_system_overview)
     except Exception as e:
         logger.error(f"Error getting system health overview: {e}")
         raise HTTPException(status_code=500, detail="Failed to get system health data")
@@ -31,8 +33,8 @@ async def get_service_status():
     """
     try:
         return {
-            "services": system_health_service.get_service_status(),
-            "timestamp": system_health_service.get_system_overview()["timestamp"]
+            "services": await run_in_threadpool(system_health_service.get_service_status),
+            "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         logger.error(f"Error getting service status: {e}")
@@ -44,7 +46,7 @@ async def get_kafka_metrics():
     Get Kafka cluster metrics
     """
     try:
-        return system_health_service.get_kafka_metrics()
+        return await run_in_threadpool(system_health_service.get_kafka_metrics)
     except Exception as e:
         logger.error(f"Error getting Kafka metrics: {e}")
         raise HTTPException(status_code=500, detail="Failed to get Kafka metrics")
@@ -55,7 +57,7 @@ async def get_backend_metrics():
     Get backend API metrics
     """
     try:
-        return system_health_service.get_backend_metrics()
+        return await run_in_threadpool(system_health_service.get_backend_metrics)
     except Exception as e:
         logger.error(f"Error getting backend metrics: {e}")
         raise HTTPException(status_code=500, detail="Failed to get backend metrics")
@@ -66,7 +68,7 @@ async def get_redis_metrics():
     Get Redis cache metrics
     """
     try:
-        return system_health_service.get_redis_metrics()
+        return await run_in_threadpool(system_health_service.get_redis_metrics)
     except Exception as e:
         logger.error(f"Error getting Redis metrics: {e}")
         raise HTTPException(status_code=500, detail="Failed to get Redis metrics")
@@ -77,7 +79,7 @@ async def get_database_metrics():
     Get PostgreSQL database metrics
     """
     try:
-        return system_health_service.get_database_metrics()
+        return await run_in_threadpool(system_health_service.get_database_metrics)
     except Exception as e:
         logger.error(f"Error getting database metrics: {e}")
         raise HTTPException(status_code=500, detail="Failed to get database metrics")
@@ -89,8 +91,8 @@ async def get_system_alerts():
     """
     try:
         return {
-            "alerts": system_health_service.get_system_alerts(),
-            "timestamp": system_health_service.get_system_overview()["timestamp"]
+            "alerts": await run_in_threadpool(system_health_service.get_system_alerts),
+            "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         logger.error(f"Error getting system alerts: {e}")
@@ -103,7 +105,7 @@ async def get_detailed_health_metrics():
     Requires authentication
     """
     try:
-        overview = system_health_service.get_system_overview()
+        overview = await run_in_threadpool(system_health_service.get_system_overview)
         
         # Add additional detailed metrics for authenticated users
         overview["detailed"] = {
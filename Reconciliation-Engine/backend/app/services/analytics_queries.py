@@ -0,0 +1,196 @@
+"""
+Set-based delay analytics
+Per-source reconciliation delay percentiles, duplicate and delayed counts from one grouped
+query over an indexed created_at window, cached until the transaction rollups move
+"""
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import Session
+
+from ..models.transaction import Transaction
+from ..models.rollup import TransactionRollup
+
+# Window the analytics cover (hours back from now) and the "delayed" threshold (minutes)
+ANALYTICS_WINDOW_HOURS = int(os.getenv("ANALYTICS_WINDOW_HOURS", 24))
+ANALYTICS_DELAYED_MINUTES = int(os.getenv("ANALYTICS_DELAYED_MINUTES", 5))
+# A cached result is served without checking the watermark for this many seconds
+ANALYTICS_MIN_REFRESH_SECONDS = float(os.getenv("ANALYTICS_MIN_REFRESH_SECONDS", 5))
+
+DELAY_PERCENTILES = {'p50_delay_s': 0.5, 'p95_delay_s': 0.95, 'p99_delay_s': 0.99}
+
+def _delay_seconds(dialect: str):
+    """SQL expression for reconciled_at - created_at in seconds (NULL while unreconciled)"""
+    if dialect == 'postgresql':
+        return func.extract('epoch', Transaction.reconciled_at - Transaction.created_at)
+    return (func.julianday(Transaction.reconciled_at) - func.julianday(Transaction.created_at)) * 86400
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    """percentile_cont: linear interpolation between the closest ranks of a sorted list"""
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def _source_stats(transactions: int = 0, reconciled: int = 0, avg_delay: Optional[float] = None,
+                  percentiles: Dict[str, Optional[float]] = None, delayed: int = 0, duplicates: int = 0) -> Dict:
+    stats = {
+        'transactions': int(transactions),
+        'reconciled': int(reconciled),
+        'avg_delay_s': round(float(avg_delay or 0.0), 3)
+    }
+    for name in DELAY_PERCENTILES:
+        stats[name] = round(float((percentiles or {}).get(name) or 0.0), 3)
+    stats.update({'delayed': int(delayed or 0), 'duplicates': int(duplicates or 0)})
+    return stats
+
+class DelayAnalytics:
+    """Delay percentiles, duplicate and delayed counts per source, in one pass over the window.
+    
+    The window rows are numbered per (source, txn_id) with row_number(),
+    so a duplicate group is counted once at its second row and the same
+    scan yields the delay distribution. PostgreSQL aggregates it with
+    percentile_cont; other dialects (SQLite in development) fold the
+    window rows in Python. Results are cached per (window, threshold) and
+    recomputed only when the rollup watermark of the window changes.
+    """
+    
+    def __init__(self, min_refresh_seconds: float = ANALYTICS_MIN_REFRESH_SECONDS):
+        self.min_refresh_seconds = min_refresh_seconds
+        self.lock = threading.Lock()
+        self.cache: Dict[tuple, tuple] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def clear(self):
+        """Drop every cached result (the next call recomputes)"""
+        with self.lock:
+            self.cache.clear()
+    
+    def watermark(self, db: Session, window_start: datetime) -> tuple:
+        """Rollup state of the window: (first bucket, last bucket, rows, reconciled rows)"""
+        first_bucket = window_start.replace(second=0, microsecond=0)
+        reconciled = case(
+            (TransactionRollup.reconciliation_status.in_(('', 'PENDING')), 0),
+            else_=TransactionRollup.count
+        )
+        last_bucket, rows, reconciled_rows = db.execute(
+            select(
+                func.max(TransactionRollup.bucket),
+                func.coalesce(func.sum(TransactionRollup.count), 0),
+                func.coalesce(func.sum(reconciled), 0)
+            ).where(TransactionRollup.bucket >= first_bucket)
+        ).one()
+        return (first_bucket, last_bucket, int(rows), int(reconciled_rows))
+    
+    def get(self, db: Session, window_hours: int = ANALYTICS_WINDOW_HOURS,
+            delayed_minutes: int = ANALYTICS_DELAYED_MINUTES) -> Dict:
+        """Cached analytics of the last window_hours; recomputed when the watermark moved"""
+        key = (window_hours, delayed_minutes)
+        now = time.monotonic()
+        with self.lock:
+            cached = self.cache.get(key)
+        if cached is not None and now - cached[1] < self.min_refresh_seconds:
+            self.hits += 1
+            return cached[2]
+        
+        window_start = datetime.now() - timedelta(hours=window_hours)
+        watermark = self.watermark(db, window_start)
+        if cached is not None and cached[0] == watermark:
+            self.hits += 1
+            result = cached[2]
+        else:
+            self.misses += 1
+            result = self.compute(db, window_start, delayed_minutes)
+            result['window_hours'] = window_hours
+            result['watermark'] = watermark[1].isoformat() if watermark[1] else None
+        
+        # The lock only guards the dict: holding it across a query would block the event
+        # loop thread when the async service runs this on a greenlet
+        with self.lock:
+            self.cache[key] = (watermark, now, result)
+        return result
+    
+    def compute(self, db: Session, window_start: datetime, delayed_minutes: int) -> Dict:
+        """Run the window query (no caching)"""
+        dialect = db.get_bind().dialect.name
+        threshold = delayed_minutes * 60
+        window = select(
+            Transaction.source.label('source'),
+            _delay_seconds(dialect).label('delay'),
+            func.row_number().over(
+                partition_by=(Transaction.source, Transaction.txn_id),
+                order_by=Transaction.id
+            ).label('rn')
+        ).where(Transaction.created_at >= window_start).subquery()
+        
+        if dialect == 'postgresql':
+            by_source = self._aggregate_sql(db, window, threshold)
+        else:
+            by_source = self._aggregate_rows(db, window, threshold)
+        
+        return {
+            'window_start': window_start.isoformat(),
+            'delayed_threshold_s': threshold,
+            'transactions': sum(stats['transactions'] for stats in by_source.values()),
+            'reconciled': sum(stats['reconciled'] for stats in by_source.values()),
+            'delayed_count': sum(stats['delayed'] for stats in by_source.values()),
+            'duplicate_count': sum(stats['duplicates'] for stats in by_source.values()),
+            'by_source': by_source,
+            'computed_at': datetime.now().isoformat()
+        }
+    
+    def _aggregate_sql(self, db: Session, window, threshold: int) -> Dict[str, Dict]:
+        percentiles = [
+            func.percentile_cont(fraction).within_group(window.c.delay).label(name)
+            for name, fraction in DELAY_PERCENTILES.items()
+        ]
+        query = select(
+            window.c.source,
+            func.count().label('transactions'),
+            func.count(window.c.delay).label('reconciled'),
+            func.avg(window.c.delay).label('avg_delay'),
+            *percentiles,
+            func.count().filter(window.c.delay > threshold).label('delayed'),
+            func.count().filter(window.c.rn == 2).label('duplicates')
+        ).group_by(window.c.source)
+        
+        by_source = {}
+        for row in db.execute(query).mappings():
+            by_source[row['source'] or 'unknown'] = _source_stats(
+                row['transactions'], row['reconciled'], row['avg_delay'],
+                {name: row[name] for name in DELAY_PERCENTILES}, row['delayed'], row['duplicates']
+            )
+        return by_source
+    
+    def _aggregate_rows(self, db: Session, window, threshold: int) -> Dict[str, Dict]:
+        totals: Dict[str, list] = {}
+        delays: Dict[str, List[float]] = {}
+        for source, delay, rn in db.execute(select(window.c.source, window.c.delay, window.c.rn)):
+            source = source or 'unknown'
+            counts = totals.setdefault(source, [0, 0, 0])  # transactions, delayed, duplicates
+            counts[0] += 1
+            if rn == 2:
+                counts[2] += 1
+            if delay is not None:
+                delays.setdefault(source, []).append(float(delay))
+                if delay > threshold:
+                    counts[1] += 1
+        
+        by_source = {}
+        for source, (transactions, delayed, duplicates) in totals.items():
+            ordered = sorted(delays.get(source, []))
+            by_source[source] = _source_stats(
+                transactions, len(ordered), sum(ordered) / len(ordered) if ordered else None,
+                {name: _percentile(ordered, fraction) for name, fraction in DELAY_PERCENTILES.items()},
+                delayed, duplicates
+            )
+        return by_source
+
+# Global delay analytics instance
+delay_analytics = DelayAnalytics()
@@ -0,0 +1,106 @@
+"""
+Async database service for the async def routers
+Same query surface as DatabaseService, awaited on SQLAlchemy's asyncio engine (asyncpg on
+PostgreSQL), so a handler waiting on the database does not hold a threadpool worker
+"""
+from starlette.concurrency import run_in_threadpool
+
+from ..db.database import AsyncSessionLocal, current_request_scope
+from .database_service import DatabaseService, db_service
+from .read_cache import read_cache
+
+# DatabaseService methods available as coroutines (report iterators stay sync: they stream
+# from a server-side cursor in the threadpool). Reads only: writes end in read_cache.invalidate,
+# whose Redis calls block, so async handlers write with run_in_threadpool(db_service...)
+ASYNC_METHODS = (
+    'get_rollup_stats',
+    'get_transactions',
+    'get_transactions_page',
+    'get_transactions_by_txn_id',
+    'get_mismatches',
+    'get_mismatches_page',
+    'get_transaction_stats',
+    'get_health_status',
+    'get_transactions_by_date',
+    'get_mismatches_by_date',
+    'count_transactions',
+    'count_transactions_by',
+    'count_transactions_by_date',
+    'count_mismatches',
+    'count_mismatches_by',
+    'count_mismatches_by_date',
+    'get_delayed_transactions_count',
+    'get_duplicate_transactions_count',
+    'get_timeline_stats',
+    'get_recent_activity_stats',
+    'get_delay_analytics',
+    'get_source_delay_analysis'
+)
+
+class AsyncDatabaseService:
+    """Awaitable DatabaseService.
+    
+    Each call runs the DatabaseService method on an AsyncSession through
+    run_sync: the query code is shared, while every statement goes through
+    the asyncio driver and yields to the event loop while it waits. Inside
+    a request (RequestSessionMiddleware) calls awaited one after another
+    share the request's AsyncSession, like sync handlers share their
+    session; a call made while another is running on it (asyncio.gather)
+    opens its own. Without an asyncio driver (asyncpg / aiosqlite not
+    installed) calls run the sync service in the threadpool, as sync
+    handlers did.
+    """
+    
+    def __init__(self, session_factory=None, fallback: DatabaseService = db_service):
+        self.session_factory = session_factory
+        self.fallback = fallback
+    
+    @property
+    def is_async(self) -> bool:
+        return self.session_factory is not None
+    
+    async def _call(self, method: str, *args, **kwargs):
+        function = getattr(DatabaseService, method)
+        spec = getattr(function, 'cached_read', None)
+        if spec is not None:
+            # Cached reads: the lookup and single flight run here, on the event loop, so
+            # concurrent handlers wait on one load instead of each taking a session
+            return await read_cache.aget_or_load(spec, args, kwargs, lambda: self._run(spec.function, args, kwargs))
+        return await self._run(function, args, kwargs)
+    
+    async def _run(self, function, args: tuple, kwargs: dict):
+        if self.session_factory is None:
+            return await run_in_threadpool(function, self.fallback, *args, **kwargs)
+        
+        def call(sync_session):
+            return function(DatabaseService(sync_session), *args, **kwargs)
+        
+        request_scope = current_request_scope()
+        if request_scope is None or request_scope.async_busy:
+            async with self.session_factory() as session:
+                return await session.run_sync(call)
+        
+        if request_scope.async_session is None:
+            request_scope.async_session = self.session_factory()
+        request_scope.async_busy = True
+        try:
+            if request_scope.async_failed:
+                # A previous call hit a database error; start a clean transaction
+                await request_scope.async_session.rollback()
+                request_scope.async_failed = False
+            return await request_scope.async_session.run_sync(call)
+        finally:
+            request_scope.async_busy = False
+
+def _delegate(method: str):
+    async def call(self, *args, **kwargs):
+        return await self._call(method, *args, **kwargs)
+    call.__name__ = method
+    call.__doc__ = getattr(DatabaseService, method).__doc__
+    return call
+
+for _method in ASYNC_METHODS:
+    setattr(AsyncDatabaseService, _method, _delegate(_method))
+
+# Global async database service instance
+async_db_service = AsyncDatabaseService(AsyncSessionLocal)
@@ -0,0 +1,263 @@
+"""
+Write-behind batch writer for the database
+Accumulates transaction inserts from the consumers and mismatch inserts / reconciliation status
+updates from the engine, and flushes them together in one database transaction
+"""
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A flush starts when this many rows are buffered...
+DB_BATCH_MAX_ROWS = int(os.getenv("DB_BATCH_MAX_ROWS", 2000))
+# ...or when the oldest buffered row has waited this long
+DB_BATCH_MAX_LATENCY_MS = float(os.getenv("DB_BATCH_MAX_LATENCY_MS", 50))
+
+_database_module = None
+_database_lock = threading.Lock()
+
+def _database():
+    """database_service module (imported lazily: it connects to the database on import).
+    
+    Resolved once under a lock: consumer and shard threads reach it at the
+    same time, and a thread must not pick up the other import path's
+    half-initialized module.
+    """
+    global _database_module
+    if _database_module is None:
+        with _database_lock:
+            if _database_module is None:
+                try:
+                    from services import database_service
+                except ImportError:
+                    from app.services import database_service
+                _database_module = database_service
+    return _database_module
+
+class FlushTicket:
+    """Durability signal for rows handed to the writer"""
+    
+    __slots__ = ('event', 'ok')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.ok = False
+    
+    def resolve(self, ok: bool):
+        self.ok = ok
+        self.event.set()
+    
+    @property
+    def done(self) -> bool:
+        return self.event.is_set()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True once the rows are committed; False if the flush failed or timeout elapsed"""
+        return self.event.wait(timeout) and self.ok
+
+class BatchWriter:
+    """Buffers rows and flushes them with multi-row INSERTs and set-based UPDATEs.
+    
+    Every submit returns a FlushTicket that resolves when the flush holding
+    those rows commits (or fails), so the Kafka consumers commit offsets
+    only for durable batches. Rows submitted while a flush is running are
+    buffered for the next one, so concurrent consumers and shards share
+    commits instead of paying one each.
+    
+    If a combined flush fails, the transaction inserts and the engine's
+    verdict writes are retried separately: a bad verdict row must not fail
+    a consumer batch. Transaction tickets resolve False on failure (the
+    consumer retries or rewinds); verdict writes that still fail are
+    logged and dropped, as the per-row path did.
+    """
+    
+    def __init__(self, max_rows: int = DB_BATCH_MAX_ROWS, max_latency_ms: float = DB_BATCH_MAX_LATENCY_MS,
+                 write: Optional[Callable[..., bool]] = None):
+        self.max_rows = max_rows
+        self.max_latency = max_latency_ms / 1000
+        self.write = write  # write(transactions=, mismatches=, status_updates=) -> bool
+        self.cond = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.pid = None
+        self.running = False
+        self.flushing = False
+        self._reset_buffer()
+        self.stats = {
+            'flushes': 0,
+            'failed_flushes': 0,
+            'transactions': 0,
+            'mismatches': 0,
+            'status_updates': 0,
+            'dropped': 0,
+            'largest_flush': 0,
+            'last_flush_ms': 0.0
+        }
+    
+    def _reset_buffer(self):
+        self.transactions: List[dict] = []
+        self.mismatches: List[dict] = []
+        self.status_updates: Dict[str, tuple] = {}  # {txn_id: (status, sources, reconciled_at)}, last one wins
+        self.transaction_tickets: List[FlushTicket] = []
+        self.verdict_tickets: List[FlushTicket] = []
+        self.oldest: Optional[float] = None
+        self.forced = False
+    
+    def _pending_rows(self) -> int:
+        return len(self.transactions) + len(self.mismatches) + len(self.status_updates)
+    
+    # ==================== SUBMISSION ====================
+    
+    def save_transactions(self, transactions: List[dict]) -> FlushTicket:
+        """Queue new transactions rows (one per source message)"""
+        current_time = datetime.now()
+        rows = [_database().transaction_row(data, current_time) for data in transactions]
+        return self._submit(transactions=rows)
+    
+    def save_mismatches(self, mismatches: List[dict]) -> FlushTicket:
+        """Queue mismatch rows (same dicts as DatabaseService.save_mismatch)"""
+        current_time = datetime.now()
+        rows = [_database().mismatch_row(data, current_time) for data in mismatches]
+        return self._submit(mismatches=rows)
+    
+    def update_status(self, txn_id: str, status: str, sources: List[str]) -> FlushTicket:
+        """Queue a reconciliation verdict for every row of txn_id"""
+        return self._submit(status_updates={txn_id: (status, sources, datetime.now())})
+    
+    def _submit(self, transactions: List[dict] = (), mismatches: List[dict] = (),
+                status_updates: Optional[Dict[str, tuple]] = None) -> FlushTicket:
+        ticket = FlushTicket()
+        with self.cond:
+            self._ensure_started()
+            self.transactions.extend(transactions)
+            self.mismatches.extend(mismatches)
+            if status_updates:
+                self.status_updates.update(status_updates)
+            (self.transaction_tickets if transactions else self.verdict_tickets).append(ticket)
+            if self.oldest is None:
+                # First row of a batch: wake the flush thread to arm the latency deadline
+                self.oldest = time.monotonic()
+                self.cond.notify_all()
+            elif self._pending_rows() >= self.max_rows:
+                self.cond.notify_all()
+        return ticket
+    
+    def _ensure_started(self):
+        """Start the flush thread on first use (and again in a forked shard process)"""
+        if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+            self.pid = os.getpid()
+            self.running = True
+            self.flushing = False
+            self.thread = threading.Thread(target=self._run, name="db-batch-writer", daemon=True)
+            self.thread.start()
+    
+    # ==================== FLUSHING ====================
+    
+    def _due(self) -> bool:
+        if self.oldest is None:
+            return False
+        return (self.forced or self._pending_rows() >= self.max_rows
+                or time.monotonic() - self.oldest >= self.max_latency)
+    
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self._due():
+                    timeout = None if self.oldest is None else self.oldest + self.max_latency - time.monotonic()
+                    self.cond.wait(max(timeout, 0) if timeout is not None else None)
+                
+                if self.oldest is None:
+                    return  # stopped with nothing buffered
+                
+                batch = (self.transactions, self.mismatches, self.status_updates,
+                         self.transaction_tickets, self.verdict_tickets)
+                self._reset_buffer()
+                self.flushing = True
+            
+            try:
+                self._flush(*batch)
+            finally:
+                with self.cond:
+                    self.flushing = False
+                    self.cond.notify_all()
+    
+    def _write(self, transactions: List[dict], mismatches: List[dict], status_updates: Dict[str, tuple]) -> bool:
+        write = self.write or _database().db_service.write_batch
+        try:
+            return write(transactions=transactions, mismatches=mismatches, status_updates=status_updates)
+        except Exception as e:
+            logger.error(f"❌ Batch write failed: {e}")
+            return False
+    
+    def _flush(self, transactions: List[dict], mismatches: List[dict], status_updates: Dict[str, tuple],
+               transaction_tickets: List[FlushTicket], verdict_tickets: List[FlushTicket]):
+        started = time.perf_counter()
+        
+        if self._write(transactions, mismatches, status_updates):
+            transactions_ok = verdicts_ok = True
+        else:
+            self.stats['failed_flushes'] += 1
+            has_verdicts = bool(mismatches or status_updates)
+            if transactions and has_verdicts:
+                # Retry the parts on their own so one bad row cannot fail the other side
+                transactions_ok = self._write(transactions, [], {})
+                verdicts_ok = self._write([], mismatches, status_updates)
+            else:
+                transactions_ok = verdicts_ok = False
+            
+            if has_verdicts and not verdicts_ok:
+                dropped = len(mismatches) + len(status_updates)
+                self.stats['dropped'] += dropped
+                logger.error(f"❌ Dropped {len(mismatches)} mismatches and {len(status_updates)} status updates "
+                             f"the database rejected")
+        
+        for ticket in transaction_tickets:
+            ticket.resolve(transactions_ok)
+        for ticket in verdict_tickets:
+            ticket.resolve(verdicts_ok)
+        
+        rows = len(transactions) + len(mismatches) + len(status_updates)
+        self.stats['flushes'] += 1
+        self.stats['largest_flush'] = max(self.stats['largest_flush'], rows)
+        self.stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        if transactions_ok:
+            self.stats['transactions'] += len(transactions)
+        if verdicts_ok:
+            self.stats['mismatches'] += len(mismatches)
+            self.stats['status_updates'] += len(status_updates)
+    
+    # ==================== LIFECYCLE ====================
+    
+    def flush(self, timeout: float = 30) -> bool:
+        """Flush everything buffered now and wait for it; False on timeout"""
+        with self.cond:
+            if self.oldest is None and not self.flushing:
+                return True
+            self.forced = True
+            self.cond.notify_all()
+            return self.cond.wait_for(lambda: self.oldest is None and not self.flushing, timeout)
+    
+    def stop(self, timeout: float = 30):
+        """Flush what is buffered and stop the flush thread"""
+        self.flush(timeout)
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread and self.thread.is_alive() and self.pid == os.getpid():
+            self.thread.join(timeout=timeout)
+    
+    def get_status(self) -> dict:
+        with self.cond:
+            pending = self._pending_rows()
+        return {
+            'pending_rows': pending,
+            'max_rows': self.max_rows,
+            'max_latency_ms': self.max_latency * 1000,
+            **self.stats
+        }
+
+# Global batch writer instance (flush thread starts on first use)
+batch_writer = BatchWriter()
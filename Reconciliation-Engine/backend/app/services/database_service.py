@@ -1,26 +1,337 @@
 """
 Database service for transaction reconciliation
 Handles all database operations for transactions and mismatches
-Enhanced with Redis caching for banking-grade performance
+Enhanced with a two-tier (in-process + Redis) read cache for banking-grade performance
 """
+import os
 import json
+import base64
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy import func, desc, and_, insert, update, select, cast, literal, Integer, tuple_, text
 from collections import defaultdict
 
-from ..db.database import SessionLocal
+from ..db.database import SessionLocal, SharedSession, current_request_scope, get_pool_status
 from ..models.transaction import Transaction
 from ..models.mismatch import Mismatch
+from ..models.rollup import TransactionRollup, MismatchRollup
 from .redis_service import redis_service
+from .read_cache import read_cache, skip_cache, READ_CACHE_TTL
+from .analytics_queries import delay_analytics, ANALYTICS_WINDOW_HOURS, ANALYTICS_DELAYED_MINUTES
+
+def transaction_row(transaction_data: dict, current_time: datetime) -> dict:
+    """Column values of a new transactions row (shared by the single and bulk paths)"""
+    return {
+        'txn_id': transaction_data['txn_id'],
+        'amount': float(transaction_data.get('amount', 0)),
+        'status': transaction_data.get('status', 'UNKNOWN'),
+        'timestamp': current_time,
+        'currency': transaction_data.get('currency', 'INR'),
+        'account_id': transaction_data.get('account_id'),
+        'source': transaction_data['source'],
+        'reconciliation_status': 'PENDING',
+        'created_at': current_time,
+        'updated_at': current_time
+    }
+
+def mismatch_row(mismatch_data: dict, current_time: datetime) -> dict:
+    """Column values of a new mismatches row (shared by the single and bulk paths)"""
+    return {
+        'txn_id': mismatch_data['txn_id'],
+        'mismatch_type': mismatch_data['type'],
+        'severity': mismatch_data['severity'],
+        'details': mismatch_data['details'],
+        'sources_involved': json.dumps(mismatch_data.get('sources_involved', [])),
+        'expected_value': mismatch_data.get('expected_value'),
+        'actual_value': mismatch_data.get('actual_value'),
+        'difference_amount': mismatch_data.get('difference_amount'),
+        'status': 'OPEN',
+        'detected_at': current_time,
+        'created_at': current_time,
+        'updated_at': current_time
+    }
+
+def _minute(value: Optional[datetime]) -> datetime:
+    """Rollup bucket of a timestamp"""
+    return (value or datetime.min).replace(second=0, microsecond=0)
+
+def _upsert_counts(db: Session, model, key_columns: List[str], deltas: Dict[tuple, int]):
+    """Add deltas to rollup counters: INSERT ... ON CONFLICT DO UPDATE SET count = count + excluded.count"""
+    rows = [dict(zip(key_columns, key), count=delta) for key, delta in deltas.items() if delta]
+    if not rows:
+        return
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    statement = upsert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={'count': model.count + statement.excluded.count}
+    )
+    db.execute(statement, rows)
+
+TRANSACTION_ROLLUP_KEYS = ['bucket', 'source', 'status', 'reconciliation_status']
+MISMATCH_ROLLUP_KEYS = ['bucket', 'mismatch_type', 'severity']
+
+def _transaction_rollup_key(created_at, source, status, reconciliation_status) -> tuple:
+    return (_minute(created_at), source or '', status or '', reconciliation_status or '')
+
+# Timeline granularities: bucket width in seconds and the label format of a bucket start
+TIMELINE_INTERVALS = {
+    'minute': (60, '%H:%M'),
+    '5m': (300, '%H:%M'),
+    'hour': (3600, '%H:00'),
+    'day': (86400, '%Y-%m-%d')
+}
+# Upper bound on buckets per timeline (e.g. 7 days of minutes); longer windows are clamped
+MAX_TIMELINE_BUCKETS = 10080
+
+def timeline_start(end_time: datetime, window: timedelta, step: int) -> datetime:
+    """Start of the first bucket: end_time - window, truncated to a bucket boundary (date_trunc)"""
+    start = end_time - window
+    if step >= 86400:
+        return start.replace(hour=0, minute=0, second=0, microsecond=0)
+    midnight = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = int((start - midnight).total_seconds())
+    return midnight + timedelta(seconds=elapsed - elapsed % step)
+
+def _bucket_index(dialect: str, column, start: datetime, step: int):
+    """SQL expression for the bucket number of column: floor((column - start) / step)"""
+    if dialect == 'postgresql':
+        seconds = func.extract('epoch', column - start)
+        return cast(func.floor(seconds / step), Integer)
+    # SQLite stores datetimes as text; julianday() is in days. Rows are >= start, so
+    # truncating toward zero is the floor.
+    seconds = (func.julianday(column) - func.julianday(start)) * 86400
+    return cast(seconds / step, Integer)
+
+def _bucket_series(dialect: str, buckets: int):
+    """Selectable of bucket numbers 0..buckets-1 (one column, 'bucket') for zero-filling"""
+    if dialect == 'postgresql':
+        series = func.generate_series(0, buckets - 1).table_valued('bucket')
+        return select(series.c.bucket).subquery()
+    series = select(literal(0).label('bucket')).cte('buckets', recursive=True)
+    series = series.union_all(select(series.c.bucket + 1).where(series.c.bucket < buckets - 1))
+    return select(series.c.bucket).subquery()
+
+# Columns the API representations read: lists select these (Core rows, no ORM identity map
+# or change tracking) and transaction_dict / mismatch_dict accept the rows as they are
+TRANSACTION_API_COLUMNS = (
+    Transaction.id, Transaction.txn_id, Transaction.amount, Transaction.status, Transaction.timestamp,
+    Transaction.currency, Transaction.account_id, Transaction.source, Transaction.reconciliation_status,
+    Transaction.reconciled_at, Transaction.reconciled_with_sources, Transaction.created_at
+)
+MISMATCH_API_COLUMNS = (
+    Mismatch.id, Mismatch.txn_id, Mismatch.mismatch_type, Mismatch.severity, Mismatch.details,
+    Mismatch.sources_involved, Mismatch.expected_value, Mismatch.actual_value, Mismatch.difference_amount,
+    Mismatch.status, Mismatch.detected_at, Mismatch.resolved_at, Mismatch.resolution_notes
+)
+
+# Dimensions the grouped counts accept
+TRANSACTION_COUNT_DIMENSIONS = ('source', 'status', 'reconciliation_status')
+MISMATCH_COUNT_DIMENSIONS = ('severity', 'mismatch_type', 'status')
+
+def transaction_dict(txn) -> dict:
+    """API representation of a transactions row (entity or TRANSACTION_API_COLUMNS row)"""
+    return {
+        'id': txn.id,
+        'txn_id': txn.txn_id,
+        'amount': txn.amount,
+        'status': txn.status,
+        'timestamp': txn.timestamp.isoformat() if txn.timestamp else None,
+        'currency': txn.currency,
+        'account_id': txn.account_id,
+        'source': txn.source,
+        'reconciliation_status': txn.reconciliation_status,
+        'reconciled_at': txn.reconciled_at.isoformat() if txn.reconciled_at else None,
+        'reconciled_with_sources': json.loads(txn.reconciled_with_sources) if txn.reconciled_with_sources else [],
+        'created_at': txn.created_at.isoformat()
+    }
+
+def mismatch_dict(m) -> dict:
+    """API representation of a mismatches row (entity or MISMATCH_API_COLUMNS row)"""
+    return {
+        'id': m.id,
+        'txn_id': m.txn_id,
+        'type': m.mismatch_type,
+        'severity': m.severity,
+        'details': m.details,
+        'sources_involved': json.loads(m.sources_involved) if m.sources_involved else [],
+        'expected_value': m.expected_value,
+        'actual_value': m.actual_value,
+        'difference_amount': m.difference_amount,
+        'status': m.status,
+        'detected_at': m.detected_at.isoformat(),
+        'resolved_at': m.resolved_at.isoformat() if m.resolved_at else None,
+        'resolution_notes': m.resolution_notes
+    }
+
+# Report exports: rows fetched per server-side cursor round trip (and per CSV chunk / Parquet row group)
+REPORT_CHUNK_ROWS = int(os.getenv("REPORT_CHUNK_ROWS", 5000))
+
+# Report columns and their types (int, float, string, datetime), in file order
+TRANSACTION_REPORT_COLUMNS = {
+    'id': 'int',
+    'txn_id': 'string',
+    'amount': 'float',
+    'status': 'string',
+    'timestamp': 'datetime',
+    'currency': 'string',
+    'account_id': 'string',
+    'source': 'string',
+    'reconciliation_status': 'string',
+    'reconciled_at': 'datetime',
+    'reconciled_with_sources': 'string',
+    'created_at': 'datetime'
+}
+MISMATCH_REPORT_COLUMNS = {
+    'id': 'int',
+    'txn_id': 'string',
+    'type': 'string',
+    'severity': 'string',
+    'details': 'string',
+    'sources_involved': 'string',
+    'expected_value': 'string',
+    'actual_value': 'string',
+    'difference_amount': 'float',
+    'status': 'string',
+    'detected_at': 'datetime',
+    'resolved_at': 'datetime',
+    'resolution_notes': 'string'
+}
+
+def encode_cursor(time_value: datetime, row_id: int, direction: str) -> str:
+    """Opaque page cursor: the (time, id) key of the edge row and which way to read from it"""
+    payload = json.dumps({'t': time_value.isoformat(), 'i': row_id, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    """(time, id, direction) of a cursor from encode_cursor; ValueError if it is not one"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload['d']
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(payload['t']), int(payload['i']), direction
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def _transaction_filters(start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                         source: Optional[str] = None, status: Optional[str] = None,
+                         reconciliation_status: Optional[str] = None, txn_id: Optional[str] = None) -> list:
+    """WHERE conditions on transactions; created_at in [start_time, end_time)"""
+    conditions = []
+    if start_time is not None:
+        conditions.append(Transaction.created_at >= start_time)
+    if end_time is not None:
+        conditions.append(Transaction.created_at < end_time)
+    if source:
+        conditions.append(Transaction.source == source)
+    if status:
+        conditions.append(Transaction.status == status)
+    if reconciliation_status:
+        conditions.append(Transaction.reconciliation_status == reconciliation_status)
+    if txn_id:
+        conditions.append(Transaction.txn_id == txn_id)
+    return conditions
+
+def _mismatch_filters(start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                      severity: Optional[str] = None, mismatch_type: Optional[str] = None,
+                      status: Optional[str] = None, txn_id: Optional[str] = None) -> list:
+    """WHERE conditions on mismatches; detected_at in [start_time, end_time)"""
+    conditions = []
+    if start_time is not None:
+        conditions.append(Mismatch.detected_at >= start_time)
+    if end_time is not None:
+        conditions.append(Mismatch.detected_at < end_time)
+    if severity:
+        conditions.append(Mismatch.severity == severity)
+    if mismatch_type:
+        conditions.append(Mismatch.mismatch_type == mismatch_type)
+    if status:
+        conditions.append(Mismatch.status == status)
+    if txn_id:
+        conditions.append(Mismatch.txn_id == txn_id)
+    return conditions
+
+def _day_bounds(date) -> tuple:
+    """[midnight, next midnight) of a date"""
+    start = datetime.combine(date, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+def _keyset_page(db: Session, statement, model, time_column, limit: int, cursor: Optional[str]) -> tuple:
+    """One page of a select() in (time_column, id) descending order, seeking from cursor.
+    
+    The cursor's key goes into the WHERE clause as a row-value comparison,
+    so every page is an index range scan of limit + 1 rows no matter how
+    deep it is (OFFSET would read and discard every row before it).
+    Returns (rows, next_key, prev_key), the keys None at either end.
+    """
+    statement = statement.where(time_column.isnot(None))
+    direction = 'next'
+    if cursor:
+        time_value, row_id, direction = decode_cursor(cursor)
+        key = tuple_(time_column, model.id)
+        if direction == 'next':
+            statement = statement.where(key < tuple_(time_value, row_id))
+        else:
+            statement = statement.where(key > tuple_(time_value, row_id))
+    
+    if direction == 'next':
+        statement = statement.order_by(desc(time_column), desc(model.id))
+    else:
+        statement = statement.order_by(time_column, model.id)
+    
+    rows = db.execute(statement.limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+    
+    # Reading forward, a previous page exists if we came from one; reading back, a next page does
+    has_next = more if direction == 'next' else True
+    has_prev = bool(cursor) if direction == 'next' else more
+    first, last = rows[0], rows[-1]
+    next_key = (getattr(last, time_column.key), last.id) if has_next else None
+    prev_key = (getattr(first, time_column.key), first.id) if has_prev else None
+    return rows, next_key, prev_key
+
+def _planner_estimate(db: Session, statement) -> Optional[int]:
+    """Row estimate of a select() from the PostgreSQL planner (no rows read); None elsewhere"""
+    if db.get_bind().dialect.name != 'postgresql':
+        return None
+    try:
+        compiled = statement.compile(dialect=db.get_bind().dialect, compile_kwargs={'literal_binds': True})
+        plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        print(f"Error estimating row count: {e}")
+        return None
 
 class DatabaseService:
-    def __init__(self):
-        pass
+    def __init__(self, session: Optional[Session] = None):
+        # A service bound to a session runs every call on it (AsyncDatabaseService uses this)
+        self.session = session
     
-    def get_db(self):
-        """Get database session"""
+    def get_db(self, request_scoped: bool = True):
+        """Get database session.
+        
+        Inside an API request (RequestSessionMiddleware) every call shares the
+        request's session, so a handler calling several methods checks out
+        one pooled connection instead of one per call; its close() keeps the
+        session open until the response is sent. Elsewhere, a new session.
+        """
+        if self.session is not None:
+            return SharedSession(self.session)
+        request_scope = current_request_scope() if request_scoped else None
+        if request_scope is not None:
+            return request_scope.get()
         db = SessionLocal()
         try:
             return db
@@ -34,50 +345,215 @@ class DatabaseService:
         """Save a transaction to database"""
         db = self.get_db()
         try:
-            # Use current time for all transactions to ensure correct timestamps
-            timestamp = datetime.now()
-            
-            # Get current time for all timestamp fields
-            current_time = datetime.now()
-            
-            transaction = Transaction(
-                txn_id=transaction_data['txn_id'],
-                amount=float(transaction_data.get('amount', 0)),
-                status=transaction_data.get('status', 'UNKNOWN'),
-                timestamp=current_time,
-                currency=transaction_data.get('currency', 'INR'),
-                account_id=transaction_data.get('account_id'),
-                source=transaction_data['source'],
-                reconciliation_status='PENDING',
-                created_at=current_time,
-                updated_at=current_time
+            # Use current time for all timestamp fields to ensure correct timestamps
+            row = transaction_row(transaction_data, datetime.now())
+            db.add(Transaction(**row))
+            self._count_transactions(db, [row])
+            db.commit()
+            read_cache.invalidate(('transactions',))
+            return True
+        
+        except Exception as e:
+            print(f"Error saving transaction: {e}")
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
+    def save_transactions(self, transactions: List[dict]) -> bool:
+        """Save a batch of transactions in one database transaction (all or nothing)"""
+        current_time = datetime.now()
+        return self.write_batch(transactions=[transaction_row(data, current_time) for data in transactions])
+    
+    def write_batch(self, transactions: List[dict] = (), mismatches: List[dict] = (),
+                    status_updates: Dict[str, tuple] = None) -> bool:
+        """Persist prepared rows in one database transaction (all or nothing).
+        
+        transactions and mismatches are column dicts (transaction_row /
+        mismatch_row) written with one executemany INSERT each, which
+        SQLAlchemy sends as multi-row VALUES batches. status_updates maps
+        txn_id -> (status, sources, reconciled_at); inserts go first so a
+        verdict can update rows from the same batch. The per-minute rollups
+        are updated in the same transaction, so they never drift from the rows.
+        """
+        db = self.get_db()
+        try:
+            if transactions:
+                db.execute(insert(Transaction), list(transactions))
+                self._count_transactions(db, transactions)
+            if mismatches:
+                db.execute(insert(Mismatch), list(mismatches))
+                self._count_mismatches(db, mismatches)
+            if status_updates:
+                self._apply_status_updates(db, status_updates)
+            db.commit()
+            read_cache.invalidate(
+                (('transactions',) if transactions or status_updates else ()) + (('mismatches',) if mismatches else ())
             )
+            return True
+        
+        except Exception as e:
+            print(f"Error writing batch ({len(transactions)} transactions, {len(mismatches)} mismatches, "
+                  f"{len(status_updates or {})} status updates): {e}")
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
+    def _apply_status_updates(self, db: Session, status_updates: Dict[str, tuple]):
+        """One set-based UPDATE per distinct (status, sources) instead of a SELECT + UPDATE per txn"""
+        groups = defaultdict(list)
+        reconciled_at = {}
+        for txn_id, (status, sources, at) in status_updates.items():
+            key = (status, json.dumps(sources))
+            groups[key].append(txn_id)
+            reconciled_at[key] = max(at, reconciled_at.get(key, at))
+        
+        for (status, sources), txn_ids in groups.items():
+            ids = self._count_status_change(db, txn_ids, status)
+            if not ids:
+                continue
+            db.execute(
+                update(Transaction)
+                .where(Transaction.id.in_(ids))
+                .values(reconciliation_status=status, reconciled_at=reconciled_at[(status, sources)],
+                        reconciled_with_sources=sources)
+                .execution_options(synchronize_session=False)
+            )
+    
+    # ==================== ROLLUPS ====================
+    
+    def _count_transactions(self, db: Session, rows: List[dict]):
+        """Add new transactions rows to the per-minute rollup"""
+        deltas = defaultdict(int)
+        for row in rows:
+            deltas[_transaction_rollup_key(row['created_at'], row['source'], row['status'],
+                                           row['reconciliation_status'])] += 1
+        _upsert_counts(db, TransactionRollup, TRANSACTION_ROLLUP_KEYS, deltas)
+    
+    def _count_mismatches(self, db: Session, rows: List[dict]):
+        """Add new mismatches rows to the per-minute rollup"""
+        deltas = defaultdict(int)
+        for row in rows:
+            deltas[(_minute(row['detected_at']), row['mismatch_type'], row['severity'])] += 1
+        _upsert_counts(db, MismatchRollup, MISMATCH_ROLLUP_KEYS, deltas)
+    
+    def _count_status_change(self, db: Session, txn_ids: List[str], status: str) -> List[int]:
+        """Lock the rows of txn_ids and move those changing reconciliation_status to status.
+        
+        Returns the ids of the locked rows, which the caller updates: the
+        rollup deltas are taken from the values those rows hold until commit,
+        so a concurrent verdict for the same txn waits instead of counting
+        the same change twice (SELECT ... FOR UPDATE; SQLite serialises
+        writers and ignores it). Locked in id order so writers cannot deadlock.
+        """
+        rows = db.query(
+            Transaction.id, Transaction.created_at, Transaction.source, Transaction.status,
+            Transaction.reconciliation_status
+        ).filter(Transaction.txn_id.in_(txn_ids)).order_by(Transaction.id).with_for_update().all()
+        
+        deltas = defaultdict(int)
+        for _, created_at, source, row_status, previous in rows:
+            if previous != status:
+                deltas[_transaction_rollup_key(created_at, source, row_status, previous)] -= 1
+                deltas[_transaction_rollup_key(created_at, source, row_status, status)] += 1
+        _upsert_counts(db, TransactionRollup, TRANSACTION_ROLLUP_KEYS, deltas)
+        return [row_id for row_id, *_ in rows]
+    
+    def rebuild_rollups(self) -> bool:
+        """Recompute both rollup tables from the rows (backfill, or repair after manual edits)"""
+        db = self.get_db()
+        try:
+            db.query(TransactionRollup).delete()
+            db.query(MismatchRollup).delete()
+            
+            deltas = defaultdict(int)
+            for created_at, source, status, reconciliation_status in db.query(
+                Transaction.created_at, Transaction.source, Transaction.status, Transaction.reconciliation_status
+            ).yield_per(10000):
+                deltas[_transaction_rollup_key(created_at, source, status, reconciliation_status)] += 1
+            _upsert_counts(db, TransactionRollup, TRANSACTION_ROLLUP_KEYS, deltas)
+            
+            deltas = defaultdict(int)
+            for detected_at, mismatch_type, severity in db.query(
+                Mismatch.detected_at, Mismatch.mismatch_type, Mismatch.severity
+            ).yield_per(10000):
+                deltas[(_minute(detected_at), mismatch_type or '', severity or '')] += 1
+            _upsert_counts(db, MismatchRollup, MISMATCH_ROLLUP_KEYS, deltas)
             
-            db.add(transaction)
             db.commit()
+            read_cache.invalidate(('transactions', 'mismatches'))
             return True
-            
+        
         except Exception as e:
-            print(f"Error saving transaction: {e}")
+            print(f"Error rebuilding rollups: {e}")
             db.rollback()
             return False
         finally:
             db.close()
     
-    def update_reconciliation_status(self, txn_id: str, status: str, sources: List[str]) -> bool:
-        """Update reconciliation status for all transactions with given txn_id"""
+    def get_rollup_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict:
+        """Counts by dimension summed from the rollups (O(buckets), not O(rows)).
+        
+        since/until bound the minute buckets (until exclusive); None means unbounded.
+        """
         db = self.get_db()
         try:
-            transactions = db.query(Transaction).filter(Transaction.txn_id == txn_id).all()
+            def window(query, bucket):
+                if since is not None:
+                    query = query.filter(bucket >= _minute(since))
+                if until is not None:
+                    query = query.filter(bucket < until)
+                return query
+            
+            transaction_rows = window(db.query(
+                TransactionRollup.source, TransactionRollup.status, TransactionRollup.reconciliation_status,
+                func.sum(TransactionRollup.count)
+            ), TransactionRollup.bucket).group_by(
+                TransactionRollup.source, TransactionRollup.status, TransactionRollup.reconciliation_status
+            ).all()
             
-            for txn in transactions:
-                txn.reconciliation_status = status
-                txn.reconciled_at = datetime.now()
-                txn.reconciled_with_sources = json.dumps(sources)
+            mismatch_rows = window(db.query(
+                MismatchRollup.mismatch_type, MismatchRollup.severity, func.sum(MismatchRollup.count)
+            ), MismatchRollup.bucket).group_by(MismatchRollup.mismatch_type, MismatchRollup.severity).all()
             
+            stats = {
+                'transactions': 0,
+                'mismatches': 0,
+                'by_source': defaultdict(int),
+                'by_status': defaultdict(int),
+                'by_reconciliation_status': defaultdict(int),
+                'by_mismatch_type': defaultdict(int),
+                'by_severity': defaultdict(int)
+            }
+            for source, status, reconciliation_status, total in transaction_rows:
+                if not total:
+                    continue
+                stats['transactions'] += total
+                stats['by_source'][source] += total
+                stats['by_status'][status] += total
+                stats['by_reconciliation_status'][reconciliation_status or None] += total
+            for mismatch_type, severity, total in mismatch_rows:
+                if not total:
+                    continue
+                stats['mismatches'] += total
+                stats['by_mismatch_type'][mismatch_type] += total
+                stats['by_severity'][severity] += total
+            
+            return {key: dict(value) if isinstance(value, defaultdict) else int(value) for key, value in stats.items()}
+        
+        finally:
+            db.close()
+    
+    def update_reconciliation_status(self, txn_id: str, status: str, sources: List[str]) -> bool:
+        """Update reconciliation status for all transactions with given txn_id"""
+        db = self.get_db()
+        try:
+            self._apply_status_updates(db, {txn_id: (status, sources, datetime.now())})
             db.commit()
+            read_cache.invalidate(('transactions',))
             return True
-            
+        
         except Exception as e:
             print(f"Error updating reconciliation status: {e}")
             db.rollback()
@@ -85,81 +561,74 @@ class DatabaseService:
         finally:
             db.close()
     
+    @read_cache.cached(ttl=READ_CACHE_TTL, datasets=('transactions',))
     def get_transactions(self, limit: int = 50, source: Optional[str] = None, 
                         status: Optional[str] = None) -> List[Dict]:
-        """Get transactions with optional filtering - Redis cached for performance"""
-        # Create cache key from parameters
-        cache_params = {'limit': limit, 'source': source, 'status': status}
-        
-        # Try Redis cache first
-        if redis_service.is_connected():
-            cached_result = redis_service.get_cached_response('get_transactions', cache_params)
-            if cached_result:
-                return cached_result
-        
+        """Get transactions with optional filtering - read cached for performance"""
         db = self.get_db()
         try:
-            query = db.query(Transaction).order_by(desc(Transaction.created_at))
-            
-            if source:
-                query = query.filter(Transaction.source == source)
-            if status:
-                query = query.filter(Transaction.status == status)
+            statement = select(*TRANSACTION_API_COLUMNS).where(
+                *_transaction_filters(source=source, status=status)
+            ).order_by(desc(Transaction.created_at), desc(Transaction.id)).limit(limit)
             
-            transactions = query.limit(limit).all()
-            
-            result = [
-                {
-                    'id': txn.id,
-                    'txn_id': txn.txn_id,
-                    'amount': txn.amount,
-                    'status': txn.status,
-                    'timestamp': txn.timestamp.isoformat() if txn.timestamp else None,
-                    'currency': txn.currency,
-                    'account_id': txn.account_id,
-                    'source': txn.source,
-                    'reconciliation_status': txn.reconciliation_status,
-                    'reconciled_at': txn.reconciled_at.isoformat() if txn.reconciled_at else None,
-                    'reconciled_with_sources': json.loads(txn.reconciled_with_sources) if txn.reconciled_with_sources else [],
-                    'created_at': txn.created_at.isoformat()
-                }
-                for txn in transactions
-            ]
-            
-            # Cache the result
-            if redis_service.is_connected():
-                redis_service.cache_api_response('get_transactions', cache_params, result)
-            
-            return result
+            transactions = db.execute(statement).all()
             
+            return [transaction_dict(txn) for txn in transactions]
+        
         except Exception as e:
             print(f"Error getting transactions: {e}")
+            skip_cache()
             return []
         finally:
             db.close()
     
+    def get_transactions_page(self, limit: int = 50, cursor: Optional[str] = None, source: Optional[str] = None,
+                              status: Optional[str] = None, reconciliation_status: Optional[str] = None) -> Dict:
+        """A page of transactions, newest first, with keyset cursors.
+        
+        Ordered by (created_at, id) so rows sharing a timestamp are never
+        skipped or repeated; next_cursor/prev_cursor are opaque and None at
+        either end. Raises ValueError for a malformed cursor. total is
+        approximate: summed from the rollups (every filter here is a rollup
+        dimension), so it never counts the table.
+        """
+        db = self.get_db()
+        try:
+            statement = select(*TRANSACTION_API_COLUMNS).where(*_transaction_filters(
+                source=source, status=status, reconciliation_status=reconciliation_status
+            ))
+            dimensions = {
+                name: value for name, value in (
+                    ('source', source), ('status', status), ('reconciliation_status', reconciliation_status)
+                ) if value
+            }
+            
+            rows, next_key, prev_key = _keyset_page(db, statement, Transaction, Transaction.created_at, limit, cursor)
+            return {
+                'items': [transaction_dict(txn) for txn in rows],
+                'next_cursor': encode_cursor(*next_key, 'next') if next_key else None,
+                'prev_cursor': encode_cursor(*prev_key, 'prev') if prev_key else None,
+                'total': self._rollup_total(db, TransactionRollup, dimensions),
+                'total_is_estimate': True
+            }
+        finally:
+            db.close()
+    
+    def _rollup_total(self, db: Session, model, dimensions: Dict[str, str]) -> int:
+        """Rows matching equality filters on rollup dimensions, summed from the rollup buckets"""
+        query = db.query(func.coalesce(func.sum(model.count), 0))
+        for column, value in dimensions.items():
+            query = query.filter(getattr(model, column) == value)
+        return int(query.scalar() or 0)
+    
     def get_transactions_by_txn_id(self, txn_id: str) -> List[Dict]:
         """Get all transactions for a specific transaction ID"""
         db = self.get_db()
         try:
-            transactions = db.query(Transaction).filter(Transaction.txn_id == txn_id).all()
-            
-            return [
-                {
-                    'id': txn.id,
-                    'txn_id': txn.txn_id,
-                    'amount': txn.amount,
-                    'status': txn.status,
-                    'timestamp': txn.timestamp.isoformat() if txn.timestamp else None,
-                    'currency': txn.currency,
-                    'account_id': txn.account_id,
-                    'source': txn.source,
-                    'reconciliation_status': txn.reconciliation_status,
-                    'created_at': txn.created_at.isoformat()
-                }
-                for txn in transactions
-            ]
+            statement = select(*TRANSACTION_API_COLUMNS).where(*_transaction_filters(txn_id=txn_id))
             
+            return [transaction_dict(txn) for txn in db.execute(statement)]
+        
         except Exception as e:
             print(f"Error getting transactions by txn_id: {e}")
             return []
@@ -173,27 +642,13 @@ class DatabaseService:
         db = self.get_db()
         try:
             # Get current time for all timestamp fields
-            current_time = datetime.now()
-            
-            mismatch = Mismatch(
-                txn_id=mismatch_data['txn_id'],
-                mismatch_type=mismatch_data['type'],
-                severity=mismatch_data['severity'],
-                details=mismatch_data['details'],
-                sources_involved=json.dumps(mismatch_data.get('sources_involved', [])),
-                expected_value=mismatch_data.get('expected_value'),
-                actual_value=mismatch_data.get('actual_value'),
-                difference_amount=mismatch_data.get('difference_amount'),
-                status='OPEN',
-                detected_at=current_time,
-                created_at=current_time,
-                updated_at=current_time
-            )
-            
-            db.add(mismatch)
+            row = mismatch_row(mismatch_data, datetime.now())
+            db.add(Mismatch(**row))
+            self._count_mismatches(db, [row])
             db.commit()
+            read_cache.invalidate(('mismatches',))
             return True
-            
+        
         except Exception as e:
             print(f"Error saving mismatch: {e}")
             db.rollback()
@@ -201,97 +656,141 @@ class DatabaseService:
         finally:
             db.close()
     
+    @read_cache.cached(ttl=READ_CACHE_TTL, datasets=('mismatches',))
     def get_mismatches(self, limit: int = 50, severity: Optional[str] = None,
                       mismatch_type: Optional[str] = None, status: Optional[str] = None, 
                       txn_id: Optional[str] = None) -> List[Dict]:
         """Get mismatches with optional filtering"""
         db = self.get_db()
         try:
-            query = db.query(Mismatch).order_by(desc(Mismatch.detected_at))
-            
-            if severity:
-                query = query.filter(Mismatch.severity == severity)
-            if mismatch_type:
-                query = query.filter(Mismatch.mismatch_type == mismatch_type)
-            if status:
-                query = query.filter(Mismatch.status == status)
-            if txn_id:
-                query = query.filter(Mismatch.txn_id == txn_id)
+            statement = select(*MISMATCH_API_COLUMNS).where(*_mismatch_filters(
+                severity=severity, mismatch_type=mismatch_type, status=status, txn_id=txn_id
+            )).order_by(desc(Mismatch.detected_at), desc(Mismatch.id)).limit(limit)
             
-            mismatches = query.limit(limit).all()
-            
-            return [
-                {
-                    'id': m.id,
-                    'txn_id': m.txn_id,
-                    'type': m.mismatch_type,
-                    'severity': m.severity,
-                    'details': m.details,
-                    'sources_involved': json.loads(m.sources_involved) if m.sources_involved else [],
-                    'expected_value': m.expected_value,
-                    'actual_value': m.actual_value,
-                    'difference_amount': m.difference_amount,
-                    'status': m.status,
-                    'detected_at': m.detected_at.isoformat(),
-                    'resolved_at': m.resolved_at.isoformat() if m.resolved_at else None,
-                    'resolution_notes': m.resolution_notes
-                }
-                for m in mismatches
-            ]
+            mismatches = db.execute(statement).all()
             
+            return [mismatch_dict(m) for m in mismatches]
+        
         except Exception as e:
             print(f"Error getting mismatches: {e}")
+            skip_cache()
             return []
         finally:
             db.close()
     
-    # ==================== STATISTICS OPERATIONS ====================
-    
-    def get_transaction_stats(self) -> Dict:
-        """Get comprehensive transaction statistics - Redis cached for performance"""
-        # Try Redis cache first
-        if redis_service.is_connected():
-            cached_stats = redis_service.get_cached_stats('transaction_stats')
-            if cached_stats:
-                return cached_stats
+    def get_mismatches_page(self, limit: int = 50, cursor: Optional[str] = None, severity: Optional[str] = None,
+                            mismatch_type: Optional[str] = None, status: Optional[str] = None,
+                            txn_id: Optional[str] = None) -> Dict:
+        """A page of mismatches, newest first, with keyset cursors on (detected_at, id).
         
+        Same contract as get_transactions_page. total comes from the rollups
+        for severity/type filters, is exact for a txn_id (a handful of
+        indexed rows) and is the planner's estimate when filtering by
+        status (None on SQLite, which has no estimate to offer).
+        """
         db = self.get_db()
         try:
-            # Total counts
-            total_transactions = db.query(Transaction).count()
-            total_mismatches = db.query(Mismatch).count()
-            
-            # Reconciliation status counts
-            reconciliation_stats = db.query(
-                Transaction.reconciliation_status,
-                func.count(Transaction.id)
-            ).group_by(Transaction.reconciliation_status).all()
-            
-            reconciliation_counts = {status: count for status, count in reconciliation_stats}
-            
-            # Source distribution
-            source_stats = db.query(
-                Transaction.source,
-                func.count(Transaction.id)
-            ).group_by(Transaction.source).all()
-            
-            source_counts = {source: count for source, count in source_stats}
-            
-            # Status distribution
-            status_stats = db.query(
-                Transaction.status,
-                func.count(Transaction.id)
-            ).group_by(Transaction.status).all()
+            conditions = _mismatch_filters(severity=severity, mismatch_type=mismatch_type, status=status, txn_id=txn_id)
+            statement = select(*MISMATCH_API_COLUMNS).where(*conditions)
+            dimensions = {
+                name: value for name, value in (('severity', severity), ('mismatch_type', mismatch_type)) if value
+            }
             
-            status_counts = {status: count for status, count in status_stats}
+            if txn_id:
+                total, estimate = self._count(db, Mismatch, conditions), False
+            elif status:
+                total, estimate = _planner_estimate(db, statement), True
+            else:
+                total, estimate = self._rollup_total(db, MismatchRollup, dimensions), True
             
-            # Mismatch type distribution
-            mismatch_type_stats = db.query(
-                Mismatch.mismatch_type,
-                func.count(Mismatch.id)
-            ).group_by(Mismatch.mismatch_type).all()
+            rows, next_key, prev_key = _keyset_page(db, statement, Mismatch, Mismatch.detected_at, limit, cursor)
+            return {
+                'items': [mismatch_dict(m) for m in rows],
+                'next_cursor': encode_cursor(*next_key, 'next') if next_key else None,
+                'prev_cursor': encode_cursor(*prev_key, 'prev') if prev_key else None,
+                'total': total,
+                'total_is_estimate': estimate
+            }
+        finally:
+            db.close()
+    
+    # ==================== REPORT EXPORTS ====================
+    
+    def iter_transactions_report(self, source: Optional[str] = None, status: Optional[str] = None,
+                                 start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                                 chunk_size: int = REPORT_CHUNK_ROWS) -> Iterator[List[Dict]]:
+        """Every matching transaction, newest first, in chunks of TRANSACTION_REPORT_COLUMNS dicts (no row cap).
+        
+        end_time is exclusive. Values are left as the database returns them
+        (datetimes included) for the exporter to format.
+        """
+        columns = [getattr(Transaction, name) for name in TRANSACTION_REPORT_COLUMNS]
+        statement = select(*columns)
+        if source:
+            statement = statement.where(Transaction.source == source)
+        if status:
+            statement = statement.where(Transaction.status == status)
+        if start_time is not None:
+            statement = statement.where(Transaction.created_at >= start_time)
+        if end_time is not None:
+            statement = statement.where(Transaction.created_at < end_time)
+        statement = statement.order_by(desc(Transaction.created_at), desc(Transaction.id))
+        return self._iter_chunks(statement, chunk_size)
+    
+    def iter_mismatches_report(self, severity: Optional[str] = None, mismatch_type: Optional[str] = None,
+                               status: Optional[str] = None, start_time: Optional[datetime] = None,
+                               end_time: Optional[datetime] = None,
+                               chunk_size: int = REPORT_CHUNK_ROWS) -> Iterator[List[Dict]]:
+        """Every matching mismatch, newest first, in chunks of MISMATCH_REPORT_COLUMNS dicts (no row cap)"""
+        columns = [
+            Mismatch.mismatch_type.label('type') if name == 'type' else getattr(Mismatch, name)
+            for name in MISMATCH_REPORT_COLUMNS
+        ]
+        statement = select(*columns)
+        if severity:
+            statement = statement.where(Mismatch.severity == severity)
+        if mismatch_type:
+            statement = statement.where(Mismatch.mismatch_type == mismatch_type)
+        if status:
+            statement = statement.where(Mismatch.status == status)
+        if start_time is not None:
+            statement = statement.where(Mismatch.detected_at >= start_time)
+        if end_time is not None:
+            statement = statement.where(Mismatch.detected_at < end_time)
+        statement = statement.order_by(desc(Mismatch.detected_at), desc(Mismatch.id))
+        return self._iter_chunks(statement, chunk_size)
+    
+    def _iter_chunks(self, statement, chunk_size: int) -> Iterator[List[Dict]]:
+        """Run statement on a server-side cursor and yield its rows chunk_size at a time.
+        
+        stream_results makes psycopg2 use a named cursor, so only one chunk
+        is ever held in memory (SQLite's cursor already fetches lazily).
+        The session stays open until the generator is exhausted or closed.
+        """
+        db = self.get_db(request_scoped=False)  # the cursor outlives the handler call
+        try:
+            result = db.execute(statement.execution_options(stream_results=True, yield_per=chunk_size))
+            for partition in result.mappings().partitions():
+                yield [dict(row) for row in partition]
+        finally:
+            db.close()
+    
+    # ==================== STATISTICS OPERATIONS ====================
+    
+    @read_cache.cached(ttl=READ_CACHE_TTL, datasets=('transactions', 'mismatches'))
+    def get_transaction_stats(self) -> Dict:
+        """Get comprehensive transaction statistics - read cached for performance"""
+        try:
+            # Summed from the per-minute rollups instead of scanning both tables
+            totals = self.get_rollup_stats()
+            recent = self.get_rollup_stats(since=datetime.now() - timedelta(days=1))
             
-            mismatch_type_counts = {mtype: count for mtype, count in mismatch_type_stats}
+            total_transactions = totals['transactions']
+            total_mismatches = totals['mismatches']
+            reconciliation_counts = totals['by_reconciliation_status']
+            source_counts = totals['by_source']
+            status_counts = totals['by_status']
+            mismatch_type_counts = totals['by_mismatch_type']
             
             # Success rate calculation
             matched_count = reconciliation_counts.get('MATCHED', 0)
@@ -299,17 +798,7 @@ class DatabaseService:
             total_reconciled = matched_count + mismatched_count
             success_rate = (matched_count / total_reconciled * 100) if total_reconciled > 0 else 100
             
-            # Recent activity (last 24 hours)
-            yesterday = datetime.now() - timedelta(days=1)
-            recent_transactions = db.query(Transaction).filter(
-                Transaction.created_at >= yesterday
-            ).count()
-            
-            recent_mismatches = db.query(Mismatch).filter(
-                Mismatch.detected_at >= yesterday
-            ).count()
-            
-            stats = {
+            return {
                 'total_transactions': total_transactions,
                 'total_mismatches': total_mismatches,
                 'total_reconciled': total_reconciled,
@@ -319,20 +808,16 @@ class DatabaseService:
                 'source_distribution': source_counts,
                 'status_distribution': status_counts,
                 'mismatch_types': mismatch_type_counts,
+                'severity_distribution': totals['by_severity'],
                 'recent_activity': {
-                    'transactions_24h': recent_transactions,
-                    'mismatches_24h': recent_mismatches
+                    'transactions_24h': recent['transactions'],
+                    'mismatches_24h': recent['mismatches']
                 }
             }
-            
-            # Cache the stats
-            if redis_service.is_connected():
-                redis_service.cache_stats('transaction_stats', stats)
-            
-            return stats
-            
+        
         except Exception as e:
             print(f"Error getting transaction stats: {e}")
+            skip_cache()
             return {
                 'total_transactions': 0,
                 'total_mismatches': 0,
@@ -343,10 +828,9 @@ class DatabaseService:
                 'source_distribution': {},
                 'status_distribution': {},
                 'mismatch_types': {},
+                'severity_distribution': {},
                 'recent_activity': {'transactions_24h': 0, 'mismatches_24h': 0}
             }
-        finally:
-            db.close()
     
     def get_health_status(self) -> Dict:
         """Get system health status"""
@@ -358,19 +842,17 @@ class DatabaseService:
             
             # Get recent activity
             last_hour = datetime.now() - timedelta(hours=1)
-            recent_transactions = db.query(Transaction).filter(
-                Transaction.created_at >= last_hour
-            ).count()
+            recent_transactions = self._count(db, Transaction, _transaction_filters(start_time=last_hour))
             
-            # Get last transaction
+            # Get last transaction (total from the rollups, not a table scan)
             last_transaction = None
-            total_transactions = db.query(Transaction).count()
+            total_transactions = self.get_rollup_stats()['transactions']
             if total_transactions > 0:
-                last_txn = db.query(Transaction).order_by(
-                    desc(Transaction.created_at)
-                ).first()
-                if last_txn:
-                    last_transaction = last_txn.created_at.isoformat()
+                last_created_at = db.execute(
+                    select(Transaction.created_at).order_by(desc(Transaction.created_at)).limit(1)
+                ).scalar()
+                if last_created_at:
+                    last_transaction = last_created_at.isoformat()
             
             # Determine system status
             if recent_transactions > 0:
@@ -386,9 +868,10 @@ class DatabaseService:
                 'last_transaction': last_transaction,
                 'transactions_last_hour': recent_transactions,
                 'total_transactions': total_transactions,
+                'connection_pool': get_pool_status(),
                 'uptime': 'OK'
             }
-            
+        
         except Exception as e:
             print(f"Error getting health status: {e}")
             return {
@@ -399,19 +882,16 @@ class DatabaseService:
             }
         finally:
             db.close()
-
+    
     def get_transactions_by_date(self, date) -> List[Dict]:
-        """Get transactions for a specific date"""
+        """Get transactions for a specific date (count_transactions_by_date when only the number is needed)"""
         db = self.get_db()
         try:
-            from datetime import datetime
-            start_date = datetime.combine(date, datetime.min.time())
-            end_date = datetime.combine(date, datetime.max.time())
-            
-            transactions = db.query(Transaction).filter(
-                Transaction.created_at >= start_date,
-                Transaction.created_at <= end_date
-            ).all()
+            start_date, end_date = _day_bounds(date)
+            statement = select(
+                Transaction.id, Transaction.txn_id, Transaction.amount, Transaction.status,
+                Transaction.source, Transaction.created_at
+            ).where(*_transaction_filters(start_date, end_date))
             
             return [
                 {
@@ -422,9 +902,9 @@ class DatabaseService:
                     'source': txn.source,
                     'created_at': txn.created_at.isoformat()
                 }
-                for txn in transactions
+                for txn in db.execute(statement)
             ]
-            
+        
         except Exception as e:
             print(f"Error getting transactions by date: {e}")
             return []
@@ -432,17 +912,13 @@ class DatabaseService:
             db.close()
     
     def get_mismatches_by_date(self, date) -> List[Dict]:
-        """Get mismatches for a specific date"""
+        """Get mismatches for a specific date (count_mismatches_by_date when only the number is needed)"""
         db = self.get_db()
         try:
-            from datetime import datetime
-            start_date = datetime.combine(date, datetime.min.time())
-            end_date = datetime.combine(date, datetime.max.time())
-            
-            mismatches = db.query(Mismatch).filter(
-                Mismatch.detected_at >= start_date,
-                Mismatch.detected_at <= end_date
-            ).all()
+            start_date, end_date = _day_bounds(date)
+            statement = select(
+                Mismatch.id, Mismatch.txn_id, Mismatch.mismatch_type, Mismatch.severity, Mismatch.detected_at
+            ).where(*_mismatch_filters(start_date, end_date))
             
             return [
                 {
@@ -452,94 +928,189 @@ class DatabaseService:
                     'severity': m.severity,
                     'detected_at': m.detected_at.isoformat()
                 }
-                for m in mismatches
+                for m in db.execute(statement)
             ]
-            
+        
         except Exception as e:
             print(f"Error getting mismatches by date: {e}")
             return []
         finally:
             db.close()
     
-    def get_delayed_transactions_count(self, minutes: int = 5) -> int:
-        """Get count of transactions with delays > specified minutes"""
+    # ==================== COUNTS ====================
+    
+    def _count(self, db: Session, model, conditions: list) -> int:
+        """SELECT count(*) with the conditions: no rows leave the database"""
+        return int(db.execute(select(func.count()).select_from(model).where(*conditions)).scalar() or 0)
+    
+    def _count_by(self, db: Session, column, conditions: list) -> Dict[Optional[str], int]:
+        """SELECT column, count(*) ... GROUP BY column"""
+        statement = select(column, func.count()).where(*conditions).group_by(column)
+        return {value: int(total) for value, total in db.execute(statement)}
+    
+    def count_transactions(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                           source: Optional[str] = None, status: Optional[str] = None,
+                           reconciliation_status: Optional[str] = None) -> int:
+        """Number of matching transactions (created_at in [start_time, end_time), either bound optional)"""
         db = self.get_db()
         try:
-            # Count transactions where reconciliation took longer than expected
-            delayed = db.query(Transaction).filter(
-                Transaction.reconciled_at.isnot(None),
-                func.extract('epoch', Transaction.reconciled_at - Transaction.created_at) > minutes * 60
-            ).count()
-            
-            return delayed
-            
+            return self._count(db, Transaction, _transaction_filters(
+                start_time, end_time, source=source, status=status, reconciliation_status=reconciliation_status
+            ))
+        
         except Exception as e:
-            print(f"Error getting delayed transactions: {e}")
+            print(f"Error counting transactions: {e}")
             return 0
         finally:
             db.close()
     
-    def get_duplicate_transactions_count(self) -> int:
-        """Get count of duplicate transactions"""
+    def count_transactions_by(self, dimension: str, start_time: Optional[datetime] = None,
+                              end_time: Optional[datetime] = None, source: Optional[str] = None,
+                              status: Optional[str] = None) -> Dict[Optional[str], int]:
+        """Matching transactions per value of dimension (source, status or reconciliation_status).
+        
+        All-time totals are cheaper from get_rollup_stats; this counts the
+        rows of a created_at range exactly. Raises ValueError for an
+        unknown dimension.
+        """
+        if dimension not in TRANSACTION_COUNT_DIMENSIONS:
+            raise ValueError(f"Unknown transaction dimension: {dimension}")
         db = self.get_db()
         try:
-            # Find transactions with same txn_id and source (duplicates)
-            duplicates = db.query(Transaction.txn_id, Transaction.source, func.count(Transaction.id)).group_by(
-                Transaction.txn_id, Transaction.source
-            ).having(func.count(Transaction.id) > 1).count()
-            
-            return duplicates
-            
+            return self._count_by(db, getattr(Transaction, dimension), _transaction_filters(
+                start_time, end_time, source=source, status=status
+            ))
+        
         except Exception as e:
-            print(f"Error getting duplicate transactions: {e}")
+            print(f"Error counting transactions by {dimension}: {e}")
+            return {}
+        finally:
+            db.close()
+    
+    def count_transactions_by_date(self, date) -> int:
+        """Number of transactions created on a date"""
+        return self.count_transactions(*_day_bounds(date))
+    
+    def count_mismatches(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                         severity: Optional[str] = None, mismatch_type: Optional[str] = None,
+                         status: Optional[str] = None, txn_id: Optional[str] = None) -> int:
+        """Number of matching mismatches (detected_at in [start_time, end_time), either bound optional)"""
+        db = self.get_db()
+        try:
+            return self._count(db, Mismatch, _mismatch_filters(
+                start_time, end_time, severity=severity, mismatch_type=mismatch_type, status=status, txn_id=txn_id
+            ))
+        
+        except Exception as e:
+            print(f"Error counting mismatches: {e}")
             return 0
         finally:
             db.close()
     
-    def get_timeline_stats(self, hours: int = 24, interval: str = "hour") -> List[Dict]:
-        """Get timeline statistics for charts"""
+    def count_mismatches_by(self, dimension: str, start_time: Optional[datetime] = None,
+                            end_time: Optional[datetime] = None, severity: Optional[str] = None,
+                            mismatch_type: Optional[str] = None) -> Dict[Optional[str], int]:
+        """Matching mismatches per value of dimension (severity, mismatch_type or status).
+        
+        Raises ValueError for an unknown dimension.
+        """
+        if dimension not in MISMATCH_COUNT_DIMENSIONS:
+            raise ValueError(f"Unknown mismatch dimension: {dimension}")
         db = self.get_db()
         try:
-            from datetime import datetime, timedelta
-            
-            end_time = datetime.now()
-            start_time = end_time - timedelta(hours=hours)
-            
-            # Group by hour for simplicity
-            if interval == "hour":
-                timeline_data = []
-                current_time = start_time
-                
-                while current_time < end_time:
-                    next_time = current_time + timedelta(hours=1)
-                    
-                    # Count transactions in this hour
-                    txn_count = db.query(Transaction).filter(
-                        Transaction.created_at >= current_time,
-                        Transaction.created_at < next_time
-                    ).count()
-                    
-                    # Count mismatches in this hour
-                    mismatch_count = db.query(Mismatch).filter(
-                        Mismatch.detected_at >= current_time,
-                        Mismatch.detected_at < next_time
-                    ).count()
-                    
-                    timeline_data.append({
-                        'hour': current_time.strftime('%H:00'),
-                        'timestamp': current_time.isoformat(),
-                        'transactions': txn_count,
-                        'mismatches': mismatch_count
-                    })
-                    
-                    current_time = next_time
-                
-                return timeline_data
-            
+            return self._count_by(db, getattr(Mismatch, dimension), _mismatch_filters(
+                start_time, end_time, severity=severity, mismatch_type=mismatch_type
+            ))
+        
+        except Exception as e:
+            print(f"Error counting mismatches by {dimension}: {e}")
+            return {}
+        finally:
+            db.close()
+    
+    def count_mismatches_by_date(self, date) -> int:
+        """Number of mismatches detected on a date"""
+        return self.count_mismatches(*_day_bounds(date))
+    
+    def get_delay_analytics(self, window_hours: int = ANALYTICS_WINDOW_HOURS,
+                            delayed_minutes: int = ANALYTICS_DELAYED_MINUTES) -> Dict:
+        """Delay percentiles, delayed and duplicate counts per source over the last window_hours.
+        
+        One window query for all of them (see analytics_queries), cached
+        until the transaction rollups of the window change.
+        """
+        db = self.get_db()
+        try:
+            return delay_analytics.get(db, window_hours, delayed_minutes)
+        
+        except Exception as e:
+            print(f"Error getting delay analytics: {e}")
+            return {'delayed_count': 0, 'duplicate_count': 0, 'by_source': {}}
+        finally:
+            db.close()
+    
+    def get_delayed_transactions_count(self, minutes: int = ANALYTICS_DELAYED_MINUTES) -> int:
+        """Get count of transactions in the analytics window reconciled after more than `minutes`"""
+        return self.get_delay_analytics(delayed_minutes=minutes)['delayed_count']
+    
+    def get_duplicate_transactions_count(self) -> int:
+        """Get count of (txn_id, source) groups with more than one row in the analytics window"""
+        return self.get_delay_analytics()['duplicate_count']
+    
+    # Short TTL all the same: the window slides with the clock, not only with writes
+    @read_cache.cached(ttl=redis_service.CACHE_TTL['api_response'], datasets=('transactions', 'mismatches'))
+    def get_timeline_stats(self, hours: int = 24, interval: str = "hour",
+                           start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[Dict]:
+        """Get timeline statistics for charts.
+        
+        One grouped query per table: rows are bucketed by
+        floor((created_at - start) / step) in the database and right-joined
+        to the series of bucket numbers, so empty buckets come back as 0
+        and the cost is one index range scan whatever the window length.
+        """
+        if interval not in TIMELINE_INTERVALS:
             return []
-            
+        
+        step, label = TIMELINE_INTERVALS[interval]
+        end_time = end_time or datetime.now()
+        start_time = timeline_start(end_time, end_time - start_time if start_time else timedelta(hours=hours), step)
+        buckets = min(max(int((end_time - start_time).total_seconds() // step) + 1, 1), MAX_TIMELINE_BUCKETS)
+        start_time = max(start_time, timeline_start(end_time, timedelta(seconds=step * (buckets - 1)), step))
+        
+        db = self.get_db()
+        try:
+            dialect = db.get_bind().dialect.name
+            
+            def counts(column):
+                bucket = _bucket_index(dialect, column, start_time, step).label('bucket')
+                grouped = select(bucket, func.count().label('total')).where(
+                    column >= start_time,
+                    column < end_time
+                ).group_by(bucket).subquery()
+                series = _bucket_series(dialect, buckets)
+                query = select(series.c.bucket, func.coalesce(grouped.c.total, 0)).select_from(
+                    series.outerjoin(grouped, grouped.c.bucket == series.c.bucket)
+                ).order_by(series.c.bucket)
+                return [total for _, total in db.execute(query)]
+            
+            transactions = counts(Transaction.created_at)
+            mismatches = counts(Mismatch.detected_at)
+            
+            timeline_data = []
+            for index in range(buckets):
+                bucket_start = start_time + timedelta(seconds=step * index)
+                timeline_data.append({
+                    'hour': bucket_start.strftime(label),
+                    'timestamp': bucket_start.isoformat(),
+                    'transactions': transactions[index],
+                    'mismatches': mismatches[index]
+                })
+            
+            return timeline_data
+        
         except Exception as e:
             print(f"Error getting timeline stats: {e}")
+            skip_cache()
             return []
         finally:
             db.close()
@@ -553,14 +1124,10 @@ class DatabaseService:
             cutoff_time = datetime.now() - timedelta(minutes=minutes)
             
             # Count recent transactions
-            recent_transactions = db.query(Transaction).filter(
-                Transaction.created_at >= cutoff_time
-            ).count()
+            recent_transactions = self._count(db, Transaction, _transaction_filters(start_time=cutoff_time))
             
             # Count recent mismatches
-            recent_mismatches = db.query(Mismatch).filter(
-                Mismatch.detected_at >= cutoff_time
-            ).count()
+            recent_mismatches = self._count(db, Mismatch, _mismatch_filters(start_time=cutoff_time))
             
             # Calculate rates per minute
             transaction_rate = round(recent_transactions / minutes, 1)
@@ -573,7 +1140,7 @@ class DatabaseService:
                 'total_mismatches': recent_mismatches,
                 'period_minutes': minutes
             }
-            
+        
         except Exception as e:
             print(f"Error getting recent activity stats: {e}")
             return {'transaction_rate': 0, 'mismatch_rate': 0, 'total_transactions': 0, 'total_mismatches': 0}
@@ -581,31 +1148,11 @@ class DatabaseService:
             db.close()
     
     def get_source_delay_analysis(self) -> Dict[str, float]:
-        """Analyze delays by source"""
-        db = self.get_db()
-        try:
-            # Simplified delay analysis
-            sources = ['core', 'gateway', 'mobile']
-            delays = {}
-            
-            for source in sources:
-                # Calculate average processing time for this source
-                avg_delay = db.query(
-                    func.avg(func.extract('epoch', Transaction.reconciled_at - Transaction.created_at))
-                ).filter(
-                    Transaction.source == source,
-                    Transaction.reconciled_at.isnot(None)
-                ).scalar()
-                
-                delays[source] = float(avg_delay) if avg_delay else 0.0
-            
-            return delays
-            
-        except Exception as e:
-            print(f"Error getting source delay analysis: {e}")
-            return {'core': 0.0, 'gateway': 0.0, 'mobile': 0.0}
-        finally:
-            db.close()
+        """Average reconciliation delay (seconds) per source over the analytics window"""
+        delays = {source: 0.0 for source in ('core', 'gateway', 'mobile')}
+        for source, stats in self.get_delay_analytics()['by_source'].items():
+            delays[source] = stats['avg_delay_s']
+        return delays
 
 # Global database service instance
 db_service = DatabaseService()
\ No newline at end of file
@@ -0,0 +1,320 @@
+"""
+Partition manager for the transactions and mismatches tables
+Converts them to PostgreSQL range-partitioned tables (by created_at / detected_at), keeps
+future partitions created ahead of the writers, and applies retention by detaching or
+dropping whole partitions instead of deleting rows
+"""
+import os
+import re
+import threading
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text, inspect
+
+logger = logging.getLogger(__name__)
+
+# day or month partitions
+PARTITION_INTERVAL = os.getenv("PARTITION_INTERVAL", "day")
+# Partitions created ahead of today (in PARTITION_INTERVAL units)
+PARTITION_PRECREATE = int(os.getenv("PARTITION_PRECREATE", 7))
+# Days of data kept; 0 keeps everything
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", 0))
+# detach (keep the old partition as a standalone table) or drop
+RETENTION_MODE = os.getenv("RETENTION_MODE", "detach")
+# Seconds between background maintenance runs
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", 3600))
+
+# Partitioned table -> (partition key column, rollup table pruned with it)
+PARTITIONED_TABLES = {
+    'transactions': ('created_at', 'transaction_rollups'),
+    'mismatches': ('detected_at', 'mismatch_rollups')
+}
+
+def _database():
+    try:
+        from app.db.database import engine
+        from app.models.transaction import Transaction
+        from app.models.mismatch import Mismatch
+    except ImportError:
+        from db.database import engine
+        from models.transaction import Transaction
+        from models.mismatch import Mismatch
+    return engine, {'transactions': Transaction.__table__, 'mismatches': Mismatch.__table__}
+
+def period_start(day: date, interval: str = PARTITION_INTERVAL) -> date:
+    return day.replace(day=1) if interval == "month" else day
+
+def next_period(start: date, interval: str = PARTITION_INTERVAL) -> date:
+    if interval == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+def partition_name(table: str, start: date, interval: str = PARTITION_INTERVAL) -> str:
+    return f"{table}_p{start.strftime('%Y%m' if interval == 'month' else '%Y%m%d')}"
+
+def parse_partition_name(table: str, name: str) -> Optional[Tuple[date, date]]:
+    """(start, end) of a partition named by partition_name, else None"""
+    match = re.fullmatch(rf"{re.escape(table)}_p(\d{{6}}|\d{{8}})", name)
+    if not match:
+        return None
+    suffix = match.group(1)
+    if len(suffix) == 6:
+        start = datetime.strptime(suffix, "%Y%m").date()
+        return start, next_period(start, "month")
+    start = datetime.strptime(suffix, "%Y%m%d").date()
+    return start, next_period(start, "day")
+
+class PartitionManager:
+    """Range partitioning lifecycle for the reconciliation tables.
+    
+    Partitioning is PostgreSQL-only: on other databases (the SQLite
+    benchmark stand-in) convert/ensure are no-ops and retention falls back
+    to a range DELETE. Every partitioned table has a DEFAULT partition, so
+    a write outside the pre-created range never fails; maintenance keeps
+    it empty by creating partitions PARTITION_PRECREATE periods ahead.
+    """
+    
+    def __init__(self, interval: str = PARTITION_INTERVAL, precreate: int = PARTITION_PRECREATE,
+                 retention_days: int = RETENTION_DAYS, retention_mode: str = RETENTION_MODE):
+        if interval not in ("day", "month"):
+            raise ValueError(f"PARTITION_INTERVAL must be day or month, not {interval!r}")
+        if retention_mode not in ("detach", "drop"):
+            raise ValueError(f"RETENTION_MODE must be detach or drop, not {retention_mode!r}")
+        self.interval = interval
+        self.precreate = precreate
+        self.retention_days = retention_days
+        self.retention_mode = retention_mode
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.last_run: Optional[str] = None
+        self.last_error: Optional[str] = None
+    
+    # ==================== INSPECTION ====================
+    
+    def is_supported(self) -> bool:
+        engine, _ = _database()
+        return engine.dialect.name == 'postgresql'
+    
+    def is_partitioned(self, connection, table: str) -> bool:
+        return bool(connection.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+        ), {'table': table}).first())
+    
+    def partitions(self, connection, table: str) -> List[str]:
+        """Names of the partitions attached to table"""
+        return [row[0] for row in connection.execute(text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = :table AND pg_table_is_visible(parent.oid) ORDER BY child.relname"
+        ), {'table': table})]
+    
+    # ==================== CONVERSION ====================
+    
+    def convert(self, table: str) -> bool:
+        """One-off migration of an existing heap table to a partitioned one (copies the rows).
+        
+        Runs in one transaction: the table is renamed, recreated as
+        PARTITION BY RANGE (key) with primary key (id, key), partitioned
+        from the oldest row to PARTITION_PRECREATE periods ahead, refilled
+        and its indexes recreated on the parent. Writers must be stopped.
+        """
+        if not self.is_supported():
+            logger.warning("⚠️ Table partitioning requires PostgreSQL; nothing to convert")
+            return False
+        
+        engine, tables = _database()
+        key, _ = PARTITIONED_TABLES[table]
+        model = tables[table]
+        legacy = f"{table}_legacy"
+        columns = [column.name for column in model.columns]
+        
+        try:
+            with engine.begin() as connection:
+                if self.is_partitioned(connection, table):
+                    logger.info(f"✅ {table} is already partitioned")
+                    return True
+                
+                logger.info(f"🏗️ Converting {table} to range partitions on {key}...")
+                sequence = connection.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"),
+                                              {'table': table}).scalar()
+                connection.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+                # Index names are schema-wide: free them for the new table
+                for index in inspect(connection).get_indexes(legacy):
+                    connection.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+                connection.execute(text(f"ALTER INDEX IF EXISTS {table}_pkey RENAME TO {legacy}_pkey"))
+                
+                connection.execute(text(
+                    f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ({key})"
+                ))
+                connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {key} SET NOT NULL"))
+                connection.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id, {key})"))
+                if sequence:
+                    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+                connection.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+                
+                oldest = connection.execute(text(f"SELECT min({key}) FROM {legacy}")).scalar()
+                self._create_partitions(connection, table, (oldest or datetime.now()).date())
+                
+                # Rows without a key timestamp get their last update (or now) as partition key
+                values = [f"COALESCE({key}, updated_at, now())" if column == key else column for column in columns]
+                copied = connection.execute(text(
+                    f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(values)} FROM {legacy}"
+                )).rowcount
+                connection.execute(text(f"DROP TABLE {legacy}"))
+                
+                for index in model.indexes:
+                    index.create(connection)
+            
+            logger.info(f"✅ {table} partitioned by {self.interval} ({copied:,} rows copied)")
+            return True
+        
+        except Exception as e:
+            logger.error(f"❌ Error converting {table}: {e}")
+            return False
+    
+    # ==================== LIFECYCLE ====================
+    
+    def _create_partitions(self, connection, table: str, first: date) -> List[str]:
+        """Create the partitions from first's period to PARTITION_PRECREATE periods ahead of today"""
+        created = []
+        existing = set(self.partitions(connection, table))
+        start = period_start(first, self.interval)
+        last = period_start(date.today(), self.interval)
+        for _ in range(self.precreate):
+            last = next_period(last, self.interval)
+        
+        while start <= last:
+            end = next_period(start, self.interval)
+            name = partition_name(table, start, self.interval)
+            if name not in existing:
+                connection.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+                created.append(name)
+            start = end
+        return created
+    
+    def ensure_partitions(self) -> Dict[str, List[str]]:
+        """Pre-create the coming partitions of every partitioned table"""
+        created = {}
+        if not self.is_supported():
+            return created
+        
+        engine, _ = _database()
+        for table in PARTITIONED_TABLES:
+            try:
+                with engine.begin() as connection:
+                    if self.is_partitioned(connection, table):
+                        created[table] = self._create_partitions(connection, table, date.today())
+            except Exception as e:
+                # Usually rows for that range already landed in the DEFAULT partition
+                logger.error(f"❌ Error creating partitions for {table}: {e}")
+        return created
+    
+    def apply_retention(self, retention_days: Optional[int] = None) -> Dict[str, List[str]]:
+        """Detach or drop the partitions older than the retention window (O(1) per partition).
+        
+        Unpartitioned tables fall back to a range DELETE. The matching rollup
+        buckets are deleted with the rows so dashboard totals stay consistent.
+        """
+        retention_days = self.retention_days if retention_days is None else retention_days
+        removed = {}
+        if retention_days <= 0:
+            return removed
+        
+        engine, _ = _database()
+        cutoff_day = period_start(date.today() - timedelta(days=retention_days), self.interval)
+        cutoff = datetime.combine(cutoff_day, time.min)
+        for table, (key, rollup) in PARTITIONED_TABLES.items():
+            try:
+                with engine.begin() as connection:
+                    if self.is_supported() and self.is_partitioned(connection, table):
+                        removed[table] = []
+                        for name in self.partitions(connection, table):
+                            bounds = parse_partition_name(table, name)
+                            if bounds is None or bounds[1] > cutoff_day:
+                                continue
+                            connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                            if self.retention_mode == "drop":
+                                connection.execute(text(f"DROP TABLE {name}"))
+                            removed[table].append(name)
+                    else:
+                        deleted = connection.execute(text(f"DELETE FROM {table} WHERE {key} < :cutoff"),
+                                                     {'cutoff': cutoff}).rowcount
+                        removed[table] = [f"{deleted} rows"]
+                    
+                    connection.execute(text(f"DELETE FROM {rollup} WHERE bucket < :cutoff"), {'cutoff': cutoff})
+                
+                if removed[table]:
+                    logger.info(f"🗑️ Retention ({retention_days}d, {self.retention_mode}) on {table}: "
+                                f"{', '.join(removed[table])}")
+            except Exception as e:
+                logger.error(f"❌ Error applying retention to {table}: {e}")
+        return removed
+    
+    def maintain(self) -> Dict:
+        """One maintenance pass: pre-create partitions, then apply retention"""
+        try:
+            result = {'created': self.ensure_partitions(), 'removed': self.apply_retention()}
+            self.last_error = None
+        except Exception as e:
+            result = {'error': str(e)}
+            self.last_error = str(e)
+            logger.error(f"❌ Partition maintenance failed: {e}")
+        self.last_run = datetime.now().isoformat()
+        return result
+    
+    def start(self, interval: float = PARTITION_MAINTENANCE_INTERVAL):
+        """Run maintain() now and then every interval seconds in a daemon thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        
+        def run():
+            while not self.stop_event.is_set():
+                self.maintain()
+                self.stop_event.wait(interval)
+        
+        self.thread = threading.Thread(target=run, name="partition-maintenance", daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+    
+    def get_status(self) -> Dict:
+        status = {
+            'supported': self.is_supported(),
+            'interval': self.interval,
+            'precreate': self.precreate,
+            'retention_days': self.retention_days,
+            'retention_mode': self.retention_mode,
+            'last_run': self.last_run,
+            'last_error': self.last_error,
+            'tables': {}
+        }
+        if not status['supported']:
+            return status
+        
+        engine, _ = _database()
+        with engine.connect() as connection:
+            for table in PARTITIONED_TABLES:
+                partitioned = self.is_partitioned(connection, table)
+                partitions = [name for name in (self.partitions(connection, table) if partitioned else [])
+                              if parse_partition_name(table, name)]
+                status['tables'][table] = {
+                    'partitioned': partitioned,
+                    'partitions': len(partitions),
+                    'oldest': partitions[0] if partitions else None,
+                    'newest': partitions[-1] if partitions else None
+                }
+        return status
+
+# Global partition manager instance
+partition_manager = PartitionManager()
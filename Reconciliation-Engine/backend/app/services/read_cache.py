@@ -0,0 +1,434 @@
+"""
+Two-tier read cache for DatabaseService
+In-process TTL+LRU (L1) in front of Redis (L2), with single-flight loading and
+probabilistic early refresh so an expiring key is recomputed once, not by every caller.
+Keys carry the generation of the datasets they read, bumped by every write, so entries
+live long while nothing changes and are superseded as soon as something does
+"""
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import inspect
+import functools
+import threading
+from datetime import datetime, date
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from .redis_service import redis_service
+
+# Entry lifetime when no write supersedes it first
+READ_CACHE_TTL = int(os.getenv("READ_CACHE_TTL", 600))
+# Entries kept in process, and how long one is served before L2 is consulted again
+# (other instances may have refreshed it)
+READ_CACHE_ENABLED = os.getenv("READ_CACHE_ENABLED", "true").lower() == "true"
+READ_CACHE_L1_SIZE = int(os.getenv("READ_CACHE_L1_SIZE", 512))
+READ_CACHE_L1_TTL = float(os.getenv("READ_CACHE_L1_TTL", 5))
+# Early refresh aggressiveness (XFetch beta: 1.0 is the usual setting, > 1 refreshes earlier)
+READ_CACHE_BETA = float(os.getenv("READ_CACHE_BETA", 1.0))
+# A caller waiting on another caller's load gives up and loads itself after this many seconds
+READ_CACHE_WAIT_TIMEOUT = float(os.getenv("READ_CACHE_WAIT_TIMEOUT", 10))
+# Seconds between reads of the shared generation counters (writes by other processes
+# become visible after at most this long; this process's own writes immediately)
+READ_CACHE_GENERATION_CHECK = float(os.getenv("READ_CACHE_GENERATION_CHECK", 0.5))
+
+# What cached reads depend on; a write bumps the generation of the datasets it touched
+DATASETS = ('transactions', 'mismatches')
+
+_FAILED = object()  # result of a flight whose leader raised or was cancelled
+
+# Set while a cached method runs; skip_cache() marks its result as not to be stored
+_uncacheable: ContextVar = ContextVar("read_cache_uncacheable", default=None)
+
+def skip_cache():
+    """Do not cache the result of the running cached call (its error fallback, say)"""
+    marker = _uncacheable.get()
+    if marker is not None:
+        marker.append(True)
+
+def _key_part(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return repr(value)
+
+def _latency_summary(samples: list) -> Dict:
+    if not samples:
+        return {'avg_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+    ordered = sorted(samples)
+    return {
+        'avg_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+
+class CacheMetrics:
+    """Outcome counters and hit/load latencies of one cached method"""
+    
+    OUTCOMES = ('l1_hits', 'l2_hits', 'coalesced', 'stale_served', 'misses', 'early_refreshes', 'errors')
+    
+    def __init__(self, samples: int = 1000):
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(self.OUTCOMES, 0)
+        self.hit_times = deque(maxlen=samples)
+        self.load_times = deque(maxlen=samples)
+    
+    def record_hit(self, outcome: str, seconds: float):
+        with self.lock:
+            self.counts[outcome] += 1
+            self.hit_times.append(seconds)
+    
+    def record_load(self, outcome: str, seconds: float):
+        with self.lock:
+            self.counts[outcome] += 1
+            self.load_times.append(seconds)
+    
+    def record_error(self):
+        with self.lock:
+            self.counts['errors'] += 1
+    
+    def snapshot(self) -> Dict:
+        with self.lock:
+            counts = dict(self.counts)
+            hit_times, load_times = list(self.hit_times), list(self.load_times)
+        served = counts['l1_hits'] + counts['l2_hits'] + counts['coalesced'] + counts['stale_served']
+        calls = served + counts['misses'] + counts['early_refreshes']
+        return {
+            **counts,
+            'hit_ratio': round(served / calls * 100, 2) if calls else 0.0,
+            'hit_latency': _latency_summary(hit_times),
+            'load_latency': _latency_summary(load_times)
+        }
+
+class CachedRead:
+    """A read method registered with ReadCache: its TTL, datasets and how its arguments form a key"""
+    
+    def __init__(self, function: Callable, ttl: int, name: str, datasets: Tuple[str, ...]):
+        unknown = set(datasets) - set(DATASETS)
+        if unknown:
+            raise ValueError(f"Unknown datasets {sorted(unknown)}, expected some of {DATASETS}")
+        self.function = function
+        self.ttl = ttl
+        self.name = name
+        self.datasets = tuple(datasets)
+        self.signature = inspect.signature(function)
+    
+    def key(self, args: tuple, kwargs: dict, generations: Dict[str, int]) -> str:
+        # Bound with defaults, so get_transactions(50) and get_transactions(limit=50) share a key
+        bound = self.signature.bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        params = list(bound.arguments.items())[1:]
+        generation = ".".join(str(generations[dataset]) for dataset in self.datasets)
+        return f"{redis_service.PREFIXES['cache']}{self.name}:g{generation}:" + "|".join(
+            f"{name}={_key_part(value)}" for name, value in params
+        )
+
+class _Flight:
+    """A load in progress: followers wait on it instead of querying too"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.ok = False
+
+class ReadCache:
+    """Cache for DatabaseService read methods.
+    
+    A lookup checks L1 (this process, LRU-bounded, short TTL) then L2
+    (Redis, the method's TTL, shared by every API instance). On a miss
+    one caller per key loads while concurrent callers wait for its result
+    (single flight), so an expiring key costs one query, not one per
+    request. Before expiry each hit may refresh early with probability
+    rising as expiry nears (XFetch: delta * beta * -ln(rand) past the
+    expiry, delta being the load time), so hot keys are usually reloaded
+    while the old value is still being served. Cached values are shared
+    between callers and must not be mutated.
+    
+    Each method names the datasets it reads, and the key embeds their
+    generations. A committed write calls invalidate(), which INCRs the
+    shared counters in Redis; lookups re-read them every
+    READ_CACHE_GENERATION_CHECK seconds, so after a write every instance
+    moves to new keys and the old entries are left to expire.
+    """
+    
+    def __init__(self, l1_size: int = READ_CACHE_L1_SIZE, l1_ttl: float = READ_CACHE_L1_TTL,
+                 beta: float = READ_CACHE_BETA, wait_timeout: float = READ_CACHE_WAIT_TIMEOUT,
+                 enabled: bool = READ_CACHE_ENABLED):
+        self.l1_size = l1_size
+        self.l1_ttl = l1_ttl
+        self.beta = beta
+        self.wait_timeout = wait_timeout
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.l1: OrderedDict = OrderedDict()  # key -> (value, delta, expires_at, l1_expires_at)
+        self.flights: Dict[str, _Flight] = {}
+        self.async_flights: Dict[tuple, asyncio.Future] = {}
+        self.metrics: Dict[str, CacheMetrics] = {}
+        self.generations = dict.fromkeys(DATASETS, 0)
+        self.generations_checked_at = float('-inf')
+        self.unpublished = set()  # datasets written while Redis was down, INCRed on reconnect
+    
+    def cached(self, ttl: int = READ_CACHE_TTL, datasets: Tuple[str, ...] = DATASETS, name: Optional[str] = None):
+        """Decorator for a DatabaseService read method (results must be JSON-serialisable)"""
+        def decorator(function):
+            spec = CachedRead(function, ttl, name or function.__name__, datasets)
+            self.metrics.setdefault(spec.name, CacheMetrics())
+            
+            @functools.wraps(function)
+            def wrapper(service, *args, **kwargs):
+                return self.get_or_load(spec, args, kwargs, lambda: function(service, *args, **kwargs))
+            
+            wrapper.cached_read = spec
+            return wrapper
+        return decorator
+    
+    def clear(self):
+        """Drop the in-process entries (L2 entries expire by TTL)"""
+        with self.lock:
+            self.l1.clear()
+    
+    def snapshot(self) -> Dict:
+        """Per-method hit/miss counters and latencies"""
+        with self.lock:
+            l1_entries = len(self.l1)
+        return {
+            'enabled': self.enabled,
+            'l1_entries': l1_entries,
+            'l1_size': self.l1_size,
+            'generations': dict(self.generations),
+            'methods': {name: metrics.snapshot() for name, metrics in self.metrics.items()}
+        }
+    
+    # ==================== GENERATIONS ====================
+    
+    def invalidate(self, datasets: Iterable[str]):
+        """A write to datasets was committed: move every instance to new keys for them"""
+        datasets = tuple(datasets)
+        if not datasets:
+            return
+        with self.lock:
+            # Writes missed during an outage go out with this one
+            pending = tuple(self.unpublished.union(datasets))
+        bumped = redis_service.bump_cache_generations(pending) if redis_service.is_connected() else None
+        with self.lock:
+            if bumped is not None:
+                self.generations.update(bumped)
+                self.unpublished.difference_update(pending)
+                return
+            # Redis is down: L2 is out of use, only this process's entries can be superseded.
+            # The shared counters are bumped on reconnect, before any value read from Redis is used
+            for dataset in datasets:
+                self.generations[dataset] += 1
+            self.unpublished.update(datasets)
+            self.l1.clear()
+    
+    def _generations_due(self) -> bool:
+        return time.monotonic() - self.generations_checked_at >= READ_CACHE_GENERATION_CHECK
+    
+    def _sync_generations(self):
+        """Read the shared counters (at most once per READ_CACHE_GENERATION_CHECK).
+        
+        Datasets written while Redis was down are INCRed first: their
+        counters in Redis still predate those writes, and entries stored
+        under them by other instances may be stale.
+        """
+        self.generations_checked_at = time.monotonic()
+        if not redis_service.is_connected():
+            return
+        with self.lock:
+            pending = tuple(self.unpublished)
+        if pending:
+            if redis_service.bump_cache_generations(pending) is None:
+                return
+            with self.lock:
+                self.unpublished.difference_update(pending)
+                self.l1.clear()  # entries stored under outage-only generation numbers
+        current = redis_service.get_cache_generations(DATASETS)
+        if current is not None:
+            with self.lock:
+                self.generations.update(current)
+    
+    # ==================== TIERS ====================
+    
+    def _l1_get(self, key: str) -> Optional[tuple]:
+        with self.lock:
+            entry = self.l1.get(key)
+            if entry is None:
+                return None
+            if entry[3] <= time.time():
+                del self.l1[key]
+                return None
+            self.l1.move_to_end(key)
+            return entry
+    
+    def _l1_put(self, key: str, value: Any, delta: float, expires_at: float):
+        entry = (value, delta, expires_at, min(expires_at, time.time() + self.l1_ttl))
+        with self.lock:
+            self.l1[key] = entry
+            self.l1.move_to_end(key)
+            while len(self.l1) > self.l1_size:
+                self.l1.popitem(last=False)
+    
+    def _l2_get(self, key: str) -> Optional[tuple]:
+        if not redis_service.is_connected():
+            return None
+        payload = redis_service.get_cache_entry(key)
+        if payload is None:
+            return None
+        try:
+            cached = json.loads(payload)
+            entry = (cached['value'], cached['delta'], cached['expires_at'])
+        except (ValueError, KeyError, TypeError):
+            return None
+        self._l1_put(key, *entry)
+        return entry
+    
+    def _l2_put(self, key: str, value: Any, delta: float, expires_at: float, ttl: int):
+        if not redis_service.is_connected():
+            return
+        payload = json.dumps({'value': value, 'delta': delta, 'expires_at': expires_at}, default=str)
+        redis_service.set_cache_entry(key, payload, ttl)
+    
+    def _should_refresh(self, entry: tuple) -> bool:
+        """XFetch: refresh when now - delta * beta * ln(rand) reaches the expiry"""
+        _, delta, expires_at = entry[:3]
+        return time.time() - delta * self.beta * math.log(1.0 - random.random()) >= expires_at
+    
+    def _store(self, spec: CachedRead, key: str, value: Any, delta: float):
+        expires_at = time.time() + spec.ttl
+        self._l1_put(key, value, delta, expires_at)
+        self._l2_put(key, value, delta, expires_at, spec.ttl)
+    
+    # ==================== SYNC CALLERS ====================
+    
+    def _lookup(self, key: str) -> Tuple[Optional[tuple], str]:
+        entry = self._l1_get(key)
+        if entry is not None:
+            return entry, 'l1_hits'
+        return self._l2_get(key), 'l2_hits'
+    
+    def get_or_load(self, spec: CachedRead, args: tuple, kwargs: dict, loader: Callable[[], Any]) -> Any:
+        """Cached result of spec for these arguments; loader() runs on a miss (one caller per key)"""
+        if not self.enabled:
+            return loader()
+        started = time.perf_counter()
+        metrics = self.metrics[spec.name]
+        if self._generations_due():
+            self._sync_generations()
+        key = spec.key(args, kwargs, self.generations)
+        entry, tier = self._lookup(key)
+        if entry is not None and not self._should_refresh(entry):
+            metrics.record_hit(tier, time.perf_counter() - started)
+            return entry[0]
+        
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+        
+        if not leader:
+            if entry is not None:
+                # Someone is already refreshing this key: keep serving the current value
+                metrics.record_hit('stale_served', time.perf_counter() - started)
+                return entry[0]
+            if flight.event.wait(self.wait_timeout) and flight.ok:
+                metrics.record_hit('coalesced', time.perf_counter() - started)
+                return flight.value
+            metrics.record_error()
+            return loader()  # the leader failed or is stuck: load independently
+        
+        try:
+            flight.value = self._load(spec, key, loader, metrics, 'early_refreshes' if entry is not None else 'misses')
+            flight.ok = True
+            return flight.value
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+            flight.event.set()
+    
+    def _load(self, spec: CachedRead, key: str, loader: Callable[[], Any], metrics: CacheMetrics, outcome: str) -> Any:
+        marker = []
+        token = _uncacheable.set(marker)
+        started = time.perf_counter()
+        try:
+            value = loader()
+        finally:
+            _uncacheable.reset(token)
+        delta = time.perf_counter() - started
+        metrics.record_load(outcome, delta)
+        if not marker:
+            self._store(spec, key, value, delta)
+        return value
+    
+    # ==================== ASYNC CALLERS ====================
+    
+    async def aget_or_load(self, spec: CachedRead, args: tuple, kwargs: dict, loader: Callable[[], Any]) -> Any:
+        """get_or_load for coroutines: loader() returns an awaitable; Redis calls run in the executor"""
+        if not self.enabled:
+            return await loader()
+        started = time.perf_counter()
+        metrics = self.metrics[spec.name]
+        loop = asyncio.get_running_loop()
+        if self._generations_due():
+            # Redis is a blocking client: keep its round trips off the event loop
+            await loop.run_in_executor(None, self._sync_generations)
+        key = spec.key(args, kwargs, self.generations)
+        entry = self._l1_get(key)
+        if entry is not None and not self._should_refresh(entry):
+            metrics.record_hit('l1_hits', time.perf_counter() - started)
+            return entry[0]
+        
+        flight_key = (id(loop), key)
+        flight = self.async_flights.get(flight_key)
+        if flight is not None:
+            if entry is not None:
+                metrics.record_hit('stale_served', time.perf_counter() - started)
+                return entry[0]
+            try:
+                value = await asyncio.wait_for(asyncio.shield(flight), self.wait_timeout)
+            except asyncio.TimeoutError:
+                value = _FAILED
+            if value is not _FAILED:
+                metrics.record_hit('coalesced', time.perf_counter() - started)
+                return value
+            metrics.record_error()
+            return await loader()
+        
+        flight = self.async_flights[flight_key] = loop.create_future()
+        value = _FAILED
+        try:
+            if entry is None:
+                entry = await loop.run_in_executor(None, self._l2_get, key)
+                if entry is not None and not self._should_refresh(entry):
+                    metrics.record_hit('l2_hits', time.perf_counter() - started)
+                    value = entry[0]
+                    return value
+            value = await self._aload(spec, key, loader, metrics, 'early_refreshes' if entry is not None else 'misses')
+            return value
+        finally:
+            # On failure or cancellation the followers get _FAILED and load themselves
+            self.async_flights.pop(flight_key, None)
+            flight.set_result(value)
+    
+    async def _aload(self, spec: CachedRead, key: str, loader: Callable[[], Any], metrics: CacheMetrics, outcome: str) -> Any:
+        marker = []
+        token = _uncacheable.set(marker)
+        started = time.perf_counter()
+        try:
+            value = await loader()
+        finally:
+            _uncacheable.reset(token)
+        delta = time.perf_counter() - started
+        metrics.record_load(outcome, delta)
+        if not marker:
+            expires_at = time.time() + spec.ttl
+            self._l1_put(key, value, delta, expires_at)
+            await asyncio.get_running_loop().run_in_executor(None, self._l2_put, key, value, delta, expires_at, spec.ttl)
+        return value
+
+# Global read cache instance
+read_cache = ReadCache()
@@ -1,80 +1,410 @@
 import json
+import os
 import time
+import queue
+import zlib
+import heapq
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from collections import defaultdict, deque
 import threading
+import multiprocessing
 import logging
 
 from services.redis_service import redis_service
+from services.batch_writer import batch_writer
+from services.batch_mismatch_detector import BatchMismatchDetector
+from services.reconciliation_rules import RuleRegistry, RuleStats, rule_registry, merge_rule_stats, normalize_channel
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of shards used by the global engine (one lock + worker per shard)
+DEFAULT_SHARD_COUNT = int(os.getenv("RECONCILIATION_SHARDS", os.cpu_count() or 4))
+
+# Pending buffer bounds (per shard)
+DEFAULT_MATCHING_WINDOW = float(os.getenv("RECONCILIATION_WINDOW_SECONDS", 300))
+DEFAULT_MAX_PENDING = int(os.getenv("RECONCILIATION_MAX_PENDING", 50000))
+DEFAULT_HISTORY_SIZE = int(os.getenv("RECONCILIATION_HISTORY_SIZE", 1000))
+# Furthest an event time may sit from this host's wall clock before it is clamped (at most half the window)
+MAX_CLOCK_SKEW = float(os.getenv("RECONCILIATION_MAX_CLOCK_SKEW", 30))
+
+# Where pending sources wait for their txn to complete: 'memory' (this process, sources of a
+# txn must reach the same shard) or 'redis' (shared, any consumer process may receive any source)
+PENDING_STORES = ('memory', 'redis')
+DEFAULT_PENDING_STORE = os.getenv("RECONCILIATION_PENDING_STORE", "memory")
+# Most expired txns one call claims from the shared store
+EXPIRY_CLAIM_BATCH = 1000
+# Seconds a claimed shared txn may wait for its verdict before another process takes it over
+CLAIM_TIMEOUT = float(os.getenv("RECONCILIATION_CLAIM_TIMEOUT", 60))
+
+# Sources expected to report a transaction, by channel (mirrors producers/utils.py CHANNEL_SOURCES).
+# A txn is reconciled once, as soon as its expected set is complete, or at window expiry.
+DEFAULT_EXPECTED_SOURCES = frozenset(['core', 'gateway', 'mobile'])
+CHANNEL_SOURCE_PROFILES = {
+    'ATM': frozenset(['core', 'gateway']),
+    'ONLINE': frozenset(['core', 'gateway']),
+    'BRANCH': frozenset(['core', 'gateway']),
+    'POS': frozenset(['core', 'gateway']),
+    'MOBILE': frozenset(['core', 'gateway', 'mobile']),
+    'UPI': frozenset(['core', 'gateway', 'mobile'])
+}
+KNOWN_SOURCES = sorted(DEFAULT_EXPECTED_SOURCES.union(*CHANNEL_SOURCE_PROFILES.values()))
+
+def shard_for(txn_id: str, num_shards: int) -> int:
+    """Map a txn_id to its shard.
+    
+    Uses crc32 instead of hash() so the mapping is identical in every
+    process (hash() is salted per interpreter).
+    """
+    return zlib.crc32(txn_id.encode('utf-8')) % num_shards
+
+def event_time(transaction: dict, default: float) -> float:
+    """Event time of a transaction as epoch seconds (falls back to default)"""
+    timestamp = transaction.get('timestamp')
+    if not timestamp:
+        return default
+    try:
+        return datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return default
+
 class ReconciliationEngine:
-    def __init__(self):
+    def __init__(self, matching_window: float = DEFAULT_MATCHING_WINDOW,
+                 max_pending: int = DEFAULT_MAX_PENDING, history_size: int = DEFAULT_HISTORY_SIZE,
+                 source_profiles: Optional[Dict[str, frozenset]] = None,
+                 rules: Optional[RuleRegistry] = None, pending_store: str = DEFAULT_PENDING_STORE):
+        if pending_store not in PENDING_STORES:
+            raise ValueError(f"Unknown pending store {pending_store!r}, expected one of {PENDING_STORES}")
+        self.pending_store = pending_store
         # Store transactions by txn_id for comparison
         self.pending_transactions = defaultdict(dict)  # {txn_id: {source: transaction}}
-        self.reconciled_transactions = []
-        self.detected_mismatches = []
+        self.reconciled_transactions = deque(maxlen=history_size)
+        self.detected_mismatches = deque(maxlen=history_size)
+        # Guards the in-memory state only; Redis and DB I/O happen outside it
         self.lock = threading.Lock()
         
-        # Reconciliation rules
-        self.amount_tolerance = 0.01  # ₹0.01 tolerance for amount differences
-        self.time_tolerance = 300     # 5 minutes tolerance for timestamp differences
+        # Reconciliation rules (declarative, compiled once, hot-reloaded from RECONCILIATION_RULES_FILE)
+        self.rules = rules or rule_registry
+        self.rule_stats = RuleStats()
+        self.source_profiles = {normalize_channel(channel): sources
+                                for channel, sources in (source_profiles or CHANNEL_SOURCE_PROFILES).items()}
+        self.detector = BatchMismatchDetector(self.rule_stats)
+        
+        # Pending buffer bounds
+        self.matching_window = matching_window  # seconds of event time a txn waits for its other sources
+        self.clock_skew = min(MAX_CLOCK_SKEW, matching_window / 2)
+        self.max_pending = max_pending          # hard cap on pending txn_ids
+        self.expiry_heap = []                   # (first event time, txn_id), lazily cleaned
+        self.first_seen = {}                    # {txn_id: first event time}
+        self.verdicts = {}                      # {txn_id: status} reconciled txns kept until expiry
+        self.watermark = time.time()            # max (clamped) event time seen, seeded from the wall clock
+        self.last_event_at = time.monotonic()
         
+        # Running totals (history deques are bounded)
+        self.total_reconciled = 0
+        self.total_mismatched = 0
+        self.expired_count = 0
+        self.evicted_count = 0
+        self.late_count = 0
+        self.reclaimed_count = 0
+        self.mismatch_type_counts = defaultdict(int)
+        self.source_counts = defaultdict(int)    # {source: pending txns it reported, awaiting a verdict}
+    
     def add_transaction(self, transaction: dict):
         """Add a transaction from any source for reconciliation - Enhanced with Redis"""
-        with self.lock:
+        self.add_transactions([transaction])
+    
+    def add_transactions(self, transactions: List[dict]):
+        """Add a micro-batch of transactions and reconcile every txn it completes in one pass"""
+        if self.pending_store == 'redis' and redis_service.is_connected():
+            if self._add_shared(transactions):
+                return
+            logger.warning("Shared pending store unavailable; matching this batch in memory")
+        
+        ready = []    # [(txn_id, sources)] whose expected source set is now complete
+        expired = []  # [(txn_id, sources, evicted)] released by the watermark or the cap
+        late = []     # [(txn_id, source, verdict)] arriving after their txn was reconciled
+        waiting = []  # transactions still pending after this batch (tracked in Redis)
+        
+        for transaction in transactions:
             txn_id = transaction.get('txn_id')
             source = transaction.get('source')
             
             if not txn_id or not source:
                 logger.warning(f"Invalid transaction: missing txn_id or source")
-                return
-            
-            # Store in Redis for in-flight tracking
-            if redis_service.is_connected():
-                redis_service.store_inflight_transaction(txn_id, transaction)
+                continue
             
             # Store transaction by source (fallback to memory)
-            self.pending_transactions[txn_id][source] = transaction
+            with self.lock:
+                ts = self._advance_watermark(transaction)
+                expired.extend(self._collect_expired())
+                
+                if txn_id in self.verdicts:
+                    # Already reconciled: a duplicate or unexpected extra source
+                    self.late_count += 1
+                    late.append((txn_id, source, self.verdicts[txn_id]))
+                else:
+                    if txn_id not in self.first_seen:
+                        # Hard cap: make room by evicting the oldest pending txn
+                        while len(self.first_seen) >= self.max_pending and self.expiry_heap:
+                            expired.extend(self._pop_oldest(evicted=True))
+                        self.first_seen[txn_id] = ts
+                        heapq.heappush(self.expiry_heap, (ts, txn_id))
+                    
+                    if source not in self.pending_transactions[txn_id]:
+                        self.source_counts[source] += 1
+                    self.pending_transactions[txn_id][source] = transaction
+                    
+                    if self.expected_sources(transaction).issubset(self.pending_transactions[txn_id]):
+                        self.verdicts[txn_id] = None  # claimed: reconciled exactly once
+                        for pending_source in self.pending_transactions[txn_id]:
+                            self.source_counts[pending_source] -= 1
+                        ready.append((txn_id, dict(self.pending_transactions[txn_id])))
+                    else:
+                        waiting.append(transaction)
             
             logger.info(f"Added transaction {txn_id} from {source}")
-            
-            # Always attempt reconciliation for now (disable throttling)
-            self._attempt_reconciliation(txn_id)
-    
-    def _attempt_reconciliation(self, txn_id: str):
-        """Attempt to reconcile a transaction across all sources - Enhanced with Redis locking"""
-        # Acquire Redis lock to prevent race conditions
-        if redis_service.is_connected():
-            if not redis_service.acquire_reconciliation_lock(txn_id):
-                logger.info(f"Reconciliation already in progress for {txn_id}")
-                return
+        
+        # In-flight tracking in Redis: one pipelined write for the batch. Sources that completed
+        # their txn within the batch are skipped (the reconciliation below removes the entry).
+        if waiting and redis_service.is_connected():
+            ready_ids = {txn_id for txn_id, _ in ready}
+            redis_service.store_inflight_transactions(
+                [transaction for transaction in waiting if transaction['txn_id'] not in ready_ids]
+            )
+        
+        self._reconcile_batch(ready, expired)
+        
+        # After the batch is reconciled, so a source following its txn's completion (or
+        # expiry) within the same batch is stamped with the verdict just reached
+        for txn_id, source, verdict in late:
+            if verdict is None:
+                with self.lock:
+                    verdict = self.verdicts.get(txn_id)
+            self._record_late_source(txn_id, source, verdict)
+    
+    def _add_shared(self, transactions: List[dict]) -> bool:
+        """add_transactions against the Redis pending store; False (nothing applied) if Redis failed"""
+        entries = []
+        with self.lock:
+            for transaction in transactions:
+                txn_id = transaction.get('txn_id')
+                source = transaction.get('source')
+                if not txn_id or not source:
+                    logger.warning(f"Invalid transaction: missing txn_id or source")
+                    continue
+                ts = self._advance_watermark(transaction)
+                entries.append((txn_id, source, transaction, ts, self.expected_sources(transaction)))
+        
+        # The hash TTL must outlive the matching window, so late sources still find the verdict
+        ttl = max(redis_service.CACHE_TTL['transaction_temp'], int(self.matching_window * 2))
+        results = redis_service.add_pending_sources(entries, ttl, CLAIM_TIMEOUT)
+        if results is None:
+            return False
+        
+        ready = []
+        late = []
+        for (txn_id, source, *_), (state, verdict, sources) in zip(entries, results):
+            if state == 'ready':
+                ready.append((txn_id, sources))
+            elif state == 'late':
+                late.append((txn_id, source, verdict, list(sources)))
+            logger.info(f"Added transaction {txn_id} from {source}")
+        
+        # source_counts stays a per-process gauge of memory-matched txns; the shared one is
+        # the per-source in-flight indexes, read once by ShardedReconciliationEngine
+        with self.lock:
+            self.late_count += len(late)
+        
+        for txn_id, source, verdict, sources in late:
+            self._record_late_source(txn_id, source, verdict, sources)
+        
+        reclaimed, expired = self._claim_expired()
+        self._reconcile_batch(ready + reclaimed, expired)
+        return True
+    
+    def _advance_watermark(self, transaction: dict) -> float:
+        """Move the event-time watermark for a transaction and return its clamped event time (lock held)"""
+        now = time.monotonic()
+        wall = time.time()
+        # Clamp to the wall clock +/- clock_skew: a source clock running ahead cannot expire every
+        # pending txn, nor one running behind (a UTC stamp read as local time) expire its own txn
+        ts = min(max(event_time(transaction, wall), wall - self.clock_skew), wall + self.clock_skew)
+        # ...and may not move the watermark further than the wall clock did
+        self.watermark = max(self.watermark, min(ts, self.watermark + now - self.last_event_at))
+        self.last_event_at = now
+        return min(ts, self.watermark)
+    
+    def _claim_expired(self) -> Tuple[List[tuple], List[tuple]]:
+        """Claim shared txns older than the matching window, and those whose claimer died.
+        
+        Returns (ready, expired) for _reconcile_batch: a taken-over txn with
+        its expected sources complete is reconciled normally, any other as
+        expired.
+        """
+        with self.lock:
+            cutoff = self.watermark - self.matching_window
+        claimed = redis_service.claim_expired_pending(cutoff, CLAIM_TIMEOUT, EXPIRY_CLAIM_BATCH) or []
+        
+        ready, expired = [], []
+        with self.lock:
+            for txn_id, sources, reclaimed in claimed:
+                if reclaimed:
+                    self.reclaimed_count += 1
+                    logger.warning(f"Taking over {txn_id}: its claim expired without a verdict")
+                    if self.expected_sources(next(iter(sources.values()))).issubset(sources):
+                        ready.append((txn_id, sources))
+                        continue
+                else:
+                    self.expired_count += 1
+                expired.append((txn_id, sources, False))
+        return ready, expired
+    
+    def expected_sources(self, transaction: dict) -> frozenset:
+        """Sources expected to report this transaction, from its channel profile"""
+        return self.source_profiles.get(normalize_channel(transaction.get('channel')), DEFAULT_EXPECTED_SOURCES)
+    
+    def _record_late_source(self, txn_id: str, source: str, verdict: Optional[str],
+                            sources: Optional[List[str]] = None):
+        """Stamp a source that arrived after its txn was reconciled with the existing verdict.
+        
+        Without a verdict yet the txn is being reconciled: the shared store
+        keeps the source in _late and the verdict owner stamps it.
+        """
+        logger.info(f"Late source {source} for already reconciled {txn_id} ({verdict})")
+        if not verdict:
+            return
         
         try:
-            sources = self.pending_transactions[txn_id]
-            
-            # We need at least 2 sources to reconcile, but let's be more aggressive
-            if len(sources) < 2:
-                return
-            
-            # If we have 2 sources and it's been more than 30 seconds, reconcile anyway
-            # This prevents transactions from staying pending forever
-            
-            logger.info(f"Attempting reconciliation for {txn_id} with sources: {list(sources.keys())}")
-            
-            # Perform reconciliation checks
-            mismatches = self._detect_mismatches(txn_id, sources)
+            if sources is None:
+                with self.lock:
+                    sources = list(self.pending_transactions.get(txn_id, {}).keys()) + [source]
+            batch_writer.update_status(txn_id, verdict, sources)
+        except Exception as e:
+            logger.warning(f"Failed to update database: {e}")
+    
+    # ==================== PENDING EXPIRY ====================
+    
+    def advance_idle(self):
+        """Advance the watermark by elapsed wall-clock time and expire stale entries.
+        
+        Called by the shard worker when its inbox is idle so that quiet periods
+        still release transactions whose other sources never arrived.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.watermark += now - self.last_event_at
+            self.last_event_at = now
+            expired = self._collect_expired()
+        
+        ready = []
+        if self.pending_store == 'redis' and redis_service.is_connected():
+            ready, claimed = self._claim_expired()
+            expired.extend(claimed)
+        self._reconcile_batch(ready, expired)
+    
+    def _collect_expired(self) -> List[tuple]:
+        """Pop every txn whose first event is older than the matching window (lock held)"""
+        expired = []
+        cutoff = self.watermark - self.matching_window
+        while self.expiry_heap and self.expiry_heap[0][0] < cutoff:
+            expired.extend(self._pop_oldest())
+        return expired
+    
+    def _pop_oldest(self, evicted: bool = False) -> List[tuple]:
+        """Release the oldest pending txn (lock held); returns it if it still needs a verdict"""
+        first_ts, txn_id = heapq.heappop(self.expiry_heap)
+        if self.first_seen.get(txn_id) != first_ts:
+            return []  # stale heap entry
+        
+        del self.first_seen[txn_id]
+        sources = self.pending_transactions.pop(txn_id, {})
+        if txn_id in self.verdicts:
+            del self.verdicts[txn_id]
+            return []
+        
+        for source in sources:
+            self.source_counts[source] -= 1
+        if evicted:
+            self.evicted_count += 1
+        else:
+            self.expired_count += 1
+            # Keep a marker for one more window: its verdict stamps late sources instead of
+            # re-opening the txn (evictions skip it, the cap has to free a slot)
+            self.verdicts[txn_id] = None
+            self.first_seen[txn_id] = self.watermark
+            heapq.heappush(self.expiry_heap, (self.watermark, txn_id))
+        return [(txn_id, sources, evicted)]
+    
+    def _reconcile_batch(self, ready: List[tuple], expired: List[tuple]):
+        """Reconcile complete txns, and expired partial ones, with one vectorized detection pass.
+        
+        Expired txns are reconciled once with whatever sources arrived, plus a
+        MISSING_SOURCE mismatch naming the expected sources that never did.
+        """
+        # Acquire Redis locks to prevent race conditions (one round trip for the batch; without
+        # Redis, or when it fails, reconciliation goes ahead unlocked). Txns claimed from the
+        # shared pending store are already exclusive to this process.
+        shared = self.pending_store == 'redis'
+        locked = ready
+        held = []
+        if ready and not shared and redis_service.is_connected():
+            acquired = redis_service.acquire_reconciliation_locks([txn_id for txn_id, _ in ready])
+            if acquired is not None:
+                held = acquired
+                acquired = set(acquired)
+                locked = [(txn_id, sources) for txn_id, sources in ready if txn_id in acquired]
+                for txn_id, _ in ready:
+                    if txn_id not in acquired:
+                        logger.info(f"Reconciliation already in progress for {txn_id}")
+        finished = []  # (txn_id, sources, status) whose in-flight entries are removed
+        
+        try:
+            rules = self.rules.current()
+            partial = [(txn_id, sources) for txn_id, sources, _ in expired if len(sources) >= 2]
+            detected = self.detector.detect(locked + partial, rules) if locked or partial else []
             
-            # Create and process reconciliation result
-            self._process_reconciliation_result(txn_id, sources, mismatches)
+            for (txn_id, sources), mismatches in zip(locked, detected):
+                logger.info(f"Attempting reconciliation for {txn_id} with sources: {list(sources.keys())}")
+                self._process_reconciliation_result(txn_id, sources, mismatches)
+                finished.append((txn_id, sources.keys(), 'MISMATCH' if mismatches else 'MATCHED'))
             
+            partial_results = iter(detected[len(locked):])
+            for txn_id, sources, evicted in expired:
+                mismatches = next(partial_results) if len(sources) >= 2 else []
+                missing = sorted(self.expected_sources(next(iter(sources.values()))) - set(sources))
+                if missing:
+                    reason = "evicted at pending capacity" if evicted else f"not received within {self.matching_window:.0f}s window"
+                    mismatches.append({
+                        'type': 'MISSING_SOURCE',
+                        'severity': rules.profile_for(sources).missing_source_severity,
+                        'details': f"Expected sources missing: {', '.join(missing)} ({reason})",
+                        'sources': list(sources.keys()),
+                        'values': {source: txn.get('amount') for source, txn in sources.items()}
+                    })
+                
+                self._process_reconciliation_result(txn_id, sources, mismatches)
+                finished.append((txn_id, sources.keys(), 'MISMATCH' if mismatches else 'MATCHED'))
+        
         finally:
-            # Always release the lock
-            if redis_service.is_connected():
-                redis_service.release_reconciliation_lock(txn_id)
+            # Always release the locks; clean up Redis in-flight transactions in the same call
+            if (held or finished) and redis_service.is_connected():
+                if shared:
+                    self._stamp_late_sources(finished, redis_service.record_pending_verdicts(finished))
+                else:
+                    redis_service.finish_reconciliations(held, [(txn_id, sources) for txn_id, sources, _ in finished])
+    
+    def _stamp_late_sources(self, finished: List[tuple], late: Optional[Dict[str, List[str]]]):
+        """Give sources that reached the shared store while their txn was reconciled its verdict"""
+        if not late:
+            return
+        statuses = {txn_id: status for txn_id, _, status in finished}
+        try:
+            for txn_id, sources in late.items():
+                batch_writer.update_status(txn_id, statuses[txn_id], sources)
+        except Exception as e:
+            logger.warning(f"Failed to update database: {e}")
     
     def _process_reconciliation_result(self, txn_id: str, sources: dict, mismatches: list):
         """Process the reconciliation result and update systems"""
@@ -88,9 +418,7 @@ class ReconciliationEngine:
             'transactions': sources
         }
         
-        self.reconciled_transactions.append(reconciliation_result)
-        
-        # Add mismatches to the detected list
+        detected = []
         for mismatch in mismatches:
             mismatch_data = {
                 'id': f"{txn_id}_{mismatch['type']}_{int(time.time())}",
@@ -101,20 +429,31 @@ class ReconciliationEngine:
                 'sources_involved': mismatch['sources'],
                 'timestamp': datetime.now().isoformat()
             }
-            self.detected_mismatches.append(mismatch_data)
+            detected.append(mismatch_data)
         
-        # Update database
-        try:
-            try:
-                from services.database_service import db_service
-            except ImportError:
-                from app.services.database_service import db_service
+        with self.lock:
+            self.reconciled_transactions.append(reconciliation_result)
+            # Add mismatches to the detected list
+            self.detected_mismatches.extend(detected)
+            
+            self.total_reconciled += 1
+            if mismatches:
+                self.total_mismatched += 1
+            for mismatch in mismatches:
+                self.mismatch_type_counts[mismatch['type']] += 1
             
+            # Keep the entry until window expiry so late sources don't re-open it
+            if txn_id in self.first_seen:
+                self.verdicts[txn_id] = reconciliation_result['status']
+        
+        # Queue the database writes (the batch writer flushes them with the next batch)
+        try:
             # Update reconciliation status for all transactions with this txn_id
             reconciliation_status = 'MISMATCH' if mismatches else 'MATCHED'
-            db_service.update_reconciliation_status(txn_id, reconciliation_status, list(sources.keys()))
+            batch_writer.update_status(txn_id, reconciliation_status, list(sources.keys()))
             
             # Save mismatches to database
+            rows = []
             for mismatch in mismatches:
                 mismatch_data = {
                     'txn_id': txn_id,
@@ -136,173 +475,388 @@ class ReconciliationEngine:
                         except:
                             pass
                 
-                db_service.save_mismatch(mismatch_data)
-                
+                rows.append(mismatch_data)
+            
+            if rows:
+                batch_writer.save_mismatches(rows)
+        
         except Exception as e:
             logger.warning(f"Failed to update database: {e}")
         
-        # Clean up Redis in-flight transactions
-        if redis_service.is_connected():
-            for source in sources.keys():
-                redis_service.remove_inflight_transaction(txn_id, source)
-        
-        # Remove from pending (transaction is now reconciled)
-        if len(sources) >= 2:  # Keep it if we're still waiting for more sources
-            pass  # Keep for now, in real system you'd have timeout logic
-        
         logger.info(f"Reconciliation complete for {txn_id}: {reconciliation_result['status']}")
     
     def _detect_mismatches(self, txn_id: str, sources: Dict[str, dict]) -> List[dict]:
-        """Detect mismatches between transaction sources"""
-        mismatches = []
-        source_list = list(sources.keys())
-        
-        # Compare each pair of sources
-        for i in range(len(source_list)):
-            for j in range(i + 1, len(source_list)):
-                source1, source2 = source_list[i], source_list[j]
-                txn1, txn2 = sources[source1], sources[source2]
-                
-                # Check amount mismatch
-                amount1 = float(txn1.get('amount', 0))
-                amount2 = float(txn2.get('amount', 0))
-                if abs(amount1 - amount2) > self.amount_tolerance:
-                    mismatches.append({
-                        'type': 'AMOUNT_MISMATCH',
-                        'severity': 'HIGH',
-                        'details': f"Amount differs: {source1}=₹{amount1}, {source2}=₹{amount2}",
-                        'sources': [source1, source2],
-                        'values': {source1: amount1, source2: amount2}
-                    })
-                
-                # Check status mismatch
-                status1 = txn1.get('status', '').upper()
-                status2 = txn2.get('status', '').upper()
-                if status1 != status2:
-                    mismatches.append({
-                        'type': 'STATUS_MISMATCH',
-                        'severity': 'MEDIUM',
-                        'details': f"Status differs: {source1}={status1}, {source2}={status2}",
-                        'sources': [source1, source2],
-                        'values': {source1: status1, source2: status2}
-                    })
-                
-                # Check currency mismatch
-                currency1 = txn1.get('currency', 'INR')
-                currency2 = txn2.get('currency', 'INR')
-                if currency1 != currency2:
-                    mismatches.append({
-                        'type': 'CURRENCY_MISMATCH',
-                        'severity': 'HIGH',
-                        'details': f"Currency differs: {source1}={currency1}, {source2}={currency2}",
-                        'sources': [source1, source2],
-                        'values': {source1: currency1, source2: currency2}
-                    })
-                
-                # Check account ID mismatch
-                account1 = txn1.get('account_id')
-                account2 = txn2.get('account_id')
-                if account1 and account2 and account1 != account2:
-                    mismatches.append({
-                        'type': 'ACCOUNT_MISMATCH',
-                        'severity': 'HIGH',
-                        'details': f"Account ID differs: {source1}={account1}, {source2}={account2}",
-                        'sources': [source1, source2],
-                        'values': {source1: account1, source2: account2}
-                    })
-                
-                # Check timestamp mismatch (if both have timestamps)
-                if txn1.get('timestamp') and txn2.get('timestamp'):
-                    try:
-                        time1 = datetime.fromisoformat(txn1['timestamp'].replace('Z', '+00:00'))
-                        time2 = datetime.fromisoformat(txn2['timestamp'].replace('Z', '+00:00'))
-                        time_diff = abs((time1 - time2).total_seconds())
-                        
-                        if time_diff > self.time_tolerance:
-                            mismatches.append({
-                                'type': 'TIMESTAMP_MISMATCH',
-                                'severity': 'LOW',
-                                'details': f"Timestamp differs by {time_diff:.0f}s: {source1}={txn1['timestamp']}, {source2}={txn2['timestamp']}",
-                                'sources': [source1, source2],
-                                'values': {source1: txn1['timestamp'], source2: txn2['timestamp']}
-                            })
-                    except Exception as e:
-                        logger.warning(f"Error parsing timestamps: {e}")
-        
-        # Check for missing fields
-        all_fields = set()
-        for txn in sources.values():
-            all_fields.update(txn.keys())
-        
-        for field in ['amount', 'status', 'account_id']:
-            if field in all_fields:
-                missing_sources = []
-                for source, txn in sources.items():
-                    if field not in txn or txn[field] is None:
-                        missing_sources.append(source)
-                
-                if missing_sources:
-                    mismatches.append({
-                        'type': 'MISSING_FIELD',
-                        'severity': 'MEDIUM',
-                        'details': f"Field '{field}' missing in sources: {', '.join(missing_sources)}",
-                        'sources': missing_sources,
-                        'field': field
-                    })
-        
-        return mismatches
+        """Detect mismatches between transaction sources (scalar path of the compiled rules)"""
+        return self.rules.current().profile_for(sources).detect(sources, self.rule_stats)
     
     def get_pending_count(self) -> int:
         """Get count of transactions pending reconciliation"""
         with self.lock:
-            return len(self.pending_transactions)
+            return len(self.first_seen) - len(self.verdicts)
     
     def get_reconciled_count(self) -> int:
         """Get count of reconciled transactions"""
         with self.lock:
-            return len(self.reconciled_transactions)
+            return self.total_reconciled
     
     def get_mismatch_count(self) -> int:
         """Get count of detected mismatches"""
         with self.lock:
-            return len(self.detected_mismatches)
+            return sum(self.mismatch_type_counts.values())
     
     def get_recent_mismatches(self, limit: int = 20) -> List[dict]:
         """Get recent mismatches"""
         with self.lock:
-            return self.detected_mismatches[-limit:]
+            return list(self.detected_mismatches)[-limit:]
     
     def get_recent_reconciled(self, limit: int = 50) -> List[dict]:
         """Get recent reconciled transactions"""
         with self.lock:
-            return self.reconciled_transactions[-limit:]
+            return list(self.reconciled_transactions)[-limit:]
     
     def get_statistics(self) -> dict:
         """Get reconciliation statistics"""
         with self.lock:
-            total_reconciled = len(self.reconciled_transactions)
-            total_mismatches = len([r for r in self.reconciled_transactions if r['status'] == 'MISMATCH'])
+            total_reconciled = self.total_reconciled
+            total_mismatches = self.total_mismatched
             success_rate = ((total_reconciled - total_mismatches) / total_reconciled * 100) if total_reconciled > 0 else 100
             
-            # Count by mismatch type
-            mismatch_types = defaultdict(int)
-            for mismatch in self.detected_mismatches:
-                mismatch_types[mismatch['type']] += 1
-            
-            # Count by source
-            source_counts = defaultdict(int)
-            for txn_id, sources in self.pending_transactions.items():
-                for source in sources.keys():
-                    source_counts[source] += 1
-            
             return {
                 'total_reconciled': total_reconciled,
                 'total_mismatches': total_mismatches,
                 'success_rate': round(success_rate, 1),
-                'pending_reconciliation': len(self.pending_transactions),
-                'mismatch_types': dict(mismatch_types),
-                'source_counts': dict(source_counts)
+                'pending_reconciliation': len(self.first_seen) - len(self.verdicts),
+                'pending_store': self.pending_store,
+                'mismatch_types': dict(self.mismatch_type_counts),
+                'source_counts': {source: count for source, count in self.source_counts.items() if count},
+                'expired_missing_source': self.expired_count,
+                'evicted_at_capacity': self.evicted_count,
+                'late_sources': self.late_count,
+                'reclaimed_claims': self.reclaimed_count,
+                'rule_stats': self.rule_stats.snapshot(),
+                'watermark': datetime.fromtimestamp(self.watermark).isoformat()
             }
 
+# ==================== SHARDED ENGINE ====================
+
+# Shard inbox message kinds (_SNAPSHOT only wakes the worker: requests go through its control queue)
+_TXN = 'txn'
+_SNAPSHOT = 'snapshot'
+_STOP = 'stop'
+
+# How often an idle shard advances its watermark (seconds)
+IDLE_TICK = 1.0
+
+# Longest wait for the shard processes to answer a statistics request; the rest are skipped
+SNAPSHOT_TIMEOUT = float(os.getenv("RECONCILIATION_SNAPSHOT_TIMEOUT", 2.0))
+
+# Most transactions a shard worker hands to its engine in one micro-batch
+MICRO_BATCH_SIZE = int(os.getenv("RECONCILIATION_BATCH_SIZE", 500))
+
+def run_shard_worker(inbox, outbox=None, engine: Optional[ReconciliationEngine] = None,
+                     engine_options: Optional[dict] = None, control=None):
+    """Drain one shard's inbox into its engine.
+    
+    Module-level so it can be the target of a threading.Thread (sharing the
+    engine with the caller) or a multiprocessing.Process (building its own
+    engine in the child and answering snapshot requests through outbox).
+    Snapshot requests arrive on control and are answered between
+    micro-batches, not behind the transactions queued in the inbox.
+    """
+    if engine is None:
+        engine = ReconciliationEngine(**(engine_options or {}))
+    
+    def answer_snapshots(wait: float = 0):
+        while control is not None:
+            try:
+                request_id, limit = control.get(timeout=wait) if wait else control.get_nowait()
+            except queue.Empty:
+                return
+            wait = 0
+            outbox.put((request_id, {
+                'statistics': engine.get_statistics(),
+                'recent_reconciled': engine.get_recent_reconciled(limit) if limit else [],
+                'recent_mismatches': engine.get_recent_mismatches(limit) if limit else []
+            }))
+    
+    while True:
+        answer_snapshots()
+        try:
+            kind, payload = inbox.get(timeout=IDLE_TICK)
+        except queue.Empty:
+            engine.advance_idle()
+            continue
+        
+        # Drain whatever else is already queued into one micro-batch
+        batch = []
+        while kind == _TXN:
+            batch.append(payload)
+            if len(batch) >= MICRO_BATCH_SIZE:
+                kind = None
+                break
+            try:
+                kind, payload = inbox.get_nowait()
+            except queue.Empty:
+                kind = None
+        
+        if batch:
+            try:
+                engine.add_transactions(batch)
+            except Exception as e:
+                logger.error(f"Shard worker failed on a batch of {len(batch)} transactions: {e}")
+        
+        if kind == _STOP:
+            if outbox is not None:
+                batch_writer.stop()  # own writer in a shard process: flush its verdicts before exit
+            break
+        
+        if kind == _SNAPSHOT:
+            # The request may still be in flight on the control queue's feeder thread
+            answer_snapshots(wait=0.05)
+
+class ShardedReconciliationEngine:
+    """Partitions pending transactions by txn_id across independent shards.
+    
+    Every source of a txn_id lands on the same shard, so shards never need
+    to coordinate; each one has its own lock, inbox and worker. Workers are
+    threads by default, or separate processes with use_processes=True.
+    
+    Memory is bounded twice: each shard caps its pending buffer by evicting
+    its oldest txn, so a worker never stalls on a full buffer, and each
+    inbox holds at most queue_size messages (queue.Queue, or
+    multiprocessing.Queue whose maxsize is a shared semaphore), so a
+    worker that falls behind blocks the consumers until it catches up.
+    
+    In process mode statistics are requested from every worker; one that
+    does not answer within SNAPSHOT_TIMEOUT is left out and listed in
+    unresponsive_shards. Requests are serialised, and answers to an
+    earlier, timed-out request are discarded.
+    """
+    
+    def __init__(self, num_shards: int = DEFAULT_SHARD_COUNT, use_processes: bool = False,
+                 queue_size: int = 10000, **engine_options):
+        self.num_shards = max(1, num_shards)
+        self.use_processes = use_processes
+        self.queue_size = queue_size
+        self.engine_options = engine_options
+        
+        # In thread mode the engines live here; in process mode they live in the workers
+        self.shards = [] if use_processes else [ReconciliationEngine(**engine_options) for _ in range(self.num_shards)]
+        self.inboxes = []
+        self.outboxes = []
+        self.controls = []
+        self.workers = []
+        self.running = False
+        self.unresponsive_shards = []
+        self._start_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_requests = 0
+    
+    def start(self):
+        """Start one worker per shard"""
+        with self._start_lock:
+            if self.running:
+                return
+            
+            for index in range(self.num_shards):
+                if self.use_processes:
+                    inbox = multiprocessing.Queue(self.queue_size)
+                    outbox = multiprocessing.Queue()
+                    control = multiprocessing.Queue()
+                    worker = multiprocessing.Process(
+                        target=run_shard_worker, args=(inbox, outbox, None, self.engine_options, control),
+                        name=f"reconciliation-shard-{index}", daemon=True
+                    )
+                else:
+                    inbox = queue.Queue(self.queue_size)
+                    outbox = None
+                    control = None
+                    worker = threading.Thread(
+                        target=run_shard_worker, args=(inbox, None, self.shards[index]),
+                        name=f"reconciliation-shard-{index}", daemon=True
+                    )
+                
+                worker.start()
+                self.inboxes.append(inbox)
+                self.outboxes.append(outbox)
+                self.controls.append(control)
+                self.workers.append(worker)
+            
+            self.running = True
+            logger.info(f"Started {self.num_shards} reconciliation shards "
+                        f"({'processes' if self.use_processes else 'threads'})")
+    
+    def stop(self, timeout: float = 5):
+        """Stop all shard workers after their inboxes drain"""
+        with self._start_lock:
+            if not self.running:
+                return
+            
+            for inbox in self.inboxes:
+                inbox.put((_STOP, None))
+            for worker in self.workers:
+                worker.join(timeout=timeout)
+            if not self.use_processes:
+                batch_writer.flush(timeout)
+            
+            self.inboxes, self.outboxes, self.controls, self.workers = [], [], [], []
+            self.running = False
+    
+    def add_transaction(self, transaction: dict, shard: Optional[int] = None):
+        """Route a transaction to its shard, blocking while that shard's inbox is full.
+        
+        shard overrides the txn_id hash (e.g. Kafka partition-aware routing);
+        the caller must then send every source of a txn_id to the same shard.
+        """
+        txn_id = transaction.get('txn_id')
+        if not txn_id or not transaction.get('source'):
+            logger.warning(f"Invalid transaction: missing txn_id or source")
+            return
+        
+        if not self.running:
+            self.start()
+        
+        index = shard_for(txn_id, self.num_shards) if shard is None else shard % self.num_shards
+        
+        # Backpressure is the bounded inbox (same in thread and process mode). The pending
+        # cap is enforced by the worker evicting its oldest txn, so waiting for it here
+        # would only stall the consumer thread that feeds every shard
+        self.inboxes[index].put((_TXN, transaction))
+    
+    def _snapshots(self, limit: int = 50) -> List[dict]:
+        """Collect statistics and recent results from every shard"""
+        if not self.use_processes:
+            return [
+                {
+                    'statistics': shard.get_statistics(),
+                    'recent_reconciled': shard.get_recent_reconciled(limit) if limit else [],
+                    'recent_mismatches': shard.get_recent_mismatches(limit) if limit else []
+                }
+                for shard in self.shards
+            ]
+        
+        if not self.running:
+            return []
+        
+        with self._snapshot_lock:
+            self._snapshot_requests += 1
+            request_id = self._snapshot_requests
+            asked = []
+            for index, worker in enumerate(self.workers):
+                if not worker.is_alive():
+                    continue
+                self.controls[index].put((request_id, limit))
+                try:
+                    self.inboxes[index].put_nowait((_SNAPSHOT, None))  # wake it if idle
+                except queue.Full:
+                    pass  # busy: it checks the control queue after its current micro-batch
+                asked.append(index)
+            
+            deadline = time.monotonic() + SNAPSHOT_TIMEOUT
+            snapshots = []
+            answered = set()
+            for index in asked:
+                while True:
+                    try:
+                        answer_id, snapshot = self.outboxes[index].get(timeout=max(deadline - time.monotonic(), 0.001))
+                    except queue.Empty:
+                        break
+                    if answer_id == request_id:
+                        snapshots.append(snapshot)
+                        answered.add(index)
+                        break
+            
+            self.unresponsive_shards = [index for index in range(len(self.workers)) if index not in answered]
+            if self.unresponsive_shards:
+                logger.warning(f"Shards {self.unresponsive_shards} did not answer within {SNAPSHOT_TIMEOUT:.1f}s; "
+                               f"statistics exclude them")
+            return snapshots
+    
+    @staticmethod
+    def _latest(items: List[dict], limit: int) -> List[dict]:
+        return sorted(items, key=lambda item: item['timestamp'])[-limit:]
+    
+    def get_pending_count(self) -> int:
+        """Get count of transactions pending reconciliation"""
+        return self.get_statistics()['pending_reconciliation']
+    
+    def get_reconciled_count(self) -> int:
+        """Get count of reconciled transactions"""
+        return self.get_statistics()['total_reconciled']
+    
+    def get_mismatch_count(self) -> int:
+        """Get count of detected mismatches"""
+        return sum(self.get_statistics()['mismatch_types'].values())
+    
+    def get_recent_mismatches(self, limit: int = 20) -> List[dict]:
+        """Get recent mismatches across all shards"""
+        items = [m for snap in self._snapshots(limit) for m in snap['recent_mismatches']]
+        return self._latest(items, limit)
+    
+    def get_recent_reconciled(self, limit: int = 50) -> List[dict]:
+        """Get recent reconciled transactions across all shards"""
+        items = [r for snap in self._snapshots(limit) for r in snap['recent_reconciled']]
+        return self._latest(items, limit)
+    
+    @property
+    def detected_mismatches(self) -> List[dict]:
+        """Recent mismatches across all shards (compatibility with the single engine)"""
+        return self.get_recent_mismatches(100)
+    
+    def get_statistics(self) -> dict:
+        """Get reconciliation statistics summed over all shards"""
+        total_reconciled = 0
+        total_mismatches = 0
+        pending = 0
+        expired = 0
+        evicted = 0
+        late = 0
+        reclaimed = 0
+        mismatch_types = defaultdict(int)
+        source_counts = defaultdict(int)
+        rule_stats = []
+        
+        for snap in self._snapshots(0):
+            stats = snap['statistics']
+            total_reconciled += stats['total_reconciled']
+            total_mismatches += stats['total_mismatches']
+            pending += stats['pending_reconciliation']
+            expired += stats['expired_missing_source']
+            evicted += stats['evicted_at_capacity']
+            late += stats['late_sources']
+            reclaimed += stats['reclaimed_claims']
+            rule_stats.append(stats['rule_stats'])
+            for mtype, count in stats['mismatch_types'].items():
+                mismatch_types[mtype] += count
+            for source, count in stats['source_counts'].items():
+                source_counts[source] += count
+        
+        success_rate = ((total_reconciled - total_mismatches) / total_reconciled * 100) if total_reconciled > 0 else 100
+        
+        # Shared pending txns are counted once, from Redis (plus any a shard matched in memory)
+        pending_store = self.engine_options.get('pending_store', DEFAULT_PENDING_STORE)
+        if pending_store == 'redis' and redis_service.is_connected():
+            pending += redis_service.count_pending()
+            for source, count in redis_service.count_inflight(KNOWN_SOURCES).items():
+                source_counts[source] += count
+        
+        return {
+            'total_reconciled': total_reconciled,
+            'total_mismatches': total_mismatches,
+            'success_rate': round(success_rate, 1),
+            'pending_reconciliation': pending,
+            'pending_store': pending_store,
+            'mismatch_types': dict(mismatch_types),
+            'source_counts': {source: count for source, count in source_counts.items() if count},
+            'expired_missing_source': expired,
+            'evicted_at_capacity': evicted,
+            'late_sources': late,
+            'reclaimed_claims': reclaimed,
+            'rule_stats': merge_rule_stats(rule_stats),
+            'rules': (self.engine_options.get('rules') or rule_registry).info(),
+            'shards': self.num_shards,
+            'unresponsive_shards': list(self.unresponsive_shards)
+        }
+
 # Global reconciliation engine instance
-reconciliation_engine = ReconciliationEngine()
\ No newline at end of file
+reconciliation_engine = ShardedReconciliationEngine()
\ No newline at end of file
@@ -0,0 +1,539 @@
+"""
+Declarative reconciliation rules
+Loads the rule set (JSON or YAML), compiles it once into flat lists of comparator
+closures per channel / amount band, and hot-reloads it when the file changes
+"""
+import os
+import json
+import time
+import bisect
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import yaml
+except ImportError:  # YAML rule files need PyYAML; JSON works without it
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+# Optional rule file; the built-in DEFAULT_RULES apply when it is unset or invalid
+RULES_FILE = os.getenv("RECONCILIATION_RULES_FILE")
+# How often (seconds) the rule file's mtime is checked for changes
+RULES_RELOAD_INTERVAL = float(os.getenv("RECONCILIATION_RULES_RELOAD_SECONDS", 5))
+
+SEVERITIES = ('HIGH', 'MEDIUM', 'LOW')
+
+# The checks the engine has always run. Overrides patch rules by name.
+DEFAULT_RULES = {
+    'version': 1,
+    'pair_rules': [
+        {'name': 'amount', 'type': 'AMOUNT_MISMATCH', 'severity': 'HIGH', 'field': 'amount',
+         'compare': 'numeric', 'tolerance': 0.01, 'default': 0, 'label': 'Amount', 'prefix': '₹'},
+        {'name': 'status', 'type': 'STATUS_MISMATCH', 'severity': 'MEDIUM', 'field': 'status',
+         'compare': 'equals', 'default': '', 'normalize': 'upper', 'label': 'Status'},
+        {'name': 'currency', 'type': 'CURRENCY_MISMATCH', 'severity': 'HIGH', 'field': 'currency',
+         'compare': 'equals', 'default': 'INR', 'label': 'Currency'},
+        {'name': 'account', 'type': 'ACCOUNT_MISMATCH', 'severity': 'HIGH', 'field': 'account_id',
+         'compare': 'equals_if_present', 'label': 'Account ID'},
+        {'name': 'timestamp', 'type': 'TIMESTAMP_MISMATCH', 'severity': 'LOW', 'field': 'timestamp',
+         'compare': 'time', 'tolerance': 300, 'label': 'Timestamp'}
+    ],
+    'missing_fields': {'fields': ['amount', 'status', 'account_id'], 'severity': 'MEDIUM'},
+    'missing_source': {'severity': 'HIGH'},
+    # e.g. {'name': 'atm-clock-drift', 'channel': 'ATM', 'rules': {'timestamp': {'tolerance': 900}}}
+    #      {'name': 'high-value', 'min_amount': 100000, 'rules': {'amount': {'tolerance': 0}}}
+    'overrides': []
+}
+
+# ==================== COMPARATORS ====================
+
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_EPOCH_AWARE = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Timestamp kinds: pairs are only compared when both sides have the same kind
+_TS_NONE, _TS_NAIVE, _TS_AWARE = 0, 1, 2
+
+def parse_timestamp(value) -> Tuple[int, int]:
+    """Return (kind, epoch microseconds) for a raw timestamp value; kind is _TS_NONE if unusable"""
+    if not value:
+        return _TS_NONE, 0
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except Exception as e:
+        logger.warning(f"Error parsing timestamps: {e}")
+        return _TS_NONE, 0
+    
+    if parsed.tzinfo is None:
+        return _TS_NAIVE, (parsed - _EPOCH_NAIVE) // _MICROSECOND
+    return _TS_AWARE, (parsed - _EPOCH_AWARE) // _MICROSECOND
+
+def intern_codes(values: list, skip_falsy: bool = False) -> np.ndarray:
+    """Map values to integer codes; equal values share a code, falsy ones get -1 if skip_falsy"""
+    ids = {}
+    if skip_falsy:
+        return np.array([ids.setdefault(value, len(ids)) if value else -1 for value in values], dtype=np.int64)
+    return np.array([ids.setdefault(value, len(ids)) for value in values], dtype=np.int64)
+
+class CompiledRule:
+    """One pairwise check, specialised for its field, tolerance and severity.
+    
+    check(source1, txn1, source2, txn2) is the scalar comparator closure.
+    column(txns) / mask(arrays, left, right) are its columnar counterpart,
+    used by BatchMismatchDetector; mismatch() builds the result dict for both.
+    """
+    
+    __slots__ = ('name', 'type', 'severity', 'check', 'column', 'mask', 'mismatch')
+    
+    def __init__(self, name: str, mtype: str, severity: str, check: Callable,
+                 column: Callable, mask: Callable, mismatch: Callable):
+        self.name = name
+        self.type = mtype
+        self.severity = severity
+        self.check = check
+        self.column = column
+        self.mask = mask
+        self.mismatch = mismatch
+
+def _compile_rule(spec: dict) -> CompiledRule:
+    """Build the comparator closures for one resolved rule spec"""
+    name = spec['name']
+    mtype = spec['type']
+    severity = spec['severity']
+    field = spec['field']
+    compare = spec['compare']
+    label = spec.get('label', field.replace('_', ' ').title())
+    prefix = spec.get('prefix', '')
+    
+    if severity not in SEVERITIES:
+        raise ValueError(f"Rule '{name}': unknown severity {severity!r}")
+    
+    def mismatch(source1, source2, value1, value2, extra=None):
+        if compare == 'time':
+            details = f"{label} differs by {extra:.0f}s: {source1}={value1}, {source2}={value2}"
+        else:
+            details = f"{label} differs: {source1}={prefix}{value1}, {source2}={prefix}{value2}"
+        return {
+            'type': mtype,
+            'severity': severity,
+            'details': details,
+            'sources': [source1, source2],
+            'values': {source1: value1, source2: value2}
+        }
+    
+    if compare == 'numeric':
+        tolerance = float(spec.get('tolerance', 0))
+        default = spec.get('default', 0)
+        
+        def check(source1, txn1, source2, txn2):
+            value1 = float(txn1.get(field, default))
+            value2 = float(txn2.get(field, default))
+            if abs(value1 - value2) > tolerance:
+                return mismatch(source1, source2, value1, value2)
+        
+        def column(txns):
+            values = [float(txn.get(field, default)) for txn in txns]
+            return values, (np.array(values, dtype=np.float64),)
+        
+        def mask(arrays, left, right):
+            values, = arrays
+            return np.abs(values[left] - values[right]) > tolerance, None
+    
+    elif compare in ('equals', 'equals_if_present'):
+        default = spec.get('default')
+        upper = spec.get('normalize') == 'upper'
+        if_present = compare == 'equals_if_present'
+        
+        def check(source1, txn1, source2, txn2):
+            value1 = txn1.get(field, default)
+            value2 = txn2.get(field, default)
+            if upper:
+                value1, value2 = value1.upper(), value2.upper()
+            if if_present and not (value1 and value2):
+                return None
+            if value1 != value2:
+                return mismatch(source1, source2, value1, value2)
+        
+        def column(txns):
+            if upper:
+                values = [txn.get(field, default).upper() for txn in txns]
+            else:
+                values = [txn.get(field, default) for txn in txns]
+            return values, (intern_codes(values, skip_falsy=if_present),)
+        
+        def mask(arrays, left, right):
+            codes, = arrays
+            differs = codes[left] != codes[right]
+            if if_present:
+                differs &= (codes[left] >= 0) & (codes[right] >= 0)
+            return differs, None
+    
+    elif compare == 'time':
+        tolerance = float(spec.get('tolerance', 0))
+        
+        def check(source1, txn1, source2, txn2):
+            value1 = txn1.get(field)
+            value2 = txn2.get(field)
+            if not (value1 and value2):
+                return None
+            try:
+                time1 = datetime.fromisoformat(value1.replace('Z', '+00:00'))
+                time2 = datetime.fromisoformat(value2.replace('Z', '+00:00'))
+                time_diff = abs((time1 - time2).total_seconds())
+            except Exception as e:
+                logger.warning(f"Error parsing timestamps: {e}")
+                return None
+            if time_diff > tolerance:
+                return mismatch(source1, source2, value1, value2, time_diff)
+        
+        def column(txns):
+            values = [txn.get(field) for txn in txns]
+            # Sources usually share the producer's timestamp, so parse each distinct value once
+            parsed = {value: parse_timestamp(value) for value in set(values)}
+            return values, (
+                np.array([parsed[value][0] for value in values], dtype=np.int8),
+                np.array([parsed[value][1] for value in values], dtype=np.int64)
+            )
+        
+        def mask(arrays, left, right):
+            kinds, micros = arrays
+            # Naive minus aware raises in the scalar comparator, which skips the pair
+            comparable = (kinds[left] != _TS_NONE) & (kinds[left] == kinds[right])
+            time_diff = np.abs(micros[left] - micros[right]) / 1e6
+            return comparable & (time_diff > tolerance), time_diff
+    
+    else:
+        raise ValueError(f"Rule '{name}': unknown compare {compare!r}")
+    
+    return CompiledRule(name, mtype, severity, check, column, mask, mismatch)
+
+def source_pairs(count: int, _cache: Dict[int, List[Tuple[int, int]]] = {}) -> List[Tuple[int, int]]:
+    """Source index pairs (i < j) compared within a group of count sources"""
+    pairs = _cache.get(count)
+    if pairs is None:
+        pairs = _cache[count] = [(i, j) for i in range(count) for j in range(i + 1, count)]
+    return pairs
+
+class RuleProfile:
+    """The fully resolved rules for one (channel, amount band) combination"""
+    
+    def __init__(self, key: str, rules: List[CompiledRule], required_fields: List[str],
+                 missing_field_severity: str, missing_source_severity: str):
+        self.key = key
+        self.rules = rules
+        self.rule_names = [rule.name for rule in rules]
+        self.required_fields = required_fields
+        self.missing_field_severity = missing_field_severity
+        self.missing_source_severity = missing_source_severity
+    
+    def detect(self, sources: Dict[str, dict], stats: Optional['RuleStats'] = None) -> List[dict]:
+        """Run every comparator over every source pair (the scalar reference path)"""
+        names = list(sources.keys())
+        txns = list(sources.values())
+        pairs = [(names[i], txns[i], names[j], txns[j]) for i, j in source_pairs(len(names))]
+        found = [[] for _ in pairs]  # per pair, in rule order
+        hits = []
+        timings = []
+        
+        # Rule-major, so each rule is timed once per group rather than once per pair
+        for rule in self.rules:
+            check = rule.check
+            rule_hits = 0
+            start = time.perf_counter()
+            for index, pair in enumerate(pairs):
+                mismatch = check(*pair)
+                if mismatch is not None:
+                    found[index].append(mismatch)
+                    rule_hits += 1
+            timings.append(time.perf_counter() - start)
+            hits.append(rule_hits)
+        
+        if stats is not None:
+            stats.record(self.rule_names, len(pairs), hits, timings)
+        
+        mismatches = found[0] if len(found) == 1 else [mismatch for pair_found in found for mismatch in pair_found]
+        mismatches.extend(self.missing_fields(sources))
+        return mismatches
+    
+    def missing_fields(self, sources: Dict[str, dict]) -> List[dict]:
+        """Flag required fields that some sources carry and others don't"""
+        mismatches = []
+        all_fields = set()
+        for txn in sources.values():
+            all_fields.update(txn.keys())
+        
+        for field in self.required_fields:
+            if field in all_fields:
+                missing_sources = []
+                for source, txn in sources.items():
+                    if field not in txn or txn[field] is None:
+                        missing_sources.append(source)
+                
+                if missing_sources:
+                    mismatches.append({
+                        'type': 'MISSING_FIELD',
+                        'severity': self.missing_field_severity,
+                        'details': f"Field '{field}' missing in sources: {', '.join(missing_sources)}",
+                        'sources': missing_sources,
+                        'field': field
+                    })
+        
+        return mismatches
+
+# ==================== RULE SET ====================
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def normalize_channel(value) -> Optional[str]:
+    """Channel as rules and source profiles match it: upper-cased, None when missing"""
+    if not value:
+        return None
+    return str(value).strip().upper() or None
+
+def _channels(override: dict) -> List[str]:
+    return [normalize_channel(channel) for channel in _as_list(override.get('channel'))]
+
+class RuleSet:
+    """A compiled rule definition: one RuleProfile per distinct (channel, amount band).
+    
+    Every combination is resolved and compiled up front, so picking the rules
+    for a transaction is a dict lookup plus, when amount bands exist, a bisect.
+    """
+    
+    def __init__(self, definition: dict, origin: str = 'defaults'):
+        self.definition = definition
+        self.origin = origin
+        self.version = definition.get('version')
+        
+        base = {}
+        for spec in definition.get('pair_rules', []):
+            if 'name' not in spec:
+                raise ValueError(f"Rule without a name: {spec}")
+            base[spec['name']] = dict(spec)
+        
+        overrides = definition.get('overrides', [])
+        for override in overrides:
+            unknown = set(override.get('rules', {})) - set(base)
+            if unknown:
+                raise ValueError(f"Override '{override.get('name')}' patches unknown rules: {sorted(unknown)}")
+        
+        missing_fields = definition.get('missing_fields', {})
+        self.required_fields = list(missing_fields.get('fields', []))
+        missing_field_severity = missing_fields.get('severity', 'MEDIUM')
+        missing_source_severity = definition.get('missing_source', {}).get('severity', 'HIGH')
+        
+        # Channels named by any override get their own profiles; all others share None
+        self.channels = {channel for override in overrides for channel in _channels(override)}
+        self.bounds = sorted({float(override[edge]) for override in overrides
+                              for edge in ('min_amount', 'max_amount') if override.get(edge) is not None})
+        
+        compiled = {}
+        
+        def profile(key: str, resolved: Dict[str, dict]) -> RuleProfile:
+            # Combinations that resolve to identical rules share one profile
+            signature = json.dumps(resolved, sort_keys=True, default=str)
+            if signature not in compiled:
+                compiled[signature] = RuleProfile(
+                    key,
+                    [_compile_rule(spec) for spec in resolved.values() if spec.get('enabled', True)],
+                    self.required_fields, missing_field_severity, missing_source_severity
+                )
+            return compiled[signature]
+        
+        self.base = profile('base', base)
+        self.profiles: Dict[Tuple[Optional[str], int], RuleProfile] = {}
+        for channel in [None] + sorted(self.channels):
+            for band in range(len(self.bounds) + 1):
+                # Override membership is constant within a band, so test its lower edge
+                low = self.bounds[band - 1] if band else float('-inf')
+                applied = [override for override in overrides if self._applies(override, channel, low)]
+                
+                resolved = {name: dict(spec) for name, spec in base.items()}
+                for override in applied:
+                    for name, patch in override.get('rules', {}).items():
+                        resolved[name].update(patch)
+                
+                key = '+'.join(override.get('name', '?') for override in applied) or 'base'
+                self.profiles[(channel, band)] = profile(key, resolved)
+        
+        self._single = len(compiled) == 1
+        
+        # Severity per mismatch type, from the rules that apply when no override does
+        self.severities = {rule.type: rule.severity for rule in self.base.rules}
+        self.severities['MISSING_FIELD'] = missing_field_severity
+        self.severities['MISSING_SOURCE'] = missing_source_severity
+    
+    @staticmethod
+    def _applies(override: dict, channel: Optional[str], amount: float) -> bool:
+        channels = _channels(override)
+        if channels and channel not in channels:
+            return False
+        if override.get('min_amount') is not None and not amount >= float(override['min_amount']):
+            return False
+        if override.get('max_amount') is not None and not amount < float(override['max_amount']):
+            return False
+        return True
+    
+    def profile_for(self, sources: Dict[str, dict]) -> RuleProfile:
+        """Pick the compiled rules for a txn from its channel and amount.
+        
+        Bands use the largest amount any source reports, so a txn that one
+        source claims is high value gets the high-value rules.
+        """
+        if self._single:
+            return self.base
+        
+        channel = None
+        band = 0
+        if self.channels:
+            for txn in sources.values():
+                channel = normalize_channel(txn.get('channel'))
+                break
+            if channel not in self.channels:
+                channel = None
+        if self.bounds:
+            amount = float('-inf')
+            for txn in sources.values():
+                try:
+                    amount = max(amount, float(txn.get('amount')))
+                except (TypeError, ValueError):
+                    continue
+            band = bisect.bisect_right(self.bounds, amount) if amount != float('-inf') else 0
+        return self.profiles[(channel, band)]
+    
+    def severity_for(self, mismatch_type: str) -> str:
+        """Default severity of a mismatch type"""
+        return self.severities.get(mismatch_type, 'LOW')
+
+def load_rule_file(path: str) -> dict:
+    """Read a rule definition from a .json or .yaml/.yml file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ValueError("PyYAML is required for YAML rule files")
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+class RuleRegistry:
+    """Holds the current RuleSet and swaps in a recompiled one when the file changes.
+    
+    Engines call current() once per batch; at most every check_interval
+    seconds that stats the rule file. A file that fails to load or compile
+    is logged and the previous rules stay active.
+    """
+    
+    def __init__(self, path: Optional[str] = RULES_FILE, check_interval: float = RULES_RELOAD_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self.rules = RuleSet(DEFAULT_RULES)
+        self.seen_mtime = None  # mtime of the last file attempted, good or bad
+        self.next_check = 0.0
+        self.reload_count = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        if path:
+            self.reload()
+    
+    def current(self) -> RuleSet:
+        """The active rule set, reloading it first if the file changed"""
+        if self.path and time.monotonic() >= self.next_check:
+            self._reload_if_changed()
+        return self.rules
+    
+    def _reload_if_changed(self):
+        with self._lock:
+            if time.monotonic() < self.next_check:
+                return
+            self.next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return
+            if mtime == self.seen_mtime:
+                return
+        self.reload()
+    
+    def reload(self) -> bool:
+        """Load and compile the rule file now; True if the new rules are active"""
+        with self._lock:
+            try:
+                self.seen_mtime = os.path.getmtime(self.path)
+                rules = RuleSet(load_rule_file(self.path), origin=self.path)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"❌ Failed to load reconciliation rules from {self.path}: {e}")
+                return False
+            
+            self.rules = rules
+            self.reload_count += 1
+            self.last_error = None
+            logger.info(f"✅ Loaded reconciliation rules from {self.path} "
+                        f"(version {rules.version}, {len(set(map(id, rules.profiles.values())))} profiles)")
+            return True
+    
+    def severity_for(self, mismatch_type: str) -> str:
+        return self.current().severity_for(mismatch_type)
+    
+    def info(self) -> dict:
+        """Which rules are active and where they came from"""
+        rules = self.current()
+        return {
+            'origin': rules.origin,
+            'version': rules.version,
+            'profiles': sorted({profile.key for profile in rules.profiles.values()}),
+            'rules': [rule.name for rule in rules.base.rules],
+            'reloads': self.reload_count,
+            'last_error': self.last_error
+        }
+
+class RuleStats:
+    """Per-rule evaluation counters and timings (one per engine, summed across shards)"""
+    
+    def __init__(self):
+        self.counters: Dict[str, List[float]] = {}  # {rule: [evaluations, hits, seconds]}
+        self._lock = threading.Lock()
+    
+    def record(self, names: List[str], evaluations: int, hits: List[int], seconds: List[float]):
+        """Add one pass of several rules, each evaluated over the same number of pairs"""
+        with self._lock:
+            for name, rule_hits, rule_seconds in zip(names, hits, seconds):
+                counter = self.counters.get(name)
+                if counter is None:
+                    counter = self.counters[name] = [0, 0, 0.0]
+                counter[0] += evaluations
+                counter[1] += rule_hits
+                counter[2] += rule_seconds
+    
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: summarize_rule_counter(*counter) for name, counter in self.counters.items()}
+
+def summarize_rule_counter(evaluations: int, hits: int, seconds: float) -> dict:
+    return {
+        'evaluations': evaluations,
+        'hits': hits,
+        'total_ms': round(seconds * 1000, 3),
+        'avg_us': round(seconds / evaluations * 1e6, 3) if evaluations else 0.0
+    }
+
+def merge_rule_stats(snapshots: List[Dict[str, dict]]) -> Dict[str, dict]:
+    """Sum RuleStats snapshots from several shards"""
+    totals: Dict[str, List[float]] = {}
+    for snapshot in snapshots:
+        for name, entry in snapshot.items():
+            counter = totals.setdefault(name, [0, 0, 0.0])
+            counter[0] += entry['evaluations']
+            counter[1] += entry['hits']
+            counter[2] += entry['total_ms'] / 1000
+    return {name: summarize_rule_counter(*counter) for name, counter in totals.items()}
+
+# Global rule registry instance
+rule_registry = RuleRegistry()
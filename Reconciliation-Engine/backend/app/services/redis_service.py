@@ -2,12 +2,233 @@
 Redis service for banking-grade transaction reconciliation
 Handles caching, throttling, and temporary transaction storage
 """
+import os
 import json
+import time
+import uuid
+import socket
+import threading
 import redis
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterable, Tuple
 from collections import defaultdict
-import hashlib
+
+# Redis availability is trusted for this many seconds after the last successful command
+# (one PING per interval at most), and skipped for REDIS_RETRY_INTERVAL after a failure
+REDIS_HEALTH_INTERVAL = float(os.getenv("REDIS_HEALTH_INTERVAL", 5))
+REDIS_RETRY_INTERVAL = float(os.getenv("REDIS_RETRY_INTERVAL", 5))
+
+# Take the reconciliation locks of a batch in one call: SET NX EX per key, returns the
+# (1-based) positions of the keys acquired
+ACQUIRE_LOCKS_SCRIPT = """
+local acquired = {}
+for i, key in ipairs(KEYS) do
+    if redis.call('SET', key, ARGV[1], 'NX', 'EX', ARGV[2]) then
+        acquired[#acquired + 1] = i
+    end
+end
+return acquired
+"""
+
+# Finish a batch in one call. KEYS: ARGV[2] lock keys, ARGV[3] in-flight keys to delete, then
+# one source index per member to remove; ARGV: lock token, lock count, in-flight key count,
+# then the txn_id of each index member. A lock is only deleted while it still holds our token
+# (after expiry another consumer may own it).
+FINISH_BATCH_SCRIPT = """
+local locks = tonumber(ARGV[2])
+local deleted = locks + tonumber(ARGV[3])
+local released = 0
+for i = 1, locks do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        released = released + redis.call('DEL', KEYS[i])
+    end
+end
+for i = locks + 1, deleted do
+    redis.call('DEL', KEYS[i])
+end
+for i = deleted + 1, #KEYS do
+    redis.call('ZREM', KEYS[i], ARGV[i - deleted + 3])
+end
+return released
+"""
+
+# Add a batch of sources to the shared pending store (one temp:{txn_id} hash per txn, one
+# field per source) and claim the txns they complete. KEYS: per entry its hash and its
+# source's in-flight index, then the expiry and claims sorted sets. ARGV: claim token, hash
+# TTL, arrival time, claim deadline, then 5 values per entry: txn_id, source, payload, event
+# time, comma-separated expected sources. Replies per entry {state, verdict or '', field,
+# value, ...}; the sources are only sent back to the claimer. A source reaching a claimed
+# txn before its verdict is listed in _late, for the verdict owner to stamp.
+ADD_PENDING_SCRIPT = """
+local expiry, claims = KEYS[#KEYS - 1], KEYS[#KEYS]
+local replies = {}
+for i = 1, (#KEYS - 2) / 2 do
+    local key, index = KEYS[2 * i - 1], KEYS[2 * i]
+    local base = 4 + (i - 1) * 5
+    local txn_id, source = ARGV[base + 1], ARGV[base + 2]
+    if redis.call('TYPE', key).ok == 'string' then
+        redis.call('DEL', key)  -- in-flight record written before hashes were used
+    end
+    local fresh = redis.call('EXISTS', key) == 0
+    redis.call('HSET', key, source, ARGV[base + 3])
+    redis.call('EXPIRE', key, ARGV[2])
+    if redis.call('HEXISTS', key, '_claimed') == 1 then
+        local verdict = redis.call('HGET', key, '_verdict')
+        if not verdict then
+            local late = redis.call('HGET', key, '_late')
+            redis.call('HSET', key, '_late', late and (late .. ',' .. source) or source)
+        end
+        local reply = {'late', verdict or ''}
+        for _, value in ipairs(redis.call('HGETALL', key)) do
+            reply[#reply + 1] = value
+        end
+        replies[i] = reply
+    else
+        if fresh then
+            redis.call('ZADD', expiry, 'NX', ARGV[base + 4], txn_id)
+        end
+        redis.call('ZADD', index, ARGV[3], txn_id)
+        local complete = true
+        for expected in string.gmatch(ARGV[base + 5], '[^,]+') do
+            if redis.call('HEXISTS', key, expected) == 0 then
+                complete = false
+                break
+            end
+        end
+        if complete then
+            redis.call('HSET', key, '_claimed', ARGV[1])
+            redis.call('ZREM', expiry, txn_id)
+            redis.call('ZADD', claims, ARGV[4], txn_id)
+            local reply = {'ready', ''}
+            for _, value in ipairs(redis.call('HGETALL', key)) do
+                reply[#reply + 1] = value
+            end
+            replies[i] = reply
+        else
+            replies[i] = {'pending', ''}
+        end
+    end
+end
+return replies
+"""
+
+# Claim candidate txns (read beforehand from the expiry and claims sets) that are still
+# eligible: pending with a first event older than the cutoff, or claimed without a verdict
+# past their claim deadline (the claimer died). KEYS: the candidates' hashes, then the expiry
+# and claims sorted sets. ARGV: cutoff, now, claim token, new claim deadline, then the
+# candidates' txn_ids. Replies {txn_id, 'expired' | 'reclaimed', {field, value, ...}}
+CLAIM_SCRIPT = """
+local expiry, claims = KEYS[#KEYS - 1], KEYS[#KEYS]
+local replies = {}
+for i = 1, #KEYS - 2 do
+    local key, txn_id = KEYS[i], ARGV[4 + i]
+    local first_seen = redis.call('ZSCORE', expiry, txn_id)
+    local deadline = redis.call('ZSCORE', claims, txn_id)
+    local kind = nil
+    if first_seen and tonumber(first_seen) < tonumber(ARGV[1]) then
+        redis.call('ZREM', expiry, txn_id)
+        if redis.call('EXISTS', key) == 1 and redis.call('HSETNX', key, '_claimed', ARGV[3]) == 1 then
+            kind = 'expired'
+        end
+    elseif deadline and tonumber(deadline) <= tonumber(ARGV[2]) then
+        if redis.call('EXISTS', key) == 1 and redis.call('HEXISTS', key, '_verdict') == 0 then
+            redis.call('HSET', key, '_claimed', ARGV[3])
+            kind = 'reclaimed'
+        else
+            redis.call('ZREM', claims, txn_id)
+        end
+    end
+    if kind then
+        redis.call('ZADD', claims, ARGV[4], txn_id)
+        replies[#replies + 1] = {txn_id, kind, redis.call('HGETALL', key)}
+    end
+end
+return replies
+"""
+
+# Record the verdicts of claimed txns. KEYS: per verdict its hash then the in-flight index of
+# each of its sources, then the claims sorted set. ARGV: per verdict txn_id, status and its
+# source count. Sets _verdict, ends the claim and returns the _late sources (or '') per verdict,
+# read in the same step so a late source is stamped by exactly one side
+RECORD_VERDICTS_SCRIPT = """
+local claims = KEYS[#KEYS]
+local replies = {}
+local k = 1
+for i = 1, #ARGV, 3 do
+    local key, txn_id = KEYS[k], ARGV[i]
+    redis.call('HSET', key, '_verdict', ARGV[i + 1])
+    replies[#replies + 1] = redis.call('HGET', key, '_late') or ''
+    redis.call('HDEL', key, '_late')
+    redis.call('ZREM', claims, txn_id)
+    for j = 1, tonumber(ARGV[i + 2]) do
+        redis.call('ZREM', KEYS[k + j], txn_id)
+    end
+    k = k + 1 + tonumber(ARGV[i + 2])
+end
+return replies
+"""
+
+class CircuitBreaker:
+    """Cached Redis availability, so callers don't PING before every command.
+    
+    The last verdict is reused for check_interval seconds while Redis is
+    up (any successful command refreshes it) and retry_interval seconds
+    after a connection failure; then a single caller re-checks while the
+    others keep the previous verdict.
+    """
+    
+    def __init__(self, check_interval: float = REDIS_HEALTH_INTERVAL, retry_interval: float = REDIS_RETRY_INTERVAL):
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self.lock:
+            self.available = False
+            self.checked_at = None
+            self.failures = 0      # consecutive
+            self.trips = 0         # available -> unavailable transitions
+            self.checks = 0
+            self.last_error = None
+    
+    def cached(self) -> Optional[bool]:
+        """The current verdict while it is fresh; None when the caller should check"""
+        with self.lock:
+            now = time.monotonic()
+            if self.checked_at is not None:
+                ttl = self.check_interval if self.available else self.retry_interval
+                if now - self.checked_at < ttl:
+                    return self.available
+                # Claim the re-check; concurrent callers see the old verdict until it lands
+                self.checked_at = now
+            self.checks += 1
+            return None
+    
+    def record_success(self):
+        with self.lock:
+            self.available = True
+            self.checked_at = time.monotonic()
+            self.failures = 0
+    
+    def record_failure(self, error: Exception):
+        with self.lock:
+            if self.available:
+                self.trips += 1
+            self.available = False
+            self.checked_at = time.monotonic()
+            self.failures += 1
+            self.last_error = str(error)
+    
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {
+                'state': 'closed' if self.available else 'open',
+                'consecutive_failures': self.failures,
+                'trips': self.trips,
+                'health_checks': self.checks,
+                'last_error': self.last_error
+            }
 
 class RedisService:
     def __init__(self, host='localhost', port=6379, db=0):
@@ -37,98 +258,318 @@ class RedisService:
             'transaction': 'txn:',
             'mismatch': 'mismatch:',
             'cache': 'cache:',
+            'generation': 'gen:',
             'lock': 'lock:',
             'throttle': 'throttle:',
             'stats': 'stats:',
             'temp': 'temp:',
             'rate_limit': 'rate:'
         }
+        
+        self.breaker = CircuitBreaker()
+        self.instance_id = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+        self.scripting = True  # cleared if the server refuses EVALSHA (pipelined fallbacks)
+        self._scripts = {}
+        self._cleanup_cursors = {}  # SCAN cursor per prefix, so maintenance resumes where it stopped
+        self._registered_sources = set()  # sources this process has added to the index registry
     
     def is_connected(self) -> bool:
-        """Check Redis connection health"""
+        """Check Redis connection health (cached: at most one PING per health interval)"""
+        verdict = self.breaker.cached()
+        if verdict is not None:
+            return verdict
         try:
             self.redis_client.ping()
+            self.breaker.record_success()
             return True
-        except:
+        except Exception as e:
+            self.breaker.record_failure(e)
             return False
     
+    def _record_error(self, error: Exception):
+        """Open the circuit on connection errors (command errors leave it closed)"""
+        if isinstance(error, (redis.ConnectionError, redis.TimeoutError)):
+            self.breaker.record_failure(error)
+    
+    @property
+    def lock_token(self) -> str:
+        """Value stored in the locks this process holds (per pid: shard workers may fork)"""
+        return f"{self.instance_id}:{os.getpid()}"
+    
+    def _run_script(self, source: str, keys: List[str], args: List) -> Any:
+        """EVALSHA a Lua script (loaded on first use) on the current client"""
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = self.redis_client.register_script(source)
+        return script(keys=keys, args=args, client=self.redis_client)
+    
+    def _scripting_refused(self, error: Exception) -> bool:
+        """Whether error means the server has no scripting (then use the pipelined fallbacks)"""
+        if isinstance(error, redis.ResponseError) and 'unknown command' in str(error).lower():
+            self.scripting = False
+            print(f"⚠️ Redis scripting unavailable ({error}); using pipelines")
+            return True
+        return False
+    
     # ==================== IN-FLIGHT TRANSACTION STORAGE ====================
     
     def store_inflight_transaction(self, txn_id: str, transaction_data: Dict) -> bool:
         """Store in-flight transaction temporarily for reconciliation"""
+        return self.store_inflight_transactions([{**transaction_data, 'txn_id': txn_id}])
+    
+    def store_inflight_transactions(self, transactions: List[Dict]) -> bool:
+        """Store a micro-batch of in-flight transactions in one pipelined round trip.
+        
+        Each txn is a hash (temp:{txn_id}) with one field per source, so
+        every source that arrived is kept. The stored records add
+        stored_at (the source's own status is kept); the caller's dicts
+        are not modified. Each source's index (a sorted set scored by
+        arrival time) gets the txn_ids, and its members older than the
+        in-flight TTL are trimmed by score in the same round trip.
+        """
+        if not transactions:
+            return True
         try:
-            key = f"{self.PREFIXES['temp']}{txn_id}"
-            
-            # Add metadata
-            transaction_data['stored_at'] = datetime.now().isoformat()
-            transaction_data['status'] = 'IN_FLIGHT'
-            
-            # Store with TTL
-            self.redis_client.setex(
-                key, 
-                self.CACHE_TTL['transaction_temp'],
-                json.dumps(transaction_data)
-            )
-            
-            # Add to source-specific set for quick lookups
-            source_key = f"{self.PREFIXES['temp']}source:{transaction_data['source']}"
-            self.redis_client.sadd(source_key, txn_id)
-            self.redis_client.expire(source_key, self.CACHE_TTL['transaction_temp'])
-            
+            ttl = self.CACHE_TTL['transaction_temp']
+            now = time.time()
+            stored_at = datetime.fromtimestamp(now).isoformat()
+            by_source = defaultdict(list)
+            pipe = self.redis_client.pipeline(transaction=False)
+            
+            for transaction in transactions:
+                key = f"{self.PREFIXES['temp']}{transaction['txn_id']}"
+                record = {**transaction, 'stored_at': stored_at}
+                pipe.hset(key, transaction['source'], json.dumps(record, default=str))
+                pipe.expire(key, ttl)
+                by_source[transaction['source']].append(transaction['txn_id'])
+            
+            for source, txn_ids in by_source.items():
+                index_key = self._inflight_index_key(source)
+                pipe.zadd(index_key, dict.fromkeys(txn_ids, now))
+                pipe.zremrangebyscore(index_key, '-inf', f"({now - ttl}")
+            new_sources = set(by_source) - self._registered_sources
+            if new_sources:
+                pipe.sadd(self.inflight_sources_key, *new_sources)
+            
+            pipe.execute()
+            self._registered_sources.update(new_sources)
+            self.breaker.record_success()
             return True
-            
+        
         except Exception as e:
-            print(f"Error storing in-flight transaction: {e}")
+            self._record_error(e)
+            print(f"Error storing in-flight transactions: {e}")
             return False
     
     def get_inflight_transaction(self, txn_id: str) -> Optional[Dict]:
-        """Retrieve in-flight transaction"""
+        """Retrieve in-flight transaction: {source: record} of every source received"""
         try:
             key = f"{self.PREFIXES['temp']}{txn_id}"
-            data = self.redis_client.get(key)
+            data = self.redis_client.hgetall(key)
             
             if data:
-                return json.loads(data)
+                return self._source_records(data)
             return None
-            
+        
         except Exception as e:
+            self._record_error(e)
             print(f"Error retrieving in-flight transaction: {e}")
             return None
     
-    def get_inflight_by_source(self, source: str) -> List[Dict]:
-        """Get all in-flight transactions for a specific source"""
+    def _inflight_index_key(self, source: str) -> str:
+        """Sorted set of a source's in-flight txn_ids scored by arrival time (no TTL: trimmed by score)"""
+        return f"{self.PREFIXES['temp']}inflight:{source}"
+    
+    @property
+    def inflight_sources_key(self) -> str:
+        """Set of the sources that have an in-flight index, so maintenance finds them without a SCAN"""
+        return f"{self.PREFIXES['temp']}sources"
+    
+    def _register_sources(self, sources: Iterable[str]):
+        """SADD sources first seen by this process to the index registry"""
+        new_sources = set(sources) - self._registered_sources
+        if new_sources:
+            self.redis_client.sadd(self.inflight_sources_key, *new_sources)
+            self._registered_sources.update(new_sources)
+    
+    def get_inflight_by_source(self, source: str, limit: Optional[int] = None) -> List[Dict]:
+        """In-flight transactions of a source, oldest first (at most limit of them)"""
         try:
-            source_key = f"{self.PREFIXES['temp']}source:{source}"
-            txn_ids = self.redis_client.smembers(source_key)
+            cutoff = time.time() - self.CACHE_TTL['transaction_temp']
+            txn_ids = self.redis_client.zrangebyscore(
+                self._inflight_index_key(source), cutoff, '+inf',
+                start=0 if limit is not None else None, num=limit
+            )
             
-            transactions = []
+            # This source's record of every txn, fetched in one pipelined round trip
+            pipe = self.redis_client.pipeline(transaction=False)
             for txn_id in txn_ids:
-                txn_data = self.get_inflight_transaction(txn_id)
-                if txn_data:
-                    transactions.append(txn_data)
-            
-            return transactions
+                pipe.hget(f"{self.PREFIXES['temp']}{txn_id}", source)
             
+            return [json.loads(data) for data in pipe.execute() if data]
+        
         except Exception as e:
+            self._record_error(e)
             print(f"Error retrieving in-flight transactions by source: {e}")
             return []
     
+    def count_inflight(self, sources: Iterable[str]) -> Dict[str, int]:
+        """In-flight transactions per source: one ZCARD each, pipelined (O(1), no key scan)"""
+        sources = list(sources)
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for source in sources:
+                pipe.zcard(self._inflight_index_key(source))
+            return {source: int(count) for source, count in zip(sources, pipe.execute())}
+        
+        except Exception as e:
+            self._record_error(e)
+            print(f"Error counting in-flight transactions: {e}")
+            return dict.fromkeys(sources, 0)
+    
     def remove_inflight_transaction(self, txn_id: str, source: str) -> bool:
         """Remove in-flight transaction after reconciliation"""
+        return self.finish_reconciliations([], [(txn_id, [source])])
+    
+    @staticmethod
+    def _source_records(fields: Dict[str, str]) -> Dict[str, Dict]:
+        """{source: transaction} of a temp:{txn_id} hash (fields starting with _ are bookkeeping)"""
+        return {field: json.loads(value) for field, value in fields.items() if not field.startswith('_')}
+    
+    # ==================== DISTRIBUTED PENDING STORE ====================
+    
+    @property
+    def pending_expiry_key(self) -> str:
+        """Sorted set of pending txn_ids scored by their first event time"""
+        return f"{self.PREFIXES['temp']}expiry"
+    
+    @property
+    def pending_claims_key(self) -> str:
+        """Sorted set of claimed txn_ids awaiting a verdict, scored by claim deadline (wall clock)"""
+        return f"{self.PREFIXES['temp']}claims"
+    
+    def add_pending_sources(self, entries: List[Tuple[str, str, Dict, float, Iterable[str]]],
+                            ttl: int, claim_timeout: float) -> Optional[List[Tuple[str, Optional[str], Dict[str, Dict]]]]:
+        """Add a micro-batch of sources to the shared pending store and claim the txns they complete.
+        
+        entries: (txn_id, source, transaction, event time, expected sources).
+        One Lua call adds every source to its temp:{txn_id} hash and, when
+        a txn's expected sources are all present, claims it for this
+        process, so each txn is reconciled exactly once whichever consumer
+        process receives its sources. A claim not ended by a verdict within
+        claim_timeout seconds may be taken over (claim_expired_pending).
+        Returns one (state, verdict, sources) per entry: ('pending', None,
+        {}), ('ready', None, {source: txn}) for a txn this call claimed, or
+        ('late', verdict, {source: txn}) for a source of an already claimed
+        txn (verdict None while it is being reconciled: the source is then
+        stamped by the verdict owner). None when Redis or scripting is
+        unavailable.
+        """
+        if not entries:
+            return []
+        keys = []
+        now = time.time()
+        args = [self.lock_token, int(ttl), now, now + claim_timeout]
+        for txn_id, source, transaction, ts, expected in entries:
+            keys += [f"{self.PREFIXES['temp']}{txn_id}", self._inflight_index_key(source)]
+            args += [txn_id, source, json.dumps(transaction, default=str), ts, ','.join(sorted(expected))]
+        keys += [self.pending_expiry_key, self.pending_claims_key]
         try:
-            # Remove main transaction
-            key = f"{self.PREFIXES['temp']}{txn_id}"
-            self.redis_client.delete(key)
-            
-            # Remove from source set
-            source_key = f"{self.PREFIXES['temp']}source:{source}"
-            self.redis_client.srem(source_key, txn_id)
-            
-            return True
-            
+            self._register_sources(source for _, source, *_ in entries)
+            replies = self._run_script(ADD_PENDING_SCRIPT, keys, args)
+            self.breaker.record_success()
         except Exception as e:
-            print(f"Error removing in-flight transaction: {e}")
-            return False
+            self._record_error(e)
+            if isinstance(e, redis.ResponseError):
+                self._scripting_refused(e)
+            print(f"Error adding pending sources: {e}")
+            return None
+        
+        results = []
+        for state, verdict, *fields in replies:
+            sources = self._source_records(dict(zip(fields[::2], fields[1::2])))
+            results.append((state, verdict or None, sources))
+        return results
+    
+    def claim_expired_pending(self, cutoff: Optional[float], claim_timeout: float,
+                              limit: int = 1000) -> Optional[List[Tuple[str, Dict[str, Dict], bool]]]:
+        """Claim expired and abandoned txns: [(txn_id, {source: txn}, reclaimed)].
+        
+        Expired: pending txns first seen before cutoff (event time; None
+        skips them). Abandoned (reclaimed=True): claimed txns still without
+        a verdict past their claim deadline, because the claiming process
+        died. The candidates are read first and the script re-checks each
+        one, so a txn is claimed by one process only. None when Redis or
+        scripting is unavailable.
+        """
+        now = time.time()
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            if cutoff is not None:
+                pipe.zrangebyscore(self.pending_expiry_key, '-inf', f"({cutoff}", start=0, num=limit)
+            pipe.zrangebyscore(self.pending_claims_key, '-inf', now, start=0, num=limit)
+            candidates = list(dict.fromkeys(txn_id for ids in pipe.execute() for txn_id in ids))
+            if not candidates:
+                self.breaker.record_success()
+                return []
+            
+            replies = self._run_script(
+                CLAIM_SCRIPT,
+                [f"{self.PREFIXES['temp']}{txn_id}" for txn_id in candidates]
+                + [self.pending_expiry_key, self.pending_claims_key],
+                [cutoff if cutoff is not None else '-inf', now, self.lock_token, now + claim_timeout] + candidates
+            )
+            self.breaker.record_success()
+        except Exception as e:
+            self._record_error(e)
+            print(f"Error claiming expired pending transactions: {e}")
+            return None
+        
+        claimed = []
+        for txn_id, kind, fields in replies:
+            sources = self._source_records(dict(zip(fields[::2], fields[1::2])))
+            if sources:
+                claimed.append((txn_id, sources, kind == 'reclaimed'))
+        return claimed
+    
+    def record_pending_verdicts(self, verdicts: Iterable[Tuple[str, Iterable[str], str]]) -> Optional[Dict[str, List[str]]]:
+        """Store the verdict of claimed txns and end their claims: {txn_id: late sources}.
+        
+        The hashes stay until their TTL, so a source arriving after the
+        verdict is recognised as late instead of starting a new txn. Sources
+        that arrived while the txn was claimed but had no verdict yet are
+        returned (and cleared) for the caller to stamp. None if Redis failed.
+        """
+        verdicts = [(txn_id, list(sources), status) for txn_id, sources, status in verdicts]
+        if not verdicts:
+            return {}
+        keys, args = [], []
+        for txn_id, sources, status in verdicts:
+            keys += [f"{self.PREFIXES['temp']}{txn_id}"] + [self._inflight_index_key(source) for source in sources]
+            args += [txn_id, status, len(sources)]
+        keys.append(self.pending_claims_key)
+        try:
+            replies = self._run_script(RECORD_VERDICTS_SCRIPT, keys, args)
+            self.breaker.record_success()
+        except Exception as e:
+            self._record_error(e)
+            print(f"Error recording pending verdicts: {e}")
+            return None
+        
+        return {
+            txn_id: late.split(',')
+            for (txn_id, _, _), late in zip(verdicts, replies) if late
+        }
+    
+    def count_pending(self) -> int:
+        """Txns waiting in the shared pending store"""
+        try:
+            return int(self.redis_client.zcard(self.pending_expiry_key))
+        
+        except Exception as e:
+            self._record_error(e)
+            print(f"Error counting pending transactions: {e}")
+            return 0
     
     # ==================== MISMATCH THROTTLING ====================
     
@@ -149,8 +590,9 @@ class RedisService:
             )
             
             return True
-            
+        
         except Exception as e:
+            self._record_error(e)
             print(f"Error checking mismatch throttle: {e}")
             return True  # Default to allowing check
     
@@ -160,8 +602,9 @@ class RedisService:
             count_key = f"{self.PREFIXES['throttle']}count:{txn_id}"
             count = self.redis_client.get(count_key)
             return int(count) if count else 0
-            
+        
         except Exception as e:
+            self._record_error(e)
             print(f"Error getting mismatch check count: {e}")
             return 0
     
@@ -172,134 +615,150 @@ class RedisService:
             count = self.redis_client.incr(count_key)
             self.redis_client.expire(count_key, 3600)  # 1 hour TTL
             return count
-            
+        
         except Exception as e:
+            self._record_error(e)
             print(f"Error incrementing mismatch check: {e}")
             return 0
     
-    # ==================== API RESPONSE CACHING ====================
-    
-    def cache_api_response(self, endpoint: str, params: Dict, response_data: Any) -> bool:
-        """Cache API response for faster subsequent requests"""
-        try:
-            # Create cache key from endpoint and parameters
-            cache_key = self._generate_cache_key(endpoint, params)
-            
-            cache_data = {
-                'data': response_data,
-                'cached_at': datetime.now().isoformat(),
-                'endpoint': endpoint,
-                'params': params
-            }
-            
-            self.redis_client.setex(
-                cache_key,
-                self.CACHE_TTL['api_response'],
-                json.dumps(cache_data, default=str)
-            )
-            
-            return True
-            
-        except Exception as e:
-            print(f"Error caching API response: {e}")
-            return False
+    # ==================== READ CACHE (L2) ====================
     
-    def get_cached_response(self, endpoint: str, params: Dict) -> Optional[Any]:
-        """Retrieve cached API response"""
+    def get_cache_entry(self, key: str) -> Optional[str]:
+        """Raw payload of a read cache entry (ReadCache parses it), or None"""
         try:
-            cache_key = self._generate_cache_key(endpoint, params)
-            cached_data = self.redis_client.get(cache_key)
-            
-            if cached_data:
-                cache_obj = json.loads(cached_data)
-                return cache_obj['data']
-            
-            return None
-            
+            return self.redis_client.get(key)
+        
         except Exception as e:
-            print(f"Error retrieving cached response: {e}")
+            self._record_error(e)
+            print(f"Error retrieving cache entry: {e}")
             return None
     
-    def _generate_cache_key(self, endpoint: str, params: Dict) -> str:
-        """Generate consistent cache key from endpoint and parameters"""
-        # Sort parameters for consistent key generation
-        sorted_params = json.dumps(params, sort_keys=True)
-        key_string = f"{endpoint}:{sorted_params}"
-        
-        # Hash for consistent length
-        key_hash = hashlib.md5(key_string.encode()).hexdigest()
-        return f"{self.PREFIXES['cache']}{key_hash}"
-    
-    # ==================== STATISTICS CACHING ====================
-    
-    def cache_stats(self, stats_type: str, stats_data: Dict) -> bool:
-        """Cache statistics for faster dashboard loading"""
+    def set_cache_entry(self, key: str, payload: str, ttl: int) -> bool:
+        """Store a read cache entry for ttl seconds"""
         try:
-            stats_key = f"{self.PREFIXES['stats']}{stats_type}"
-            
-            cache_data = {
-                'stats': stats_data,
-                'generated_at': datetime.now().isoformat()
-            }
-            
-            self.redis_client.setex(
-                stats_key,
-                self.CACHE_TTL['stats_cache'],
-                json.dumps(cache_data, default=str)
-            )
-            
+            self.redis_client.setex(key, ttl, payload)
             return True
-            
+        
         except Exception as e:
-            print(f"Error caching stats: {e}")
+            self._record_error(e)
+            print(f"Error storing cache entry: {e}")
             return False
     
-    def get_cached_stats(self, stats_type: str) -> Optional[Dict]:
-        """Retrieve cached statistics"""
+    def _generation_key(self, dataset: str) -> str:
+        # No TTL: a counter that expired would restart and could meet its old keys again
+        return f"{self.PREFIXES['generation']}{dataset}"
+    
+    def get_cache_generations(self, datasets: Iterable[str]) -> Optional[Dict[str, int]]:
+        """Current generation of each dataset (one MGET), or None if Redis failed"""
+        datasets = list(datasets)
         try:
-            stats_key = f"{self.PREFIXES['stats']}{stats_type}"
-            cached_data = self.redis_client.get(stats_key)
-            
-            if cached_data:
-                cache_obj = json.loads(cached_data)
-                return cache_obj['stats']
-            
+            values = self.redis_client.mget([self._generation_key(dataset) for dataset in datasets])
+            return {dataset: int(value or 0) for dataset, value in zip(datasets, values)}
+        
+        except Exception as e:
+            self._record_error(e)
+            print(f"Error reading cache generations: {e}")
             return None
-            
+    
+    def bump_cache_generations(self, datasets: Iterable[str]) -> Optional[Dict[str, int]]:
+        """INCR the generation of each dataset (one round trip); the new values, or None"""
+        datasets = list(datasets)
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for dataset in datasets:
+                pipe.incr(self._generation_key(dataset))
+            return dict(zip(datasets, pipe.execute()))
+        
         except Exception as e:
-            print(f"Error retrieving cached stats: {e}")
+            self._record_error(e)
+            print(f"Error bumping cache generations: {e}")
             return None
     
     # ==================== RECONCILIATION LOCKING ====================
     
+    def _lock_key(self, txn_id: str) -> str:
+        return f"{self.PREFIXES['lock']}reconcile:{txn_id}"
+    
     def acquire_reconciliation_lock(self, txn_id: str) -> bool:
         """Acquire lock for transaction reconciliation to prevent race conditions"""
+        return bool(self.acquire_reconciliation_locks([txn_id]))
+    
+    def acquire_reconciliation_locks(self, txn_ids: List[str]) -> Optional[List[str]]:
+        """Acquire the reconciliation locks of a batch in one round trip.
+        
+        Returns the txn_ids whose lock was acquired (another consumer holds
+        the rest), or None when Redis failed and no lock could be taken.
+        """
+        if not txn_ids:
+            return []
+        keys = [self._lock_key(txn_id) for txn_id in txn_ids]
+        ttl = self.CACHE_TTL['reconciliation_lock']
         try:
-            lock_key = f"{self.PREFIXES['lock']}reconcile:{txn_id}"
-            
-            # Try to acquire lock
-            acquired = self.redis_client.set(
-                lock_key,
-                datetime.now().isoformat(),
-                nx=True,  # Only set if key doesn't exist
-                ex=self.CACHE_TTL['reconciliation_lock']
-            )
-            
-            return bool(acquired)
-            
+            if self.scripting:
+                try:
+                    positions = self._run_script(ACQUIRE_LOCKS_SCRIPT, keys, [self.lock_token, ttl])
+                    self.breaker.record_success()
+                    return [txn_ids[int(position) - 1] for position in positions]
+                except redis.ResponseError as e:
+                    if not self._scripting_refused(e):
+                        raise
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.set(key, self.lock_token, nx=True, ex=ttl)  # Only set if key doesn't exist
+            acquired = pipe.execute()
+            self.breaker.record_success()
+            return [txn_id for txn_id, ok in zip(txn_ids, acquired) if ok]
+        
         except Exception as e:
-            print(f"Error acquiring reconciliation lock: {e}")
-            return False
+            self._record_error(e)
+            print(f"Error acquiring reconciliation locks: {e}")
+            return None
     
     def release_reconciliation_lock(self, txn_id: str) -> bool:
         """Release reconciliation lock"""
+        return self.finish_reconciliations([txn_id], [])
+    
+    def finish_reconciliations(self, locked: List[str], reconciled: Iterable[Tuple[str, Iterable[str]]]) -> bool:
+        """Release a batch's locks and drop its reconciled in-flight entries in one round trip.
+        
+        locked: txn_ids whose lock this process holds; reconciled:
+        (txn_id, sources) pairs whose in-flight records are removed.
+        """
+        reconciled = [(txn_id, list(sources)) for txn_id, sources in reconciled]
+        if not locked and not reconciled:
+            return True
+        lock_keys = [self._lock_key(txn_id) for txn_id in locked]
+        temp_keys = [f"{self.PREFIXES['temp']}{txn_id}" for txn_id, _ in reconciled]
+        members = [
+            (self._inflight_index_key(source), txn_id)
+            for txn_id, sources in reconciled for source in sources
+        ]
         try:
-            lock_key = f"{self.PREFIXES['lock']}reconcile:{txn_id}"
-            self.redis_client.delete(lock_key)
+            if self.scripting:
+                try:
+                    keys = lock_keys + temp_keys + [index_key for index_key, _ in members]
+                    args = [self.lock_token, len(lock_keys), len(temp_keys)] + [txn_id for _, txn_id in members]
+                    self._run_script(FINISH_BATCH_SCRIPT, keys, args)
+                    self.breaker.record_success()
+                    return True
+                except redis.ResponseError as e:
+                    if not self._scripting_refused(e):
+                        raise
+            
+            # Without scripting the ownership check is skipped (plain DEL, as a single lock release did)
+            pipe = self.redis_client.pipeline(transaction=False)
+            if lock_keys or temp_keys:
+                pipe.delete(*(lock_keys + temp_keys))
+            for index_key, txn_id in members:
+                pipe.zrem(index_key, txn_id)
+            pipe.execute()
+            self.breaker.record_success()
             return True
-            
+        
         except Exception as e:
-            print(f"Error releasing reconciliation lock: {e}")
+            self._record_error(e)
+            print(f"Error finishing reconciliations: {e}")
             return False
     
     # ==================== RATE LIMITING ====================
@@ -321,8 +780,9 @@ class RedisService:
             # Increment counter
             self.redis_client.incr(rate_key)
             return True
-            
+        
         except Exception as e:
+            self._record_error(e)
             print(f"Error checking rate limit: {e}")
             return True  # Default to allowing request
     
@@ -339,37 +799,74 @@ class RedisService:
                 'keyspace_hits': info.get('keyspace_hits', 0),
                 'keyspace_misses': info.get('keyspace_misses', 0),
                 'total_commands_processed': info.get('total_commands_processed', 0),
-                'uptime_in_seconds': info.get('uptime_in_seconds', 0)
+                'uptime_in_seconds': info.get('uptime_in_seconds', 0),
+                'circuit_breaker': self.breaker.snapshot(),
+                'scripting': self.scripting
             }
-            
+        
         except Exception as e:
+            self._record_error(e)
             print(f"Error getting Redis stats: {e}")
-            return {}
+            return {'circuit_breaker': self.breaker.snapshot(), 'scripting': self.scripting}
     
-    def cleanup_expired_keys(self) -> int:
-        """Clean up expired keys (maintenance operation)"""
+    def _persistent_key(self, key: str) -> bool:
+        """Keys that live without a TTL by design (sorted-set indexes trimmed by score, counters)"""
+        temp = self.PREFIXES['temp']
+        return (key in (self.pending_expiry_key, self.pending_claims_key, self.inflight_sources_key)
+                or key.startswith(f"{temp}inflight:"))
+    
+    def cleanup_expired_keys(self, batch_size: int = 500, max_keys: int = 50000) -> int:
+        """Incremental maintenance: trim the in-flight indexes and give TTL-less keys a TTL.
+        
+        The indexes are listed by the source registry (SMEMBERS, no key
+        scan), and their members older than the in-flight TTL are removed by
+        score (ZREMRANGEBYSCORE, O(log n) per index). temp: and cache: keys
+        are walked with SCAN in batches of batch_size, their TTLs read and
+        fixed in one pipeline per batch. A call visits about max_keys keys
+        per prefix and the next call resumes from the saved cursor, so the
+        server is never blocked by a full keyspace walk. Returns the number
+        of index members trimmed plus keys that were given a TTL.
+        """
         try:
-            # Get all keys with our prefixes
-            all_keys = []
-            for prefix in self.PREFIXES.values():
-                keys = self.redis_client.keys(f"{prefix}*")
-                all_keys.extend(keys)
-            
-            # Check TTL and remove expired keys
             cleaned = 0
-            for key in all_keys:
-                ttl = self.redis_client.ttl(key)
-                if ttl == -1:  # No expiration set
-                    # Set default expiration based on key type
-                    if 'temp:' in key:
-                        self.redis_client.expire(key, self.CACHE_TTL['transaction_temp'])
-                    elif 'cache:' in key:
-                        self.redis_client.expire(key, self.CACHE_TTL['api_response'])
-                    cleaned += 1
+            cutoff = time.time() - self.CACHE_TTL['transaction_temp']
+            
+            sources = self.redis_client.smembers(self.inflight_sources_key)
+            if sources:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for source in sources:
+                    pipe.zremrangebyscore(self._inflight_index_key(source), '-inf', f"({cutoff}")
+                cleaned += sum(pipe.execute())
+            
+            default_ttls = {
+                self.PREFIXES['temp']: self.CACHE_TTL['transaction_temp'],
+                self.PREFIXES['cache']: self.CACHE_TTL['api_response']
+            }
+            for prefix, ttl in default_ttls.items():
+                cursor = self._cleanup_cursors.get(prefix, 0)
+                # SCAN's COUNT is the work per call (keys visited, matching or not)
+                for _ in range(max(1, max_keys // batch_size)):
+                    cursor, keys = self.redis_client.scan(cursor=cursor, match=f"{prefix}*", count=batch_size)
+                    keys = [key for key in keys if not self._persistent_key(key)]
+                    if keys:
+                        pipe = self.redis_client.pipeline(transaction=False)
+                        for key in keys:
+                            pipe.ttl(key)
+                        missing = [key for key, key_ttl in zip(keys, pipe.execute()) if key_ttl == -1]
+                        if missing:
+                            pipe = self.redis_client.pipeline(transaction=False)
+                            for key in missing:
+                                pipe.expire(key, ttl)
+                            pipe.execute()
+                            cleaned += len(missing)
+                    if cursor == 0:
+                        break
+                self._cleanup_cursors[prefix] = cursor
             
             return cleaned
-            
+        
         except Exception as e:
+            self._record_error(e)
             print(f"Error cleaning up expired keys: {e}")
             return 0
 
@@ -0,0 +1,109 @@
+"""
+Streaming report exports
+Turns the row chunks of DatabaseService.iter_*_report into CSV or Parquet byte chunks for a
+StreamingResponse, so a report of any size is written with one chunk in memory at a time
+"""
+import io
+import csv
+import logging
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+REPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+def _pyarrow():
+    """pyarrow modules, or None when it is not installed (Parquet exports are optional)"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        return None
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects what the Parquet writer emits until it is drained"""
+    
+    def __init__(self):
+        super().__init__()
+        self.parts: List[bytes] = []
+        self.position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def drain(self) -> bytes:
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+class ReportExporter:
+    """Encodes report row chunks as CSV or Parquet, chunk by chunk"""
+    
+    def parquet_available(self) -> bool:
+        return _pyarrow() is not None
+    
+    def start(self, chunks: Iterator[List[Dict]]) -> Iterator[List[Dict]]:
+        """Fetch the first chunk now, so query errors surface before the response starts"""
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        return chain([first], chunks) if first is not None else iter(())
+    
+    def csv(self, chunks: Iterator[List[Dict]], columns: Dict[str, str]) -> Iterator[bytes]:
+        """UTF-8 CSV: the header, then one encoded block per chunk"""
+        datetime_columns = [name for name, kind in columns.items() if kind == 'datetime']
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=list(columns))
+        writer.writeheader()
+        yield output.getvalue().encode('utf-8')
+        
+        for chunk in chunks:
+            output.seek(0)
+            output.truncate()
+            for row in chunk:
+                for name in datetime_columns:
+                    value = row[name]
+                    if isinstance(value, datetime):
+                        row[name] = value.isoformat()
+                writer.writerow(row)
+            yield output.getvalue().encode('utf-8')
+    
+    def parquet(self, chunks: Iterator[List[Dict]], columns: Dict[str, str]) -> Iterator[bytes]:
+        """Parquet with one row group per chunk; bytes are yielded as each row group is written"""
+        pa = _pyarrow()
+        if pa is None:
+            raise RuntimeError("Parquet export requires pyarrow")
+        
+        types = {
+            'int': pa.int64(),
+            'float': pa.float64(),
+            'string': pa.string(),
+            'datetime': pa.timestamp('us')
+        }
+        schema = pa.schema([(name, types[kind]) for name, kind in columns.items()])
+        sink = _ChunkSink()
+        writer = pa.parquet.ParquetWriter(sink, schema, compression='snappy')
+        try:
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()  # footer
+
+# Global report exporter instance
+report_exporter = ReportExporter()
@@ -12,7 +12,7 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import logging
 from sqlalchemy import text
-from ..db.database import SessionLocal
+from ..db.database import SessionLocal, get_pool_status
 from .redis_service import redis_service
 
 logger = logging.getLogger(__name__)
@@ -252,6 +252,13 @@ class SystemHealthService:
     
     def get_database_metrics(self) -> Dict:
         """Get PostgreSQL database metrics"""
+        pool = get_pool_status()
+        pool_details = [
+            {"label": "Pool Checked Out", "value": f"{pool.get('checked_out', 0)}/{pool.get('size', 0)} (+{pool.get('overflow', 0)} overflow)"},
+            {"label": "Pool Wait p95", "value": f"{pool['wait']['p95_ms']}ms"},
+            {"label": "Checkout Time p95", "value": f"{pool['checkout_time']['p95_ms']}ms"},
+            {"label": "Pool Timeouts", "value": str(pool['timeouts'])}
+        ]
         try:
             db = SessionLocal()
             
@@ -268,8 +275,8 @@ class SystemHealthService:
             active_connections = row[1] if row[1] else 0
             table_count = row[2] if row[2] else 0
             
-            # Get average query time (simplified)
-            query_time = 15  # Placeholder - would need query performance monitoring
+            # Average time a connection is checked out (recent pool samples)
+            query_time = pool['checkout_time']['avg_ms']
             
             db.close()
             
@@ -281,8 +288,10 @@ class SystemHealthService:
                 "details": [
                     {"label": "Database Size", "value": f"{db_size_mb:.1f}MB"},
                     {"label": "Tables", "value": str(table_count)},
-                    {"label": "Active Queries", "value": str(active_connections)}
-                ]
+                    {"label": "Active Queries", "value": str(active_connections)},
+                    *pool_details
+                ],
+                "pool": pool
             }
         except Exception as e:
             logger.error(f"Error getting database metrics: {e}")
@@ -294,8 +303,10 @@ class SystemHealthService:
                 "details": [
                     {"label": "Database Size", "value": "N/A"},
                     {"label": "Tables", "value": "N/A"},
-                    {"label": "Active Queries", "value": "N/A"}
-                ]
+                    {"label": "Active Queries", "value": "N/A"},
+                    *pool_details
+                ],
+                "pool": pool
             }
     
     def get_system_alerts(self) -> List[Dict]:
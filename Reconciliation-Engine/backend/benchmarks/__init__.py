@@ -0,0 +1 @@
+# End-to-end reconciliation benchmarks (run with: python -m benchmarks --help)
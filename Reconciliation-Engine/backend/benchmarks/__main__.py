@@ -0,0 +1,159 @@
+"""
+Reconciliation benchmark runner
+    
+    cd backend
+    python -m benchmarks run --transactions 20000 --output bench.json
+    python -m benchmarks compare baseline.json bench.json --threshold 0.10
+
+Each scenario runs in its own spawned process, so peak RSS and module-level state
+(global engines, database engine, Redis client) belong to that scenario alone
+"""
+import os
+import sys
+import json
+import platform
+import argparse
+import subprocess
+import queue
+import multiprocessing
+from datetime import datetime
+
+from benchmarks.standins import BACKEND_DIR, REDIS_MODES
+from benchmarks.scenarios import SCENARIOS, run_scenario, run_isolated
+
+RESULT_FORMAT = "reconciliation-benchmark/1"
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True,
+                              timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+def run_benchmarks(names: list, options: dict, isolate: bool = True) -> dict:
+    """Run the named scenarios and return the full result document"""
+    document = {
+        'format': RESULT_FORMAT,
+        'commit': _git("rev-parse", "HEAD") or None,
+        'dirty': bool(_git("status", "--porcelain", "--", ".")),
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'options': options,
+        'results': {}
+    }
+    
+    context = multiprocessing.get_context("spawn")
+    for name in names:
+        print(f"⏱️  {name}: {SCENARIOS[name].description}")
+        if isolate:
+            results = context.Queue()
+            process = context.Process(target=run_isolated, args=(name, options, results), name=f"bench-{name}")
+            process.start()
+            result = None
+            while result is None:
+                try:
+                    result = results.get(timeout=1)
+                except queue.Empty:
+                    if not process.is_alive():
+                        result = {'scenario': name, 'error': f"worker exited with code {process.exitcode}"}
+            process.join()
+        else:
+            result = run_scenario(name, options)
+        
+        document['results'][name] = result
+        if 'error' in result:
+            print(f"   ❌ {result['error']}")
+        else:
+            latency = result['latency']
+            print(f"   ✅ {result['msgs_per_sec']:,.0f} msgs/sec | p50 {latency['p50_ms']} ms | "
+                  f"p95 {latency['p95_ms']} ms | p99 {latency['p99_ms']} ms | "
+                  f"{result['allocations']['blocks_per_msg']} blocks/msg | peak RSS {result['peak_rss_mb']} MB")
+    return document
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Print per-scenario deltas; returns the regressions beyond threshold"""
+    regressions = []
+    print(f"{'scenario':<12} {'msgs/sec':>24} {'p99 ms':>24} {'blocks/msg':>20}")
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if not before or 'error' in before or 'error' in result:
+            continue
+        
+        throughput = (result['msgs_per_sec'] / before['msgs_per_sec'] - 1) if before['msgs_per_sec'] else 0.0
+        p99_before, p99 = before['latency']['p99_ms'], result['latency']['p99_ms']
+        latency = (p99 / p99_before - 1) if p99_before else 0.0
+        blocks_before, blocks = before['allocations']['blocks_per_msg'], result['allocations']['blocks_per_msg']
+        
+        print(f"{name:<12} {before['msgs_per_sec']:>10,.0f} → {result['msgs_per_sec']:>8,.0f} {throughput:+6.1%}"
+              f" {p99_before:>10} → {p99:>8} {latency:+6.1%} {blocks_before:>8} → {blocks:>8}")
+        if throughput < -threshold:
+            regressions.append(f"{name}: throughput {throughput:+.1%}")
+        if latency > threshold:
+            regressions.append(f"{name}: p99 latency {latency:+.1%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Reconciliation benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    run = commands.add_parser("run", help="run scenarios and write a JSON result file")
+    run.add_argument("--scenarios", default=",".join(SCENARIOS),
+                     help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    run.add_argument("--transactions", type=int, default=5000, help="coordinated transactions per scenario")
+    run.add_argument("--load-file", default=None, help="replay a producers/load_generator.py file instead")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--shards", type=int, default=4)
+    run.add_argument("--partitions", type=int, default=6)
+    run.add_argument("--consumers", type=int, default=2)
+    run.add_argument("--batch-size", type=int, default=500)
+    run.add_argument("--api-requests", type=int, default=50, help="requests per API endpoint")
+    run.add_argument("--alloc-sample", type=int, default=500, help="transactions in the tracemalloc pass")
+    run.add_argument("--redis", choices=REDIS_MODES, default="auto")
+    run.add_argument("--no-isolate", action="store_true", help="run every scenario in this process")
+    run.add_argument("--output", default=None, help="result file (default benchmark-<commit>.json)")
+    
+    diff = commands.add_parser("compare", help="compare two result files, exit 1 on regression")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=0.10, help="allowed relative change")
+    
+    args = parser.parse_args()
+    
+    if args.command == "compare":
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        with open(args.current) as handle:
+            current = json.load(handle)
+        regressions = compare(baseline, current, args.threshold)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        sys.exit(1 if regressions else 0)
+    
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    
+    options = {
+        'transactions': args.transactions,
+        'load_file': args.load_file,
+        'seed': args.seed,
+        'shards': args.shards,
+        'partitions': args.partitions,
+        'consumers': args.consumers,
+        'batch_size': args.batch_size,
+        'api_requests': args.api_requests,
+        'alloc_sample': args.alloc_sample,
+        'redis': args.redis
+    }
+    document = run_benchmarks(names, options, isolate=not args.no_isolate)
+    
+    output = args.output or f"benchmark-{(document['commit'] or 'unknown')[:12]}.json"
+    with open(output, "w") as handle:
+        json.dump(document, handle, indent=2)
+    print(f"📄 Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measurement helpers: latency percentiles, peak RSS and allocation probes
+"""
+import sys
+import resource
+import tracemalloc
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+def latency_summary(seconds: Iterable[float]) -> Dict[str, float]:
+    """p50/p95/p99/max of latency samples, in milliseconds"""
+    samples = np.fromiter(seconds, dtype=np.float64)
+    if not len(samples):
+        return {'count': 0, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+    return {
+        'count': int(len(samples)),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(samples.max()) * 1000, 3)
+    }
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+class AllocationProbe:
+    """tracemalloc over one pass: net new blocks/bytes and the traced peak, per message.
+    
+    CPython cannot count every malloc, so blocks_per_msg is the number of
+    allocations still alive at the end of the pass (what grows the heap),
+    and peak_kb_per_msg is the high-water mark of traced memory spread over
+    the pass. tracemalloc slows the code down, so probes run on a separate
+    sample pass, never on the timed one.
+    """
+    
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+    
+    def __enter__(self):
+        tracemalloc.start(self.frames)
+        self.before = tracemalloc.take_snapshot()
+        self.start_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        return self
+    
+    def __exit__(self, *exc):
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        diff = after.compare_to(self.before, 'filename')
+        self.blocks = sum(stat.count_diff for stat in diff)
+        self.bytes = sum(stat.size_diff for stat in diff)
+        self.peak = peak - self.start_size
+        self.top = [
+            {'file': str(stat.traceback[0].filename), 'blocks': stat.count_diff, 'kb': round(stat.size_diff / 1024, 1)}
+            for stat in sorted(diff, key=lambda stat: stat.size_diff, reverse=True)[:5]
+        ]
+        return False
+    
+    def per_message(self, messages: int) -> dict:
+        messages = max(messages, 1)
+        return {
+            'sample_messages': messages,
+            'blocks_per_msg': round(self.blocks / messages, 2),
+            'kb_per_msg': round(self.bytes / 1024 / messages, 3),
+            'peak_kb_per_msg': round(self.peak / 1024 / messages, 3),
+            'top_files': self.top
+        }
+
+def paired_latencies(start: Dict[str, float], end: Dict[str, float]) -> List[float]:
+    """end - start for every key present in both"""
+    return [end[key] - start[key] for key in end.keys() & start.keys()]
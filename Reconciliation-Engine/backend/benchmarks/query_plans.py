@@ -0,0 +1,238 @@
+"""
+Query plan regression check
+Runs every DatabaseService read against a large fixture, EXPLAINs each statement it sent
+and exits 1 if any of them scans transactions or mismatches sequentially
+    
+    cd backend
+    python -m benchmarks.query_plans --rows 200000
+    python -m benchmarks.query_plans --database-url postgresql://.../scratch   # tables are cleared!
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+from benchmarks import standins
+
+# Tables big enough in production that a sequential scan is a regression
+LARGE_TABLES = ("transactions", "mismatches")
+
+# Reads that aggregate every row by design, with the reason
+FULL_SCAN_ALLOWED = {}
+# ...and on SQLite only, where the index cannot exist
+SQLITE_FULL_SCAN_ALLOWED = {}
+
+SOURCES = ('core', 'gateway', 'mobile')
+STATUSES = ('SUCCESS', 'SUCCESS', 'SUCCESS', 'FAILED', 'PENDING')
+MISMATCH_TYPES = ('AMOUNT_MISMATCH', 'STATUS_MISMATCH', 'TIMESTAMP_MISMATCH', 'CURRENCY_MISMATCH', 'MISSING_SOURCE')
+SEVERITIES = ('HIGH', 'MEDIUM', 'LOW')
+
+def use_database(url: str = None) -> str:
+    """SQLite in a temporary directory, or the given (scratch) database with the tables created"""
+    if url is None:
+        return standins.use_sqlite(tempfile.mkdtemp(prefix="reconciliation-plans-"))
+    
+    os.environ["DATABASE_URL"] = url
+    from app.db.database import Base, engine
+    from app.models.transaction import Transaction  # noqa: F401 (registers the table)
+    from app.models.mismatch import Mismatch  # noqa: F401
+    from app.models.rollup import TransactionRollup, MismatchRollup  # noqa: F401
+    Base.metadata.create_all(engine)
+    standins.clear_database()
+    return url
+
+def load_fixture(rows: int, days: int = 30, seed: int = 42, chunk: int = 10000):
+    """rows transactions (one per source of rows/3 txn_ids) spread over days, ~1 mismatch in 10"""
+    from app.services.database_service import db_service, transaction_row, mismatch_row
+    
+    rng = random.Random(seed)
+    now = datetime.now()
+    transactions, mismatches = [], []
+    
+    def flush():
+        db_service.write_batch(transactions=transactions, mismatches=mismatches)
+        transactions.clear()
+        mismatches.clear()
+    
+    for index in range(rows):
+        created = now - timedelta(seconds=rng.uniform(0, days * 86400))
+        txn_id = f"TXN{index // len(SOURCES):09d}"
+        row = transaction_row({
+            'txn_id': txn_id,
+            'source': SOURCES[index % len(SOURCES)],
+            'amount': round(rng.uniform(10, 50000), 2),
+            'status': rng.choice(STATUSES)
+        }, created)
+        if created < now - timedelta(minutes=10):
+            row['reconciliation_status'] = 'MISMATCH' if rng.random() < 0.1 else 'MATCHED'
+            row['reconciled_at'] = created + timedelta(seconds=rng.expovariate(1 / 120))
+        transactions.append(row)
+        
+        if rng.random() < 0.1:
+            mismatches.append(mismatch_row({
+                'txn_id': txn_id,
+                'type': rng.choice(MISMATCH_TYPES),
+                'severity': rng.choice(SEVERITIES),
+                'details': 'fixture',
+                'sources_involved': list(SOURCES[:2])
+            }, created))
+        
+        if len(transactions) >= chunk:
+            flush()
+    flush()
+    
+    from app.db.database import engine
+    with engine.connect() as connection:
+        connection.exec_driver_sql("ANALYZE")
+        connection.commit()
+
+def _second_page(get_page, **filters):
+    """Read the first page of a keyset listing and then seek to the next one"""
+    first = get_page(limit=50, **filters)
+    return get_page(limit=50, cursor=first['next_cursor'], **filters)
+
+def probes() -> list:
+    """(name, call) for every DatabaseService read the API serves"""
+    from app.services.database_service import db_service
+    from app.services.analytics_queries import delay_analytics
+    today = datetime.now().date()
+    return [
+        ('get_transactions', lambda: db_service.get_transactions(50)),
+        ('get_transactions[source]', lambda: db_service.get_transactions(50, source='core')),
+        ('get_transactions[status]', lambda: db_service.get_transactions(50, status='FAILED')),
+        ('get_transactions_page[cursor]', lambda: _second_page(db_service.get_transactions_page)),
+        ('get_transactions_page[reconciliation_status]',
+         lambda: _second_page(db_service.get_transactions_page, reconciliation_status='MATCHED')),
+        ('get_mismatches_page[cursor]', lambda: _second_page(db_service.get_mismatches_page)),
+        ('get_mismatches_page[severity]', lambda: _second_page(db_service.get_mismatches_page, severity='HIGH')),
+        ('get_transactions_by_txn_id', lambda: db_service.get_transactions_by_txn_id('TXN000000042')),
+        ('get_mismatches', lambda: db_service.get_mismatches(50)),
+        ('get_mismatches[severity]', lambda: db_service.get_mismatches(50, severity='HIGH')),
+        ('get_mismatches[type]', lambda: db_service.get_mismatches(50, mismatch_type='AMOUNT_MISMATCH')),
+        ('get_mismatches[status]', lambda: db_service.get_mismatches(50, status='OPEN')),
+        ('get_mismatches[txn_id]', lambda: db_service.get_mismatches(50, txn_id='TXN000000042')),
+        ('get_transaction_stats', db_service.get_transaction_stats),
+        ('get_health_status', db_service.get_health_status),
+        ('get_transactions_by_date', lambda: db_service.get_transactions_by_date(today)),
+        ('get_mismatches_by_date', lambda: db_service.get_mismatches_by_date(today)),
+        ('count_transactions_by_date', lambda: db_service.count_transactions_by_date(today)),
+        ('count_transactions[source]', lambda: db_service.count_transactions(
+            datetime.now() - timedelta(hours=6), source='core')),
+        ('count_transactions_by[status]', lambda: db_service.count_transactions_by(
+            'status', datetime.now() - timedelta(hours=6))),
+        ('count_mismatches_by_date', lambda: db_service.count_mismatches_by_date(today)),
+        ('count_mismatches[severity]', lambda: db_service.count_mismatches(
+            datetime.now() - timedelta(hours=6), severity='HIGH')),
+        ('count_mismatches_by[status]', lambda: db_service.count_mismatches_by('status')),
+        ('get_timeline_stats', lambda: db_service.get_timeline_stats(24, 'hour')),
+        ('get_recent_activity_stats', db_service.get_recent_activity_stats),
+        ('get_delay_analytics', lambda: (delay_analytics.clear(), db_service.get_delay_analytics()))
+    ]
+
+def capture(call) -> list:
+    """Run call and return the (statement, parameters) of every SELECT it sent"""
+    from sqlalchemy import event
+    from app.db.database import engine
+    
+    statements = []
+    
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+    
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+def explain(statement: str, parameters) -> list:
+    """Sequential scans of LARGE_TABLES in the statement's plan, and the plan as text"""
+    from app.db.database import engine
+    
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if engine.dialect.name == 'postgresql':
+            cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            scans, lines = [], []
+            
+            def walk(node, depth=0):
+                relation = node.get('Relation Name')
+                lines.append(f"{'  ' * depth}{node['Node Type']}{f' on {relation}' if relation else ''}"
+                             f"{' using ' + node['Index Name'] if node.get('Index Name') else ''}")
+                if node['Node Type'] == 'Seq Scan' and relation in LARGE_TABLES:
+                    scans.append(relation)
+                for child in node.get('Plans', []):
+                    walk(child, depth + 1)
+            
+            walk(plan[0]['Plan'])
+            return scans, lines
+        
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        lines = [row[-1] for row in cursor.fetchall()]
+        scans = [
+            table for line in lines for table in LARGE_TABLES
+            if line.startswith(f"SCAN {table}") and "INDEX" not in line
+        ]
+        return scans, lines
+    finally:
+        connection.close()
+
+def check() -> int:
+    """EXPLAIN every probe; returns the number of unexpected sequential scans"""
+    from app.db.database import engine
+    failures = 0
+    for name, call in probes():
+        method = name.split('[')[0]
+        for statement, parameters in capture(call):
+            scans, plan = explain(statement, parameters)
+            allowed = FULL_SCAN_ALLOWED.get(method)
+            if not allowed and engine.dialect.name == 'sqlite':
+                allowed = SQLITE_FULL_SCAN_ALLOWED.get(method)
+            if scans and not allowed:
+                failures += 1
+                print(f"❌ {name}: sequential scan on {', '.join(sorted(set(scans)))}")
+                print(f"   {' '.join(statement.split())[:200]}")
+                for line in plan:
+                    print(f"      {line}")
+            elif scans:
+                print(f"⚠️  {name}: sequential scan allowed ({allowed})")
+            else:
+                print(f"✅ {name}: {plan[0] if plan else 'no plan'}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.query_plans",
+                                     description="Fail on sequential scans in DatabaseService queries")
+    parser.add_argument("--rows", type=int, default=100000, help="transactions rows in the fixture")
+    parser.add_argument("--days", type=int, default=30, help="days the fixture spans")
+    parser.add_argument("--database-url", default=None,
+                        help="scratch database to use instead of SQLite (its tables are cleared)")
+    args = parser.parse_args()
+    
+    use_database(args.database_url)
+    standins.use_redis("none")  # no cached responses: every call must reach the database
+    from app.services.read_cache import read_cache
+    read_cache.enabled = False  # ...including the in-process tier
+    standins.quiet_logging()
+    
+    print(f"🏗️ Loading {args.rows:,} transactions over {args.days} days...")
+    load_fixture(args.rows, args.days)
+    
+    failures = check()
+    if args.database_url:
+        standins.clear_database()
+    if failures:
+        print(f"❌ {failures} queries scan a large table sequentially")
+        sys.exit(1)
+    print("✅ No unexpected sequential scans")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+"""
+Benchmark scenarios
+Each scenario sets up its stand-ins, runs a workload and reports per-message latencies;
+run_scenario() adds throughput, an allocation probe pass and peak RSS
+"""
+import time
+import asyncio
+import logging
+import tempfile
+from typing import Dict
+from urllib.parse import urlsplit
+
+from benchmarks import standins
+from benchmarks.metrics import AllocationProbe, latency_summary, paired_latencies, peak_rss_mb
+from benchmarks.workload import Workload
+
+logger = logging.getLogger(__name__)
+
+TOPICS = {'core': 'core_txns', 'gateway': 'gateway_txns', 'mobile': 'mobile_txns'}
+VERDICT_TIMEOUT = 120.0
+
+def _record_verdicts(engine, verdicts: Dict[str, float]):
+    """Stamp the time each txn's verdict is decided (database writes queued on the batch writer)"""
+    process = engine._process_reconciliation_result
+    
+    def recorded(txn_id, sources, mismatches):
+        process(txn_id, sources, mismatches)
+        verdicts[txn_id] = time.perf_counter()
+    
+    engine._process_reconciliation_result = recorded
+
+def _flush_batch_writer():
+    """Make the verdict writes queued by the engine durable"""
+    from services.batch_writer import batch_writer
+    batch_writer.flush(VERDICT_TIMEOUT)
+
+def _wait_for(condition, timeout: float = VERDICT_TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+class Scenario:
+    """setup() before the clock starts, run() timed, teardown() after"""
+    
+    name = "base"
+    description = ""
+    
+    def __init__(self, options: dict):
+        self.options = options
+    
+    def setup(self, workload: Workload):
+        pass
+    
+    def run(self, workload: Workload) -> dict:
+        """Returns {'messages': n, 'latencies': [seconds, ...], ...extra fields}"""
+        raise NotImplementedError
+    
+    def teardown(self):
+        pass
+
+class EngineScenario(Scenario):
+    """ReconciliationEngine.add_transaction driven directly, one message at a time.
+    
+    Latency is from handing the completing source to add_transaction until
+    the verdict is decided (detection, Redis bookkeeping, database writes
+    queued). The final batch writer flush is inside the timed pass.
+    """
+    
+    name = "engine"
+    description = "single ReconciliationEngine, synchronous add_transaction"
+    
+    def setup(self, workload: Workload):
+        from services.real_reconciliation_service import ReconciliationEngine
+        self.verdicts = {}
+        self.engine = ReconciliationEngine()
+        _record_verdicts(self.engine, self.verdicts)
+    
+    def run(self, workload: Workload) -> dict:
+        ingest = {}
+        for message in workload.messages:
+            ingest[message['txn_id']] = time.perf_counter()  # the last source to arrive wins
+            self.engine.add_transaction(message)
+        
+        complete = _wait_for(lambda: len(self.verdicts) >= workload.transactions)
+        _flush_batch_writer()
+        return {
+            'messages': len(workload),
+            'latencies': paired_latencies(ingest, self.verdicts),
+            'verdicts': len(self.verdicts),
+            'complete': complete
+        }
+
+class ShardedEngineScenario(EngineScenario):
+    """ShardedReconciliationEngine with thread workers and micro-batches"""
+    
+    name = "sharded"
+    description = "ShardedReconciliationEngine (threads), txn_id-hashed shards"
+    
+    def setup(self, workload: Workload):
+        from services.real_reconciliation_service import ShardedReconciliationEngine
+        self.verdicts = {}
+        self.engine = ShardedReconciliationEngine(num_shards=self.options['shards'])
+        for shard in self.engine.shards:
+            _record_verdicts(shard, self.verdicts)
+        self.engine.start()
+    
+    def teardown(self):
+        self.engine.stop()
+
+class PipelineScenario(Scenario):
+    """Producer -> LocalBroker -> consumer group -> database -> sharded engine -> verdict.
+    
+    Latency is from producing the completing source to its verdict, so it
+    includes consume batching, batch persistence and shard queueing.
+    """
+    
+    name = "pipeline"
+    description = "LocalBroker + KafkaGroupConsumer + SQLite + sharded engine"
+    
+    def setup(self, workload: Workload):
+        from services.real_reconciliation_service import ShardedReconciliationEngine
+        from consumers.kafka_group_consumer import start_group_consumers
+        from backends import LocalSinkProducer
+        
+        self.broker = standins.new_broker(self.options['partitions'])
+        for topic in TOPICS.values():
+            self.broker.create_topic(topic)
+        self.producer = LocalSinkProducer(self.broker.produce)
+        
+        self.verdicts = {}
+        self.engine = ShardedReconciliationEngine(num_shards=self.options['shards'])
+        for shard in self.engine.shards:
+            _record_verdicts(shard, self.verdicts)
+        self.engine.start()
+        self.consumers = start_group_consumers(
+            self.engine, count=self.options['consumers'], topics=list(TOPICS.values()),
+            batch_size=self.options['batch_size'], poll_timeout=0.05, consumer_factory=self.broker.consumer
+        )
+    
+    def run(self, workload: Workload) -> dict:
+        produced = {}
+        for message in workload.messages:
+            produced[message['txn_id']] = time.perf_counter()
+            self.producer.send(TOPICS[message['source']], message, key=message['txn_id'])
+        
+        complete = _wait_for(lambda: len(self.verdicts) >= workload.transactions)
+        _wait_for(lambda: self.broker.lag(self.consumers[0].config['group.id']) == 0, timeout=10)
+        _flush_batch_writer()
+        return {
+            'messages': len(workload),
+            'latencies': paired_latencies(produced, self.verdicts),
+            'verdicts': len(self.verdicts),
+            'complete': complete,
+            'consumers': [consumer.get_status() for consumer in self.consumers]
+        }
+    
+    def teardown(self):
+        for consumer in self.consumers:
+            consumer.stop()
+        self.engine.stop()
+
+class DatabaseInsertScenario(Scenario):
+    """DatabaseService.save_transactions in consumer-sized batches; latency is per batch"""
+    
+    name = "db_insert"
+    description = "DatabaseService.save_transactions batches on SQLite"
+    
+    def run(self, workload: Workload) -> dict:
+        from app.services.database_service import db_service
+        size = self.options['batch_size']
+        latencies, failed = [], 0
+        for start in range(0, len(workload), size):
+            batch = workload.messages[start:start + size]
+            began = time.perf_counter()
+            if not db_service.save_transactions(batch):
+                failed += len(batch)
+            latencies.append(time.perf_counter() - began)
+        return {'messages': len(workload), 'latencies': latencies, 'failed': failed}
+
+class DatabaseVerdictScenario(Scenario):
+    """The per-verdict writes the engine does: update_reconciliation_status + save_mismatch"""
+    
+    name = "db_verdicts"
+    description = "DatabaseService verdict updates and mismatch inserts on SQLite"
+    
+    def setup(self, workload: Workload):
+        from app.services.database_service import db_service
+        db_service.save_transactions(workload.messages)
+        self.groups = {}
+        for message in workload.messages:
+            self.groups.setdefault(message['txn_id'], []).append(message)
+    
+    def run(self, workload: Workload) -> dict:
+        from app.services.database_service import db_service
+        latencies = []
+        for txn_id, messages in self.groups.items():
+            sources = [message['source'] for message in messages]
+            began = time.perf_counter()
+            if len({message['amount'] for message in messages}) > 1:
+                db_service.update_reconciliation_status(txn_id, 'MISMATCH', sources)
+                db_service.save_mismatch({
+                    'txn_id': txn_id, 'type': 'AMOUNT_MISMATCH', 'severity': 'HIGH',
+                    'details': 'benchmark', 'sources_involved': sources[:2]
+                })
+            else:
+                db_service.update_reconciliation_status(txn_id, 'MATCHED', sources)
+            latencies.append(time.perf_counter() - began)
+        return {'messages': len(workload), 'latencies': latencies, 'verdicts': len(self.groups)}
+
+class BatchWriterScenario(DatabaseVerdictScenario):
+    """The same verdict writes through a BatchWriter; latency is from submit until the flush commits"""
+    
+    name = "db_writer"
+    description = "BatchWriter verdict updates and mismatch inserts on SQLite"
+    
+    def run(self, workload: Workload) -> dict:
+        from services.batch_writer import BatchWriter
+        from app.services.database_service import db_service
+        
+        # Flushes take every buffered row in submit order, so flush k covers the
+        # verdicts submitted after flush k-1 up to its cumulative status count
+        committed = []
+        
+        def write(**batch):
+            ok = db_service.write_batch(**batch)
+            done = (committed[-1][0] if committed else 0) + len(batch['status_updates'])
+            committed.append((done, time.perf_counter()))
+            return ok
+        
+        writer = BatchWriter(write=write)
+        submitted, tickets = [], []
+        for txn_id, messages in self.groups.items():
+            sources = [message['source'] for message in messages]
+            submitted.append(time.perf_counter())
+            if len({message['amount'] for message in messages}) > 1:
+                writer.save_mismatches([{
+                    'txn_id': txn_id, 'type': 'AMOUNT_MISMATCH', 'severity': 'HIGH',
+                    'details': 'benchmark', 'sources_involved': sources[:2]
+                }])
+                tickets.append(writer.update_status(txn_id, 'MISMATCH', sources))
+            else:
+                tickets.append(writer.update_status(txn_id, 'MATCHED', sources))
+        writer.stop(VERDICT_TIMEOUT)
+        
+        latencies, flush = [], 0
+        for index, began in enumerate(submitted):
+            while committed[flush][0] <= index:
+                flush += 1
+            latencies.append(committed[flush][1] - began)
+        return {
+            'messages': len(workload),
+            'latencies': latencies,
+            'verdicts': sum(ticket.wait(0) for ticket in tickets),
+            'flushes': len(committed)
+        }
+
+class ApiScenario(Scenario):
+    """The simple analytics and dashboard routers over a reconciled dataset, called in-process over ASGI"""
+    
+    name = "api"
+    description = "analytics/dashboard routers via ASGI on a reconciled SQLite dataset"
+    
+    ENDPOINTS = [
+        "/api/stats",
+        "/api/transactions?limit=50",
+        "/api/mismatches?limit=50",
+        "/api/analytics/overview",
+        "/api/analytics/mismatch-summary",
+        "/api/analytics/source-distribution",
+        "/api/analytics/mismatch-type-counts",
+        "/api/analytics/timeline?hours=24",
+        "/api/analytics/anomalies"
+    ]
+    
+    def setup(self, workload: Workload):
+        from fastapi import FastAPI
+        from app.routers.auth_router_simple import DEMO_USERS, create_token
+        from app.routers.analytics_router_simple import router as analytics_router
+        from app.routers.dashboard_router_simple import router as dashboard_router
+        from app.services.database_service import db_service
+        from app.db.database import RequestSessionMiddleware
+        from services.real_reconciliation_service import ReconciliationEngine
+        
+        # Same mounts as main_simple.py, without the docker/psutil-backed health router
+        self.app = FastAPI()
+        self.app.add_middleware(RequestSessionMiddleware)
+        self.app.include_router(analytics_router, prefix="/api/analytics")
+        self.app.include_router(dashboard_router, prefix="/api")
+        self.token = create_token(DEMO_USERS['admin'])
+        
+        db_service.save_transactions(workload.messages)
+        engine = ReconciliationEngine()
+        engine.add_transactions([dict(message) for message in workload.messages])
+    
+    async def _get(self, url: str) -> int:
+        parts = urlsplit(url)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': parts.path, 'raw_path': parts.path.encode(),
+            'query_string': parts.query.encode(), 'root_path': '',
+            'headers': [(b'host', b'benchmark'), (b'authorization', f"Bearer {self.token}".encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('benchmark', 80)
+        }
+        response = {'status': None}
+        
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+        
+        await self.app(scope, receive, send)
+        return response['status']
+    
+    def run(self, workload: Workload) -> dict:
+        requests = self.options['api_requests']
+        
+        async def drive():
+            latencies, per_endpoint, errors = [], {}, 0
+            for url in self.ENDPOINTS:
+                samples = []
+                for _ in range(requests):
+                    began = time.perf_counter()
+                    status = await self._get(url)
+                    samples.append(time.perf_counter() - began)
+                    if status != 200:
+                        errors += 1
+                latencies.extend(samples)
+                per_endpoint[url] = latency_summary(samples)
+            return latencies, per_endpoint, errors
+        
+        from app.db.database import pool_metrics
+        checkouts = pool_metrics.snapshot()['checkouts']
+        latencies, per_endpoint, errors = asyncio.run(drive())
+        pool = pool_metrics.snapshot()
+        return {
+            'messages': len(latencies), 'latencies': latencies, 'errors': errors, 'endpoints': per_endpoint,
+            'pool_checkouts_per_request': round((pool['checkouts'] - checkouts) / max(len(latencies), 1), 2),
+            'pool_wait_p95_ms': pool['wait']['p95_ms']
+        }
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    EngineScenario, ShardedEngineScenario, PipelineScenario,
+    DatabaseInsertScenario, DatabaseVerdictScenario, BatchWriterScenario, ApiScenario
+)}
+
+def run_scenario(name: str, options: dict) -> dict:
+    """Run one scenario end to end in this process and return its result record.
+    
+    A timed pass over the full workload gives throughput and latency; a
+    second pass over a small sample, on cleared stores, runs under
+    tracemalloc for the allocation figures.
+    """
+    with tempfile.TemporaryDirectory(prefix="reconciliation-bench-") as directory:
+        standins.use_sqlite(directory)
+        redis_mode = standins.use_redis(options['redis'])
+        standins.quiet_logging()
+        
+        if options.get('load_file'):
+            workload = Workload.from_file(options['load_file'], options['transactions'])
+        else:
+            workload = Workload.generate(options['transactions'], options['seed'])
+        
+        scenario = SCENARIOS[name](options)
+        timed_input = workload.copy()
+        scenario.setup(workload)
+        try:
+            started = time.perf_counter()
+            outcome = scenario.run(timed_input)
+            elapsed = time.perf_counter() - started
+        finally:
+            scenario.teardown()
+        
+        standins.clear_database()
+        standins.flush_redis()
+        sample = workload.sample(options['alloc_sample'])
+        sample_input = sample.copy()
+        scenario.setup(sample)
+        try:
+            with AllocationProbe() as probe:
+                sampled = scenario.run(sample_input)
+        finally:
+            scenario.teardown()
+        
+        messages = outcome.pop('messages')
+        return {
+            'scenario': name,
+            'description': scenario.description,
+            'redis': redis_mode,
+            'messages': messages,
+            'transactions': workload.transactions,
+            'elapsed_s': round(elapsed, 3),
+            'msgs_per_sec': round(messages / elapsed, 1) if elapsed else None,
+            'latency': latency_summary(outcome.pop('latencies')),
+            'allocations': probe.per_message(sampled['messages']),
+            'peak_rss_mb': peak_rss_mb(),
+            **outcome
+        }
+
+def run_isolated(name: str, options: dict, results):
+    """Process target: run_scenario with the result (or the error) sent back through a queue"""
+    try:
+        results.put(run_scenario(name, options))
+    except Exception as e:
+        results.put({'scenario': name, 'error': f"{type(e).__name__}: {e}"})
@@ -0,0 +1,134 @@
+"""
+In-process stand-ins for Postgres, Redis and Kafka
+SQLite replaces Postgres, fakeredis replaces Redis and the consumers' LocalBroker replaces
+Kafka, so every benchmark runs on one machine without docker
+"""
+import os
+import sys
+import logging
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(BACKEND_DIR, "app")
+PRODUCERS_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "producers")
+
+# The app is imported both as a package (app.services...) and, by the engine and
+# consumers, as top-level modules (services...), exactly like the running services do.
+# producers/ goes before app/ so `utils` is the producers' module, not app/utils (unused by the app).
+for path in (BACKEND_DIR, PRODUCERS_DIR, APP_DIR):
+    if path not in sys.path:
+        sys.path.append(path)
+
+logger = logging.getLogger(__name__)
+
+REDIS_MODES = ("auto", "fake", "none", "real")
+
+def use_sqlite(directory: str) -> str:
+    """Point DATABASE_URL at a fresh SQLite file and create the tables.
+    
+    Must run before anything imports app.db.database, which builds the
+    engine from DATABASE_URL at import time.
+    """
+    if "app.db.database" in sys.modules:
+        raise RuntimeError("use_sqlite() must be called before the app's database module is imported")
+    
+    path = os.path.join(directory, "reconciliation_bench.db")
+    if os.path.exists(path):
+        os.remove(path)
+    url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+    
+    from sqlalchemy import event
+    from app.db.database import Base, engine, async_engine
+    from app.models.transaction import Transaction  # noqa: F401 (registers the table)
+    from app.models.mismatch import Mismatch  # noqa: F401
+    from app.models.rollup import TransactionRollup, MismatchRollup  # noqa: F401
+    
+    def _sqlite_pragmas(connection, _):
+        # WAL + a busy timeout let the consumer and shard threads write concurrently
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+    
+    event.listen(engine, "connect", _sqlite_pragmas)
+    if async_engine is not None:
+        # aiosqlite connections for the async routers
+        event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+    
+    Base.metadata.create_all(engine)
+    return url
+
+def clear_database():
+    """Delete every row written by a previous pass"""
+    from sqlalchemy import text
+    from app.db.database import engine
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM mismatches"))
+        connection.execute(text("DELETE FROM transactions"))
+        connection.execute(text("DELETE FROM mismatch_rollups"))
+        connection.execute(text("DELETE FROM transaction_rollups"))
+
+def use_redis(mode: str = "auto") -> str:
+    """Swap the client of every loaded redis_service for the chosen stand-in.
+    
+    fake: fakeredis in this process; none: a client that cannot connect
+    (the services' Redis-down paths); real: leave localhost:6379 alone;
+    auto: fake when fakeredis is installed, else none. Returns the mode used.
+    """
+    if mode not in REDIS_MODES:
+        raise ValueError(f"Unknown redis mode {mode!r}, expected one of {REDIS_MODES}")
+    
+    if mode in ("auto", "fake"):
+        try:
+            import fakeredis
+        except ImportError:
+            if mode == "fake":
+                raise ImportError("fakeredis is required for --redis fake (pip install -r benchmarks/requirements.txt)")
+            mode = "none"
+    
+    if mode == "real":
+        return mode
+    
+    import redis
+    if mode == "fake":
+        client = fakeredis.FakeRedis(decode_responses=True)
+    else:
+        # Port 1 refuses immediately, so every call takes the "Redis unavailable" branch
+        client = redis.Redis(host="127.0.0.1", port=1, decode_responses=True, socket_connect_timeout=0.1)
+    
+    # Engine and consumers import services.redis_service, the routers app.services.redis_service
+    for name in ("services.redis_service", "app.services.redis_service"):
+        try:
+            module = __import__(name, fromlist=["redis_service"])
+        except ImportError:
+            continue
+        module.redis_service.redis_client = client
+        module.redis_service.breaker.reset()  # the cached health verdict was for the old client
+    return mode
+
+def flush_redis():
+    for name in ("services.redis_service", "app.services.redis_service"):
+        module = sys.modules.get(name)
+        if module is not None:
+            try:
+                module.redis_service.redis_client.flushdb()
+            except Exception:
+                pass
+    # The in-process tier of the read cache holds results of the previous pass too
+    for name in ("services.read_cache", "app.services.read_cache"):
+        module = sys.modules.get(name)
+        if module is not None:
+            module.read_cache.clear()
+
+def new_broker(partitions: int = 3):
+    """In-memory Kafka stand-in with the consumer group API KafkaGroupConsumer uses"""
+    from consumers.local_broker import LocalBroker
+    return LocalBroker(partitions)
+
+def quiet_logging(level: int = logging.WARNING):
+    """The engine logs every transaction at INFO; keep the benchmark measuring work, not stderr"""
+    logging.getLogger().setLevel(level)
+    for name in ("services.real_reconciliation_service", "consumers.kafka_group_consumer",
+                 "services.batch_mismatch_detector", "services.reconciliation_rules"):
+        logging.getLogger(name).setLevel(level)
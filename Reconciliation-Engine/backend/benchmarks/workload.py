@@ -0,0 +1,73 @@
+"""
+Benchmark workloads
+Coordinated multi-source transactions from the producers' load generator, in arrival order
+"""
+import json
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from benchmarks import standins  # noqa: F401 (puts producers/ on sys.path)
+from load_generator import generate_group, read_file, parse_skew, ReplayScheduler
+
+class Workload:
+    """Messages (source transactions as dicts) in the order the consumers receive them.
+    
+    expected maps txn_id -> number of sources that will report it, so a
+    benchmark knows when every complete transaction has its verdict.
+    """
+    
+    def __init__(self, messages: List[dict]):
+        self.messages = messages
+        self.expected = {}
+        for message in messages:
+            self.expected[message['txn_id']] = self.expected.get(message['txn_id'], 0) + 1
+    
+    def __len__(self):
+        return len(self.messages)
+    
+    @property
+    def transactions(self) -> int:
+        return len(self.expected)
+    
+    @classmethod
+    def generate(cls, transactions: int, seed: int = 42, out_of_order: float = 0.05, max_delay: float = 0.5,
+                 skew: Optional[str] = "gateway=0.05,mobile=0.2", rate: float = 10000.0) -> 'Workload':
+        """Generate in memory: MISMATCH_WEIGHTS mismatches, shuffled sources, replay reordering"""
+        random.seed(seed)
+        start = datetime.now().replace(microsecond=0)
+        scheduler = ReplayScheduler(rate, out_of_order, max_delay, parse_skew(skew), seed)
+        
+        ordered = []
+        for index in range(transactions):
+            for source, txn in generate_group(start + timedelta(seconds=index / rate)):
+                ordered.extend(item for _, item in scheduler.push(source, txn))
+        ordered.extend(item for _, item in scheduler.drain())
+        return cls(ordered)
+    
+    @classmethod
+    def from_file(cls, path: str, limit: Optional[int] = None) -> 'Workload':
+        """Load a file written by producers/load_generator.py (file order, no extra reordering)"""
+        _, messages = read_file(path)
+        ordered, seen, previous = [], 0, None
+        for _, txn_id, payload in messages:
+            if txn_id != previous:
+                seen += 1
+                previous = txn_id
+                if limit is not None and seen > limit:
+                    break
+            ordered.append(json.loads(payload))
+        return cls(ordered)
+    
+    def sample(self, transactions: int) -> 'Workload':
+        """The messages of the first `transactions` txn_ids, in arrival order"""
+        keep = set()
+        for message in self.messages:
+            if len(keep) >= transactions:
+                break
+            keep.add(message['txn_id'])
+        return Workload([message for message in self.messages if message['txn_id'] in keep])
+    
+    def copy(self) -> 'Workload':
+        """Fresh dicts (the engine and persistence paths annotate the ones they receive)"""
+        return Workload([dict(message) for message in self.messages])
@@ -9,9 +9,12 @@ import os
 # Add the app directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
+from sqlalchemy import text
 from app.db.database import SessionLocal
 from app.models.transaction import Transaction
 from app.models.mismatch import Mismatch
+from app.models.rollup import TransactionRollup, MismatchRollup
+from app.services.read_cache import read_cache, DATASETS
 
 def clear_all_data():
     """Clear all transactions and mismatches from database"""
@@ -25,20 +28,32 @@ def clear_all_data():
         
         print(f"📊 Found {transaction_count:,} transactions and {mismatch_count:,} mismatches")
         
-        # Delete all mismatches first (foreign key constraint)
-        deleted_mismatches = db.query(Mismatch).delete()
-        print(f"🗑️ Deleted {deleted_mismatches:,} mismatches")
-        
-        # Delete all transactions
-        deleted_transactions = db.query(Transaction).delete()
-        print(f"🗑️ Deleted {deleted_transactions:,} transactions")
+        if db.get_bind().dialect.name == 'postgresql':
+            # TRUNCATE empties every partition at once instead of deleting row by row
+            db.execute(text("TRUNCATE mismatches, transactions, transaction_rollups, mismatch_rollups"))
+            print(f"🗑️ Truncated {mismatch_count:,} mismatches and {transaction_count:,} transactions")
+        else:
+            # Delete all mismatches first (foreign key constraint)
+            deleted_mismatches = db.query(Mismatch).delete()
+            print(f"🗑️ Deleted {deleted_mismatches:,} mismatches")
+            
+            # Delete all transactions
+            deleted_transactions = db.query(Transaction).delete()
+            print(f"🗑️ Deleted {deleted_transactions:,} transactions")
+            
+            # Reset the dashboard rollups with the rows they count
+            db.query(TransactionRollup).delete()
+            db.query(MismatchRollup).delete()
         
         # Commit the changes
         db.commit()
         
+        # Cached dashboard reads of the old rows are superseded in every API instance
+        read_cache.invalidate(DATASETS)
+        
         print("✅ All transaction data cleared successfully!")
         print("🚀 Ready for fresh data generation")
-        
+    
     except Exception as e:
         print(f"❌ Error clearing data: {e}")
         db.rollback()
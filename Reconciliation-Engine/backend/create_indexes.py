@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Index migration for Banking Reconciliation Engine
+Creates the hot-query indexes declared on the models on an existing database
+(create_tables.py creates them with new tables); indexes already present are skipped
+"""
+import sys
+import os
+
+# Add the app directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+
+from sqlalchemy import inspect
+from app.db.database import engine
+from app.models.transaction import Transaction
+from app.models.mismatch import Mismatch
+from app.services.partition_manager import partition_manager
+
+def create_indexes() -> bool:
+    """Create every model index missing from the database"""
+    try:
+        print("🏗️ Creating hot-query indexes...")
+        
+        # CONCURRENTLY cannot run inside a transaction block
+        postgresql = engine.dialect.name == 'postgresql'
+        options = {'isolation_level': 'AUTOCOMMIT'} if postgresql else {}
+        
+        with engine.connect().execution_options(**options) as connection:
+            inspector = inspect(connection)
+            for model in (Transaction, Mismatch):
+                table = model.__table__
+                existing = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in sorted(table.indexes, key=lambda index: index.name):
+                    if index.name in existing:
+                        print(f"   = {index.name} (exists)")
+                        continue
+                    
+                    if postgresql and not partition_manager.is_partitioned(connection, table.name):
+                        # Build without blocking the consumers' inserts (not supported on partitioned parents)
+                        index.dialect_options['postgresql']['concurrently'] = True
+                    index.create(connection)
+                    
+                    # Dialect-specific indexes (ddl_if) are silently skipped elsewhere
+                    created = {index['name'] for index in inspect(connection).get_indexes(table.name)}
+                    if index.name in created:
+                        print(f"   + {index.name}")
+                    else:
+                        print(f"   - {index.name} (not used on {engine.dialect.name})")
+            
+            if not postgresql:
+                connection.commit()
+            
+            # Refresh planner statistics so the new indexes are picked up
+            connection.exec_driver_sql("ANALYZE")
+        
+        print("✅ Indexes up to date!")
+    
+    except Exception as e:
+        print(f"❌ Error creating indexes: {e}")
+        return False
+    
+    return True
+
+if __name__ == "__main__":
+    if not create_indexes():
+        sys.exit(1)
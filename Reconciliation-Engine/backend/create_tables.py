@@ -11,6 +11,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 from app.db.database import engine, Base
 from app.models.transaction import Transaction
 from app.models.mismatch import Mismatch
+from app.models.rollup import TransactionRollup, MismatchRollup
 
 def create_tables():
     """Create all database tables"""
@@ -24,7 +25,14 @@ def create_tables():
         print("📊 Tables created:")
         print("   - transactions")
         print("   - mismatches")
+        print("   - transaction_rollups, mismatch_rollups")
         
+        # Backfill the per-minute rollups from rows written before they existed
+        from app.services.database_service import db_service
+        if not db_service.rebuild_rollups():
+            return False
+        print("✅ Rollups rebuilt from existing rows")
+    
     except Exception as e:
         print(f"❌ Error creating tables: {e}")
         return False
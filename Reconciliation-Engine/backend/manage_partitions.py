@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Partition management for Banking Reconciliation Engine
+    
+    python manage_partitions.py convert              # one-off: partition existing tables (stop writers first)
+    python manage_partitions.py maintain             # pre-create partitions and apply RETENTION_DAYS
+    python manage_partitions.py retention --days 90  # detach/drop partitions older than 90 days
+    python manage_partitions.py status
+"""
+import sys
+import os
+import json
+import argparse
+
+# Add the app directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+
+from app.services.partition_manager import partition_manager, PARTITIONED_TABLES
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage transactions/mismatches partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("convert", help="convert the tables to range-partitioned tables")
+    commands.add_parser("maintain", help="pre-create partitions and apply retention")
+    retention = commands.add_parser("retention", help="detach or drop partitions older than --days")
+    retention.add_argument("--days", type=int, required=True)
+    retention.add_argument("--mode", choices=("detach", "drop"), default=None)
+    commands.add_parser("status", help="show partitioning status")
+    args = parser.parse_args()
+    
+    if args.command == "convert":
+        ok = all(partition_manager.convert(table) for table in PARTITIONED_TABLES)
+        print("✅ Tables partitioned" if ok else "❌ Conversion failed (see log)")
+        sys.exit(0 if ok else 1)
+    
+    if args.command == "maintain":
+        print(json.dumps(partition_manager.maintain(), indent=2))
+    elif args.command == "retention":
+        if args.mode:
+            partition_manager.retention_mode = args.mode
+        print(json.dumps(partition_manager.apply_retention(args.days), indent=2))
+    else:
+        print(json.dumps(partition_manager.get_status(), indent=2))
+
+if __name__ == "__main__":
+    main()
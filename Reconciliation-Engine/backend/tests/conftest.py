@@ -0,0 +1,29 @@
+import os
+import sys
+
+# Import the app as a package (app.services...) the way the benchmarks do
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import pytest
+
+@pytest.fixture(scope="session")
+def database(tmp_path_factory):
+    """app.services.database_service on a SQLite file, shared by the session.
+    
+    The app builds its engine from DATABASE_URL when app.db.database is
+    first imported, so it is pointed at SQLite once, before any test needs it.
+    """
+    from benchmarks import standins
+    standins.use_sqlite(str(tmp_path_factory.mktemp("db")))
+    standins.use_redis("none")
+    from app.services import database_service
+    return database_service
+
+@pytest.fixture
+def db_service(database):
+    """The global DatabaseService, on empty tables"""
+    from benchmarks import standins
+    standins.clear_database()
+    return database.db_service
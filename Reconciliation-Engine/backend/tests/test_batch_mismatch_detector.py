@@ -0,0 +1,120 @@
+"""
+BatchMismatchDetector.detect() against the scalar reference, RuleProfile.detect,
+over batches that mix columnar and scalar buckets, unusable field values and
+amounts on the tolerance edge
+"""
+import random
+
+import pytest
+
+from benchmarks import standins
+from services.batch_mismatch_detector import BatchMismatchDetector
+from services.reconciliation_rules import DEFAULT_RULES, RuleSet
+
+MIN_BATCH = 16
+BASE_AMOUNT = 2500.0
+
+# A high-value band and an ATM channel give each batch several profiles, so one detect()
+# call has buckets above min_batch (columnar) and below it (scalar)
+RULES = dict(DEFAULT_RULES, overrides=[
+    {'name': 'high-value', 'min_amount': 100000, 'rules': {'amount': {'tolerance': 0}}},
+    {'name': 'atm-clock-drift', 'channel': 'ATM', 'rules': {'timestamp': {'tolerance': 900}}}
+])
+
+AMOUNT_DELTAS = [0, 0, 0.005, 0.01, -0.01, 0.0100001, 0.02, 1.0]
+ODD_AMOUNTS = [None, 'abc', '2500.00', '', [2500]]
+STATUSES = ['SUCCESS', 'success', 'PENDING', 'FAILED']
+ODD_STATUSES = [None, 7]
+CURRENCIES = ['INR', 'INR', 'Rs', None]
+ACCOUNTS = ['ACC1', 'ACC1', 'ACC2', '', None]
+TIMESTAMPS = ['2024-03-01T10:00:00', '2024-03-01T10:05:00', '2024-03-01T10:05:01', '2024-03-01T10:20:00',
+              '2024-03-01T04:30:00Z', '2024-03-01T10:00:00+05:30', 'yesterday', '', None]
+
+@pytest.fixture(autouse=True)
+def quiet():
+    standins.quiet_logging()
+
+def source_txn(rng: random.Random, base: float, odd: float) -> dict:
+    txn = {
+        'amount': base + rng.choice(AMOUNT_DELTAS),
+        'status': rng.choice(STATUSES),
+        'currency': rng.choice(CURRENCIES),
+        'account_id': rng.choice(ACCOUNTS),
+        'timestamp': rng.choice(TIMESTAMPS),
+        'channel': rng.choice(['ATM', 'atm', 'UPI', None])
+    }
+    if rng.random() < odd:
+        txn['amount'] = rng.choice(ODD_AMOUNTS)
+    if rng.random() < odd:
+        txn['status'] = rng.choice(ODD_STATUSES)
+    for field in ('status', 'currency', 'account_id', 'timestamp'):
+        if rng.random() < odd:
+            del txn[field]
+    return txn
+
+def make_groups(seed: int, count: int, odd: float = 0.0) -> list:
+    rng = random.Random(seed)
+    groups = []
+    for index in range(count):
+        base = rng.choice([BASE_AMOUNT, BASE_AMOUNT, 150000.0])
+        sources = rng.sample(['core', 'gateway', 'mobile'], rng.choice([2, 2, 3]))
+        groups.append((f"T{index}", {source: source_txn(rng, base, odd) for source in sources}))
+    return groups
+
+def reference(rules: RuleSet, groups: list) -> list:
+    """RuleProfile.detect per group; 'failed' where the scalar comparators raise"""
+    results = []
+    for _, sources in groups:
+        try:
+            results.append(rules.profile_for(sources).detect(sources))
+        except Exception:
+            results.append('failed')
+    return results
+
+def detected(rules: RuleSet, groups: list) -> list:
+    results = []
+    for mismatches in BatchMismatchDetector(min_batch=MIN_BATCH).detect(groups, rules):
+        if [mismatch['type'] for mismatch in mismatches] == ['INVALID_DATA']:
+            results.append('failed')
+        else:
+            results.append(mismatches)
+    return results
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('count', [MIN_BATCH - 1, MIN_BATCH, 60, 300])
+def test_matches_the_scalar_reference(seed, count):
+    rules = RuleSet(RULES)
+    groups = make_groups(seed, count)
+    
+    assert detected(rules, groups) == reference(rules, groups)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_the_scalar_reference_with_unusable_fields(seed):
+    rules = RuleSet(RULES)
+    groups = make_groups(seed, 200, odd=0.05)
+    
+    expected = reference(rules, groups)
+    assert 'failed' in expected
+    assert detected(rules, groups) == expected
+
+def test_amount_tolerance_edge():
+    rules = RuleSet(DEFAULT_RULES)
+    deltas = [0.0, 0.005, 0.01, 0.0100001, 0.011]
+    groups = [(f"T{index}", {'core': {'amount': 100.0}, 'gateway': {'amount': 100.0 + delta}})
+              for index, delta in enumerate(deltas * 4)]
+    
+    expected = reference(rules, groups)
+    assert len(groups) >= MIN_BATCH
+    assert detected(rules, groups) == expected
+    assert detected(rules, groups[:len(deltas)]) == expected[:len(deltas)]
+    # Exactly the tolerance apart only mismatches through float error, the same way on both paths
+    assert [bool(mismatches) for mismatches in expected[:len(deltas)]] == [abs(100.0 + d - 100.0) > 0.01 for d in deltas]
+
+def test_failed_group_carries_the_error():
+    rules = RuleSet(DEFAULT_RULES)
+    groups = [('T1', {'core': {'amount': 'abc'}, 'gateway': {'amount': 1.0}})]
+    
+    [[mismatch]] = BatchMismatchDetector().detect(groups, rules)
+    assert (mismatch['type'], mismatch['severity']) == ('INVALID_DATA', 'HIGH')
+    assert 'abc' in mismatch['details']
+    assert mismatch['sources'] == ['core', 'gateway']
@@ -0,0 +1,139 @@
+"""
+Commit, retry and routing behaviour of KafkaGroupConsumer, driven batch by batch
+against the in-memory LocalBroker with a recording engine in place of the shards
+"""
+import json
+import threading
+
+import pytest
+
+from benchmarks import standins  # noqa: F401 (puts the app's top-level packages on sys.path)
+from consumers import kafka_group_consumer
+from consumers.kafka_group_consumer import KafkaGroupConsumer
+from consumers.local_broker import LocalBroker
+from services.batch_writer import FlushTicket
+
+TOPIC = 'core_txns'
+GROUP = 'test-group'
+
+class RecordingEngine:
+    """Stands in for ShardedReconciliationEngine: records (txn_id, shard) per dispatch"""
+    num_shards = 2
+    
+    def __init__(self):
+        self.added = []
+    
+    def add_transaction(self, transaction: dict, shard=None):
+        self.added.append((transaction['txn_id'], shard))
+
+@pytest.fixture
+def broker():
+    return LocalBroker(partitions=4)
+
+@pytest.fixture
+def engine():
+    return RecordingEngine()
+
+def produce(broker, *txn_ids, partition=None):
+    for txn_id in txn_ids:
+        broker.produce(TOPIC, json.dumps({'txn_id': txn_id, 'source': 'core', 'amount': 10.0}),
+                       key=txn_id, partition=partition)
+
+def member(broker, engine, **options):
+    """A group member and its subscribed consumer, stepped through process_batch by the test"""
+    group = KafkaGroupConsumer(engine, topics=[TOPIC], group_id=GROUP, consumer_factory=broker.consumer, **options)
+    group.retry_delay = 0
+    consumer = group.consumer_factory(group.config)
+    consumer.subscribe(group.topics, on_assign=group._on_assign, on_revoke=group._on_revoke)
+    return group, consumer
+
+def step(group, consumer) -> list:
+    messages = consumer.consume(num_messages=group.batch_size, timeout=0)
+    group.process_batch(consumer, messages)
+    return messages
+
+def log_ends(broker) -> dict:
+    return {(TOPIC, partition): len(log) for partition, log in enumerate(broker.logs[TOPIC]) if log}
+
+def test_offsets_commit_only_after_the_flush_ticket_resolves(broker, engine, monkeypatch):
+    ticket = FlushTicket()
+    submitted = threading.Event()
+    
+    class PendingWriter:
+        def save_transactions(self, transactions):
+            submitted.set()
+            return ticket
+    
+    monkeypatch.setattr(kafka_group_consumer, '_batch_writer', PendingWriter)
+    produce(broker, 'T1', 'T2', 'T3', 'T4')
+    group, consumer = member(broker, engine)
+    
+    worker = threading.Thread(target=step, args=(group, consumer))
+    worker.start()
+    assert submitted.wait(5)
+    worker.join(0.2)
+    
+    assert worker.is_alive()
+    assert broker.committed_offsets(GROUP) == {}
+    assert engine.added == []
+    
+    ticket.resolve(True)
+    worker.join(5)
+    
+    assert broker.committed_offsets(GROUP) == log_ends(broker)
+    assert sorted(txn_id for txn_id, _ in engine.added) == ['T1', 'T2', 'T3', 'T4']
+
+def test_failed_persist_rewinds_and_redelivers_the_batch(broker, engine):
+    batches = []
+    
+    def persist(transactions):
+        batches.append(sorted(txn['txn_id'] for txn in transactions))
+        return len(batches) > 1
+    
+    produce(broker, 'T1', 'T2', 'T3')
+    group, consumer = member(broker, engine, persist=persist, persist_one=None)
+    
+    step(group, consumer)
+    assert broker.committed_offsets(GROUP) == {}
+    assert engine.added == []
+    
+    step(group, consumer)
+    assert batches == [['T1', 'T2', 'T3'], ['T1', 'T2', 'T3']]
+    assert broker.committed_offsets(GROUP) == log_ends(broker)
+    assert sorted(txn_id for txn_id, _ in engine.added) == ['T1', 'T2', 'T3']
+    assert group.stats['persist_failures'] == 1
+
+def test_rejected_batch_drops_only_the_rows_that_fail_alone(broker, engine):
+    produce(broker, 'T1', 'BAD', 'T3')
+    group, consumer = member(broker, engine, persist=lambda transactions: False,
+                             persist_one=lambda transaction: transaction['txn_id'] != 'BAD')
+    
+    step(group, consumer)
+    
+    assert sorted(txn_id for txn_id, _ in engine.added) == ['T1', 'T3']
+    assert broker.committed_offsets(GROUP) == log_ends(broker)
+    assert (group.stats['persisted'], group.stats['dropped']) == (2, 1)
+
+def test_batch_every_row_rejects_is_retried_not_dropped(broker, engine):
+    produce(broker, 'T1', 'T2')
+    group, consumer = member(broker, engine, persist=lambda transactions: False,
+                             persist_one=lambda transaction: False)
+    
+    step(group, consumer)
+    
+    assert engine.added == []
+    assert broker.committed_offsets(GROUP) == {}
+    assert group.stats['dropped'] == 0
+
+@pytest.mark.parametrize('shard_by_partition', [True, False])
+def test_shard_routing(broker, engine, shard_by_partition):
+    for partition in range(broker.partitions):
+        produce(broker, f"T{partition}", partition=partition)
+    group, consumer = member(broker, engine, persist=lambda transactions: True,
+                             shard_by_partition=shard_by_partition)
+    
+    step(group, consumer)
+    
+    expected = {f"T{partition}": partition % engine.num_shards if shard_by_partition else None
+                for partition in range(broker.partitions)}
+    assert dict(engine.added) == expected
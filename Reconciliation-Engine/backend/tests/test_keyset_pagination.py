@@ -0,0 +1,120 @@
+"""
+Keyset page cursors: encoding, rejection of malformed cursors, and walking the
+transactions and mismatches lists both ways over rows sharing a timestamp
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+START = datetime(2024, 3, 1, 10, 0, 0)
+PAGE = 4
+
+def transactions(database, count: int, per_timestamp: int) -> list:
+    """count rows, per_timestamp of them sharing each created_at"""
+    return [database.transaction_row({'txn_id': f"T{index}", 'source': 'core', 'amount': 10.0, 'status': 'SUCCESS'},
+                            START + timedelta(seconds=index // per_timestamp))
+            for index in range(count)]
+
+def walk(fetch) -> tuple:
+    """Every page forward through next_cursor, then back through prev_cursor"""
+    forward = [fetch(None)]
+    while forward[-1]['next_cursor']:
+        forward.append(fetch(forward[-1]['next_cursor']))
+    
+    backward = [forward[-1]]
+    while backward[-1]['prev_cursor']:
+        backward.append(fetch(backward[-1]['prev_cursor']))
+    backward.reverse()
+    return forward, backward
+
+def ids(pages: list) -> list:
+    return [[item['id'] for item in page['items']] for page in pages]
+
+def table_order(db_service, table: str, time_column: str) -> list:
+    """Ids in the order the pages must return them, straight from the table"""
+    with db_service.get_db() as db:
+        return [row_id for row_id, in db.execute(text(f"SELECT id FROM {table} ORDER BY {time_column} DESC, id DESC"))]
+
+# ==================== CURSORS ====================
+
+def test_cursor_round_trip(database):
+    encode_cursor, decode_cursor = database.encode_cursor, database.decode_cursor
+    moment = datetime(2024, 3, 1, 10, 0, 0, 123456)
+    
+    assert decode_cursor(encode_cursor(moment, 42, 'next')) == (moment, 42, 'next')
+    assert decode_cursor(encode_cursor(moment, 7, 'prev')) == (moment, 7, 'prev')
+    assert '=' not in encode_cursor(moment, 42, 'next')
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'not a cursor',
+    '!!!!',
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+    raw_cursor(['2024-03-01T10:00:00', 1, 'next']),
+    raw_cursor({'t': '2024-03-01T10:00:00', 'i': 1}),
+    raw_cursor({'t': '2024-03-01T10:00:00', 'i': 1, 'd': 'sideways'}),
+    raw_cursor({'t': 'yesterday', 'i': 1, 'd': 'next'}),
+    raw_cursor({'t': '2024-03-01T10:00:00', 'i': 'one', 'd': 'next'}),
+    raw_cursor({'t': None, 'i': 1, 'd': 'prev'}),
+])
+def test_malformed_cursor_raises_value_error(database, cursor):
+    with pytest.raises(ValueError):
+        database.decode_cursor(cursor)
+
+def test_page_with_a_malformed_cursor_raises_value_error(db_service):
+    with pytest.raises(ValueError):
+        db_service.get_transactions_page(limit=PAGE, cursor='garbage')
+    with pytest.raises(ValueError):
+        db_service.get_mismatches_page(limit=PAGE, cursor=raw_cursor({'t': '2024-03-01', 'i': 1, 'd': 'up'}))
+
+# ==================== PAGES ====================
+
+@pytest.mark.parametrize('count, per_timestamp', [(23, 3), (16, 16), (8, 1), (4, 2), (1, 1)])
+def test_transactions_walk_both_ways_through_shared_timestamps(database, db_service, count, per_timestamp):
+    assert db_service.write_batch(transactions=transactions(database, count, per_timestamp))
+    expected = table_order(db_service, 'transactions', 'created_at')
+    
+    forward, backward = walk(lambda cursor: db_service.get_transactions_page(limit=PAGE, cursor=cursor))
+    
+    assert [row_id for page in ids(forward) for row_id in page] == expected
+    assert ids(backward) == ids(forward)
+    assert all(len(page) == PAGE for page in ids(forward)[:-1])
+    assert forward[0]['prev_cursor'] is None
+    assert forward[-1]['next_cursor'] is None
+
+def test_mismatches_walk_both_ways_through_shared_timestamps(database, db_service):
+    rows = [database.mismatch_row({'txn_id': f"T{index}", 'type': 'AMOUNT_MISMATCH', 'severity': 'HIGH',
+                          'details': 'Amount differs', 'sources_involved': ['core', 'gateway']},
+                         START + timedelta(seconds=index // 5))
+            for index in range(17)]
+    assert db_service.write_batch(mismatches=rows)
+    expected = table_order(db_service, 'mismatches', 'detected_at')
+    
+    forward, backward = walk(lambda cursor: db_service.get_mismatches_page(limit=PAGE, cursor=cursor))
+    
+    assert [row_id for page in ids(forward) for row_id in page] == expected
+    assert ids(backward) == ids(forward)
+    assert forward[0]['total'] == 17
+
+def test_filters_apply_on_every_page(database, db_service):
+    rows = transactions(database, 12, 4)
+    for row in rows[::2]:
+        row['source'] = 'gateway'
+    assert db_service.write_batch(transactions=rows)
+    
+    forward, backward = walk(lambda cursor: db_service.get_transactions_page(limit=PAGE, cursor=cursor, source='gateway'))
+    
+    assert {item['source'] for page in forward for item in page['items']} == {'gateway'}
+    assert sum(len(page['items']) for page in forward) == 6
+    assert ids(backward) == ids(forward)
+
+def test_empty_table_has_no_cursors(db_service):
+    page = db_service.get_transactions_page(limit=PAGE)
+    
+    assert (page['items'], page['next_cursor'], page['prev_cursor']) == ([], None, None)
@@ -0,0 +1,131 @@
+"""
+Matching-window behaviour of the in-memory pending store: expiry, late sources
+and the event-time watermark, on a fake clock with Redis unavailable and the
+batch writer recording what it would have written
+"""
+from datetime import datetime
+
+import pytest
+
+from benchmarks import standins
+from services import real_reconciliation_service as service
+
+WINDOW = 60.0
+START = 1_700_000_000.0
+
+class FakeClock:
+    """Stands in for the time module the engine reads (wall clock and monotonic move together)"""
+    def __init__(self, wall: float = START):
+        self.wall = wall
+    
+    def time(self) -> float:
+        return self.wall
+    
+    def monotonic(self) -> float:
+        return self.wall
+    
+    def advance(self, seconds: float):
+        self.wall += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(service, "time", clock)
+    return clock
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Calls the engine made to the batch writer, as (txn_id, status, sources) / mismatch rows"""
+    writes = {"status": [], "mismatches": []}
+    monkeypatch.setattr(service.batch_writer, "update_status",
+                        lambda txn_id, status, sources: writes["status"].append((txn_id, status, sorted(sources))))
+    monkeypatch.setattr(service.batch_writer, "save_mismatches", writes["mismatches"].extend)
+    return writes
+
+@pytest.fixture
+def engine(clock, writes):
+    standins.use_redis("none")
+    standins.quiet_logging()
+    return service.ReconciliationEngine(matching_window=WINDOW, pending_store="memory")
+
+def txn(source, at, txn_id="T1", amount=100.0, channel="ATM"):
+    # Naive local time, the way the producers stamp their events
+    return {'txn_id': txn_id, 'source': source, 'amount': amount, 'status': 'SUCCESS',
+            'currency': 'INR', 'account_id': 'ACC1', 'channel': channel,
+            'timestamp': datetime.fromtimestamp(at).isoformat()}
+
+def test_expired_txn_stamps_a_late_source_with_its_verdict(engine, clock, writes):
+    engine.add_transaction(txn('core', clock.time()))
+    clock.advance(WINDOW + 1)
+    engine.advance_idle()
+    
+    assert engine.expired_count == 1
+    assert engine.total_reconciled == 1
+    assert engine.verdicts['T1'] == 'MISMATCH'
+    assert [m['type'] for m in writes["mismatches"]] == ['MISSING_SOURCE']
+    
+    engine.add_transaction(txn('gateway', clock.time()))
+    
+    assert engine.late_count == 1
+    assert engine.total_reconciled == 1
+    assert engine.get_pending_count() == 0
+    assert writes["status"][-1] == ('T1', 'MISMATCH', ['gateway'])
+    assert len(writes["mismatches"]) == 1
+
+def test_expired_marker_is_dropped_one_window_later(engine, clock):
+    engine.add_transaction(txn('core', clock.time()))
+    clock.advance(WINDOW + 1)
+    engine.advance_idle()
+    clock.advance(WINDOW + 1)
+    engine.advance_idle()
+    
+    assert 'T1' not in engine.verdicts
+    assert not engine.first_seen and not engine.expiry_heap
+    assert engine.get_pending_count() == 0
+    assert engine.total_reconciled == 1
+
+def test_source_completing_and_following_a_txn_in_one_batch_is_stamped(engine, clock, writes):
+    now = clock.time()
+    engine.add_transactions([txn('core', now), txn('gateway', now), txn('mobile', now)])
+    
+    assert engine.total_reconciled == 1
+    assert engine.late_count == 1
+    assert writes["status"] == [('T1', 'MATCHED', ['core', 'gateway']),
+                                ('T1', 'MATCHED', ['core', 'gateway', 'mobile'])]
+
+def test_future_skewed_first_event_does_not_expire_the_others(engine, clock):
+    engine.add_transaction(txn('core', clock.time() + 3600, txn_id='T1'))
+    engine.add_transaction(txn('core', clock.time(), txn_id='T2'))
+    engine.add_transaction(txn('gateway', clock.time(), txn_id='T2'))
+    
+    assert engine.watermark <= clock.time()
+    assert engine.expired_count == 0
+    assert engine.total_reconciled == 1
+    assert engine.get_pending_count() == 1
+    
+    clock.advance(WINDOW + 1)
+    engine.advance_idle()
+    assert engine.expired_count == 1
+
+def test_lagging_source_clock_does_not_expire_its_txn(engine, clock, writes):
+    engine.add_transaction(txn('core', clock.time(), txn_id='T0'))
+    # A naive UTC stamp read as local time on a UTC+05:30 host: five and a half hours behind
+    engine.add_transaction(txn('core', clock.time() - 19800))
+    engine.add_transaction(txn('gateway', clock.time()))
+    
+    assert engine.expired_count == 0
+    assert engine.total_reconciled == 1
+    # Reconciled complete (the stamps still disagree), not expired with a missing source
+    assert [(txn_id, sources) for txn_id, _, sources in writes["status"]] == [('T1', ['core', 'gateway'])]
+    assert 'MISSING_SOURCE' not in {m['type'] for m in writes["mismatches"]}
+
+def test_failed_detection_is_a_verdict(engine, clock, writes):
+    engine.add_transaction(txn('core', clock.time(), amount='abc'))
+    engine.add_transaction(txn('gateway', clock.time()))
+    
+    assert engine.verdicts['T1'] == 'MISMATCH'
+    assert engine.get_pending_count() == 0
+    assert writes["status"] == [('T1', 'MISMATCH', ['core', 'gateway'])]
+    [row] = writes["mismatches"]
+    assert (row['type'], row['severity']) == ('INVALID_DATA', 'HIGH')
+    assert 'abc' in row['details']
@@ -0,0 +1,179 @@
+"""
+Rule compilation, channel and amount-band profile selection, and hot reload of
+the rule file by RuleRegistry
+"""
+import json
+import os
+
+import pytest
+
+from benchmarks import standins
+from services.reconciliation_rules import DEFAULT_RULES, RuleRegistry, RuleSet, normalize_channel
+
+HIGH_VALUE = {'name': 'high-value', 'min_amount': 100000, 'rules': {'amount': {'tolerance': 0}}}
+MID_VALUE = {'name': 'mid-value', 'min_amount': 10000, 'max_amount': 100000, 'rules': {'amount': {'tolerance': 0.5}}}
+ATM = {'name': 'atm-clock-drift', 'channel': 'atm', 'rules': {'timestamp': {'tolerance': 900}}}
+
+@pytest.fixture(autouse=True)
+def quiet():
+    standins.quiet_logging()
+
+def definition(*overrides, **changes) -> dict:
+    return dict(DEFAULT_RULES, overrides=list(overrides), **changes)
+
+def sources(*amounts, channel=None) -> dict:
+    return {f"s{index}": {'amount': amount, 'channel': channel} for index, amount in enumerate(amounts)}
+
+def rule(profile, name):
+    [compiled] = [rule for rule in profile.rules if rule.name == name]
+    return compiled
+
+# ==================== CHANNELS ====================
+
+@pytest.mark.parametrize('value, expected', [
+    ('ATM', 'ATM'), ('atm', 'ATM'), (' Upi ', 'UPI'), ('', None), ('   ', None), (None, None)
+])
+def test_normalize_channel(value, expected):
+    assert normalize_channel(value) == expected
+
+@pytest.mark.parametrize('channel', ['ATM', 'atm', ' Atm'])
+def test_channel_override_matches_any_case(channel):
+    rules = RuleSet(definition(ATM))
+    
+    assert rules.channels == {'ATM'}
+    assert rules.profile_for(sources(10.0, 10.0, channel=channel)).key == 'atm-clock-drift'
+    assert rules.profile_for(sources(10.0, 10.0, channel='UPI')).key == 'base'
+
+def test_engine_source_profiles_match_any_case():
+    from services.real_reconciliation_service import ReconciliationEngine
+    engine = ReconciliationEngine(source_profiles={'atm': frozenset(['core', 'gateway'])}, pending_store='memory')
+    
+    assert engine.expected_sources({'channel': 'ATM'}) == frozenset(['core', 'gateway'])
+    assert engine.expected_sources({'channel': ' atm'}) == frozenset(['core', 'gateway'])
+    assert engine.expected_sources({'channel': 'UPI'}) == frozenset(['core', 'gateway', 'mobile'])
+
+# ==================== COMPILATION ====================
+
+def test_defaults_compile_to_one_profile():
+    rules = RuleSet(DEFAULT_RULES)
+    
+    assert rules.profile_for(sources(10.0, 10.0, channel='ATM')) is rules.base
+    assert rules.base.rule_names == [spec['name'] for spec in DEFAULT_RULES['pair_rules']]
+    assert rules.severity_for('AMOUNT_MISMATCH') == 'HIGH'
+    assert rules.severity_for('MISSING_FIELD') == 'MEDIUM'
+    assert rules.severity_for('UNKNOWN') == 'LOW'
+
+def test_override_patches_only_its_rule():
+    rules = RuleSet(definition(ATM))
+    atm = rules.profile_for(sources(10.0, channel='ATM'))
+    
+    late = {'timestamp': '2024-03-01T10:10:00'}
+    on_time = {'timestamp': '2024-03-01T10:00:00'}
+    assert rule(atm, 'timestamp').check('core', on_time, 'gateway', late) is None
+    assert rule(rules.base, 'timestamp').check('core', on_time, 'gateway', late)['type'] == 'TIMESTAMP_MISMATCH'
+    assert rule(atm, 'amount') is not rule(rules.base, 'amount')
+    assert rule(atm, 'amount').check('core', {'amount': 1.0}, 'gateway', {'amount': 2.0})['severity'] == 'HIGH'
+
+def test_disabled_rule_is_not_compiled():
+    rules = RuleSet(definition({'name': 'no-status', 'channel': 'ATM', 'rules': {'status': {'enabled': False}}}))
+    
+    assert 'status' not in rules.profile_for(sources(1.0, channel='ATM')).rule_names
+    assert 'status' in rules.base.rule_names
+
+def test_identical_resolutions_share_a_profile():
+    noop = {'name': 'noop', 'channel': 'POS', 'rules': {'amount': {'tolerance': 0.01}}}
+    rules = RuleSet(definition(noop))
+    
+    assert rules.profiles[('POS', 0)] is rules.profiles[(None, 0)]
+
+@pytest.mark.parametrize('broken, message', [
+    (definition(pair_rules=[dict(DEFAULT_RULES['pair_rules'][0], severity='CRITICAL')]), 'unknown severity'),
+    (definition(pair_rules=[dict(DEFAULT_RULES['pair_rules'][0], compare='fuzzy')]), 'unknown compare'),
+    (definition(pair_rules=[{'type': 'AMOUNT_MISMATCH', 'field': 'amount'}]), 'without a name'),
+    (definition({'name': 'typo', 'rules': {'amount_rule': {'tolerance': 0}}}), 'unknown rules'),
+    (definition({'name': 'bad-band', 'min_amount': 'lots', 'rules': {}}), 'could not convert'),
+])
+def test_invalid_definitions_raise(broken, message):
+    with pytest.raises(ValueError, match=message):
+        RuleSet(broken)
+
+# ==================== AMOUNT BANDS ====================
+
+@pytest.mark.parametrize('amounts, expected', [
+    ((50.0, 50.0), 'base'),
+    ((9999.99,), 'base'),
+    ((10000.0,), 'mid-value'),
+    ((99999.99,), 'mid-value'),
+    ((100000.0,), 'high-value'),
+    ((500.0, 250000.0), 'high-value'),   # the largest amount any source reports
+    (('abc', 20000.0), 'mid-value'),     # unusable amounts are skipped
+    (('abc', None), 'base'),
+])
+def test_amount_band_selection(amounts, expected):
+    rules = RuleSet(definition(MID_VALUE, HIGH_VALUE))
+    
+    assert rules.bounds == [10000.0, 100000.0]
+    assert rules.profile_for(sources(*amounts)).key == expected
+
+def test_band_and_channel_overrides_combine():
+    rules = RuleSet(definition(ATM, HIGH_VALUE))
+    
+    profile = rules.profile_for(sources(200000.0, channel='atm'))
+    assert profile.key == 'atm-clock-drift+high-value'
+    assert rule(profile, 'amount').check('core', {'amount': 1.0}, 'gateway', {'amount': 1.001}) is not None
+    assert rule(profile, 'timestamp').check('core', {'timestamp': '2024-03-01T10:00:00'},
+                                            'gateway', {'timestamp': '2024-03-01T10:10:00'}) is None
+
+# ==================== HOT RELOAD ====================
+
+def write_rules(path, content, mtime):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content if isinstance(content, str) else json.dumps(content))
+    os.utime(path, (mtime, mtime))
+
+def test_registry_reloads_on_mtime_change_and_keeps_the_last_good_rules(tmp_path):
+    path = str(tmp_path / 'rules.json')
+    write_rules(path, definition(ATM, version=2), mtime=1000)
+    registry = RuleRegistry(path, check_interval=0)
+    
+    first = registry.current()
+    assert (first.version, first.origin, registry.reload_count) == (2, path, 1)
+    assert registry.current() is first  # unchanged mtime: not recompiled
+    
+    write_rules(path, definition(HIGH_VALUE, version=3), mtime=2000)
+    second = registry.current()
+    assert second.version == 3
+    assert second.profile_for(sources(200000.0)).key == 'high-value'
+    
+    write_rules(path, '{"pair_rules": [', mtime=3000)
+    assert registry.current() is second
+    assert registry.last_error
+    assert registry.info()['version'] == 3
+    
+    write_rules(path, definition(pair_rules=[{'name': 'amount', 'type': 'AMOUNT_MISMATCH', 'field': 'amount',
+                                              'compare': 'numeric', 'severity': 'CRITICAL'}]), mtime=4000)
+    assert registry.current() is second
+    assert 'CRITICAL' in registry.last_error
+    assert registry.reload_count == 2
+    
+    write_rules(path, definition(version=4), mtime=5000)
+    assert registry.current().version == 4
+    assert registry.last_error is None
+
+def test_registry_checks_the_file_at_most_every_interval(tmp_path):
+    path = str(tmp_path / 'rules.json')
+    write_rules(path, definition(version=1), mtime=1000)
+    registry = RuleRegistry(path, check_interval=3600)
+    assert registry.current().version == 1  # checks the file and arms the interval
+    
+    write_rules(path, definition(version=2), mtime=2000)
+    assert registry.current().version == 1
+    
+    registry.next_check = 0.0
+    assert registry.current().version == 2
+
+def test_registry_without_a_readable_file_uses_the_defaults(tmp_path):
+    registry = RuleRegistry(str(tmp_path / 'missing.json'), check_interval=0)
+    
+    assert registry.current().origin == 'defaults'
+    assert registry.last_error
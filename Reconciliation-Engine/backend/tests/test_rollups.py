@@ -0,0 +1,106 @@
+"""
+The per-minute rollups behind get_rollup_stats() stay equal to counting the
+tables directly through inserts, verdicts, repeated verdicts and changed ones
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+START = datetime(2024, 3, 1, 10, 0, 0)
+SOURCES = ['core', 'gateway', 'mobile']
+STATUSES = ['SUCCESS', 'PENDING', 'FAILED']
+
+def transactions(database, count: int) -> list:
+    """Three source rows per txn, spread over several minutes"""
+    return [database.transaction_row({'txn_id': f"T{index}", 'source': source, 'amount': 10.0,
+                                      'status': STATUSES[(index + offset) % len(STATUSES)]},
+                                     START + timedelta(seconds=25 * index))
+            for index in range(count) for offset, source in enumerate(SOURCES)]
+
+def mismatches(database, txn_ids: list) -> list:
+    return [database.mismatch_row({'txn_id': txn_id, 'type': mtype, 'severity': severity, 'details': 'differs',
+                                   'sources_involved': ['core', 'gateway']},
+                                  START + timedelta(seconds=40 * index))
+            for index, txn_id in enumerate(txn_ids)
+            for mtype, severity in [('AMOUNT_MISMATCH', 'HIGH'), ('STATUS_MISMATCH', 'MEDIUM')][:1 + index % 2]]
+
+def verdict(status: str, sources=('core', 'gateway', 'mobile')) -> tuple:
+    return status, list(sources), datetime.now()
+
+def counted(db_service, since=None, until=None) -> dict:
+    """get_rollup_stats() computed with COUNT(*) ... GROUP BY on the tables themselves"""
+    def grouped(table, column, time_column):
+        conditions, params = [], {}
+        if since is not None:
+            conditions.append(f"{time_column} >= :since")
+            params['since'] = since.replace(second=0, microsecond=0)
+        if until is not None:
+            conditions.append(f"{time_column} < :until")
+            params['until'] = until
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = db.execute(text(f"SELECT {column}, COUNT(*) FROM {table} {where} GROUP BY {column}"), params).all()
+        return {value: count for value, count in rows}
+    
+    with db_service.get_db() as db:
+        by_source = grouped('transactions', 'source', 'created_at')
+        by_type = grouped('mismatches', 'mismatch_type', 'detected_at')
+        return {
+            'transactions': sum(by_source.values()),
+            'mismatches': sum(by_type.values()),
+            'by_source': by_source,
+            'by_status': grouped('transactions', 'status', 'created_at'),
+            'by_reconciliation_status': grouped('transactions', 'reconciliation_status', 'created_at'),
+            'by_mismatch_type': by_type,
+            'by_severity': grouped('mismatches', 'severity', 'detected_at')
+        }
+
+def test_rollups_match_the_tables_through_status_changes(database, db_service):
+    assert db_service.write_batch(transactions=transactions(database, 20))
+    assert db_service.get_rollup_stats() == counted(db_service)
+    assert db_service.get_rollup_stats()['by_reconciliation_status'] == {'PENDING': 60}
+    
+    # Verdicts in the same batch as their mismatch rows, as the batch writer flushes them
+    mismatched = [f"T{index}" for index in range(0, 20, 3)]
+    assert db_service.write_batch(
+        mismatches=mismatches(database, mismatched),
+        status_updates={txn_id: verdict('MISMATCH') for txn_id in mismatched}
+    )
+    assert db_service.write_batch(status_updates={f"T{index}": verdict('MATCHED') for index in range(1, 20, 3)})
+    assert db_service.get_rollup_stats() == counted(db_service)
+    
+    # The same verdicts again (a late source, a redelivered batch) must not count twice
+    assert db_service.write_batch(status_updates={txn_id: verdict('MISMATCH') for txn_id in mismatched})
+    assert db_service.update_reconciliation_status('T1', 'MATCHED', ['core', 'gateway'])
+    assert db_service.get_rollup_stats() == counted(db_service)
+    
+    # A changed verdict moves the rows between buckets
+    assert db_service.update_reconciliation_status('T1', 'MISMATCH', ['core', 'gateway', 'mobile'])
+    stats = db_service.get_rollup_stats()
+    assert stats == counted(db_service)
+    assert stats['by_reconciliation_status'] == {'PENDING': 18, 'MISMATCH': 24, 'MATCHED': 18}
+
+def test_status_change_for_rows_inserted_in_the_same_batch(database, db_service):
+    assert db_service.write_batch(transactions=transactions(database, 2),
+                                  status_updates={'T0': verdict('MATCHED'), 'T1': verdict('MISMATCH')})
+    
+    stats = db_service.get_rollup_stats()
+    assert stats == counted(db_service)
+    assert stats['by_reconciliation_status'] == {'MATCHED': 3, 'MISMATCH': 3}
+
+def test_windowed_rollups_match_the_tables(database, db_service):
+    assert db_service.write_batch(transactions=transactions(database, 20),
+                                  mismatches=mismatches(database, [f"T{index}" for index in range(10)]))
+    assert db_service.write_batch(status_updates={f"T{index}": verdict('MATCHED') for index in range(0, 20, 2)})
+    
+    for since, until in [(START + timedelta(minutes=2), None), (None, START + timedelta(minutes=3)),
+                         (START + timedelta(minutes=1, seconds=30), START + timedelta(minutes=5))]:
+        assert db_service.get_rollup_stats(since, until) == counted(db_service, since, until)
+
+def test_rebuild_reproduces_the_incremental_rollups(database, db_service):
+    assert db_service.write_batch(transactions=transactions(database, 10),
+                                  mismatches=mismatches(database, ['T1', 'T2', 'T3']))
+    assert db_service.write_batch(status_updates={'T1': verdict('MISMATCH'), 'T4': verdict('MATCHED')})
+    incremental = db_service.get_rollup_stats()
+    
+    assert db_service.rebuild_rollups()
+    assert db_service.get_rollup_stats() == incremental == counted(db_service)
@@ -0,0 +1,103 @@
+"""
+Behaviour of the shared (Redis) pending store scripts: ready, late, expired and
+abandoned-claim takeover, with two RedisService instances standing in for two
+consumer processes on one fakeredis server
+"""
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis runs the Lua scripts through lupa
+
+from app.services.redis_service import RedisService
+
+TTL = 600
+CLAIM_TIMEOUT = 60
+EXPECTED = ('core', 'gateway')
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+def process(server) -> RedisService:
+    service = RedisService()
+    service.redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    return service
+
+@pytest.fixture
+def first(server):
+    return process(server)
+
+@pytest.fixture
+def second(server):
+    return process(server)
+
+def entry(source, txn_id='T1', ts=1000.0):
+    return (txn_id, source, {'txn_id': txn_id, 'source': source, 'amount': 10.0}, ts, EXPECTED)
+
+def add(service, source, claim_timeout=CLAIM_TIMEOUT, **kwargs):
+    [result] = service.add_pending_sources([entry(source, **kwargs)], TTL, claim_timeout)
+    return result
+
+def test_completing_source_claims_the_txn_once(first, second):
+    assert add(first, 'core') == ('pending', None, {})
+    state, verdict, sources = add(second, 'gateway')
+    
+    assert (state, verdict, sorted(sources)) == ('ready', None, ['core', 'gateway'])
+    assert first.count_pending() == 0
+    assert first.redis_client.zscore(first.pending_claims_key, 'T1') is not None
+    assert first.count_inflight(EXPECTED) == {'core': 1, 'gateway': 1}
+
+def test_verdict_ends_the_claim_and_clears_the_indexes(first):
+    add(first, 'core')
+    add(first, 'gateway')
+    
+    assert first.record_pending_verdicts([('T1', EXPECTED, 'MATCHED')]) == {}
+    assert first.redis_client.zcard(first.pending_claims_key) == 0
+    assert first.count_inflight(EXPECTED) == {'core': 0, 'gateway': 0}
+
+def test_source_after_the_verdict_gets_it(first, second):
+    add(first, 'core')
+    add(first, 'gateway')
+    first.record_pending_verdicts([('T1', EXPECTED, 'MISMATCH')])
+    
+    state, verdict, sources = add(second, 'mobile')
+    assert (state, verdict) == ('late', 'MISMATCH')
+    assert 'mobile' in sources
+    assert first.redis_client.hget('temp:T1', '_late') is None
+
+def test_source_before_the_verdict_is_returned_to_the_verdict_owner(first, second):
+    add(first, 'core')
+    add(first, 'gateway')
+    
+    assert add(second, 'mobile')[:2] == ('late', None)
+    assert first.record_pending_verdicts([('T1', EXPECTED, 'MATCHED')]) == {'T1': ['mobile']}
+    assert first.redis_client.hget('temp:T1', '_late') is None
+
+def test_expired_txn_is_claimed_by_one_process(first, second):
+    add(first, 'core', ts=1000.0)
+    
+    assert first.claim_expired_pending(1000.0, CLAIM_TIMEOUT) == []
+    [(txn_id, sources, reclaimed)] = first.claim_expired_pending(1001.0, CLAIM_TIMEOUT)
+    assert (txn_id, sorted(sources), reclaimed) == ('T1', ['core'], False)
+    assert second.claim_expired_pending(1001.0, CLAIM_TIMEOUT) == []
+    assert first.count_pending() == 0
+
+def test_claim_without_a_verdict_is_taken_over_after_its_deadline(first, second):
+    # The first process claims with an already passed deadline, then dies before its verdict
+    add(first, 'core')
+    assert add(first, 'gateway', claim_timeout=0)[0] == 'ready'
+    
+    [(txn_id, sources, reclaimed)] = second.claim_expired_pending(None, CLAIM_TIMEOUT)
+    assert (txn_id, sorted(sources), reclaimed) == ('T1', ['core', 'gateway'], True)
+    assert first.claim_expired_pending(None, CLAIM_TIMEOUT) == []  # the new claim is live
+    
+    second.record_pending_verdicts([('T1', EXPECTED, 'MATCHED')])
+    assert second.redis_client.zcard(second.pending_claims_key) == 0
+
+def test_claim_with_a_verdict_is_not_taken_over(first, second):
+    add(first, 'core')
+    add(first, 'gateway', claim_timeout=0)
+    first.redis_client.hset('temp:T1', '_verdict', 'MATCHED')  # verdict stored, claim not yet ended
+    
+    assert second.claim_expired_pending(None, CLAIM_TIMEOUT) == []
+    assert second.redis_client.zcard(second.pending_claims_key) == 0
@@ -0,0 +1,312 @@
+"""
+Producer backends
+One send()/flush()/close() interface over an in-process batching Kafka producer,
+a long-lived docker console producer, and local sinks for tests and load runs
+"""
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+
+try:
+    from confluent_kafka import Producer
+except ImportError:  # only the kafka backend needs the client library
+    Producer = None
+
+PRODUCER_BACKEND = os.getenv("PRODUCER_BACKEND", "kafka")
+KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
+KAFKA_CONTAINER = os.getenv("KAFKA_CONTAINER", "kafka-kafka-1")
+
+def encode_message(value) -> bytes:
+    """Compact JSON, the format the reconciliation consumers parse"""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+
+class ProducerBackend(ABC):
+    """Common interface: send() queues a message, flush() waits for delivery"""
+    
+    name = "base"
+    
+    def __init__(self):
+        self.sent = 0
+        self.delivered = 0
+        self.failed = 0
+        self.last_error = None
+    
+    @abstractmethod
+    def send(self, topic: str, value, key: str = None) -> bool:
+        """Queue one message (dict, str or bytes); False if it could not be queued"""
+    
+    def flush(self, timeout: float = 30) -> int:
+        """Block until queued messages are delivered; returns how many are still pending"""
+        return 0
+    
+    def close(self):
+        self.flush()
+    
+    def stats(self) -> dict:
+        return {
+            'backend': self.name,
+            'sent': self.sent,
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'last_error': self.last_error
+        }
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+class KafkaBatchProducer(ProducerBackend):
+    """In-process confluent-kafka producer that batches, compresses and pipelines sends.
+    
+    Messages are keyed by txn_id so every source topic puts a transaction on
+    the same partition number (see KAFKA_SHARD_BY_PARTITION on the consumer).
+    send() never blocks on the network: librdkafka lingers up to linger_ms to
+    fill batches and reports each message through the delivery callback.
+    """
+    
+    name = "kafka"
+    
+    def __init__(self, bootstrap_servers: str = KAFKA_BOOTSTRAP_SERVERS, linger_ms: int = 20,
+                 batch_size: int = 10000, compression: str = "lz4", acks: str = "all",
+                 queue_max_messages: int = 500000, on_delivery=None, **config):
+        super().__init__()
+        if Producer is None:
+            raise ImportError("confluent-kafka is required for the kafka producer backend")
+        
+        self.on_delivery = on_delivery
+        self.producer = Producer({
+            'bootstrap.servers': bootstrap_servers,
+            'linger.ms': linger_ms,
+            'batch.num.messages': batch_size,
+            'compression.type': compression,
+            'acks': acks,
+            'enable.idempotence': acks == "all",
+            'queue.buffering.max.messages': queue_max_messages,
+            **config
+        })
+    
+    def _delivered(self, err, msg):
+        if err is not None:
+            self.failed += 1
+            self.last_error = str(err)
+        else:
+            self.delivered += 1
+        if self.on_delivery:
+            self.on_delivery(err, msg)
+    
+    def send(self, topic: str, value, key: str = None) -> bool:
+        payload = encode_message(value)
+        while True:
+            try:
+                self.producer.produce(topic, payload, key=key, on_delivery=self._delivered)
+                break
+            except BufferError:
+                # Local queue full: serve delivery reports until there is room
+                self.producer.poll(0.1)
+            except Exception as e:
+                self.failed += 1
+                self.last_error = str(e)
+                print(f"Exception sending message: {e}")
+                return False
+        
+        self.sent += 1
+        self.producer.poll(0)  # serve delivery callbacks without blocking
+        return True
+    
+    def flush(self, timeout: float = 30) -> int:
+        return self.producer.flush(timeout)
+
+class DockerConsoleProducer(ProducerBackend):
+    """kafka-console-producer inside the Kafka container, one long-lived process per topic.
+    
+    For setups where only `docker exec` reaches the broker. Messages are
+    written as lines to the process's stdin instead of starting a process
+    per message, and the pipes are flushed every linger_ms; delivery is only
+    known when the process exits. Each process's stderr goes to a temporary
+    file (an undrained pipe would block it once full, and then send()).
+    """
+    
+    name = "docker"
+    
+    def __init__(self, container: str = KAFKA_CONTAINER, bootstrap_servers: str = "localhost:9092",
+                 linger_ms: int = 50):
+        super().__init__()
+        self.container = container
+        self.bootstrap_servers = bootstrap_servers
+        self.processes = {}
+        self.errors = {}   # {topic: temporary file holding the current process's stderr}
+        self.written = {}  # {topic: lines written to the current process}
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_periodically, args=(linger_ms / 1000,), daemon=True)
+        self.flusher.start()
+    
+    def _flush_periodically(self, interval: float):
+        while not self.closed.wait(interval):
+            self.flush()
+    
+    def _process(self, topic: str):
+        process = self.processes.get(topic)
+        if process is None or process.poll() is not None:
+            if process is not None:
+                # Died: settle what was written to it before starting a new one
+                self._finish(topic, process)
+            cmd = [
+                "docker", "exec", "-i", self.container,
+                "kafka-console-producer",
+                "--bootstrap-server", self.bootstrap_servers,
+                "--topic", topic,
+                "--property", "parse.key=true",
+                "--property", "key.separator=\t"
+            ]
+            self.errors[topic] = tempfile.TemporaryFile()
+            process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                       stderr=self.errors[topic])
+            self.processes[topic] = process
+            self.written[topic] = 0
+        return process
+    
+    def _finish(self, topic: str, process):
+        """Count the lines written to an exited process as delivered or failed (lock held)"""
+        if process.returncode == 0:
+            self.delivered += self.written[topic]
+        else:
+            self.failed += self.written[topic]
+            errors = self.errors[topic]
+            errors.seek(0)
+            print(f"Error sending messages to {topic}: {errors.read().decode('utf-8', 'ignore')}")
+        self.errors.pop(topic).close()
+        self.written[topic] = 0
+    
+    def send(self, topic: str, value, key: str = None) -> bool:
+        line = (key or '').encode('utf-8') + b'\t' + encode_message(value) + b'\n'
+        with self.lock:
+            try:
+                self._process(topic).stdin.write(line)
+                self.written[topic] += 1
+            except Exception as e:
+                self.failed += 1
+                self.last_error = str(e)
+                print(f"Exception sending message: {e}")
+                return False
+        self.sent += 1
+        return True
+    
+    def flush(self, timeout: float = 30) -> int:
+        with self.lock:
+            for process in self.processes.values():
+                try:
+                    process.stdin.flush()
+                except Exception as e:
+                    self.last_error = str(e)
+        return 0
+    
+    def close(self):
+        self.closed.set()
+        with self.lock:
+            for topic, process in self.processes.items():
+                try:
+                    process.stdin.close()
+                    process.wait(timeout=30)
+                except Exception as e:
+                    self.last_error = str(e)
+                self._finish(topic, process)
+            self.processes = {}
+            self.written = {}
+
+class LocalSinkProducer(ProducerBackend):
+    """Hands every message to a local sink callable: sink(topic, value_bytes, key_bytes).
+    
+    Delivery is synchronous, so tests and load runs can check exactly what
+    was produced. Any function with that signature works, e.g. the
+    consumer's in-memory LocalBroker.produce.
+    """
+    
+    name = "local"
+    
+    def __init__(self, sink):
+        super().__init__()
+        self.sink = sink
+    
+    def send(self, topic: str, value, key: str = None) -> bool:
+        try:
+            self.sink(topic, encode_message(value), key.encode('utf-8') if key else None)
+        except Exception as e:
+            self.failed += 1
+            self.last_error = str(e)
+            return False
+        self.sent += 1
+        self.delivered += 1
+        return True
+    
+    def flush(self, timeout: float = 30) -> int:
+        if hasattr(self.sink, 'flush'):
+            self.sink.flush()
+        return 0
+    
+    def close(self):
+        if hasattr(self.sink, 'close'):
+            self.sink.close()
+
+class MemorySink:
+    """Collects (topic, value, key) tuples in a list"""
+    
+    def __init__(self):
+        self.messages = []
+        self.lock = threading.Lock()
+    
+    def __call__(self, topic: str, value: bytes, key: bytes = None):
+        with self.lock:
+            self.messages.append((topic, value, key))
+    
+    def by_topic(self, topic: str) -> list:
+        return [json.loads(value) for message_topic, value, _ in self.messages if message_topic == topic]
+
+class JsonLinesSink:
+    """Appends one JSON line per message to <directory>/<topic>.jsonl"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.files = {}
+        self.lock = threading.Lock()
+    
+    def __call__(self, topic: str, value: bytes, key: bytes = None):
+        with self.lock:
+            handle = self.files.get(topic)
+            if handle is None:
+                handle = self.files[topic] = open(os.path.join(self.directory, f"{topic}.jsonl"), 'ab')
+            handle.write(value + b'\n')
+    
+    def flush(self):
+        with self.lock:
+            for handle in self.files.values():
+                handle.flush()
+    
+    def close(self):
+        with self.lock:
+            for handle in self.files.values():
+                handle.close()
+            self.files = {}
+
+def create_producer(backend: str = None, **options) -> ProducerBackend:
+    """Build a producer backend by name: kafka, docker, memory or file:<directory>"""
+    backend = backend or PRODUCER_BACKEND
+    if backend == "kafka":
+        return KafkaBatchProducer(**options)
+    if backend == "docker":
+        return DockerConsoleProducer(**options)
+    if backend == "memory":
+        return LocalSinkProducer(options.get('sink') or MemorySink())
+    if backend.startswith("file:"):
+        return LocalSinkProducer(JsonLinesSink(backend[len("file:"):]))
+    raise ValueError(f"Unknown producer backend: {backend}")
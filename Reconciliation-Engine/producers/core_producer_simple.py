@@ -1,15 +1,11 @@
-from confluent_kafka import Producer
 import time
-import json
 from utils import generate_txn, apply_mismatch, choose_mismatch
+from backends import create_producer
 
 TOPIC = "core_txns"
 SOURCE = "core"
 
-producer = Producer({"bootstrap.servers": "localhost:9092"})
-
-def serialize_json(record):
-    return json.dumps(record).encode('utf-8')
+producer = create_producer()
 
 while True:
     mismatch = choose_mismatch()
@@ -19,11 +15,10 @@ while True:
         txn = apply_mismatch(txn, mismatch)
     
     try:
-        serialized_data = serialize_json(txn)
-        producer.produce(TOPIC, serialized_data)
+        if not producer.send(TOPIC, txn, key=txn['txn_id']):
+            raise RuntimeError(producer.stats()['last_error'])
         print(f"[CORE] Sent → {txn} | Mismatch = {mismatch}")
     except Exception as e:
         print(f"[CORE] Failed to send → {txn} | Mismatch = {mismatch} | Error: {e}")
     
-    producer.flush()
     time.sleep(1)
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+Synthetic load generator and replay harness
+Pre-generates coordinated multi-source transactions (same channels, sources and mismatch
+weights as coordinated_producer.py) into a compact gzip file, then replays the file through
+a producer backend at a target rate with out-of-order arrival and per-source skew
+
+    python load_generator.py generate month_end.load.gz --transactions 5000000 --workers 8
+    python load_generator.py replay month_end.load.gz --rate 20000 --out-of-order 0.05 \\
+        --max-delay 2.0 --skew gateway=0.3,mobile=1.5 --backend kafka
+"""
+import argparse
+import gzip
+import heapq
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+from utils import MISMATCH_WEIGHTS, CHANNEL_SOURCES, generate_base_transaction, create_source_transaction
+from backends import create_producer
+
+FILE_FORMAT = "reconciliation-load/1"
+TOPICS = {
+    'core': 'core_txns',
+    'gateway': 'gateway_txns',
+    'mobile': 'mobile_txns'
+}
+CHUNK_SIZE = 20000  # transactions per gzip member (one unit of work for a generator process)
+
+# ==================== GENERATION ====================
+
+def generate_group(event_time: datetime) -> list:
+    """All source messages of one coordinated transaction, in the order the sources see it"""
+    base_txn = generate_base_transaction(event_time)
+    # Seeded ids keep a generated file reproducible
+    base_txn["txn_id"] = str(uuid.UUID(int=random.getrandbits(128), version=4))
+    
+    sources = list(CHANNEL_SOURCES[base_txn["channel"]])
+    random.shuffle(sources)
+    
+    messages = []
+    for source in sources:
+        txn, _ = create_source_transaction(base_txn, source, event_time)
+        txn["processing_time"] = (event_time + timedelta(seconds=random.uniform(0.5, 3.0))).isoformat()
+        txn["source_system_id"] = f"{source.upper()}_SYS_{random.randint(100, 999)}"
+        messages.append((source, txn))
+    return messages
+
+def _generate_chunk(args) -> bytes:
+    """One gzip member holding `count` transactions: lines of source<TAB>txn_id<TAB>json"""
+    chunk_index, first, count, seed, start, event_rate = args
+    random.seed(f"{seed}:{chunk_index}")
+    
+    lines = []
+    for index in range(first, first + count):
+        event_time = start + timedelta(seconds=index / event_rate)
+        for source, txn in generate_group(event_time):
+            payload = json.dumps(txn, separators=(',', ':'))
+            lines.append(f"{source}\t{txn['txn_id']}\t{payload}\n")
+    return gzip.compress("".join(lines).encode('utf-8'), compresslevel=6)
+
+def generate_file(path: str, transactions: int, seed: int = 42, event_rate: float = 1000.0,
+                  start: datetime = None, workers: int = None) -> dict:
+    """Write a load file of `transactions` coordinated transactions; returns its header.
+    
+    Event timestamps advance by 1/event_rate seconds per transaction from
+    `start`, so the file looks like a burst of that rate to the engine's
+    event-time watermark. Chunks are generated in parallel processes and
+    written in order as concatenated gzip members.
+    """
+    start = start or datetime.now().replace(microsecond=0)
+    header = {
+        'format': FILE_FORMAT,
+        'transactions': transactions,
+        'seed': seed,
+        'event_rate': event_rate,
+        'start': start.isoformat(),
+        'mismatch_weights': MISMATCH_WEIGHTS,
+        'channel_sources': CHANNEL_SOURCES
+    }
+    chunks = [(index, first, min(CHUNK_SIZE, transactions - first), seed, start, event_rate)
+              for index, first in enumerate(range(0, transactions, CHUNK_SIZE))]
+    
+    print(f"🏭 Generating {transactions:,} transactions into {path} ({len(chunks)} chunks)")
+    started = time.perf_counter()
+    written = 0
+    with open(path, 'wb') as handle:
+        handle.write(gzip.compress((json.dumps(header) + "\n").encode('utf-8')))
+        with Pool(workers or os.cpu_count()) as pool:
+            for (_, _, count, _, _, _), member in zip(chunks, pool.imap(_generate_chunk, chunks)):
+                handle.write(member)
+                written += count
+                if written % (CHUNK_SIZE * 25) == 0 or written == transactions:
+                    print(f"   📦 {written:,}/{transactions:,} transactions")
+    
+    elapsed = time.perf_counter() - started
+    print(f"✅ Generated {transactions:,} transactions in {elapsed:.1f}s "
+          f"({os.path.getsize(path) / 1e6:.1f} MB, {transactions / max(elapsed, 1e-9):,.0f} txns/sec)")
+    return header
+
+def read_file(path: str):
+    """Return (header, iterator of (source, txn_id, payload_bytes)) for a load file"""
+    handle = gzip.open(path, 'rb')
+    header = json.loads(handle.readline())
+    if header.get('format') != FILE_FORMAT:
+        handle.close()
+        raise ValueError(f"{path} is not a {FILE_FORMAT} file")
+    
+    def messages():
+        with handle:
+            for line in handle:
+                source, txn_id, payload = line.rstrip(b'\n').split(b'\t', 2)
+                yield source.decode(), txn_id.decode(), payload
+    
+    return header, messages()
+
+# ==================== REPLAY ====================
+
+def parse_skew(value: str) -> dict:
+    """'gateway=0.3,mobile=1.5' -> {'gateway': 0.3, 'mobile': 1.5} (seconds behind core)"""
+    skew = {}
+    for part in filter(None, (value or "").split(",")):
+        source, _, seconds = part.partition("=")
+        skew[source.strip()] = float(seconds)
+    return skew
+
+class ReplayScheduler:
+    """Assigns each message a send time and releases messages in send-time order.
+    
+    Message n is nominally due at n / rate. A source's skew delays all its
+    messages by a fixed lag, and a fraction `out_of_order` of messages is
+    held back a further uniform(0, max_delay), so sources of one transaction
+    (and transactions of one source) arrive out of order. Delays are never
+    negative, so a message can be released once the nominal time of the
+    message being read has passed its send time.
+    """
+    
+    def __init__(self, rate: float, out_of_order: float = 0.0, max_delay: float = 1.0,
+                 skew: dict = None, seed: int = None):
+        self.interval = 1.0 / rate
+        self.out_of_order = out_of_order
+        self.max_delay = max_delay
+        floor = min([0.0] + list((skew or {}).values()))
+        self.skew = {source: seconds - floor for source, seconds in (skew or {}).items()}
+        self.random = random.Random(seed)
+        self.heap = []
+        self.count = 0
+    
+    def push(self, source: str, item) -> list:
+        """Schedule one message; returns the (send_time, item) pairs now safe to release"""
+        nominal = self.count * self.interval
+        due = nominal + self.skew.get(source, 0.0)
+        if self.out_of_order and self.random.random() < self.out_of_order:
+            due += self.random.uniform(0, self.max_delay)
+        heapq.heappush(self.heap, (due, self.count, item))
+        self.count += 1
+        
+        released = []
+        while self.heap and self.heap[0][0] <= nominal:
+            due, _, ready = heapq.heappop(self.heap)
+            released.append((due, ready))
+        return released
+    
+    def drain(self) -> list:
+        released = []
+        while self.heap:
+            due, _, ready = heapq.heappop(self.heap)
+            released.append((due, ready))
+        return released
+
+def replay_file(path: str, producer, rate: float = 1000.0, out_of_order: float = 0.0, max_delay: float = 1.0,
+                skew: dict = None, limit: int = None, seed: int = None, progress_interval: float = 5.0) -> dict:
+    """Send a load file through `producer` at `rate` messages/sec (0 = as fast as possible).
+    
+    Returns replay statistics; `max_behind` is how far (seconds) sending
+    fell behind the schedule, i.e. whether the producer kept up with the rate.
+    """
+    header, messages = read_file(path)
+    throttled = rate > 0
+    # Unthrottled runs still reorder, on a virtual clock of 10k messages/sec
+    scheduler = ReplayScheduler(rate if throttled else 10000.0, out_of_order, max_delay, skew, seed)
+    
+    print(f"▶️  Replaying {header['transactions']:,} transactions from {path} "
+          f"at {f'{rate:,.0f} msgs/sec' if throttled else 'full speed'}")
+    if out_of_order or scheduler.skew:
+        print(f"   🔀 Out-of-order: {out_of_order:.1%} up to {max_delay}s | Skew: {scheduler.skew or 'none'}")
+    
+    stats = {'sent': 0, 'failed': 0, 'reordered': 0, 'max_behind': 0.0, 'elapsed': 0.0}
+    last_sequence = -1
+    started = time.perf_counter()
+    next_progress = started + progress_interval
+    
+    def send(batch):
+        nonlocal last_sequence, next_progress
+        for due, (sequence, topic, key, payload) in batch:
+            if throttled:
+                behind = time.perf_counter() - started - due
+                if behind < -0.001:  # ahead of schedule; smaller gaps are absorbed by the next sleep
+                    time.sleep(-behind)
+                elif behind > stats['max_behind']:
+                    stats['max_behind'] = behind
+            
+            if producer.send(topic, payload, key=key):
+                stats['sent'] += 1
+            else:
+                stats['failed'] += 1
+            if sequence < last_sequence:
+                stats['reordered'] += 1
+            last_sequence = max(last_sequence, sequence)
+        
+        now = time.perf_counter()
+        if now >= next_progress:
+            elapsed = now - started
+            print(f"   📤 {stats['sent']:,} sent | {stats['sent'] / elapsed:,.0f} msgs/sec | "
+                  f"{stats['reordered']:,} out of order | max behind {stats['max_behind']:.2f}s")
+            next_progress = now + progress_interval
+    
+    try:
+        transactions, previous = 0, None
+        for sequence, (source, txn_id, payload) in enumerate(messages):
+            if txn_id != previous:  # the sources of a transaction are stored together
+                transactions += 1
+                previous = txn_id
+                if limit is not None and transactions > limit:
+                    break
+            send(scheduler.push(source, (sequence, TOPICS[source], txn_id, payload)))
+        send(scheduler.drain())
+    except KeyboardInterrupt:
+        print("\n🛑 Replay interrupted")
+    finally:
+        producer.flush()
+        stats['elapsed'] = time.perf_counter() - started
+    
+    stats['rate'] = stats['sent'] / max(stats['elapsed'], 1e-9)
+    print(f"✅ Replayed {stats['sent']:,} messages in {stats['elapsed']:.1f}s ({stats['rate']:,.0f} msgs/sec), "
+          f"{stats['failed']:,} failed, {stats['reordered']:,} out of order, max behind {stats['max_behind']:.2f}s")
+    return stats
+
+# ==================== CLI ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and replay synthetic reconciliation load")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    generate = commands.add_parser("generate", help="pre-generate a load file")
+    generate.add_argument("path")
+    generate.add_argument("--transactions", type=int, default=1000000)
+    generate.add_argument("--seed", type=int, default=42)
+    generate.add_argument("--event-rate", type=float, default=1000.0,
+                          help="transactions per second of event time in the generated timestamps")
+    generate.add_argument("--workers", type=int, default=None)
+    
+    replay = commands.add_parser("replay", help="replay a load file through a producer backend")
+    replay.add_argument("path")
+    replay.add_argument("--rate", type=float, default=1000.0, help="messages per second, 0 for full speed")
+    replay.add_argument("--out-of-order", type=float, default=0.0, help="fraction of messages delivered late")
+    replay.add_argument("--max-delay", type=float, default=1.0, help="maximum extra delay of a late message (s)")
+    replay.add_argument("--skew", default="", help="per-source lag, e.g. gateway=0.3,mobile=1.5 (s)")
+    replay.add_argument("--limit", type=int, default=None, help="replay only the first N transactions")
+    replay.add_argument("--seed", type=int, default=None)
+    replay.add_argument("--backend", default=None, help="kafka, docker, memory or file:<dir> (PRODUCER_BACKEND)")
+    
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate_file(args.path, args.transactions, args.seed, args.event_rate, workers=args.workers)
+    else:
+        producer = create_producer(args.backend)
+        try:
+            replay_file(args.path, producer, args.rate, args.out_of_order, args.max_delay,
+                        parse_skew(args.skew), args.limit, args.seed)
+        finally:
+            producer.close()
+            stats = producer.stats()
+            print(f"📤 {stats['backend']}: {stats['delivered']}/{stats['sent']} delivered, {stats['failed']} failed")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-import subprocess
+import os
 import time
-import json
 from utils import generate_txn, apply_mismatch, choose_mismatch
+from backends import create_producer
 
 SOURCE = "mobile"
 TOPIC = "mobile_txns"
@@ -9,33 +9,8 @@ TOPIC = "mobile_txns"
 print(f"🚀 Starting {SOURCE} producer (Docker mode)...")
 print("Press Ctrl+C to stop")
 
-def send_to_kafka_via_docker(topic, message):
-    """Send message to Kafka using docker exec"""
-    try:
-        # Convert message to JSON string
-        json_message = json.dumps(message)
-        
-        # Use docker exec to send message via kafka-console-producer
-        cmd = [
-            "docker", "exec", "-i", "kafka-kafka-1",
-            "kafka-console-producer",
-            "--bootstrap-server", "localhost:9092",
-            "--topic", topic
-        ]
-        
-        # Run the command and send the message via stdin
-        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        stdout, stderr = process.communicate(input=json_message)
-        
-        if process.returncode == 0:
-            return True
-        else:
-            print(f"Error sending message: {stderr}")
-            return False
-            
-    except Exception as e:
-        print(f"Exception sending message: {e}")
-        return False
+# One long-lived console producer per topic instead of a docker exec per message
+producer = create_producer(os.getenv("PRODUCER_BACKEND", "docker"))
 
 try:
     while True:
@@ -45,8 +20,8 @@ try:
         if mismatch != "CORRECT":
             txn = apply_mismatch(txn, mismatch)
         
-        # Send to Kafka via Docker
-        success = send_to_kafka_via_docker(TOPIC, txn)
+        # Queue on the producer backend (Docker console producer by default)
+        success = producer.send(TOPIC, txn, key=txn['txn_id'])
         
         if success:
             print(f"[{SOURCE.upper()}] Sent → {txn} | Mismatch = {mismatch}")
@@ -56,4 +31,6 @@ try:
         time.sleep(1.4)  # Different timing than core and gateway
 
 except KeyboardInterrupt:
-    print(f"\n🛑 {SOURCE} producer stopped")
\ No newline at end of file
+    print(f"\n🛑 {SOURCE} producer stopped")
+finally:
+    producer.close()
\ No newline at end of file
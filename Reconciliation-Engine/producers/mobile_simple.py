@@ -1,16 +1,11 @@
-from kafka import KafkaProducer
 import time
-import json
 from utils import generate_txn, apply_mismatch, choose_mismatch
+from backends import create_producer
 
 TOPIC = "mobile_txns"
 SOURCE = "mobile"
 
-producer = KafkaProducer(
-    bootstrap_servers=['localhost:9092'],
-    value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-    key_serializer=lambda k: k.encode('utf-8') if k else None
-)
+producer = create_producer()
 
 print(f"🚀 Starting {SOURCE} producer...")
 print("Press Ctrl+C to stop")
@@ -24,9 +19,10 @@ try:
             txn = apply_mismatch(txn, mismatch)
         
         try:
-            future = producer.send(TOPIC, value=txn, key=txn['txn_id'])
-            producer.flush()
-            print(f"[{SOURCE.upper()}] Sent → {txn} | Mismatch = {mismatch}")
+            if producer.send(TOPIC, txn, key=txn['txn_id']):
+                print(f"[{SOURCE.upper()}] Sent → {txn} | Mismatch = {mismatch}")
+            else:
+                print(f"[{SOURCE.upper()}] Failed to send → {txn} | Error: {producer.stats()['last_error']}")
         except Exception as e:
             print(f"[{SOURCE.upper()}] Failed to send → {txn} | Error: {e}")
         
@@ -36,6 +36,17 @@ CURRENCY_WEIGHTS = {
 # Banking channels
 CHANNELS = ["ATM", "ONLINE", "MOBILE", "BRANCH", "POS", "UPI"]
 
+# Source systems that report a transaction for each channel
+# (the reconciliation engine waits for exactly this set before reconciling)
+CHANNEL_SOURCES = {
+    "ATM": ["core", "gateway"],
+    "ONLINE": ["core", "gateway"],
+    "BRANCH": ["core", "gateway"],
+    "POS": ["core", "gateway"],
+    "MOBILE": ["core", "gateway", "mobile"],
+    "UPI": ["core", "gateway", "mobile"]
+}
+
 # Bank codes (realistic Indian bank codes)
 BANK_CODES = ["HDFC", "ICICI", "SBI", "AXIS", "KOTAK", "PNB", "BOI", "CANARA"]
 
@@ -84,7 +95,7 @@ def generate_txn(source):
         "txn_id": str(uuid.uuid4()),
         "amount": generate_realistic_amount(),
         "status": choose_realistic_status(),
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.now().isoformat(),
         "currency": choose_realistic_currency(),
         "account_id": str(random.randint(100000000, 999999999)),  # 9-digit account numbers
         "source": source,
@@ -96,8 +107,38 @@ def generate_txn(source):
         "description": f"Transaction via {random.choice(CHANNELS)}",
     }
 
-def apply_mismatch(txn, mismatch_type):
-    """Apply realistic banking mismatches"""
+def generate_base_transaction(now=None):
+    """Generate a realistic base banking transaction (shared by all its sources)"""
+    now = now or datetime.now()
+    return {
+        "txn_id": str(uuid.uuid4()),
+        "amount": generate_realistic_amount(),
+        "status": choose_realistic_status(),
+        "timestamp": now.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "currency": choose_realistic_currency(),
+        "account_id": str(random.randint(100000000, 999999999)),  # 9-digit account numbers
+        "transaction_type": random.choice(TRANSACTION_TYPES),
+        "channel": random.choice(CHANNELS),
+        "bank_code": random.choice(BANK_CODES),
+        "reference_number": f"REF{random.randint(100000000, 999999999)}",
+        "merchant_id": f"MER{random.randint(10000, 99999)}" if random.random() < 0.3 else None,
+        "description": f"Banking transaction via {random.choice(CHANNELS)}",
+        "batch_id": f"BATCH{now.strftime('%Y%m%d')}{random.randint(1000, 9999)}",
+    }
+
+def create_source_transaction(base_txn, source, now=None):
+    """Copy the base transaction for one source, with a weighted random mismatch"""
+    txn = base_txn.copy()
+    txn["source"] = source
+    
+    mismatch_type = choose_mismatch()
+    if mismatch_type != "CORRECT":
+        txn = apply_mismatch(txn, mismatch_type, now)
+    
+    return txn, mismatch_type
+
+def apply_mismatch(txn, mismatch_type, now=None):
+    """Apply realistic banking mismatches (TIME_MISMATCH is relative to now, default local time like the base txn)"""
     if mismatch_type == "AMOUNT_MISMATCH":
         # Realistic amount discrepancies (fees, rounding, exchange rate differences)
         variance = random.choice([
@@ -124,7 +165,7 @@ def apply_mismatch(txn, mismatch_type):
             random.randint(60, 300),    # Processing delay
             random.randint(3600, 7200)  # System batch processing delay
         ])
-        txn["timestamp"] = (datetime.utcnow() + timedelta(seconds=delay_seconds)).isoformat()
+        txn["timestamp"] = ((now or datetime.now()) + timedelta(seconds=delay_seconds)).isoformat()
     
     elif mismatch_type == "CURRENCY_MISMATCH":
         # For INR-only system, currency mismatch would be rare formatting issues